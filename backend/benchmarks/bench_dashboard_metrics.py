@@ -0,0 +1,171 @@
+"""
+Dashboard Metrics Benchmark
+
+Compares the previous dashboard quality-metrics and enumerator-performance
+computations (every matching submission loaded and reduced in Python)
+against the aggregation pipelines, on seeded submissions in a scratch
+MongoDB database, and checks both return the same JSON.
+
+Needs a running MongoDB (MONGO_URL, default mongodb://localhost:27017).
+The scratch database is dropped afterwards.
+
+Usage (from backend/):
+    python -m benchmarks.bench_dashboard_metrics [--rows 100000,1000000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient
+
+from utils.dashboard_metrics import (
+    enumerator_performance_pipeline, enumerator_performance_rows, enumerator_rows, quality_metrics_pipeline,
+    quality_metrics_result
+)
+
+ORG_ID = "bench_org"
+FLAGS = ["missing_required:name", "out_of_range:age", "speeding", "gps_low_accuracy", "duplicate"]
+
+
+def seed(collection, rows: int):
+    collection.drop()
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "id": f"s{i}",
+            "org_id": ORG_ID,
+            "project_id": f"p{i % 5}",
+            "form_id": f"f{i % 20}",
+            "submitted_by": f"u{rng.randrange(200)}",
+            "submitted_at": (now - timedelta(minutes=rng.randrange(60 * 24 * 60))).isoformat(),
+            "status": rng.choice(("pending", "approved", "approved", "rejected", "flagged")),
+            "quality_score": rng.choice((None, round(rng.uniform(40, 100), 1))),
+            "quality_flags": rng.sample(FLAGS, rng.choice((0, 0, 0, 1, 2))),
+            "data": {"name": f"respondent {i}", "age": rng.randrange(18, 90)},
+        })
+        if len(batch) == 10_000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    # Same indexes as server.py
+    collection.create_index([
+        ("org_id", 1), ("submitted_at", -1), ("project_id", 1), ("submitted_by", 1), ("status", 1), ("quality_score", 1)
+    ])
+    collection.create_index([("org_id", 1), ("project_id", 1), ("form_id", 1), ("status", 1)])
+    collection.create_index([("project_id", 1), ("status", 1)])
+    collection.create_index([("form_id", 1), ("submitted_at", -1), ("id", -1)])
+
+
+def previous_quality_metrics(collection, query: dict) -> dict:
+    """get_quality_metrics before the aggregation pipeline"""
+    submissions = list(collection.find(query, {"_id": 0, "quality_score": 1, "quality_flags": 1, "status": 1}))
+    if not submissions:
+        return quality_metrics_result([])
+    scores = [s["quality_score"] for s in submissions if s.get("quality_score") is not None]
+    avg_score = sum(scores) / len(scores) if scores else 0
+    flag_counts = defaultdict(int)
+    for sub in submissions:
+        for flag in sub.get("quality_flags", []):
+            flag_counts[flag] += 1
+    return {
+        "avg_quality_score": round(avg_score, 2),
+        "flagged_count": len([s for s in submissions if s.get("quality_flags")]),
+        "approved_count": len([s for s in submissions if s["status"] == "approved"]),
+        "rejected_count": len([s for s in submissions if s["status"] == "rejected"]),
+        "total_count": len(submissions),
+        "flag_distribution": dict(flag_counts)
+    }
+
+
+def previous_enumerator_performance(collection, query: dict) -> list:
+    """get_enumerator_performance before the aggregation pipeline (without the user lookup)"""
+    submissions = list(collection.find(
+        query, {"_id": 0, "submitted_by": 1, "quality_score": 1, "status": 1, "submitted_at": 1}
+    ))
+    stats = defaultdict(lambda: {"submission_count": 0, "quality_scores": [], "approved_count": 0, "rejected_count": 0})
+    for sub in submissions:
+        entry = stats[sub["submitted_by"]]
+        entry["submission_count"] += 1
+        if sub.get("quality_score") is not None:
+            entry["quality_scores"].append(sub["quality_score"])
+        if sub["status"] == "approved":
+            entry["approved_count"] += 1
+        elif sub["status"] == "rejected":
+            entry["rejected_count"] += 1
+    result = []
+    for user_id, entry in stats.items():
+        scores = entry["quality_scores"]
+        result.append({
+            "user_id": user_id,
+            "name": "Unknown",
+            "email": "",
+            "submission_count": entry["submission_count"],
+            "avg_quality_score": round(sum(scores) / len(scores), 2) if scores else 0,
+            "approved_count": entry["approved_count"],
+            "rejected_count": entry["rejected_count"],
+            "approval_rate": round(entry["approved_count"] / entry["submission_count"] * 100, 1)
+        })
+    result.sort(key=lambda x: x["submission_count"], reverse=True)
+    return result
+
+
+def pipeline_quality_metrics(collection, query: dict) -> dict:
+    return quality_metrics_result(list(collection.aggregate(quality_metrics_pipeline(query), allowDiskUse=True)))
+
+
+def pipeline_enumerator_performance(collection, query: dict) -> list:
+    rows = enumerator_rows(list(collection.aggregate(enumerator_performance_pipeline(query), allowDiskUse=True)))
+    return enumerator_performance_rows(rows, {})
+
+
+def timed(label: str, fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<36} {best * 1000:>10,.1f} ms")
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100000,1000000", help="comma-separated collection sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", default="datapulse_bench")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    collection = db.submissions
+    try:
+        for rows in (int(value) for value in args.rows.split(",")):
+            print(f"Seeding {rows:,} submissions...")
+            seed(collection, rows)
+
+            quality_query = {"org_id": ORG_ID}
+            start_date = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+            enumerator_query = {"org_id": ORG_ID, "submitted_at": {"$gte": start_date}}
+
+            print(f"\n{rows:,} submissions")
+            old, old_result = timed("quality metrics (Python)", lambda: previous_quality_metrics(collection, quality_query), args.repeat)
+            new, new_result = timed("quality metrics ($facet)", lambda: pipeline_quality_metrics(collection, quality_query), args.repeat)
+            print(f"  speedup {old / new:.1f}x, identical: {old_result == new_result}")
+
+            old, old_result = timed("enumerator performance (Python)", lambda: previous_enumerator_performance(collection, enumerator_query), args.repeat)
+            new, new_result = timed("enumerator performance ($group)", lambda: pipeline_enumerator_performance(collection, enumerator_query), args.repeat)
+            print(f"  speedup {old / new:.1f}x, identical: {old_result == new_result}\n")
+    finally:
+        client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Quality Scoring Microbenchmark
+
+Compares submissions/sec of the previous per-submission scorer (field
+map rebuilt on every call) against compiled quality rules, scored one
+at a time and as a vectorized batch, and checks they agree.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quality_rules [--rows 100000] [--fields 40]
+"""
+
+import argparse
+import random
+import time
+
+from utils.quality_rules import clear_quality_rules_cache, get_quality_rules
+
+
+def previous_score(data: dict, form_fields: list) -> tuple:
+    """The scorer the API and workers used before compiled rules (min_value 0 fixed)"""
+    score = 100.0
+    flags = []
+    field_map = {f["name"]: f for f in form_fields}
+    for field_name, field_config in field_map.items():
+        value = data.get(field_name)
+        validation = field_config.get("validation") or {}
+        if validation.get("required") and (value is None or value == "" or value == []):
+            score -= 10
+            flags.append(f"missing_required:{field_name}")
+        if value is not None and isinstance(value, (int, float)):
+            if validation.get("min_value") is not None and value < validation["min_value"]:
+                score -= 5
+                flags.append(f"below_min:{field_name}")
+            if validation.get("max_value") is not None and value > validation["max_value"]:
+                score -= 5
+                flags.append(f"above_max:{field_name}")
+    return max(0.0, score), flags
+
+
+def make_form(field_count: int) -> dict:
+    fields = []
+    for i in range(field_count):
+        if i % 2:
+            fields.append({"name": f"f{i}", "type": "number", "validation": {"required": i % 3 == 0, "min_value": 0, "max_value": 100}})
+        else:
+            fields.append({"name": f"f{i}", "type": "text", "validation": {"required": i % 4 == 0}})
+    return {"id": "bench", "version": 1, "fields": fields}
+
+
+def make_data(form: dict, count: int) -> list:
+    rng = random.Random(42)
+    rows = []
+    for _ in range(count):
+        row = {}
+        for field in form["fields"]:
+            if rng.random() < 0.05:
+                continue
+            row[field["name"]] = rng.uniform(-10, 110) if field["type"] == "number" else "answer"
+        rows.append(row)
+    return rows
+
+
+def timed(label: str, fn, rows: int, repeat: int = 3) -> tuple:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<32} {rows / best:>12,.0f} submissions/sec  ({best:.2f}s)")
+    return rows / best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--fields", type=int, default=40)
+    args = parser.parse_args()
+
+    form = make_form(args.fields)
+    datas = make_data(form, args.rows)
+    clear_quality_rules_cache()
+    rules = get_quality_rules(form)
+
+    print(f"{args.rows:,} submissions x {args.fields} fields ({len(rules.rules)} rules)\n")
+    before, expected = timed("per-call field map", lambda: [previous_score(d, form["fields"]) for d in datas], args.rows)
+    timed("compiled rules, one at a time", lambda: [rules.score(d) for d in datas], args.rows)
+    after, batched = timed("compiled rules, batch", lambda: rules.score_batch(datas), args.rows)
+    assert batched == expected, "batch scores differ from the per-call scorer"
+    print(f"\nbatch speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
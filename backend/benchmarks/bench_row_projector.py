@@ -0,0 +1,111 @@
+"""
+Row Projector Microbenchmark
+
+Compares rows/sec of the previous per-row approach (flatten the whole
+data dict, then look each column up and coerce it) against the
+precompiled row projector, for plain projection and for CSV rows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_row_projector [--rows 100000] [--fields 40]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.export_builder import csv_rows
+from utils.row_projector import KIND_COERCIONS, clear_projector_cache, get_row_projector
+from utils.streaming_export import coerce_float, flatten_dict
+
+
+def make_form(field_count: int) -> dict:
+    fields = []
+    for i in range(field_count):
+        kind = ("text", "number", "select", "date", "multiselect", "gps")[i % 6]
+        field = {"name": f"f{i}", "type": kind, "label": f"Field {i}"}
+        if kind in ("select", "multiselect"):
+            field["options"] = [{"value": v, "label": v.upper()} for v in ("a", "b", "c")]
+        fields.append(field)
+    return {"id": "bench", "version": 1, "name": "Benchmark", "fields": fields}
+
+
+def make_submissions(form: dict, count: int) -> list:
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    values = {
+        "text": lambda n: f"answer {n}",
+        "number": lambda n: n * 1.5,
+        "select": lambda n: "abc"[n % 3],
+        "date": lambda n: "2000-01-02",
+        "multiselect": lambda n: ["a", "c"],
+        "gps": lambda n: {"latitude": -1.29, "longitude": 36.82, "accuracy": 5},
+    }
+    return [
+        {
+            "id": f"s{n}",
+            "submitted_by": "u1",
+            "submitted_at": (base + timedelta(seconds=n)).isoformat(),
+            "status": "pending",
+            "quality_score": 90.0,
+            "data": {f["name"]: values[f["type"]](n) for f in form["fields"]},
+        }
+        for n in range(count)
+    ]
+
+
+def flatten_and_lookup(form: dict, submissions: list) -> list:
+    """The pre-projector approach: flatten every row, then per-column lookups"""
+    projector = get_row_projector(form)
+    coercions = [KIND_COERCIONS.get(column.kind, str) for column in projector.columns]
+    gps = {f["name"] for f in form["fields"] if f["type"] == "gps"}
+    rows = []
+    for sub in submissions:
+        flat = flatten_dict(sub.get("data", {}))
+        row = [
+            coercions[0](sub.get("id")),
+            coercions[1](sub.get("submitted_by")),
+            coercions[2](sub.get("submitted_at")),
+            coercions[3](sub.get("status")),
+            coercions[4](sub.get("quality_score")),
+        ]
+        for field in form["fields"]:
+            name = field["name"]
+            if name in gps:
+                row.append(coerce_float(flat.get(f"{name}.latitude")))
+                row.append(coerce_float(flat.get(f"{name}.longitude")))
+            else:
+                row.append(coercions[len(row)](flat.get(name)))
+        rows.append(row)
+    return rows
+
+
+def timed(label: str, fn, rows: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    rate = rows / best
+    print(f"{label:<32} {rate:>12,.0f} rows/sec")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--fields", type=int, default=40)
+    args = parser.parse_args()
+
+    form = make_form(args.fields)
+    submissions = make_submissions(form, args.rows)
+    clear_projector_cache()
+    projector = get_row_projector(form)
+
+    print(f"{args.rows:,} submissions x {args.fields} fields ({len(projector.columns)} columns)\n")
+    before = timed("flatten_dict + lookups", lambda: flatten_and_lookup(form, submissions), args.rows)
+    after = timed("row projector", lambda: projector.project_rows(submissions), args.rows)
+    timed("row projector -> CSV rows", lambda: csv_rows(form, submissions), args.rows)
+    print(f"\nprojection speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Handles async processing, scheduled jobs, and heavy operations
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,6 +68,12 @@ celery_app.conf.update(
 )
 
 
+# One pooled MongoDB client (and event loop for async tasks) per worker process
+from utils.mongo_pool import init_worker_mongo, shutdown_worker_mongo
+worker_process_init.connect(init_worker_mongo, weak=False)
+worker_process_shutdown.connect(shutdown_worker_mongo, weak=False)
+
+
 # Task base class with error handling
 class BaseTask(celery_app.Task):
     """Base task with error handling and logging"""
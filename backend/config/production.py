@@ -3,12 +3,14 @@ Production Configuration for FieldForce
 Handles Redis caching, S3 storage, rate limiting, and background jobs
 """
 import os
-from typing import Optional
+from typing import Any, Optional, Tuple
 from functools import wraps
+import inspect
 import json
 import hashlib
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 
 import redis.asyncio as aioredis
@@ -25,11 +27,14 @@ class RedisConfig:
     """Redis connection manager for caching and rate limiting"""
     
     _instance: Optional[aioredis.Redis] = None
+    # After a failed connection, callers get None until this monotonic time
+    _retry_at: float = 0.0
+    RETRY_SECONDS = float(os.environ.get('REDIS_RETRY_SECONDS', '30'))
     
     @classmethod
     async def get_client(cls) -> Optional[aioredis.Redis]:
         """Get or create Redis client"""
-        if cls._instance is None:
+        if cls._instance is None and time.monotonic() >= cls._retry_at:
             redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379')
             try:
                 cls._instance = aioredis.from_url(
@@ -42,8 +47,9 @@ class RedisConfig:
                 await cls._instance.ping()
                 logger.info(f"Redis connected: {redis_url}")
             except Exception as e:
-                logger.warning(f"Redis not available: {e}. Caching disabled.")
+                logger.warning(f"Redis not available: {e}. Caching disabled for {cls.RETRY_SECONDS:.0f}s.")
                 cls._instance = None
+                cls._retry_at = time.monotonic() + cls.RETRY_SECONDS
         return cls._instance
     
     @classmethod
@@ -107,7 +113,8 @@ class CacheManager:
         redis = await RedisConfig.get_client()
         if redis:
             try:
-                keys = await redis.keys(f"fieldforce:{pattern}:*")
+                # SCAN instead of KEYS so large keyspaces do not block Redis
+                keys = [key async for key in redis.scan_iter(match=f"fieldforce:{pattern}:*", count=500)]
                 if keys:
                     return await redis.delete(*keys)
             except Exception as e:
@@ -132,29 +139,133 @@ class CacheManager:
             return await cls.set(key, json.dumps(value, default=str), ttl)
         except (TypeError, ValueError):
             return False
+    
+    # ---- Generations: invalidate a whole scope with one INCR ----
+    
+    @staticmethod
+    def _generation_key(scope: str) -> str:
+        return f"fieldforce:gen:{scope}"
+    
+    @classmethod
+    async def bump_generation(cls, scope: str) -> bool:
+        """Mark every cached entry of a scope (see scope_key) as stale"""
+        redis = await RedisConfig.get_client()
+        if redis:
+            try:
+                await redis.incr(cls._generation_key(scope))
+                return True
+            except Exception as e:
+                logger.warning(f"Cache generation bump error: {e}")
+        return False
+    
+    @classmethod
+    async def get_entry(cls, key: str, scope: Optional[str] = None) -> Tuple[Optional[dict], int]:
+        """(cached() entry or None, current generation of scope) in one round trip"""
+        redis = await RedisConfig.get_client()
+        if redis:
+            try:
+                keys = [key, cls._generation_key(scope)] if scope else [key]
+                values = await redis.mget(keys)
+                entry = json.loads(values[0]) if values[0] else None
+                generation = int(values[1] or 0) if scope else 0
+                return entry, generation
+            except Exception as e:
+                logger.warning(f"Cache get error: {e}")
+        return None, 0
+    
+    @classmethod
+    async def set_entry(cls, key: str, value: Any, generation: int, ttl: int, stale_ttl: int) -> bool:
+        """Store a cached() entry, fresh for ttl seconds and kept stale_ttl seconds longer"""
+        entry = {"value": value, "fresh_until": time.time() + ttl, "generation": generation}
+        try:
+            return await cls.set(key, json.dumps(entry, default=str), ttl + stale_ttl)
+        except (TypeError, ValueError):
+            return False
+    
+    @classmethod
+    async def acquire_lock(cls, key: str, ttl: int) -> bool:
+        """Set key if absent (expires after ttl); True for the one caller that set it"""
+        redis = await RedisConfig.get_client()
+        if redis:
+            try:
+                return bool(await redis.set(key, "1", nx=True, ex=ttl))
+            except Exception as e:
+                logger.warning(f"Cache lock error: {e}")
+        return False
 
 
-def cached(prefix: str, ttl: int = 300):
-    """Decorator to cache function results"""
+def scope_key(name: str, value: Any) -> str:
+    """Generation scope of a cached() argument, e.g. scope_key("org_id", org_id)"""
+    return f"{name}:{value}"
+
+
+# Longest a background refresh may hold its lock
+CACHE_REFRESH_LOCK_SECONDS = 60
+
+# Running background refreshes (the event loop only keeps weak references)
+_refresh_tasks: set = set()
+
+
+def cached(prefix: str, ttl: int = 300, stale_ttl: int = 0, scope: Optional[str] = None):
+    """
+    Decorator to cache function results (stale-while-revalidate).
+    
+    A result is fresh for `ttl` seconds. After that, or once the
+    generation of its scope has been bumped, callers keep getting the
+    stale result for up to `stale_ttl` more seconds while a single caller
+    (across processes) recomputes it in the background.
+    
+    scope: name of the argument whose value scopes invalidation, e.g.
+    "org_id"; CacheManager.bump_generation(scope_key("org_id", org_id))
+    then invalidates every entry for that org.
+    
+    The first positional argument (self, request or db) is not part of
+    the key. Results must be JSON-serializable.
+    """
     def decorator(func):
+        signature = inspect.signature(func)
+        
+        async def refresh(key: str, lock: str, generation: int, args, kwargs):
+            try:
+                result = await func(*args, **kwargs)
+                if result is not None:
+                    await CacheManager.set_entry(key, result, generation, ttl, stale_ttl)
+                    logger.debug(f"Cache REFRESHED: {key}")
+            except Exception as e:
+                logger.warning(f"Cache refresh failed for {key}: {e}")
+            finally:
+                await CacheManager.delete(lock)
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Skip 'self' or 'request' from cache key
             cache_args = args[1:] if args else args
             key = CacheManager._make_key(prefix, *cache_args, **kwargs)
+            scope_name = None
+            if scope:
+                scope_name = scope_key(scope, signature.bind(*args, **kwargs).arguments[scope])
             
-            # Try to get from cache
-            cached_result = await CacheManager.get_json(key)
-            if cached_result is not None:
-                logger.debug(f"Cache HIT: {key}")
-                return cached_result
+            entry, generation = await CacheManager.get_entry(key, scope_name)
+            if entry is not None:
+                if entry["fresh_until"] > time.time() and entry["generation"] == generation:
+                    logger.debug(f"Cache HIT: {key}")
+                    return entry["value"]
+                
+                # Stale: answer now, refresh once in the background
+                lock = f"{key}:refresh"
+                if await CacheManager.acquire_lock(lock, CACHE_REFRESH_LOCK_SECONDS):
+                    task = asyncio.create_task(refresh(key, lock, generation, args, kwargs))
+                    _refresh_tasks.add(task)
+                    task.add_done_callback(_refresh_tasks.discard)
+                logger.debug(f"Cache STALE: {key}")
+                return entry["value"]
             
             # Execute function
             result = await func(*args, **kwargs)
             
             # Store in cache
             if result is not None:
-                await CacheManager.set_json(key, result, ttl)
+                await CacheManager.set_entry(key, result, generation, ttl, stale_ttl)
                 logger.debug(f"Cache SET: {key}")
             
             return result
@@ -251,6 +362,40 @@ class S3Storage:
             logger.error(f"S3 upload error: {e}")
             return None
     
+    @classmethod
+    async def upload_path(
+        cls,
+        path: str,
+        key: str,
+        content_type: str = 'application/octet-stream'
+    ) -> Optional[str]:
+        """Upload a local file to S3 (multipart for large files) and return URL"""
+        client = cls.get_client()
+        if not client:
+            return None
+        
+        try:
+            # upload_file streams from disk instead of reading the file into memory
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(
+                None,
+                lambda: client.upload_file(
+                    path,
+                    cls._bucket,
+                    key,
+                    ExtraArgs={'ContentType': content_type}
+                )
+            )
+            
+            cdn_domain = os.environ.get('CDN_DOMAIN')
+            if cdn_domain:
+                return f"https://{cdn_domain}/{key}"
+            return f"https://{cls._bucket}.s3.amazonaws.com/{key}"
+            
+        except ClientError as e:
+            logger.error(f"S3 upload error: {e}")
+            return None
+    
     @classmethod
     async def get_presigned_url(
         cls, 
@@ -278,6 +423,25 @@ class S3Storage:
             logger.error(f"S3 presigned URL error: {e}")
             return None
     
+    @classmethod
+    async def file_exists(cls, key: str) -> bool:
+        """Whether an object is still in the bucket (HEAD request)"""
+        client = cls.get_client()
+        if not client:
+            return False
+        
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(
+                None,
+                lambda: client.head_object(Bucket=cls._bucket, Key=key)
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                logger.error(f"S3 head error: {e}")
+            return False
+    
     @classmethod
     async def delete_file(cls, key: str) -> bool:
         """Delete file from S3"""
@@ -7,8 +7,12 @@ from .prometheus_metrics import (
     record_bulk_submission,
     update_active_users,
     update_db_connections,
+    update_mongo_pool,
+    record_mongo_checkout_failure,
     update_celery_queue,
-    update_celery_workers
+    update_celery_workers,
+    record_cache_lookup,
+    record_ingest_flush
 )
 
 __all__ = [
@@ -19,6 +23,10 @@ __all__ = [
     'record_bulk_submission',
     'update_active_users',
     'update_db_connections',
+    'update_mongo_pool',
+    'record_mongo_checkout_failure',
     'update_celery_queue',
-    'update_celery_workers'
+    'update_celery_workers',
+    'record_cache_lookup',
+    'record_ingest_flush'
 ]
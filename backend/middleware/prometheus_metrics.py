@@ -67,6 +67,24 @@ DB_CONNECTIONS = Gauge(
     ['database']
 )
 
+MONGO_POOL_CONNECTIONS = Gauge(
+    'fieldforce_mongo_pool_connections',
+    'MongoDB connections of this process by state',
+    ['role', 'state']
+)
+
+MONGO_POOL_MAX_SIZE = Gauge(
+    'fieldforce_mongo_pool_max_size',
+    'Configured MongoDB maxPoolSize of this process',
+    ['role']
+)
+
+MONGO_CHECKOUT_FAILURES = Counter(
+    'fieldforce_mongo_pool_checkout_failures_total',
+    'Failed MongoDB connection checkouts',
+    ['role', 'reason']
+)
+
 CELERY_QUEUE_LENGTH = Gauge(
     'celery_queue_length',
     'Number of tasks in Celery queue',
@@ -78,6 +96,30 @@ CELERY_WORKERS = Gauge(
     'Number of active Celery workers'
 )
 
+INGEST_FLUSHES = Counter(
+    'fieldforce_ingest_flushes_total',
+    'Ingest buffer bulk writes',
+    ['status']
+)
+
+INGEST_FLUSH_SIZE = Histogram(
+    'fieldforce_ingest_flush_size',
+    'Submissions written per ingest buffer flush',
+    buckets=[1, 10, 50, 100, 250, 500, 1000, 5000]
+)
+
+INGEST_FLUSH_LATENCY = Histogram(
+    'fieldforce_ingest_flush_duration_seconds',
+    'Ingest buffer bulk write duration',
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
+CACHE_REQUESTS = Counter(
+    'fieldforce_cache_requests_total',
+    'In-process cache lookups',
+    ['cache', 'result']
+)
+
 
 class PrometheusMiddleware(BaseHTTPMiddleware):
     """Middleware to collect HTTP request metrics"""
@@ -159,6 +201,18 @@ def update_db_connections(database: str, count: int):
     DB_CONNECTIONS.labels(database=database).set(count)
 
 
+def update_mongo_pool(role: str, open_connections: int, checked_out: int, max_size: int):
+    """Update MongoDB connection pool gauges"""
+    MONGO_POOL_CONNECTIONS.labels(role=role, state="open").set(open_connections)
+    MONGO_POOL_CONNECTIONS.labels(role=role, state="checked_out").set(checked_out)
+    MONGO_POOL_MAX_SIZE.labels(role=role).set(max_size)
+
+
+def record_mongo_checkout_failure(role: str, reason: str):
+    """Record a failed MongoDB connection checkout (e.g. pool exhausted)"""
+    MONGO_CHECKOUT_FAILURES.labels(role=role, reason=reason).inc()
+
+
 def update_celery_queue(queue: str, length: int):
     """Update Celery queue length gauge"""
     CELERY_QUEUE_LENGTH.labels(queue=queue).set(length)
@@ -167,3 +221,16 @@ def update_celery_queue(queue: str, length: int):
 def update_celery_workers(count: int):
     """Update Celery workers count"""
     CELERY_WORKERS.set(count)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Record an in-process cache hit or miss"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_ingest_flush(size: int, duration: float, status: str = "success"):
+    """Record an ingest buffer flush"""
+    INGEST_FLUSHES.labels(status=status).inc()
+    if status == "success":
+        INGEST_FLUSH_SIZE.observe(size)
+        INGEST_FLUSH_LATENCY.observe(duration)
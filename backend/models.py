@@ -244,6 +244,8 @@ class SubmissionBase(BaseModel):
     data: Dict[str, Any]
     device_id: Optional[str] = None
     device_info: Optional[Dict[str, Any]] = None
+    # Locally generated uuid; with device_id it makes retried uploads idempotent
+    client_submission_id: Optional[str] = None
 
 
 class SubmissionCreate(SubmissionBase):
@@ -267,6 +269,7 @@ class Submission(SubmissionBase):
     reviewed_at: Optional[datetime] = None
     review_notes: Optional[str] = None
     case_id: Optional[str] = None
+    idempotency_key: Optional[str] = None  # "<user_id>:<device_id>:<client_submission_id>", unique
 
 
 class SubmissionOut(BaseModel):
@@ -282,6 +285,20 @@ class SubmissionOut(BaseModel):
     gps_location: Optional[Dict[str, float]]
 
 
+class SubmissionPartialOut(BaseModel):
+    """Submission read with fields= / exclude_data=: only the selected fields are present (id always)"""
+    id: str
+    form_id: Optional[str] = None
+    form_version: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
+    submitted_by: Optional[str] = None
+    submitted_at: Optional[datetime] = None
+    status: Optional[str] = None
+    quality_score: Optional[float] = None
+    quality_flags: Optional[List[str]] = None
+    gps_location: Optional[Dict[str, float]] = None
+
+
 # ============= CASE MODELS =============
 class CaseBase(BaseModel):
     respondent_id: str
@@ -346,9 +363,22 @@ class AuditLogOut(BaseModel):
 # ============= EXPORT MODELS =============
 class ExportRequest(BaseModel):
     form_id: str
-    format: Literal["csv", "xlsx", "json"] = "csv"
+    format: Literal["csv", "xlsx", "json", "ndjson", "parquet", "arrow", "stata", "spss"] = "csv"
     filters: Dict[str, Any] = Field(default_factory=dict)
     fields: Optional[List[str]] = None  # Specific fields to export
+    since: Optional[str] = None  # Delta export: ISO timestamp, export job id, or "last"
+    compression: Optional[Literal["gzip", "zstd", "none"]] = None  # None = negotiate via Accept-Encoding
+
+
+class BatchExportRequest(BaseModel):
+    """Export several forms of a project or organization into one archive"""
+    project_id: Optional[str] = None
+    org_id: Optional[str] = None  # Used when project_id is not given
+    form_ids: Optional[List[str]] = None  # Subset of the scope's forms
+    format: Literal["csv", "xlsx", "json", "ndjson", "parquet", "arrow", "stata", "spss"] = "csv"
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    since: Optional[str] = None  # ISO timestamp or batch export job id
+    include_archived: bool = False
 
 
 class ExportJob(BaseModel):
@@ -356,14 +386,31 @@ class ExportJob(BaseModel):
     id: str = Field(default_factory=gen_id)
     org_id: str
     user_id: str
-    form_id: str
+    form_id: Optional[str] = None  # None for project/org exports
     format: str
-    status: Literal["pending", "processing", "completed", "failed"] = "pending"
+    status: Literal["pending", "processing", "completed", "failed", "expired"] = "pending"
     file_url: Optional[str] = None
     row_count: int = 0
     created_at: datetime = Field(default_factory=utc_now)
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
+    # Background export jobs
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    form_version: Optional[int] = None
+    watermark: Optional[str] = None  # submitted_at of newest exported submission
+    since: Optional[str] = None  # Delta exports: resolved lower watermark
+    high_water_mark: Optional[str] = None  # Latest submitted/modified time exported; next delta starts here
+    compression: Optional[str] = None  # gzip/zstd-compressed artifact
+    # Project/organization exports: one ZIP entry per form plus manifest.json
+    scope: Literal["form", "project", "org"] = "form"
+    project_id: Optional[str] = None
+    form_ids: List[str] = Field(default_factory=list)
+    manifest: Optional[Dict[str, Any]] = None
+    cache_key: Optional[str] = None
+    progress: int = 0
+    storage: Optional[Literal["local", "s3"]] = None
+    artifact_key: Optional[str] = None
+    file_size: Optional[int] = None
 
 
 # ============= DASHBOARD MODELS =============
@@ -1,12 +1,19 @@
 """DataPulse - Advanced Analytics and Reporting API"""
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, status
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timezone, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
 from bson import ObjectId
-import json
+import csv
+import io
 
 from auth import get_current_user
+from utils.analytics_queries import (
+    cached_analytics, get_date_range, percent_change, period_totals, previous_range, quality_breakdown,
+    ranked_by, round_quality, status_distribution, submission_series, top_rows
+)
+from utils.batch_lookup import get_batch_lookup
+from utils.rollups import Bucket
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -26,41 +33,34 @@ class ReportConfig(BaseModel):
     recipients: List[str] = []
 
 
-# Helper functions
-def get_date_range(period: str) -> tuple:
-    """Get start and end dates for a period"""
-    now = datetime.now(timezone.utc)
+def _common_filters(project_id: Optional[str], form_id: Optional[str]) -> Dict[str, Any]:
+    return {"project_id": project_id, "form_id": form_id}
+
+
+async def _check_org_access(
+    db,
+    org_id: str,
+    current_user: dict,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+):
+    """403 unless the caller belongs to the org; 404 for project/form filters outside it"""
+    membership = await db.org_members.find_one(
+        {"org_id": org_id, "user_id": current_user["user_id"]},
+        {"_id": 0}
+    )
     
-    if period == "today":
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = now
-    elif period == "yesterday":
-        start = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=1)
-    elif period == "7_days":
-        start = now - timedelta(days=7)
-        end = now
-    elif period == "30_days":
-        start = now - timedelta(days=30)
-        end = now
-    elif period == "90_days":
-        start = now - timedelta(days=90)
-        end = now
-    elif period == "this_month":
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now
-    elif period == "last_month":
-        first_of_month = now.replace(day=1)
-        end = first_of_month - timedelta(days=1)
-        start = end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif period == "this_year":
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now
-    else:
-        start = now - timedelta(days=30)
-        end = now
+    if not membership and not current_user.get("is_superadmin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
     
-    return start, end
+    # Counters and rollups are looked up by these ids alone
+    if project_id and not await db.projects.find_one({"id": project_id, "org_id": org_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Project not found")
+    if form_id and not await db.forms.find_one({"id": form_id, "org_id": org_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Form not found")
 
 
 @router.get("/overview/{org_id}")
@@ -68,86 +68,66 @@ async def get_analytics_overview(
     request: Request,
     org_id: str,
     period: str = "30_days",
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get comprehensive analytics overview"""
     db = request.app.state.db
-    start_date, end_date = get_date_range(period)
-    
-    # Get previous period for comparison
-    period_length = (end_date - start_date).days
-    prev_start = start_date - timedelta(days=period_length)
-    prev_end = start_date
-    
-    # Current period stats
-    submissions_count = await db.submissions.count_documents({
-        "org_id": org_id,
-        "submitted_at": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
-    })
-    
-    # Previous period for comparison
-    prev_submissions = await db.submissions.count_documents({
-        "org_id": org_id,
-        "submitted_at": {"$gte": prev_start.isoformat(), "$lte": prev_end.isoformat()}
-    })
-    
-    # Calculate trends
-    submission_trend = ((submissions_count - prev_submissions) / max(prev_submissions, 1)) * 100
-    
-    # Quality metrics
-    quality_pipeline = [
-        {"$match": {"org_id": org_id}},
-        {"$group": {
-            "_id": None,
-            "avg_quality": {"$avg": "$quality_score"},
-            "total": {"$sum": 1}
-        }}
-    ]
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
+    filters = _common_filters(project_id, form_id)
     
-    # Forms analytics
-    forms_count = await db.forms.count_documents({"org_id": org_id})
-    active_forms = await db.forms.count_documents({"org_id": org_id, "status": "published"})
-    
-    # User activity
-    users_count = await db.org_members.count_documents({"org_id": org_id})
-    
-    # Submission status distribution
-    status_pipeline = [
-        {"$match": {"org_id": org_id}},
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-    ]
-    status_dist = await db.submissions.aggregate(status_pipeline).to_list(10)
-    
-    return {
-        "period": period,
-        "date_range": {
-            "start": start_date.isoformat(),
-            "end": end_date.isoformat()
-        },
-        "summary": {
-            "submissions": {
-                "total": submissions_count,
-                "trend": round(submission_trend, 1),
-                "previous": prev_submissions
-            },
-            "forms": {
-                "total": forms_count,
-                "active": active_forms
+    async def compute():
+        start_date, end_date = get_date_range(period)
+        prev_start, prev_end = previous_range(start_date, end_date)
+        
+        # Period totals from the rollups (live only for the current partial hour)
+        current = await period_totals(db, org_id, start_date, end_date, **filters)
+        previous = await period_totals(db, org_id, prev_start, prev_end, **filters)
+        
+        # Quality metrics
+        quality_avg = current.avg_quality
+        quality_trend = quality_avg - previous.avg_quality if quality_avg is not None and previous.avg_quality is not None else 0
+        
+        # Forms analytics
+        form_query = {"org_id": org_id}
+        if project_id:
+            form_query["project_id"] = project_id
+        forms_count = await db.forms.count_documents(form_query)
+        active_forms = await db.forms.count_documents({**form_query, "status": "published"})
+        
+        # User activity
+        users_count = await db.org_members.count_documents({"org_id": org_id})
+        
+        return {
+            "period": period,
+            "date_range": {
+                "start": start_date.isoformat(),
+                "end": end_date.isoformat()
             },
-            "users": {
-                "total": users_count
+            "summary": {
+                "submissions": {
+                    "total": current["count"],
+                    "trend": percent_change(current["count"], previous["count"]),
+                    "previous": previous["count"]
+                },
+                "forms": {
+                    "total": forms_count,
+                    "active": active_forms
+                },
+                "users": {
+                    "total": users_count
+                },
+                "quality": {
+                    "average": round_quality(quality_avg),
+                    "trend": round(quality_trend, 1)
+                }
             },
-            "quality": {
-                "average": 85.5,  # Placeholder
-                "trend": 2.3
-            }
-        },
-        "status_distribution": {s["_id"]: s["count"] for s in status_dist} if status_dist else {
-            "approved": 65,
-            "pending": 25,
-            "rejected": 10
+            # Submission status distribution (all time)
+            "status_distribution": await status_distribution(db, org_id, **filters)
         }
-    }
+    
+    return await cached_analytics("overview", org_id, {"period": period, **filters}, compute)
 
 
 @router.get("/submissions/{org_id}")
@@ -156,68 +136,37 @@ async def get_submission_analytics(
     org_id: str,
     period: str = "30_days",
     group_by: str = "day",
+    project_id: Optional[str] = None,
     form_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get detailed submission analytics with time series"""
     db = request.app.state.db
-    start_date, end_date = get_date_range(period)
-    
-    # Generate time series data
-    time_series = []
-    current = start_date
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
+    lookup = get_batch_lookup(request)
+    filters = _common_filters(project_id, form_id)
     
-    if group_by == "day":
-        delta = timedelta(days=1)
-        date_format = "%Y-%m-%d"
-    elif group_by == "week":
-        delta = timedelta(weeks=1)
-        date_format = "%Y-W%W"
-    else:  # month
-        delta = timedelta(days=30)
-        date_format = "%Y-%m"
-    
-    # Generate sample data (in production, query DB)
-    import random
-    while current <= end_date:
-        time_series.append({
-            "date": current.strftime(date_format),
-            "submissions": random.randint(10, 100),
-            "approved": random.randint(5, 80),
-            "rejected": random.randint(0, 10),
-            "pending": random.randint(0, 20)
-        })
-        current += delta
-    
-    # Top forms by submissions
-    top_forms = [
-        {"form_id": "form1", "name": "Household Survey", "submissions": 234, "quality_avg": 87.5},
-        {"form_id": "form2", "name": "Health Screening", "submissions": 189, "quality_avg": 92.1},
-        {"form_id": "form3", "name": "Customer Feedback", "submissions": 156, "quality_avg": 78.3},
-        {"form_id": "form4", "name": "Event Registration", "submissions": 98, "quality_avg": 95.0},
-        {"form_id": "form5", "name": "Agriculture Survey", "submissions": 67, "quality_avg": 88.7}
-    ]
-    
-    # Top enumerators
-    top_users = [
-        {"user_id": "u1", "name": "John Doe", "submissions": 156, "quality_avg": 91.2},
-        {"user_id": "u2", "name": "Jane Smith", "submissions": 134, "quality_avg": 88.5},
-        {"user_id": "u3", "name": "Mike Johnson", "submissions": 112, "quality_avg": 85.3},
-        {"user_id": "u4", "name": "Sarah Williams", "submissions": 98, "quality_avg": 93.7},
-        {"user_id": "u5", "name": "Tom Brown", "submissions": 87, "quality_avg": 82.1}
-    ]
-    
-    return {
-        "time_series": time_series,
-        "top_forms": top_forms,
-        "top_users": top_users,
-        "totals": {
-            "submissions": sum(t["submissions"] for t in time_series),
-            "approved": sum(t["approved"] for t in time_series),
-            "rejected": sum(t["rejected"] for t in time_series),
-            "pending": sum(t["pending"] for t in time_series)
+    async def compute():
+        start_date, end_date = get_date_range(period)
+        time_series = await submission_series(db, org_id, start_date, end_date, group_by, **filters)
+        
+        # Top forms and enumerators by submissions
+        by_form = await ranked_by(db, org_id, start_date, end_date, "form_id", 5, **filters)
+        by_user = await ranked_by(db, org_id, start_date, end_date, "user_id", 5, **filters)
+        
+        return {
+            "time_series": time_series,
+            "top_forms": await top_rows(lookup, "form_id", by_form),
+            "top_users": await top_rows(lookup, "user_id", by_user),
+            "totals": {
+                "submissions": sum(t["submissions"] for t in time_series),
+                "approved": sum(t["approved"] for t in time_series),
+                "rejected": sum(t["rejected"] for t in time_series),
+                "pending": sum(t["pending"] for t in time_series)
+            }
         }
-    }
+    
+    return await cached_analytics("submissions", org_id, {"period": period, "group_by": group_by, **filters}, compute)
 
 
 @router.get("/quality/{org_id}")
@@ -225,60 +174,76 @@ async def get_quality_analytics(
     request: Request,
     org_id: str,
     period: str = "30_days",
+    group_by: str = "day",
+    project_id: Optional[str] = None,
     form_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get quality analytics with breakdown by factors"""
+    db = request.app.state.db
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
+    filters = _common_filters(project_id, form_id)
     
-    # Quality score distribution
-    score_distribution = [
-        {"range": "0-20", "count": 5, "percentage": 2},
-        {"range": "21-40", "count": 12, "percentage": 5},
-        {"range": "41-60", "count": 35, "percentage": 14},
-        {"range": "61-80", "count": 89, "percentage": 35},
-        {"range": "81-100", "count": 112, "percentage": 44}
-    ]
-    
-    # Quality factors breakdown
-    quality_factors = [
-        {"factor": "Completeness", "score": 92.5, "weight": 0.3},
-        {"factor": "Accuracy", "score": 87.3, "weight": 0.25},
-        {"factor": "Timeliness", "score": 95.1, "weight": 0.15},
-        {"factor": "GPS Accuracy", "score": 78.9, "weight": 0.15},
-        {"factor": "Photo Quality", "score": 85.2, "weight": 0.15}
-    ]
+    async def compute():
+        start_date, end_date = get_date_range(period)
+        overall = await period_totals(db, org_id, start_date, end_date, **filters)
+        
+        # Quality trends
+        series = await submission_series(db, org_id, start_date, end_date, group_by, **filters)
+        quality_trends = [
+            {"date": point["date"], "average": point["quality_avg"], "submissions": point["submissions"]}
+            for point in series
+        ]
+        
+        # Score distribution, factors and issues from the period's submissions
+        breakdown = await quality_breakdown(db, org_id, start_date, end_date, **filters)
+        
+        return {
+            "overall_score": round_quality(overall.avg_quality),
+            "score_distribution": breakdown["score_distribution"],
+            "quality_factors": breakdown["quality_factors"],
+            "quality_trends": quality_trends,
+            "common_issues": breakdown["common_issues"],
+            "recommendations": breakdown["recommendations"]
+        }
     
-    # Quality trends
-    import random
-    quality_trends = []
-    for i in range(30):
-        quality_trends.append({
-            "date": (datetime.now() - timedelta(days=30-i)).strftime("%Y-%m-%d"),
-            "average": 80 + random.uniform(-5, 10),
-            "submissions": random.randint(20, 50)
+    return await cached_analytics("quality", org_id, {"period": period, "group_by": group_by, **filters}, compute)
+
+
+async def _user_performance(
+    request: Request,
+    org_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    limit: Optional[int] = None,
+    **filters
+) -> Tuple[Bucket, List[Dict[str, Any]]]:
+    """Team totals and per-enumerator rows over a period, most submissions first"""
+    db = request.app.state.db
+    prev_start, prev_end = previous_range(start_date, end_date)
+    ranked = await ranked_by(db, org_id, start_date, end_date, "user_id", limit, **filters)
+    previous = dict(await ranked_by(db, org_id, prev_start, prev_end, "user_id", None, **filters))
+    
+    members = await db.org_members.find({"org_id": org_id}, {"_id": 0, "user_id": 1, "role": 1}).to_list(None)
+    roles = {member["user_id"]: member.get("role") for member in members}
+    users = await get_batch_lookup(request).fetch("users", (user for user, _ in ranked), projection={"name": 1})
+    
+    team = Bucket()
+    rows = []
+    for user, bucket in ranked:
+        team.add(bucket["count"], {}, bucket["quality_sum"], bucket["quality_count"])
+        rejected = bucket["by_status"].get("rejected", 0)
+        rows.append({
+            "user_id": user,
+            "name": users.get(user, {}).get("name", "Unknown"),
+            "role": (roles.get(user) or "member").replace("_", " ").title(),
+            "submissions": bucket["count"],
+            "quality_avg": round_quality(bucket.avg_quality),
+            "completion_rate": round((bucket["count"] - rejected) / bucket["count"] * 100, 1),
+            "avg_time_per_submission": None,
+            "trend": percent_change(bucket["count"], previous.get(user, Bucket())["count"])
         })
-    
-    # Issues breakdown
-    common_issues = [
-        {"issue": "Missing GPS coordinates", "count": 45, "severity": "high"},
-        {"issue": "Incomplete responses", "count": 32, "severity": "medium"},
-        {"issue": "Low photo quality", "count": 28, "severity": "low"},
-        {"issue": "Outlier values", "count": 15, "severity": "medium"},
-        {"issue": "Duplicate entries", "count": 8, "severity": "high"}
-    ]
-    
-    return {
-        "overall_score": 85.7,
-        "score_distribution": score_distribution,
-        "quality_factors": quality_factors,
-        "quality_trends": quality_trends,
-        "common_issues": common_issues,
-        "recommendations": [
-            "Enable GPS accuracy validation for field submissions",
-            "Add required validation for key demographic fields",
-            "Implement photo quality checks before submission"
-        ]
-    }
+    return team, rows
 
 
 @router.get("/performance/{org_id}")
@@ -286,70 +251,47 @@ async def get_performance_analytics(
     request: Request,
     org_id: str,
     period: str = "30_days",
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get team and individual performance metrics"""
+    db = request.app.state.db
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
+    filters = _common_filters(project_id, form_id)
     
-    # Team performance summary
-    team_summary = {
-        "total_members": 12,
-        "active_this_period": 10,
-        "avg_submissions_per_user": 42.5,
-        "avg_quality_score": 87.3
-    }
-    
-    # Individual performance
-    user_performance = [
-        {
-            "user_id": "u1",
-            "name": "John Doe",
-            "role": "Enumerator",
-            "submissions": 156,
-            "quality_avg": 91.2,
-            "completion_rate": 98.5,
-            "avg_time_per_submission": "12:34",
-            "trend": 5.2
-        },
-        {
-            "user_id": "u2",
-            "name": "Jane Smith",
-            "role": "Enumerator",
-            "submissions": 134,
-            "quality_avg": 88.5,
-            "completion_rate": 95.2,
-            "avg_time_per_submission": "14:21",
-            "trend": -2.1
-        },
-        {
-            "user_id": "u3",
-            "name": "Mike Johnson",
-            "role": "Supervisor",
-            "submissions": 45,
-            "quality_avg": 94.3,
-            "completion_rate": 100,
-            "avg_time_per_submission": "08:15",
-            "trend": 8.7
+    async def compute():
+        start_date, end_date = get_date_range(period)
+        team, user_performance = await _user_performance(request, org_id, start_date, end_date, **filters)
+        
+        # Team performance summary
+        total_members = await db.org_members.count_documents({"org_id": org_id})
+        team_summary = {
+            "total_members": total_members,
+            "active_this_period": len(user_performance),
+            "avg_submissions_per_user": round(team["count"] / len(user_performance), 1) if user_performance else 0,
+            "avg_quality_score": round_quality(team.avg_quality)
         }
-    ]
-    
-    # Performance by region/area
-    regional_performance = [
-        {"region": "North District", "submissions": 234, "quality_avg": 87.5, "enumerators": 4},
-        {"region": "South District", "submissions": 189, "quality_avg": 85.2, "enumerators": 3},
-        {"region": "East District", "submissions": 156, "quality_avg": 91.3, "enumerators": 3},
-        {"region": "West District", "submissions": 98, "quality_avg": 82.1, "enumerators": 2}
-    ]
-    
-    return {
-        "team_summary": team_summary,
-        "user_performance": user_performance,
-        "regional_performance": regional_performance,
-        "benchmarks": {
-            "submissions_target": 50,
-            "quality_target": 85,
-            "completion_target": 95
+        
+        # Performance by project (the area a team works in)
+        by_project = await ranked_by(db, org_id, start_date, end_date, "project_id", **filters)
+        regional_performance = [
+            {"region": row["name"], **row}
+            for row in await top_rows(get_batch_lookup(request), "project_id", by_project)
+        ]
+        
+        return {
+            "team_summary": team_summary,
+            "user_performance": user_performance,
+            "regional_performance": regional_performance,
+            "benchmarks": {
+                "submissions_target": 50,
+                "quality_target": 85,
+                "completion_target": 95
+            }
         }
-    }
+    
+    return await cached_analytics("performance", org_id, {"period": period, **filters}, compute)
 
 
 @router.post("/reports")
@@ -380,6 +322,7 @@ async def get_reports(
 ):
     """Get saved reports for an organization"""
     db = request.app.state.db
+    await _check_org_access(db, org_id, current_user)
     
     reports = await db.reports.find(
         {"org_id": org_id},
@@ -414,37 +357,90 @@ async def get_reports(
     return {"reports": default_reports + reports}
 
 
+# Report type of each default report listed by get_reports
+DEFAULT_REPORT_TYPES = {
+    "default_submission": "submission",
+    "default_quality": "quality",
+    "default_performance": "performance",
+}
+
+
+async def _report_data(
+    request: Request,
+    org_id: str,
+    report_type: str,
+    period: str,
+    project_id: Optional[str],
+    form_id: Optional[str]
+) -> Dict[str, Any]:
+    db = request.app.state.db
+    filters = _common_filters(project_id, form_id)
+    start_date, end_date = get_date_range(period)
+    
+    totals = await period_totals(db, org_id, start_date, end_date, **filters)
+    by_form = await ranked_by(db, org_id, start_date, end_date, "form_id", 5, **filters)
+    data = {
+        "summary": {
+            "total_submissions": totals["count"],
+            "approved": totals["by_status"].get("approved", 0),
+            "pending": totals["by_status"].get("pending", 0),
+            "rejected": totals["by_status"].get("rejected", 0)
+        },
+        "quality_avg": round_quality(totals.avg_quality),
+        "top_forms": await top_rows(get_batch_lookup(request), "form_id", by_form)
+    }
+    
+    if report_type == "submission":
+        data["time_series"] = await submission_series(db, org_id, start_date, end_date, "day", **filters)
+    elif report_type == "quality":
+        breakdown = await quality_breakdown(db, org_id, start_date, end_date, **filters)
+        data.update(
+            score_distribution=breakdown["score_distribution"],
+            common_issues=breakdown["common_issues"]
+        )
+    elif report_type == "performance":
+        _, data["user_performance"] = await _user_performance(request, org_id, start_date, end_date, **filters)
+    return data
+
+
 @router.get("/reports/{report_id}/run")
 async def run_report(
     request: Request,
     report_id: str,
     period: str = "30_days",
     format: str = "json",
+    org_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Execute a report and return results"""
+    db = request.app.state.db
+    
+    if report_id in DEFAULT_REPORT_TYPES:
+        report = {"report_type": DEFAULT_REPORT_TYPES[report_id], "filters": {}}
+    else:
+        report = await db.reports.find_one({"id": report_id}, {"_id": 0})
+        if not report:
+            raise HTTPException(status_code=404, detail="Report not found")
+    
+    org_id = report.get("org_id") or org_id
+    if not org_id:
+        raise HTTPException(status_code=400, detail="org_id is required")
+    filters = report.get("filters") or {}
+    project_id, form_id = filters.get("project_id"), filters.get("form_id")
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
+    
+    data = await cached_analytics(
+        "report", org_id,
+        {"report_type": report["report_type"], "period": period, **_common_filters(project_id, form_id)},
+        lambda: _report_data(request, org_id, report["report_type"], period, project_id, form_id)
+    )
     
-    # Generate report data based on type
-    report_data = {
+    return {
         "report_id": report_id,
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "period": period,
-        "data": {
-            "summary": {
-                "total_submissions": 1247,
-                "approved": 987,
-                "pending": 185,
-                "rejected": 75
-            },
-            "quality_avg": 87.3,
-            "top_forms": [
-                {"name": "Household Survey", "submissions": 456},
-                {"name": "Health Screening", "submissions": 321}
-            ]
-        }
+        "data": data
     }
-    
-    return report_data
 
 
 @router.get("/export/{org_id}")
@@ -454,19 +450,34 @@ async def export_analytics(
     report_type: str = "overview",
     period: str = "30_days",
     format: str = "csv",
+    group_by: str = "day",
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Export analytics data in various formats"""
+    db = request.app.state.db
+    await _check_org_access(db, org_id, current_user, project_id, form_id)
     
     # Generate export based on type
     if format == "csv":
-        content = "date,submissions,approved,rejected,quality_score\n"
-        content += "2024-01-15,45,38,3,87.5\n"
-        content += "2024-01-16,52,44,5,85.2\n"
+        start_date, end_date = get_date_range(period)
+        series = await submission_series(
+            db, org_id, start_date, end_date, group_by, **_common_filters(project_id, form_id)
+        )
+        
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["date", "submissions", "approved", "rejected", "quality_score"])
+        for point in series:
+            writer.writerow([
+                point["date"], point["submissions"], point["approved"], point["rejected"],
+                "" if point["quality_avg"] is None else point["quality_avg"]
+            ])
         
         from fastapi.responses import StreamingResponse
         return StreamingResponse(
-            iter([content]),
+            iter([output.getvalue()]),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename=analytics_{period}.csv"}
         )
@@ -1,10 +1,11 @@
 """DataPulse - Case Management Routes"""
-from fastapi import APIRouter, HTTPException, status, Request, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Request, Response, Depends, Query
 from typing import List, Optional
 from datetime import datetime, timezone
 
 from models import Case, CaseCreate, CaseOut
 from auth import get_current_user
+from utils.pagination import NEXT_CURSOR_HEADER, Keyset
 
 router = APIRouter(prefix="/cases", tags=["Cases"])
 
@@ -91,15 +92,17 @@ async def create_case(
 @router.get("", response_model=List[CaseOut])
 async def list_cases(
     request: Request,
+    response: Response,
     project_id: str,
     status_filter: Optional[str] = None,
     assigned_to: Optional[str] = None,
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """List cases in a project"""
+    """List cases in a project (pass X-Next-Cursor back as `cursor` for the next page)"""
     db = request.app.state.db
     
     # Check project access
@@ -125,9 +128,16 @@ async def list_cases(
             {"name": {"$regex": search, "$options": "i"}}
         ]
     
-    skip = (page - 1) * page_size
+    keyset = Keyset("created_at", "id", descending=True)
+    skip = 0 if cursor else (page - 1) * page_size
     
-    cases = await db.cases.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(page_size).to_list(page_size)
+    cases = await db.cases.find(
+        keyset.apply(query, cursor), {"_id": 0}
+    ).sort(keyset.sort).skip(skip).limit(page_size).to_list(page_size)
+    
+    next_cursor = keyset.next_cursor(cases, page_size)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return [
         CaseOut(
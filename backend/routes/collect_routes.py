@@ -11,6 +11,9 @@ import pandas as pd
 
 from auth import get_current_user
 from utils.url_shortener import shorten_url
+from utils.access_cache import get_published_form
+from utils.counters import apply_counter_updates, counter_updates
+from utils.cache_events import submissions_changed
 
 router = APIRouter(prefix="/collect", tags=["Data Collection"])
 
@@ -427,6 +430,10 @@ async def submit_collection(
         if token_doc.get("submission_count", 0) >= token_doc["max_submissions"]:
             raise HTTPException(status_code=403, detail="Submission limit reached")
     
+    # Org and project of the form, so the submission shows up in org/project
+    # counters and dashboards like every other submission
+    form = await get_published_form(db, form_id)
+    
     # Create submission
     submission_id = f"sub_{secrets.token_hex(8)}"
     now = datetime.now(timezone.utc)
@@ -434,6 +441,8 @@ async def submit_collection(
     submission = {
         "id": submission_id,
         "form_id": form_id,
+        "org_id": form.get("org_id") if form else None,
+        "project_id": form.get("project_id") if form else None,
         "data": data.get("data", {}),
         "enumerator_name": token_doc["enumerator_name"],
         "collection_token_id": token_doc["id"],
@@ -445,6 +454,8 @@ async def submit_collection(
     }
     
     await db.submissions.insert_one(submission)
+    await apply_counter_updates(db, counter_updates("submissions", [submission], 1))
+    await submissions_changed([submission])
     
     # Increment submission count
     await db.collection_tokens.update_one(
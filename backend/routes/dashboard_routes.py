@@ -1,54 +1,55 @@
 """DataPulse - Dashboard & Analytics Routes"""
+import os
+
 from fastapi import APIRouter, HTTPException, status, Request, Depends
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
-from collections import defaultdict
 
 from models import DashboardStats, SubmissionTrend, QualityMetrics
 from auth import get_current_user
+from utils.batch_lookup import get_batch_lookup
+from utils.counters import ORG_SUBMISSIONS, count_of, get_breakdowns
+from utils.dashboard_metrics import (
+    enumerator_performance_pipeline, enumerator_performance_rows, enumerator_rows, quality_metrics_pipeline,
+    quality_metrics_result
+)
+from utils.rollups import day_floor, day_range, submission_rollup
+
+try:
+    from config.production import cached
+except ImportError:
+    def cached(prefix: str, ttl: int = 300, stale_ttl: int = 0, scope: Optional[str] = None):
+        return lambda func: func
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+# Dashboard stats are fresh for DASHBOARD_STATS_TTL seconds, then served
+# stale (while refreshing) for up to DASHBOARD_STATS_STALE_TTL more
+DASHBOARD_STATS_TTL = int(os.environ.get("DASHBOARD_STATS_TTL", "30"))
+DASHBOARD_STATS_STALE_TTL = int(os.environ.get("DASHBOARD_STATS_STALE_TTL", "600"))
 
-@router.get("/stats")
-async def get_dashboard_stats(
-    request: Request,
-    org_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Get dashboard statistics for an organization"""
-    db = request.app.state.db
-    
-    # Check org access
-    membership = await db.org_members.find_one(
-        {"org_id": org_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
-    
-    if not membership and not current_user.get("is_superadmin"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized"
-        )
-    
+
+@cached("dashboard_stats", ttl=DASHBOARD_STATS_TTL, stale_ttl=DASHBOARD_STATS_STALE_TTL, scope="org_id")
+async def org_dashboard_stats(db, org_id: str) -> dict:
+    """
+    Dashboard counts of an org. Served from Redis when available; stale
+    copies are refreshed in the background, and submission ingest/review
+    mark them stale (utils.cache_events).
+    """
     # Get counts
     total_projects = await db.projects.count_documents({"org_id": org_id, "status": {"$ne": "archived"}})
     total_forms = await db.forms.count_documents({"org_id": org_id})
-    total_submissions = await db.submissions.count_documents({"org_id": org_id})
+    org_counts = (await get_breakdowns(db, ORG_SUBMISSIONS, [org_id])).get(org_id, {})
+    total_submissions = count_of(org_counts)
     total_cases = await db.cases.count_documents({"org_id": org_id})
     
     # Today's submissions
-    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    submissions_today = await db.submissions.count_documents({
-        "org_id": org_id,
-        "submitted_at": {"$gte": today_start.isoformat()}
-    })
+    now = datetime.now(timezone.utc)
+    today = await submission_rollup(db, org_id, day_floor(now), now, bucket=None)
+    submissions_today = today[(None, None)]["count"] if today else 0
     
     # Pending reviews
-    pending_reviews = await db.submissions.count_documents({
-        "org_id": org_id,
-        "status": "pending"
-    })
+    pending_reviews = count_of(org_counts, "pending")
     
     # Active enumerators (submitted in last 7 days)
     week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
@@ -69,6 +70,30 @@ async def get_dashboard_stats(
     }
 
 
+@router.get("/stats")
+async def get_dashboard_stats(
+    request: Request,
+    org_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get dashboard statistics for an organization"""
+    db = request.app.state.db
+    
+    # Check org access
+    membership = await db.org_members.find_one(
+        {"org_id": org_id, "user_id": current_user["user_id"]},
+        {"_id": 0}
+    )
+    
+    if not membership and not current_user.get("is_superadmin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    return await org_dashboard_stats(db, org_id)
+
+
 @router.get("/submission-trends")
 async def get_submission_trends(
     request: Request,
@@ -92,41 +117,16 @@ async def get_submission_trends(
             detail="Not authorized"
         )
     
-    # Build date range
+    # Whole days from rollups; only the current partial hour is aggregated live
     end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=days)
-    
-    # Build query
-    query = {
-        "org_id": org_id,
-        "submitted_at": {"$gte": start_date.isoformat()}
-    }
-    if project_id:
-        query["project_id"] = project_id
-    
-    submissions = await db.submissions.find(
-        query,
-        {"_id": 0, "submitted_at": 1}
-    ).to_list(None)
+    start_date = day_floor(end_date - timedelta(days=days))
     
-    # Group by date
-    date_counts = defaultdict(int)
-    for sub in submissions:
-        sub_date = sub["submitted_at"][:10]  # Get YYYY-MM-DD
-        date_counts[sub_date] += 1
-    
-    # Fill in missing dates
-    result = []
-    current = start_date
-    while current <= end_date:
-        date_str = current.strftime("%Y-%m-%d")
-        result.append({
-            "date": date_str,
-            "count": date_counts.get(date_str, 0)
-        })
-        current += timedelta(days=1)
+    buckets = await submission_rollup(db, org_id, start_date, end_date, project_id=project_id)
     
-    return result
+    return [
+        {"date": date_str, "count": buckets.get((date_str, None), {}).get("count", 0)}
+        for date_str in day_range(start_date, end_date)
+    ]
 
 
 @router.get("/quality-metrics")
@@ -159,44 +159,8 @@ async def get_quality_metrics(
     if form_id:
         query["form_id"] = form_id
     
-    # Get submissions
-    submissions = await db.submissions.find(
-        query,
-        {"_id": 0, "quality_score": 1, "quality_flags": 1, "status": 1}
-    ).to_list(None)
-    
-    if not submissions:
-        return {
-            "avg_quality_score": 0,
-            "flagged_count": 0,
-            "approved_count": 0,
-            "rejected_count": 0,
-            "total_count": 0,
-            "flag_distribution": {}
-        }
-    
-    # Calculate metrics
-    scores = [s["quality_score"] for s in submissions if s.get("quality_score") is not None]
-    avg_score = sum(scores) / len(scores) if scores else 0
-    
-    flagged_count = len([s for s in submissions if s.get("quality_flags")])
-    approved_count = len([s for s in submissions if s["status"] == "approved"])
-    rejected_count = len([s for s in submissions if s["status"] == "rejected"])
-    
-    # Flag distribution
-    flag_counts = defaultdict(int)
-    for sub in submissions:
-        for flag in sub.get("quality_flags", []):
-            flag_counts[flag] += 1
-    
-    return {
-        "avg_quality_score": round(avg_score, 2),
-        "flagged_count": flagged_count,
-        "approved_count": approved_count,
-        "rejected_count": rejected_count,
-        "total_count": len(submissions),
-        "flag_distribution": dict(flag_counts)
-    }
+    rows = await db.submissions.aggregate(quality_metrics_pipeline(query), allowDiskUse=True).to_list(1)
+    return quality_metrics_result(rows)
 
 
 @router.get("/enumerator-performance")
@@ -231,50 +195,15 @@ async def get_enumerator_performance(
     if project_id:
         query["project_id"] = project_id
     
-    submissions = await db.submissions.find(
-        query,
-        {"_id": 0, "submitted_by": 1, "quality_score": 1, "status": 1, "submitted_at": 1}
-    ).to_list(None)
-    
-    # Group by enumerator
-    enumerator_stats = defaultdict(lambda: {
-        "submission_count": 0,
-        "quality_scores": [],
-        "approved_count": 0,
-        "rejected_count": 0
-    })
-    
-    for sub in submissions:
-        user_id = sub["submitted_by"]
-        enumerator_stats[user_id]["submission_count"] += 1
-        if sub.get("quality_score") is not None:
-            enumerator_stats[user_id]["quality_scores"].append(sub["quality_score"])
-        if sub["status"] == "approved":
-            enumerator_stats[user_id]["approved_count"] += 1
-        elif sub["status"] == "rejected":
-            enumerator_stats[user_id]["rejected_count"] += 1
-    
-    # Get user details and calculate averages
-    result = []
-    for user_id, stats in enumerator_stats.items():
-        user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1, "email": 1})
-        avg_quality = sum(stats["quality_scores"]) / len(stats["quality_scores"]) if stats["quality_scores"] else 0
-        
-        result.append({
-            "user_id": user_id,
-            "name": user["name"] if user else "Unknown",
-            "email": user["email"] if user else "",
-            "submission_count": stats["submission_count"],
-            "avg_quality_score": round(avg_quality, 2),
-            "approved_count": stats["approved_count"],
-            "rejected_count": stats["rejected_count"],
-            "approval_rate": round(stats["approved_count"] / stats["submission_count"] * 100, 1) if stats["submission_count"] > 0 else 0
-        })
-    
-    # Sort by submission count
-    result.sort(key=lambda x: x["submission_count"], reverse=True)
+    rows = enumerator_rows(
+        await db.submissions.aggregate(enumerator_performance_pipeline(query), allowDiskUse=True).to_list(1)
+    )
     
-    return result
+    # Get user details (one batched query)
+    users = await get_batch_lookup(request).fetch(
+        "users", (row["_id"] for row in rows), projection={"name": 1, "email": 1}
+    )
+    return enumerator_performance_rows(rows, users)
 
 
 @router.get("/gps-locations")
@@ -349,11 +278,15 @@ async def get_recent_activity(
         {"_id": 0, "id": 1, "form_id": 1, "submitted_by": 1, "submitted_at": 1, "status": 1}
     ).sort("submitted_at", -1).limit(limit).to_list(limit)
     
+    # Get user and form info (one batched query each)
+    lookup = get_batch_lookup(request)
+    users = await lookup.fetch("users", (sub["submitted_by"] for sub in submissions), projection={"name": 1})
+    forms = await lookup.fetch("forms", (sub["form_id"] for sub in submissions), projection={"name": 1})
+    
     activities = []
     for sub in submissions:
-        # Get user and form info
-        user = await db.users.find_one({"id": sub["submitted_by"]}, {"_id": 0, "name": 1})
-        form = await db.forms.find_one({"id": sub["form_id"]}, {"_id": 0, "name": 1})
+        user = users.get(sub["submitted_by"])
+        form = forms.get(sub["form_id"])
         
         activities.append({
             "type": "submission",
@@ -18,6 +18,9 @@ import csv
 import io
 import json
 
+from utils.counters import bounded_count
+from utils.pagination import Keyset
+
 router = APIRouter(prefix="/datasets", tags=["Lookup Datasets"])
 
 
@@ -325,9 +328,17 @@ async def get_records(
     limit: int = 100,
     offset: int = 0,
     search: Optional[str] = None,
-    filters: Optional[str] = None  # JSON string of filters
+    filters: Optional[str] = None,  # JSON string of filters
+    cursor: Optional[str] = None,
+    estimated: bool = True
 ):
-    """Get records from a dataset with pagination and search"""
+    """
+    Get records from a dataset with pagination (offset or next_cursor) and search.
+    
+    Without search/filters `total` is the dataset's maintained
+    record_count; with them the count stops at a bound (total_estimated
+    is then true). estimated=false always counts exactly.
+    """
     db = request.app.state.db
     
     dataset = await db.lookup_datasets.find_one({"id": dataset_id, "org_id": org_id})
@@ -357,15 +368,27 @@ async def get_records(
         except json.JSONDecodeError:
             pass
     
-    records = await collection.find(query, {"_id": 0}).skip(offset).limit(limit).to_list(limit)
-    total = await collection.count_documents(query)
+    # Records have no sort key of their own: seek on _id (insertion order)
+    keyset = Keyset(None, "_id", descending=False)
+    records = await collection.find(
+        keyset.apply(query, cursor)
+    ).sort(keyset.sort).skip(0 if cursor else offset).limit(limit).to_list(limit)
+    if estimated and query == {"_meta.is_active": True} and "record_count" in dataset:
+        total, total_estimated = dataset["record_count"], False
+    else:
+        total, total_estimated = await bounded_count(collection, query, estimated)
+    next_cursor = keyset.next_cursor(records, limit)
+    for record in records:
+        record.pop("_id", None)
     
     return {
         "dataset_id": dataset_id,
         "records": records,
         "total": total,
+        "total_estimated": total_estimated,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
         "version": dataset.get("version", 1)
     }
 
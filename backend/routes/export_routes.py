@@ -1,20 +1,63 @@
 """DataPulse - Export Routes"""
-from fastapi import APIRouter, HTTPException, status, Request, Depends
-from fastapi.responses import StreamingResponse
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timezone
-import io
-import csv
-import json
-import pandas as pd
-
-from models import ExportRequest, ExportJob
+from fastapi import APIRouter, HTTPException, status, Request, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse
+from starlette.background import BackgroundTask
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone, timedelta
+import os
+import logging
+import tempfile
+
+from models import BatchExportRequest, ExportRequest, ExportJob
 from auth import get_current_user
 from utils.security import requires_permission, check_permission
 from utils.audit import log_action
+from utils.batch_lookup import attach, get_batch_lookup
+from utils.export_builder import (
+    EXPORT_FORMATS,
+    ExportTracker,
+    job_artifact_format,
+    build_export_query,
+    csv_columns,
+    csv_rows,
+    deleted_submission_ids,
+    export_cache_key,
+    latest_submission_watermark,
+    resolve_job_since,
+    resolve_since,
+    run_export_job,
+)
+from utils.export_storage import artifact_exists, get_artifact_url, local_artifact_path
+from utils.job_manager import get_shared_job_manager
+from utils.columnar_export import ArrowBatchBuilder, write_parquet, arrow_stream
+from utils.statistical_export import write_dta, write_sav
+from utils.streaming_export import (
+    available_compressions,
+    cursor_chunks,
+    iter_file,
+    negotiate_compression,
+    stream_csv_response,
+    stream_json_response,
+    stream_jsonl_response,
+)
+from utils.xlsx_export import write_xlsx
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/exports", tags=["Exports"])
 
+# Try to import Celery tasks (optional - falls back to in-process background tasks)
+try:
+    from tasks.export_tasks import generate_export, EXPORT_TIME_LIMIT
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+    EXPORT_TIME_LIMIT = 3600
+    logger.warning("Celery export tasks not available - exports run in-process")
+
+# Workbooks larger than this are spooled to disk while being built
+XLSX_SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
 
 async def check_form_access(db, form_id: str, user_id: str):
     """Check if user has access to form's organization"""
@@ -29,29 +72,66 @@ async def check_form_access(db, form_id: str, user_id: str):
     return membership, form
 
 
-def flatten_dict(d: Dict, parent_key: str = '', sep: str = '.') -> Dict:
-    """Flatten nested dictionary"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        else:
-            items.append((new_key, v))
-    return dict(items)
+async def start_export_log(
+    db,
+    form: dict,
+    user_id: str,
+    export_format: str,
+    filters: Optional[Dict[str, Any]] = None,
+    since: Optional[str] = None
+) -> str:
+    """Record an in-progress export in export_jobs and return its id"""
+    export_log = ExportJob(
+        org_id=form["org_id"],
+        user_id=user_id,
+        form_id=form["id"],
+        format=export_format,
+        status="processing",
+        filters=filters or {},
+        since=since
+    )
+    log_dict = export_log.model_dump()
+    log_dict["created_at"] = log_dict["created_at"].isoformat()
+    await db.export_jobs.insert_one(log_dict)
+    return export_log.id
 
 
-@router.post("/csv")
-@log_action("export_csv", target_type="form")
-async def export_to_csv(
-    request: Request,
-    data: ExportRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    """Export submissions to CSV"""
-    db = request.app.state.db
+async def complete_export_log(db, export_id: str, tracker: ExportTracker):
+    """Mark a streamed export as completed with its final row count and high-water mark"""
+    await db.export_jobs.update_one(
+        {"id": export_id},
+        {"$set": {
+            "status": "completed",
+            "row_count": tracker.row_count,
+            "high_water_mark": tracker.high_water_mark,
+            "completed_at": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+
+
+async def fail_export_log(db, export_id: str, error: str):
+    """Mark a streamed export as failed"""
+    await db.export_jobs.update_one(
+        {"id": export_id},
+        {"$set": {
+            "status": "failed",
+            "error": error,
+            "completed_at": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+
+
+async def open_submission_chunks(db, data: ExportRequest, current_user: dict, export_format: str):
+    """
+    Check form access and open a chunked cursor over the matching submissions.
     
-    # Check form access
+    The first chunk is fetched eagerly so an empty export still returns 404
+    before any response bytes are sent. Delta exports (data.since) may be
+    empty, since "nothing changed" is a normal result for them.
+    
+    Returns:
+        (form, resolved since watermark, async generator of submission chunks)
+    """
     membership, form = await check_form_access(db, data.form_id, current_user["user_id"])
     
     if not membership and not current_user.get("is_superadmin"):
@@ -63,61 +143,99 @@ async def export_to_csv(
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
-    # Build query
-    query = {"form_id": data.form_id}
-    query.update(data.filters)
-    
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(None)
-    
-    if not submissions:
+    try:
+        since = await resolve_since(db, form, export_format, data.since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = build_export_query(data.form_id, data.filters, since)
+    chunks = cursor_chunks(db.submissions.find(query, {"_id": 0}))
+    first_chunk = await anext(chunks, None)
+    if not first_chunk and not data.since:
         raise HTTPException(status_code=404, detail="No submissions found")
     
-    # Get field names from form
-    field_names = ["id", "submitted_by", "submitted_at", "status", "quality_score"]
-    for field in form.get("fields", []):
-        field_names.append(field["name"])
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=field_names, extrasaction='ignore')
-    writer.writeheader()
-    
-    for sub in submissions:
-        row = {
-            "id": sub["id"],
-            "submitted_by": sub["submitted_by"],
-            "submitted_at": sub["submitted_at"],
-            "status": sub["status"],
-            "quality_score": sub.get("quality_score")
-        }
-        # Flatten submission data
-        flat_data = flatten_dict(sub.get("data", {}))
-        row.update(flat_data)
-        writer.writerow(row)
+    async def all_chunks():
+        if first_chunk:
+            yield first_chunk
+        async for chunk in chunks:
+            yield chunk
     
-    output.seek(0)
+    return form, since, all_chunks()
+
+
+@router.post("/csv")
+@log_action("export_csv", target_type="form")
+async def export_to_csv(
+    request: Request,
+    data: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Export submissions to CSV (streamed from a batched cursor)"""
+    db = request.app.state.db
     
-    # Log export
-    export_log = ExportJob(
-        org_id=form["org_id"],
-        user_id=current_user["user_id"],
-        form_id=data.form_id,
-        format="csv",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
-    )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
+    form, since, chunks = await open_submission_chunks(db, data, current_user, "csv")
+    export_id = await start_export_log(db, form, current_user["user_id"], "csv", data.filters, since)
+    tracker = ExportTracker(since)
+    
+    async def rows():
+        try:
+            async for chunk in tracker.track(chunks):
+                yield csv_rows(form, chunk)
+        except Exception as e:
+            await fail_export_log(db, export_id, str(e))
+            raise
+        
+        # Row count is known only once the cursor is drained
+        await complete_export_log(db, export_id, tracker)
     
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename={form['name'].replace(' ', '_')}_export.csv"
-        }
+    return await stream_csv_response(
+        rows(),
+        filename=f"{form['name'].replace(' ', '_')}_export.csv",
+        columns=csv_columns(form)
+    )
+
+
+def resolve_compression(request: Request, data: ExportRequest) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Compression for a streamed export.
+    
+    Returns (file compression, wire Content-Encoding): an explicit
+    `compression` option produces a compressed file; otherwise the
+    response is compressed on the wire if the client's Accept-Encoding allows.
+    """
+    if data.compression == "none":
+        return None, None
+    if data.compression:
+        if data.compression not in available_compressions():
+            raise HTTPException(status_code=400, detail=f"Compression not available: {data.compression}")
+        return data.compression, None
+    return None, negotiate_compression(request.headers.get("accept-encoding"))
+
+
+async def stream_json_export(request: Request, data: ExportRequest, current_user: dict, export_format: str):
+    """Stream submissions as a JSON array or NDJSON, optionally compressed"""
+    db = request.app.state.db
+    compression, content_encoding = resolve_compression(request, data)
+    
+    form, since, chunks = await open_submission_chunks(db, data, current_user, export_format)
+    export_id = await start_export_log(db, form, current_user["user_id"], export_format, data.filters, since)
+    tracker = ExportTracker(since)
+    
+    async def tracked_chunks():
+        try:
+            async for chunk in tracker.track(chunks):
+                yield chunk
+        except Exception as e:
+            await fail_export_log(db, export_id, str(e))
+            raise
+        await complete_export_log(db, export_id, tracker)
+    
+    stream = stream_jsonl_response if export_format == "ndjson" else stream_json_response
+    return await stream(
+        tracked_chunks(),
+        filename=f"{form['name'].replace(' ', '_')}_export{EXPORT_FORMATS[export_format]['extension']}",
+        compression=compression,
+        content_encoding=content_encoding
     )
 
 
@@ -128,52 +246,19 @@ async def export_to_json(
     data: ExportRequest,
     current_user: dict = Depends(get_current_user)
 ):
-    """Export submissions to JSON"""
-    db = request.app.state.db
-    
-    # Check form access
-    membership, form = await check_form_access(db, data.form_id, current_user["user_id"])
-    
-    if not membership and not current_user.get("is_superadmin"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized"
-        )
-    
-    if not form:
-        raise HTTPException(status_code=404, detail="Form not found")
-    
-    # Build query
-    query = {"form_id": data.form_id}
-    query.update(data.filters)
-    
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(None)
-    
-    if not submissions:
-        raise HTTPException(status_code=404, detail="No submissions found")
-    
-    # Log export
-    export_log = ExportJob(
-        org_id=form["org_id"],
-        user_id=current_user["user_id"],
-        form_id=data.form_id,
-        format="json",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
-    )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
-    
-    return StreamingResponse(
-        iter([json.dumps(submissions, default=str, indent=2)]),
-        media_type="application/json",
-        headers={
-            "Content-Disposition": f"attachment; filename={form['name'].replace(' ', '_')}_export.json"
-        }
-    )
+    """Export submissions to JSON (streamed array)"""
+    return await stream_json_export(request, data, current_user, "json")
+
+
+@router.post("/ndjson")
+@log_action("export_ndjson", target_type="form")
+async def export_to_ndjson(
+    request: Request,
+    data: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Export submissions as newline-delimited JSON (one submission per line)"""
+    return await stream_json_export(request, data, current_user, "ndjson")
 
 
 @router.post("/xlsx")
@@ -183,89 +268,26 @@ async def export_to_xlsx(
     data: ExportRequest,
     current_user: dict = Depends(get_current_user)
 ):
-    """Export submissions to Excel"""
+    """Export submissions to Excel (constant-memory, typed cells)"""
     db = request.app.state.db
     
-    try:
-        import xlsxwriter
-    except ImportError:
-        raise HTTPException(status_code=500, detail="Excel export not available")
-    
-    # Check form access
-    membership, form = await check_form_access(db, data.form_id, current_user["user_id"])
+    form, since, chunks = await open_submission_chunks(db, data, current_user, "xlsx")
+    export_id = await start_export_log(db, form, current_user["user_id"], "xlsx", data.filters, since)
+    tracker = ExportTracker(since)
     
-    if not membership and not current_user.get("is_superadmin"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized"
-        )
-    
-    if not form:
-        raise HTTPException(status_code=404, detail="Form not found")
-    
-    # Build query
-    query = {"form_id": data.form_id}
-    query.update(data.filters)
-    
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(None)
-    
-    if not submissions:
-        raise HTTPException(status_code=404, detail="No submissions found")
-    
-    # Get field names
-    field_names = ["id", "submitted_by", "submitted_at", "status", "quality_score"]
-    for field in form.get("fields", []):
-        field_names.append(field["name"])
-    
-    # Create Excel file
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-    worksheet = workbook.add_worksheet('Submissions')
-    
-    # Header format
-    header_format = workbook.add_format({
-        'bold': True,
-        'bg_color': '#4F46E5',
-        'font_color': 'white'
-    })
-    
-    # Write headers
-    for col, name in enumerate(field_names):
-        worksheet.write(0, col, name, header_format)
-    
-    # Write data
-    for row_num, sub in enumerate(submissions, start=1):
-        worksheet.write(row_num, 0, sub["id"])
-        worksheet.write(row_num, 1, sub["submitted_by"])
-        worksheet.write(row_num, 2, str(sub["submitted_at"]))
-        worksheet.write(row_num, 3, sub["status"])
-        worksheet.write(row_num, 4, sub.get("quality_score"))
-        
-        flat_data = flatten_dict(sub.get("data", {}))
-        for col, field_name in enumerate(field_names[5:], start=5):
-            value = flat_data.get(field_name, "")
-            worksheet.write(row_num, col, str(value) if value else "")
-    
-    workbook.close()
-    output.seek(0)
+    # Small workbooks stay in memory; large ones spill to a temp file
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    try:
+        await write_xlsx(tracker.track(chunks), form, output)
+    except Exception as e:
+        output.close()
+        await fail_export_log(db, export_id, str(e))
+        raise
     
-    # Log export
-    export_log = ExportJob(
-        org_id=form["org_id"],
-        user_id=current_user["user_id"],
-        form_id=data.form_id,
-        format="xlsx",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
-    )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
+    await complete_export_log(db, export_id, tracker)
     
     return StreamingResponse(
-        output,
+        iter_file(output),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={
             "Content-Disposition": f"attachment; filename={form['name'].replace(' ', '_')}_export.xlsx"
@@ -283,56 +305,59 @@ async def export_to_parquet(
     """Export data as Parquet format (efficient columnar storage)"""
     db = request.app.state.db
     
-    form = await db.forms.find_one({"id": data.form_id}, {"_id": 0})
-    if not form:
-        raise HTTPException(status_code=404, detail="Form not found")
-    
-    # Build query
-    query = {"form_id": data.form_id, "is_deleted": {"$ne": True}}
-    if data.filters:
-        for f in data.filters:
-            query[f"data.{f.field}"] = f.value
+    form, since, chunks = await open_submission_chunks(db, data, current_user, "parquet")
+    export_id = await start_export_log(db, form, current_user["user_id"], "parquet", data.filters, since)
+    tracker = ExportTracker(since)
     
-    submissions = await db.responses.find(query, {"_id": 0}).to_list(None)
-    
-    if not submissions:
-        raise HTTPException(status_code=404, detail="No data to export")
-    
-    # Create DataFrame
-    rows = []
-    for sub in submissions:
-        row = {"response_id": sub.get("id", "")}
-        row.update(sub.get("data", {}))
-        row["submitted_at"] = sub.get("created_at", "")
-        rows.append(row)
+    # Row groups are written incrementally; Parquet needs its footer
+    # before it can be read, so the file is staged on disk first.
+    tmp = tempfile.NamedTemporaryFile(suffix=".parquet", delete=False)
+    tmp.close()
+    try:
+        await write_parquet(tracker.track(chunks), ArrowBatchBuilder(form), tmp.name)
+    except Exception as e:
+        os.unlink(tmp.name)
+        await fail_export_log(db, export_id, str(e))
+        raise
+    
+    await complete_export_log(db, export_id, tracker)
+    
+    return FileResponse(
+        tmp.name,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{form['name'].replace(' ', '_')}_export.parquet",
+        background=BackgroundTask(os.unlink, tmp.name)
+    )
+
+
+@router.post("/arrow")
+@log_action("export_arrow", target_type="form")
+async def export_to_arrow(
+    request: Request,
+    data: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Export data as an Arrow IPC stream (record batches streamed as they are built)"""
+    db = request.app.state.db
     
-    df = pd.DataFrame(rows)
+    form, since, chunks = await open_submission_chunks(db, data, current_user, "arrow")
+    export_id = await start_export_log(db, form, current_user["user_id"], "arrow", data.filters, since)
+    tracker = ExportTracker(since)
     
-    # Export to Parquet
-    output = io.BytesIO()
-    df.to_parquet(output, engine='pyarrow', index=False)
-    output.seek(0)
-    
-    # Log export
-    export_log = ExportJob(
-        org_id=form["org_id"],
-        user_id=current_user["user_id"],
-        form_id=data.form_id,
-        format="parquet",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
-    )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
+    async def tracked_chunks():
+        try:
+            async for chunk in tracker.track(chunks):
+                yield chunk
+        except Exception as e:
+            await fail_export_log(db, export_id, str(e))
+            raise
+        await complete_export_log(db, export_id, tracker)
     
     return StreamingResponse(
-        output,
-        media_type="application/octet-stream",
+        arrow_stream(tracked_chunks(), ArrowBatchBuilder(form)),
+        media_type="application/vnd.apache.arrow.stream",
         headers={
-            "Content-Disposition": f"attachment; filename={form['name'].replace(' ', '_')}_export.parquet"
+            "Content-Disposition": f"attachment; filename={form['name'].replace(' ', '_')}_export.arrows"
         }
     )
 
@@ -363,25 +388,144 @@ async def get_export_history(
         {"_id": 0}
     ).sort("created_at", -1).limit(100).to_list(100)
     
-    # Enrich with form names
-    result = []
-    for exp in exports:
-        form = await db.forms.find_one({"id": exp["form_id"]}, {"_id": 0, "name": 1})
-        result.append({
-            **exp,
-            "form_name": form["name"] if form else "Unknown"
-        })
+    # Enrich with form names (one batched query)
+    forms = await get_batch_lookup(request).fetch(
+        "forms", (exp.get("form_id") for exp in exports), projection={"name": 1}
+    )
+    attach(exports, forms, "form_id", "form_name", "name", "Unknown")
     
-    return result
+    return exports
+
+
+async def write_statistical_response(
+    db,
+    data: ExportRequest,
+    current_user: dict,
+    export_format: str,
+    writer
+) -> FileResponse:
+    """
+    Write a native Stata/SPSS file to a temp file and return it as a download.
+    
+    Submissions are spooled to disk chunk by chunk while the file is
+    built, so exports of any size are served directly.
+    """
+    form, since, chunks = await open_submission_chunks(db, data, current_user, export_format)
+    export_id = await start_export_log(db, form, current_user["user_id"], export_format, data.filters, since)
+    tracker = ExportTracker(since)
+    extension = EXPORT_FORMATS[export_format]["extension"]
+    
+    # The binary formats need a seekable file, so write to disk then stream it
+    tmp = tempfile.NamedTemporaryFile(suffix=extension, delete=False)
+    tmp.close()
+    try:
+        await writer(tracker.track(chunks), form, tmp.name)
+    except Exception as e:
+        os.unlink(tmp.name)
+        await fail_export_log(db, export_id, str(e))
+        raise
+    
+    await complete_export_log(db, export_id, tracker)
+    
+    return FileResponse(
+        tmp.name,
+        media_type=EXPORT_FORMATS[export_format]["media_type"],
+        filename=f"{form['name'].replace(' ', '_')}_export{extension}",
+        background=BackgroundTask(os.unlink, tmp.name)
+    )
 
 
 @router.post("/stata")
+@log_action("export_stata", target_type="form")
 async def export_to_stata(
     request: Request,
     data: ExportRequest,
     current_user: dict = Depends(get_current_user)
 ):
-    """Export submissions to Stata format (.do file with data import script)"""
+    """Export submissions as a Stata .dta file with variable and value labels"""
+    db = request.app.state.db
+    return await write_statistical_response(db, data, current_user, "stata", write_dta)
+
+
+@router.post("/spss")
+@log_action("export_spss", target_type="form")
+async def export_to_spss(
+    request: Request,
+    data: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Export submissions as an SPSS .sav file with variable and value labels"""
+    db = request.app.state.db
+    return await write_statistical_response(db, data, current_user, "spss", write_sav)
+
+
+@router.get("/formats")
+async def get_export_formats():
+    """Get available export formats"""
+    return {
+        "formats": [
+            {
+                "id": "csv",
+                "name": "CSV",
+                "extension": ".csv",
+                "description": "Comma-separated values, compatible with Excel and most tools"
+            },
+            {
+                "id": "xlsx",
+                "name": "Excel",
+                "extension": ".xlsx",
+                "description": "Microsoft Excel format with formatting support"
+            },
+            {
+                "id": "json",
+                "name": "JSON",
+                "extension": ".json",
+                "description": "JavaScript Object Notation for developers"
+            },
+            {
+                "id": "ndjson",
+                "name": "NDJSON",
+                "extension": ".ndjson",
+                "description": "Newline-delimited JSON, one submission per line (gzip/zstd optional)"
+            },
+            {
+                "id": "parquet",
+                "name": "Parquet",
+                "extension": ".parquet",
+                "description": "Columnar format for DuckDB, Spark and pandas"
+            },
+            {
+                "id": "arrow",
+                "name": "Arrow",
+                "extension": ".arrows",
+                "description": "Apache Arrow IPC stream for zero-copy analytics tools"
+            },
+            {
+                "id": "stata",
+                "name": "Stata",
+                "extension": ".dta",
+                "description": "Stata dataset with variable and value labels"
+            },
+            {
+                "id": "spss",
+                "name": "SPSS",
+                "extension": ".sav",
+                "description": "SPSS data file with variable and value labels"
+            }
+        ]
+    }
+
+
+@router.post("/deleted")
+async def get_deleted_submissions(
+    request: Request,
+    data: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Tombstone list for delta exports: ids of submissions deleted after the
+    `since` watermark (all recorded deletions if since is omitted).
+    """
     db = request.app.state.db
     
     # Check form access
@@ -396,131 +540,87 @@ async def export_to_stata(
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
-    # Build query
-    query = {"form_id": data.form_id}
-    query.update(data.filters)
+    try:
+        since = await resolve_since(db, form, data.format, data.since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(None)
+    return {
+        "form_id": data.form_id,
+        "since": since,
+        "deleted_ids": await deleted_submission_ids(db, data.form_id, since)
+    }
+
+
+# ============= BACKGROUND EXPORT JOBS =============
+
+async def queue_export_job(
+    db,
+    export_job: ExportJob,
+    job_params: Dict[str, Any],
+    background_tasks: BackgroundTasks
+) -> Dict[str, Any]:
+    """
+    Reuse a finished export with the same cache key (or attach to one still
+    running); otherwise store export_job and queue it on Celery, building
+    it in-process if the broker is unavailable.
+    
+    Returns:
+        id, status and whether an existing export was reused ("cached")
+    """
+    in_flight_cutoff = (datetime.now(timezone.utc) - timedelta(seconds=EXPORT_TIME_LIMIT)).isoformat()
+    existing = await db.export_jobs.find_one(
+        {
+            "cache_key": export_job.cache_key,
+            "$or": [
+                {"status": "completed"},
+                {"status": {"$in": ["pending", "processing"]}, "created_at": {"$gte": in_flight_cutoff}}
+            ]
+        },
+        {"_id": 0},
+        sort=[("created_at", -1)]
+    )
+    if existing and (existing["status"] != "completed" or await artifact_exists(existing)):
+        return {"id": existing["id"], "status": existing["status"], "cached": True}
     
-    if not submissions:
-        raise HTTPException(status_code=404, detail="No submissions found")
+    job_dict = export_job.model_dump()
+    job_dict["created_at"] = job_dict["created_at"].isoformat()
+    await db.export_jobs.insert_one(job_dict)
     
-    # Get field info
-    field_info = []
-    for field in form.get("fields", []):
-        field_info.append({
-            "name": field["name"],
-            "type": field["type"],
-            "label": field.get("label", field["name"]),
-            "options": field.get("options", [])
-        })
-    
-    form_name = form['name'].replace(' ', '_')
-    
-    # Generate Stata do-file
-    do_file = f"""* DataPulse Export - Stata Import Script
-* Form: {form['name']}
-* Export Date: {datetime.now(timezone.utc).isoformat()}
-* Total Records: {len(submissions)}
-
-* Step 1: Import the CSV data (export CSV first, then run this script)
-* import delimited "{form_name}_export.csv", clear
-
-* Alternatively, input data directly:
-clear
-input str20 id str30 submitted_by str25 submitted_at str10 status quality_score """
-    
-    # Add field variable definitions
-    for field in field_info:
-        if field["type"] in ["text", "textarea", "select", "radio"]:
-            do_file += f"str100 {field['name']} "
-        elif field["type"] in ["number", "calculate"]:
-            do_file += f"{field['name']} "
-        elif field["type"] == "date":
-            do_file += f"str10 {field['name']} "
-        elif field["type"] == "gps":
-            do_file += f"double {field['name']}_lat double {field['name']}_lng "
-    
-    do_file += "\n"
-    
-    # Add sample data rows (first 10)
-    for sub in submissions[:10]:
-        row = f'"{sub["id"]}" "{sub.get("submitted_by", "")}" "{sub.get("submitted_at", "")}" "{sub.get("status", "")}" {sub.get("quality_score", 0)} '
-        flat_data = flatten_dict(sub.get("data", {}))
-        for field in field_info:
-            val = flat_data.get(field["name"], "")
-            if field["type"] in ["text", "textarea", "select", "radio", "date"]:
-                row += f'"{val}" '
-            elif field["type"] == "gps" and isinstance(val, dict):
-                row += f'{val.get("latitude", 0)} {val.get("longitude", 0)} '
-            else:
-                row += f'{val if val else 0} '
-        do_file += row + "\n"
-    
-    do_file += """end
-
-* Variable labels
-label variable id "Submission ID"
-label variable submitted_by "Submitted By"
-label variable submitted_at "Submission Date/Time"
-label variable status "Submission Status"
-label variable quality_score "Quality Score (0-100)"
-"""
-    
-    # Add field labels
-    for field in field_info:
-        do_file += f'label variable {field["name"]} "{field["label"]}"\n'
-    
-    # Add value labels for select/radio fields
-    for field in field_info:
-        if field["type"] in ["select", "radio"] and field["options"]:
-            label_name = f'{field["name"]}_lbl'
-            do_file += f'\nlabel define {label_name} '
-            for i, opt in enumerate(field["options"], 1):
-                opt_label = opt.get("label", opt.get("value", str(i)))
-                do_file += f'{i} "{opt_label}" '
-            do_file += f'\nencode {field["name"]}, gen({field["name"]}_coded) label({label_name})\n'
-    
-    do_file += f"""
-* Save as Stata format
-save "{form_name}_data.dta", replace
-
-* Summary statistics
-describe
-summarize
-"""
-    
-    # Log export
-    export_log = ExportJob(
-        org_id=form["org_id"],
-        user_id=current_user["user_id"],
-        form_id=data.form_id,
-        format="stata",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
-    )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
+    manager = await get_shared_job_manager()
+    await manager.create_job("export", job_params, export_job.user_id, export_job.org_id, job_id=export_job.id)
     
-    return StreamingResponse(
-        iter([do_file]),
-        media_type="text/plain",
-        headers={
-            "Content-Disposition": f"attachment; filename={form_name}_import.do"
-        }
-    )
+    queued = False
+    if CELERY_AVAILABLE:
+        try:
+            generate_export.delay({"export_id": export_job.id, "format": export_job.format})
+            queued = True
+        except Exception as e:
+            # Broker unavailable (Redis down), build the export in-process instead
+            logger.warning(f"Celery export task failed (Redis unavailable): {e}")
+    
+    if not queued:
+        background_tasks.add_task(run_export_job, db, export_job.id, manager)
+    
+    return {"id": export_job.id, "status": export_job.status, "cached": False}
 
 
-@router.post("/spss")
-async def export_to_spss(
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+@log_action("export_job", target_type="form")
+async def create_export_job(
     request: Request,
     data: ExportRequest,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
-    """Export submissions to SPSS format (.sps syntax file)"""
+    """
+    Queue an export to be built in the background.
+    
+    Returns the export job id immediately; poll GET /exports/{id} and fetch
+    the file from GET /exports/{id}/download once completed. A request for
+    the same form, filters, format, form version and latest submission as a
+    previous export reuses that export's artifact (or its in-flight job).
+    """
     db = request.app.state.db
     
     # Check form access
@@ -535,162 +635,200 @@ async def export_to_spss(
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
-    # Build query
-    query = {"form_id": data.form_id}
-    query.update(data.filters)
-    
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(None)
+    if data.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {data.format}")
     
-    if not submissions:
-        raise HTTPException(status_code=404, detail="No submissions found")
+    try:
+        since = await resolve_since(db, form, data.format, data.since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    compression = None if data.compression == "none" else data.compression
+    if compression and compression not in available_compressions():
+        raise HTTPException(status_code=400, detail=f"Compression not available: {compression}")
+    
+    query = build_export_query(data.form_id, data.filters, since)
+    watermark = await latest_submission_watermark(db, query)
+    cache_key = export_cache_key(
+        data.form_id, data.filters, data.format, form.get("version"), watermark, since, compression
+    )
     
-    # Get field info
-    field_info = []
-    for field in form.get("fields", []):
-        field_info.append({
-            "name": field["name"],
-            "type": field["type"],
-            "label": field.get("label", field["name"]),
-            "options": field.get("options", [])
-        })
-    
-    form_name = form['name'].replace(' ', '_')
-    
-    # Generate SPSS syntax
-    spss_syntax = f"""* DataPulse Export - SPSS Syntax File
-* Form: {form['name']}
-* Export Date: {datetime.now(timezone.utc).isoformat()}
-* Total Records: {len(submissions)}
-
-* Define variable list
-DATA LIST FREE / id (A20) submitted_by (A50) submitted_at (A25) status (A15) quality_score (F3) """
-    
-    # Add field definitions
-    for field in field_info:
-        if field["type"] in ["text", "textarea"]:
-            spss_syntax += f"{field['name']} (A200) "
-        elif field["type"] in ["select", "radio"]:
-            spss_syntax += f"{field['name']} (A100) "
-        elif field["type"] in ["number", "calculate"]:
-            spss_syntax += f"{field['name']} (F10.2) "
-        elif field["type"] == "date":
-            spss_syntax += f"{field['name']} (A10) "
-        elif field["type"] == "checkbox":
-            spss_syntax += f"{field['name']} (A200) "
-    
-    spss_syntax += ".\n\nBEGIN DATA\n"
-    
-    # Add data rows
-    for sub in submissions:
-        row = f"{sub['id']} {sub.get('submitted_by', 'NA')} {sub.get('submitted_at', 'NA')} {sub.get('status', 'NA')} {sub.get('quality_score', 0)} "
-        flat_data = flatten_dict(sub.get("data", {}))
-        for field in field_info:
-            val = flat_data.get(field["name"], "")
-            if val is None:
-                val = ""
-            if isinstance(val, (list, dict)):
-                val = json.dumps(val)
-            row += f"{str(val).replace(' ', '_')[:100] if val else 'NA'} "
-        spss_syntax += row + "\n"
-    
-    spss_syntax += """END DATA.
-
-* Variable labels
-VARIABLE LABELS
-    id 'Submission ID'
-    submitted_by 'Submitted By'
-    submitted_at 'Submission Date/Time'
-    status 'Submission Status'
-    quality_score 'Quality Score (0-100)'
-"""
-    
-    # Add field labels
-    for field in field_info:
-        spss_syntax += f"    {field['name']} '{field['label']}'\n"
-    
-    spss_syntax += ".\n"
-    
-    # Add value labels for categorical fields
-    for field in field_info:
-        if field["type"] in ["select", "radio"] and field["options"]:
-            spss_syntax += f"\nVALUE LABELS {field['name']}\n"
-            for opt in field["options"]:
-                opt_val = opt.get("value", "")
-                opt_label = opt.get("label", opt_val)
-                spss_syntax += f"    '{opt_val}' '{opt_label}'\n"
-            spss_syntax += ".\n"
-    
-    spss_syntax += f"""
-* Descriptive statistics
-DESCRIPTIVES VARIABLES=quality_score
-    /STATISTICS=MEAN STDDEV MIN MAX.
-
-FREQUENCIES VARIABLES=status
-    /ORDER=ANALYSIS.
-
-* Save the data file
-SAVE OUTFILE='{form_name}_data.sav'.
-"""
-    
-    # Log export
-    export_log = ExportJob(
+    export_job = ExportJob(
         org_id=form["org_id"],
         user_id=current_user["user_id"],
         form_id=data.form_id,
-        format="spss",
-        status="completed",
-        row_count=len(submissions),
-        completed_at=datetime.now(timezone.utc)
+        format=data.format,
+        filters=data.filters,
+        form_version=form.get("version"),
+        watermark=watermark,
+        since=since,
+        compression=compression,
+        cache_key=cache_key
     )
-    log_dict = export_log.model_dump()
-    log_dict["created_at"] = log_dict["created_at"].isoformat()
-    log_dict["completed_at"] = log_dict["completed_at"].isoformat()
-    await db.export_jobs.insert_one(log_dict)
+    return await queue_export_job(
+        db, export_job, {"form_id": data.form_id, "format": data.format}, background_tasks
+    )
+
+
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED)
+@log_action("export_batch", target_type="project")
+async def create_batch_export_job(
+    request: Request,
+    data: BatchExportRequest,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queue a project- or organization-wide export of all its forms.
     
-    return StreamingResponse(
-        iter([spss_syntax]),
-        media_type="text/plain",
-        headers={
-            "Content-Disposition": f"attachment; filename={form_name}_import.sps"
-        }
+    The artifact is a ZIP with one file per form (in the requested format)
+    and a manifest.json of row counts and SHA-256 checksums. Poll and
+    download it like any other export job.
+    """
+    db = request.app.state.db
+    
+    project = None
+    if data.project_id:
+        project = await db.projects.find_one({"id": data.project_id}, {"_id": 0, "org_id": 1})
+        scope, scope_id, org_id = "project", data.project_id, project["org_id"] if project else None
+        form_query = {"project_id": data.project_id}
+    elif data.org_id:
+        scope, scope_id, org_id = "org", data.org_id, data.org_id
+        form_query = {"org_id": data.org_id}
+    else:
+        raise HTTPException(status_code=400, detail="project_id or org_id is required")
+    
+    # Authorize before saying whether the project exists
+    membership = None
+    if org_id:
+        membership = await db.org_members.find_one(
+            {"org_id": org_id, "user_id": current_user["user_id"]},
+            {"_id": 0}
+        )
+    if not membership and not current_user.get("is_superadmin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    if data.project_id and not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if not data.include_archived:
+        form_query["status"] = {"$ne": "archived"}
+    if data.form_ids:
+        form_query["id"] = {"$in": data.form_ids}
+    forms = await db.forms.find(
+        form_query, {"_id": 0, "id": 1, "version": 1}
+    ).sort("created_at", 1).to_list(None)
+    if not forms:
+        raise HTTPException(status_code=404, detail="No forms found")
+    form_ids = [form["id"] for form in forms]
+    
+    scope_query = {"scope": scope, "project_id": data.project_id} if scope == "project" else {"scope": scope, "org_id": org_id}
+    try:
+        since = await resolve_job_since(db, scope_query, data.format, data.since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    watermark = await latest_submission_watermark(db, {"form_id": {"$in": form_ids}, **data.filters})
+    scope_key = f"{scope}:{scope_id}:" + ",".join(f"{form['id']}@{form.get('version')}" for form in forms)
+    cache_key = export_cache_key(scope_key, data.filters, data.format, None, watermark, since)
+    
+    export_job = ExportJob(
+        org_id=org_id,
+        user_id=current_user["user_id"],
+        format=data.format,
+        filters=data.filters,
+        watermark=watermark,
+        since=since,
+        scope=scope,
+        project_id=data.project_id,
+        form_ids=form_ids,
+        cache_key=cache_key
     )
+    job = await queue_export_job(
+        db,
+        export_job,
+        {"scope": scope, "scope_id": scope_id, "format": data.format, "form_count": len(form_ids)},
+        background_tasks
+    )
+    return {**job, "form_count": len(form_ids)}
 
 
-@router.get("/formats")
-async def get_export_formats():
-    """Get available export formats"""
-    return {
-        "formats": [
-            {
-                "id": "csv",
-                "name": "CSV",
-                "extension": ".csv",
-                "description": "Comma-separated values, compatible with Excel and most tools"
-            },
-            {
-                "id": "xlsx",
-                "name": "Excel",
-                "extension": ".xlsx",
-                "description": "Microsoft Excel format with formatting support"
-            },
-            {
-                "id": "json",
-                "name": "JSON",
-                "extension": ".json",
-                "description": "JavaScript Object Notation for developers"
-            },
-            {
-                "id": "stata",
-                "name": "Stata",
-                "extension": ".do",
-                "description": "Stata do-file for statistical analysis"
-            },
-            {
-                "id": "spss",
-                "name": "SPSS",
-                "extension": ".sps",
-                "description": "SPSS syntax file for statistical analysis"
-            }
-        ]
-    }
+async def _get_export_job_for_user(db, export_id: str, current_user: dict) -> dict:
+    """Load an export job and check the user belongs to its organization"""
+    job = await db.export_jobs.find_one({"id": export_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    
+    membership = await db.org_members.find_one(
+        {"org_id": job["org_id"], "user_id": current_user["user_id"]},
+        {"_id": 0}
+    )
+    
+    if not membership and not current_user.get("is_superadmin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    return job
+
 
+@router.get("/{export_id}")
+async def get_export_job(
+    request: Request,
+    export_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get export job status and progress"""
+    db = request.app.state.db
+    
+    job = await _get_export_job_for_user(db, export_id, current_user)
+    
+    # Live progress from the job manager is fresher than the stored copy
+    manager = await get_shared_job_manager()
+    live = await manager.get_job(export_id)
+    if live and job["status"] in ["pending", "processing"]:
+        job["progress"] = live.get("progress", job.get("progress", 0))
+        job["message"] = live.get("message")
+    
+    return job
+
+
+@router.get("/{export_id}/download")
+async def download_export(
+    request: Request,
+    export_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Download a completed export artifact"""
+    db = request.app.state.db
+    
+    job = await _get_export_job_for_user(db, export_id, current_user)
+    
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+    
+    if not await artifact_exists(job):
+        raise HTTPException(status_code=410, detail="Export file has expired")
+    
+    if job.get("storage") == "s3":
+        url = await get_artifact_url(job)
+        if not url:
+            raise HTTPException(status_code=503, detail="Export storage unavailable")
+        return RedirectResponse(url)
+    
+    if job.get("scope", "form") == "form":
+        form = await db.forms.find_one({"id": job["form_id"]}, {"_id": 0, "name": 1})
+        form_name = form["name"].replace(' ', '_') if form else export_id
+    else:
+        form_name = f"{job['scope']}_{job.get('project_id') or job['org_id']}"
+    fmt = job_artifact_format(job)
+    
+    return FileResponse(
+        local_artifact_path(job["artifact_key"]),
+        media_type=fmt["media_type"],
+        filename=f"{form_name}_export{fmt['extension']}"
+    )
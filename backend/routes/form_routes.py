@@ -6,6 +6,8 @@ from pydantic import BaseModel
 
 from models import Form, FormCreate, FormOut, FormDetailOut, FormField
 from auth import get_current_user
+from utils.access_cache import invalidate_form
+from utils.counters import FORM_SUBMISSIONS, get_count, get_counts
 
 router = APIRouter(prefix="/forms", tags=["Forms"])
 
@@ -116,9 +118,15 @@ async def list_forms(
     project_id: Optional[str] = None,
     org_id: Optional[str] = None,
     status_filter: Optional[str] = None,
+    estimated: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    """List forms in a project or organization"""
+    """
+    List forms in a project or organization.
+    
+    Submission counts come from maintained counters (one query for all
+    forms); estimated=false counts the submissions exactly instead.
+    """
     db = request.app.state.db
     
     # Require at least one filter
@@ -166,10 +174,11 @@ async def list_forms(
         query["status"] = status_filter
     
     forms = await db.forms.find(query, {"_id": 0}).to_list(1000)
+    submission_counts = await get_counts(db, FORM_SUBMISSIONS, [f["id"] for f in forms], exact=not estimated)
     
     result = []
     for form in forms:
-        submission_count = await db.submissions.count_documents({"form_id": form["id"]})
+        submission_count = submission_counts.get(form["id"], 0)
         
         result.append(FormOut(
             id=form["id"],
@@ -192,9 +201,10 @@ async def list_forms(
 async def get_form(
     request: Request,
     form_id: str,
+    estimated: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get form details with fields"""
+    """Get form details with fields (estimated=false for an exact submission count)"""
     db = request.app.state.db
     
     form = await db.forms.find_one({"id": form_id}, {"_id": 0})
@@ -212,7 +222,7 @@ async def get_form(
             detail="Not a member of this organization"
         )
     
-    submission_count = await db.submissions.count_documents({"form_id": form_id})
+    submission_count = await get_count(db, FORM_SUBMISSIONS, form_id, exact=not estimated)
     
     return FormDetailOut(
         id=form["id"],
@@ -273,8 +283,9 @@ async def update_form(
     }
     
     await db.forms.update_one({"id": form_id}, {"$set": update_data})
+    invalidate_form(form_id)
     
-    submission_count = await db.submissions.count_documents({"form_id": form_id})
+    submission_count = await get_count(db, FORM_SUBMISSIONS, form_id)
     
     return FormOut(
         id=form["id"],
@@ -324,6 +335,7 @@ async def update_form_fields(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_form(form_id)
     
     return {"message": "Fields updated successfully", "field_count": len(data.fields)}
 
@@ -385,6 +397,7 @@ async def publish_form(
             "updated_at": now
         }}
     )
+    invalidate_form(form_id)
     
     return {
         "message": "Form published successfully",
@@ -425,6 +438,7 @@ async def archive_form(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_form(form_id)
     
     return {"message": "Form archived successfully"}
 
@@ -579,5 +593,6 @@ async def update_form_settings(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_form(form_id)
     
     return {"message": "Settings updated successfully", "settings": merged_settings}
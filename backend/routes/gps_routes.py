@@ -2,12 +2,10 @@
 Handles GPS data collection, visualization, and accuracy tracking
 """
 
-import os
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
 
 router = APIRouter(prefix="/gps", tags=["GPS"])
 
@@ -32,18 +30,14 @@ class GPSSubmission(BaseModel):
     enumerator_name: Optional[str] = None
 
 
-def get_db():
-    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-    db_name = os.environ.get("DB_NAME", "datapulse")
-    client = AsyncIOMotorClient(mongo_url)
-    return client[db_name]
+def get_db(request: Request):
+    """Shared database handle from app state (one pooled client per process)"""
+    return request.app.state.db
 
 
 @router.post("/record")
-async def record_gps_point(data: GPSSubmission):
+async def record_gps_point(data: GPSSubmission, db=Depends(get_db)):
     """Record a GPS point from a submission"""
-    db = get_db()
-    
     record = {
         "submission_id": data.submission_id,
         "form_id": data.form_id,
@@ -73,11 +67,10 @@ async def get_gps_points(
     form_id: Optional[str] = None,
     enumerator_id: Optional[str] = None,
     days: int = Query(default=7, le=90),
-    limit: int = Query(default=1000, le=5000)
+    limit: int = Query(default=1000, le=5000),
+    db=Depends(get_db)
 ):
     """Get GPS points for map visualization"""
-    db = get_db()
-    
     # Build query
     query = {}
     
@@ -118,11 +111,10 @@ async def get_gps_clusters(
     org_id: str,
     project_id: Optional[str] = None,
     days: int = Query(default=7, le=90),
-    grid_size: float = Query(default=0.01, description="Grid size in degrees for clustering")
+    grid_size: float = Query(default=0.01, description="Grid size in degrees for clustering"),
+    db=Depends(get_db)
 ):
     """Get clustered GPS points for efficient map rendering"""
-    db = get_db()
-    
     query = {}
     if project_id:
         query["project_id"] = project_id
@@ -171,11 +163,10 @@ async def get_gps_clusters(
 async def get_coverage_stats(
     org_id: str,
     project_id: Optional[str] = None,
-    days: int = Query(default=30, le=90)
+    days: int = Query(default=30, le=90),
+    db=Depends(get_db)
 ):
     """Get GPS coverage statistics"""
-    db = get_db()
-    
     query = {}
     if project_id:
         query["project_id"] = project_id
@@ -2,11 +2,9 @@
 API endpoints for calculated fields and skip logic
 """
 
-import os
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
 from logic_engine import CalculationEngine, SkipLogicEngine, process_form_logic
 
 router = APIRouter(prefix="/logic", tags=["Form Logic"])
@@ -38,21 +36,17 @@ class ValidateSkipLogicRequest(BaseModel):
     values: Dict[str, Any]
 
 
-def get_db():
-    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-    db_name = os.environ.get("DB_NAME", "datapulse")
-    client = AsyncIOMotorClient(mongo_url)
-    return client[db_name]
+def get_db(request: Request):
+    """Shared database handle from app state (one pooled client per process)"""
+    return request.app.state.db
 
 
 @router.post("/evaluate")
-async def evaluate_form_logic(request: EvaluateRequest):
+async def evaluate_form_logic(request: EvaluateRequest, db=Depends(get_db)):
     """
     Evaluate all form logic (calculations and skip logic) for given values.
     Returns calculated field values and field visibility.
     """
-    db = get_db()
-    
     # Get form definition
     form = await db.forms.find_one({"id": request.form_id})
     if not form:
@@ -7,11 +7,10 @@ import uuid
 import hashlib
 from datetime import datetime, timezone
 from typing import Optional
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks, Request
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 import aiofiles
-from motor.motor_asyncio import AsyncIOMotorClient
 
 router = APIRouter(prefix="/media", tags=["Media"])
 
@@ -93,12 +92,9 @@ def validate_file(file: UploadFile, media_type: str) -> bool:
     return True
 
 
-def get_db():
-    """Get database connection"""
-    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-    db_name = os.environ.get("DB_NAME", "datapulse")
-    client = AsyncIOMotorClient(mongo_url)
-    return client[db_name]
+def get_db(request: Request):
+    """Shared database handle from app state (one pooled client per process)"""
+    return request.app.state.db
 
 
 @router.post("/upload")
@@ -107,14 +103,13 @@ async def upload_media(
     media_type: str = Form(...),
     submission_id: Optional[str] = Form(None),
     field_id: Optional[str] = Form(None),
-    user_id: str = Form(...)
+    user_id: str = Form(...),
+    db=Depends(get_db)
 ):
     """
     Upload a media file (single file upload)
     Supports: photos (10MB), audio (25MB), video (50MB), documents (25MB)
     """
-    db = get_db()
-    
     # Validate media type
     if media_type not in FILE_LIMITS:
         raise HTTPException(status_code=400, detail=f"Invalid media type: {media_type}")
@@ -187,13 +182,11 @@ async def upload_media(
 
 
 @router.post("/upload/init")
-async def init_chunked_upload(data: ChunkUploadInit, user_id: str = Form(...)):
+async def init_chunked_upload(data: ChunkUploadInit, user_id: str = Form(...), db=Depends(get_db)):
     """
     Initialize a chunked upload for large files
     Returns an upload_id to use for uploading chunks
     """
-    db = get_db()
-    
     # Validate
     if data.media_type not in FILE_LIMITS:
         raise HTTPException(status_code=400, detail=f"Invalid media type: {data.media_type}")
@@ -236,11 +229,10 @@ async def init_chunked_upload(data: ChunkUploadInit, user_id: str = Form(...)):
 async def upload_chunk(
     upload_id: str,
     chunk_index: int,
-    chunk: UploadFile = File(...)
+    chunk: UploadFile = File(...),
+    db=Depends(get_db)
 ):
     """Upload a single chunk of a file"""
-    db = get_db()
-    
     # Find upload session
     session = await db.upload_sessions.find_one({"upload_id": upload_id})
     if not session:
@@ -274,10 +266,8 @@ async def upload_chunk(
 
 
 @router.post("/upload/complete/{upload_id}")
-async def complete_chunked_upload(upload_id: str, background_tasks: BackgroundTasks):
+async def complete_chunked_upload(upload_id: str, background_tasks: BackgroundTasks, db=Depends(get_db)):
     """Complete a chunked upload by assembling all chunks"""
-    db = get_db()
-    
     # Find upload session
     session = await db.upload_sessions.find_one({"upload_id": upload_id})
     if not session:
@@ -373,10 +363,8 @@ async def cleanup_chunks(upload_id: str, total_chunks: int):
 
 
 @router.get("/file/{file_id}")
-async def get_media_file(file_id: str):
+async def get_media_file(file_id: str, db=Depends(get_db)):
     """Get a media file by ID"""
-    db = get_db()
-    
     media = await db.media.find_one({"id": file_id})
     if not media:
         raise HTTPException(status_code=404, detail="File not found")
@@ -393,10 +381,8 @@ async def get_media_file(file_id: str):
 
 
 @router.get("/thumbnail/{file_id}")
-async def get_thumbnail(file_id: str):
+async def get_thumbnail(file_id: str, db=Depends(get_db)):
     """Get thumbnail for a media file (photos/videos)"""
-    db = get_db()
-    
     media = await db.media.find_one({"id": file_id})
     if not media:
         raise HTTPException(status_code=404, detail="File not found")
@@ -416,10 +402,8 @@ async def get_thumbnail(file_id: str):
 
 
 @router.delete("/{file_id}")
-async def delete_media(file_id: str):
+async def delete_media(file_id: str, db=Depends(get_db)):
     """Delete a media file"""
-    db = get_db()
-    
     media = await db.media.find_one({"id": file_id})
     if not media:
         raise HTTPException(status_code=404, detail="File not found")
@@ -436,10 +420,8 @@ async def delete_media(file_id: str):
 
 
 @router.get("/submission/{submission_id}")
-async def get_submission_media(submission_id: str):
+async def get_submission_media(submission_id: str, db=Depends(get_db)):
     """Get all media files for a submission"""
-    db = get_db()
-    
     media_list = await db.media.find(
         {"submission_id": submission_id},
         {"_id": 0, "path": 0, "hash": 0}
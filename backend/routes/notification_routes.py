@@ -6,6 +6,10 @@ from pydantic import BaseModel
 import secrets
 
 from auth import get_current_user
+from utils.counters import (
+    USER_NOTIFICATIONS, apply_counter_updates, count_of, counter_updates, get_breakdowns, reset_counter,
+    status_change_updates
+)
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -33,9 +37,10 @@ async def get_notifications(
     unread_only: bool = Query(False),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    estimated: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get user's notifications"""
+    """Get user's notifications (counts from the user's counters unless estimated=false)"""
     db = request.app.state.db
     
     query = {"user_id": current_user["user_id"]}
@@ -47,16 +52,11 @@ async def get_notifications(
         {"_id": 0}
     ).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
     
-    # Get unread count
-    unread_count = await db.notifications.count_documents({
-        "user_id": current_user["user_id"],
-        "read": False
-    })
-    
-    # Get total count
-    total = await db.notifications.count_documents({
-        "user_id": current_user["user_id"]
-    })
+    # Unread and total counts
+    user_id = current_user["user_id"]
+    by_read = (await get_breakdowns(db, USER_NOTIFICATIONS, [user_id], exact=not estimated))[user_id]
+    unread_count = count_of(by_read, status=False)
+    total = count_of(by_read)
     
     return NotificationsResponse(
         notifications=[NotificationOut(**n) for n in notifications],
@@ -74,13 +74,15 @@ async def mark_as_read(
     """Mark a notification as read"""
     db = request.app.state.db
     
-    result = await db.notifications.update_one(
+    before = await db.notifications.find_one_and_update(
         {"id": notification_id, "user_id": current_user["user_id"]},
-        {"$set": {"read": True, "read_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "user_id": 1, "read": 1}
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Notification not found")
+    await apply_counter_updates(db, status_change_updates("notifications", before, True))
     
     return {"success": True}
 
@@ -97,6 +99,9 @@ async def mark_all_as_read(
         {"user_id": current_user["user_id"], "read": False},
         {"$set": {"read": True, "read_at": datetime.now(timezone.utc).isoformat()}}
     )
+    await apply_counter_updates(db, status_change_updates(
+        "notifications", {"user_id": current_user["user_id"], "read": False}, True, result.modified_count
+    ))
     
     return {"success": True, "updated": result.modified_count}
 
@@ -110,13 +115,14 @@ async def delete_notification(
     """Delete a notification"""
     db = request.app.state.db
     
-    result = await db.notifications.delete_one({
-        "id": notification_id,
-        "user_id": current_user["user_id"]
-    })
+    deleted = await db.notifications.find_one_and_delete(
+        {"id": notification_id, "user_id": current_user["user_id"]},
+        projection={"_id": 0, "user_id": 1, "read": 1}
+    )
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Notification not found")
+    await apply_counter_updates(db, counter_updates("notifications", [deleted], -1))
     
     return {"success": True}
 
@@ -132,6 +138,7 @@ async def clear_all_notifications(
     result = await db.notifications.delete_many({
         "user_id": current_user["user_id"]
     })
+    await reset_counter(db, USER_NOTIFICATIONS, current_user["user_id"])
     
     return {"success": True, "deleted": result.deleted_count}
 
@@ -160,4 +167,5 @@ async def create_notification(
     }
     
     await db.notifications.insert_one(notification)
+    await apply_counter_updates(db, counter_updates("notifications", [notification], 1))
     return notification
@@ -9,6 +9,8 @@ from models import (
     OrgMember, OrgMemberOut, UserOut
 )
 from auth import get_current_user
+from utils.access_cache import invalidate_membership
+from utils.batch_lookup import get_batch_lookup
 
 router = APIRouter(prefix="/organizations", tags=["Organizations"])
 
@@ -227,9 +229,14 @@ async def list_org_members(
     
     members = await db.org_members.find({"org_id": org_id}, {"_id": 0}).to_list(1000)
     
+    users = await get_batch_lookup(request).fetch(
+        "users", (member["user_id"] for member in members),
+        projection={"email": 1, "name": 1, "avatar": 1, "locale": 1, "is_superadmin": 1}
+    )
+    
     result = []
     for member in members:
-        user = await db.users.find_one({"id": member["user_id"]}, {"_id": 0})
+        user = users.get(member["user_id"])
         if user:
             result.append(OrgMemberOut(
                 id=member["id"],
@@ -295,6 +302,7 @@ async def add_org_member(
     member_dict["joined_at"] = member_dict["joined_at"].isoformat()
     
     await db.org_members.insert_one(member_dict)
+    invalidate_membership(org_id, user["id"])
     
     return {"message": "Member added successfully", "member_id": member.id}
 
@@ -321,9 +329,14 @@ async def remove_org_member(
             detail="Admin access required"
         )
     
-    result = await db.org_members.delete_one({"id": member_id, "org_id": org_id})
+    removed = await db.org_members.find_one_and_delete(
+        {"id": member_id, "org_id": org_id},
+        projection={"_id": 0, "user_id": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not removed:
         raise HTTPException(status_code=404, detail="Member not found")
     
+    invalidate_membership(org_id, removed["user_id"])
+    
     return {"message": "Member removed successfully"}
@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 
 from models import Project, ProjectCreate, ProjectOut
 from auth import get_current_user
+from utils.counters import PROJECT_SUBMISSIONS, get_count, get_counts
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
@@ -100,12 +101,22 @@ async def list_projects(
         query["status"] = status
     
     projects = await db.projects.find(query, {"_id": 0}).to_list(1000)
+    project_ids = [p["id"] for p in projects]
+    
+    # Count forms and submissions for all projects at once
+    form_counts = {
+        row["_id"]: row["count"]
+        for row in await db.forms.aggregate([
+            {"$match": {"project_id": {"$in": project_ids}}},
+            {"$group": {"_id": "$project_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+    }
+    submission_counts = await get_counts(db, PROJECT_SUBMISSIONS, project_ids)
     
     result = []
     for proj in projects:
-        # Count forms and submissions
-        form_count = await db.forms.count_documents({"project_id": proj["id"]})
-        submission_count = await db.submissions.count_documents({"project_id": proj["id"]})
+        form_count = form_counts.get(proj["id"], 0)
+        submission_count = submission_counts.get(proj["id"], 0)
         
         result.append(ProjectOut(
             id=proj["id"],
@@ -147,7 +158,7 @@ async def get_project(
     
     # Count forms and submissions
     form_count = await db.forms.count_documents({"project_id": project_id})
-    submission_count = await db.submissions.count_documents({"project_id": project_id})
+    submission_count = await get_count(db, PROJECT_SUBMISSIONS, project_id)
     
     return ProjectOut(
         id=project["id"],
@@ -207,7 +218,7 @@ async def update_project(
     project.update(update_data)
     
     form_count = await db.forms.count_documents({"project_id": project_id})
-    submission_count = await db.submissions.count_documents({"project_id": project_id})
+    submission_count = await get_count(db, PROJECT_SUBMISSIONS, project_id)
     
     return ProjectOut(
         id=project["id"],
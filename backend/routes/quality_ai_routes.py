@@ -18,6 +18,12 @@ import statistics
 import asyncio
 from dotenv import load_dotenv
 
+from utils.counters import (
+    ORG_QUALITY_ALERTS, apply_counter_updates, bounded_count, count_of, counter_updates, get_breakdowns, get_count,
+    status_change_updates
+)
+from utils.pagination import Keyset
+
 load_dotenv()
 
 router = APIRouter(prefix="/quality-ai", tags=["Quality & AI Monitoring"])
@@ -758,6 +764,7 @@ async def create_quality_alert(
     }
     
     await db.quality_alerts.insert_one(alert)
+    await apply_counter_updates(db, counter_updates("quality_alerts", [alert], 1))
     return alert
 
 
@@ -769,9 +776,17 @@ async def get_quality_alerts(
     alert_type: Optional[str] = None,
     severity: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    estimated: bool = True
 ):
-    """Get quality alerts"""
+    """
+    Get quality alerts, newest first (pass next_cursor back as `cursor` instead of offset).
+    
+    `total` comes from the org's alert counters when filtering by status
+    only; with other filters the count stops at a bound (total_estimated
+    is then true). estimated=false always counts exactly.
+    """
     db = request.app.state.db
     
     query = {"org_id": org_id}
@@ -782,15 +797,22 @@ async def get_quality_alerts(
     if severity:
         query["severity"] = severity
     
-    alerts = await db.quality_alerts.find(query).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
-    total = await db.quality_alerts.count_documents(query)
+    keyset = Keyset("created_at", "id", descending=True)
+    alerts = await db.quality_alerts.find(
+        keyset.apply(query, cursor)
+    ).sort(keyset.sort).skip(0 if cursor else offset).limit(limit).to_list(limit)
+    if alert_type or severity:
+        total, total_estimated = await bounded_count(db.quality_alerts, query, estimated)
+    else:
+        total, total_estimated = await get_count(db, ORG_QUALITY_ALERTS, org_id, status=status, exact=not estimated), False
+    next_cursor = keyset.next_cursor(alerts, limit)
     
     for a in alerts:
         a["_id"] = str(a.get("_id", ""))
         if a.get("created_at"):
             a["created_at"] = a["created_at"].isoformat()
     
-    return {"alerts": alerts, "total": total}
+    return {"alerts": alerts, "total": total, "total_estimated": total_estimated, "next_cursor": next_cursor}
 
 
 @router.put("/alerts/{alert_id}/resolve")
@@ -802,7 +824,7 @@ async def resolve_alert(
     db = request.app.state.db
     data = await request.json()
     
-    result = await db.quality_alerts.update_one(
+    before = await db.quality_alerts.find_one_and_update(
         {"id": alert_id},
         {
             "$set": {
@@ -811,11 +833,13 @@ async def resolve_alert(
                 "resolved_by": data.get("resolved_by"),
                 "resolved_at": datetime.now(timezone.utc)
             }
-        }
+        },
+        projection={"_id": 0, "org_id": 1, "status": 1}
     )
     
-    if result.modified_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await apply_counter_updates(db, status_change_updates("quality_alerts", before, "resolved"))
     
     return {"message": "Alert resolved"}
 
@@ -851,8 +875,9 @@ async def get_alerts_summary(
         {"$sort": {"_id": 1}}
     ]).to_list(7)
     
-    total_open = await db.quality_alerts.count_documents({"org_id": org_id, "status": "open"})
-    total_resolved = await db.quality_alerts.count_documents({"org_id": org_id, "status": "resolved"})
+    by_status = (await get_breakdowns(db, ORG_QUALITY_ALERTS, [org_id]))[org_id]
+    total_open = count_of(by_status, "open")
+    total_resolved = count_of(by_status, "resolved")
     
     return {
         "total_open": total_open,
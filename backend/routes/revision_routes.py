@@ -18,6 +18,11 @@ import json
 import hashlib
 from deepdiff import DeepDiff
 
+from utils.cache_events import submissions_changed
+from utils.counters import SUBMISSION_COUNTER_FIELDS, apply_counter_updates, status_change_updates
+from utils.pagination import Keyset
+from utils.submission_fields import FieldSelection, json_response
+
 router = APIRouter(prefix="/revisions", tags=["Submission Revisions"])
 
 
@@ -133,7 +138,7 @@ async def create_revision(
     # Update submission with new version
     new_status = SubmissionStatus.RESUBMITTED if revision_data.is_correction_mode else submission.get("status")
     
-    await db.submissions.update_one(
+    before = await db.submissions.find_one_and_update(
         {"id": submission_id},
         {
             "$set": {
@@ -144,8 +149,11 @@ async def create_revision(
                 "last_modified_at": datetime.now(timezone.utc),
                 "last_modified_by": revision["created_by"],
             }
-        }
+        },
+        projection=SUBMISSION_COUNTER_FIELDS
     )
+    await apply_counter_updates(db, status_change_updates("submissions", before, new_status))
+    await submissions_changed([before])
     
     # Log to audit trail
     await log_revision_audit(db, submission_id, revision, current_user)
@@ -308,7 +316,7 @@ async def lock_submission(
             detail="Only approved submissions can be locked"
         )
     
-    await db.submissions.update_one(
+    before = await db.submissions.find_one_and_update(
         {"id": submission_id},
         {
             "$set": {
@@ -320,8 +328,11 @@ async def lock_submission(
                 },
                 "status": SubmissionStatus.LOCKED
             }
-        }
+        },
+        projection=SUBMISSION_COUNTER_FIELDS
     )
+    await apply_counter_updates(db, status_change_updates("submissions", before, SubmissionStatus.LOCKED))
+    await submissions_changed([before])
     
     return {"message": "Submission locked", "submission_id": submission_id}
 
@@ -342,7 +353,7 @@ async def unlock_submission(
     if not submission.get("is_locked"):
         raise HTTPException(status_code=400, detail="Submission is not locked")
     
-    await db.submissions.update_one(
+    before = await db.submissions.find_one_and_update(
         {"id": submission_id},
         {
             "$set": {
@@ -354,8 +365,11 @@ async def unlock_submission(
             "$unset": {
                 "lock_settings": ""
             }
-        }
+        },
+        projection=SUBMISSION_COUNTER_FIELDS
     )
+    await apply_counter_updates(db, status_change_updates("submissions", before, SubmissionStatus.APPROVED))
+    await submissions_changed([before])
     
     return {"message": "Submission unlocked", "submission_id": submission_id}
 
@@ -390,7 +404,7 @@ async def create_correction_request(
     await db.correction_requests.insert_one(correction_doc)
     
     # Update submission status
-    await db.submissions.update_one(
+    before = await db.submissions.find_one_and_update(
         {"id": correction.submission_id},
         {
             "$set": {
@@ -398,8 +412,11 @@ async def create_correction_request(
                 "correction_request_id": correction_doc["id"],
                 "returned_at": datetime.now(timezone.utc)
             }
-        }
+        },
+        projection=SUBMISSION_COUNTER_FIELDS
     )
+    await apply_counter_updates(db, status_change_updates("submissions", before, SubmissionStatus.RETURNED))
+    await submissions_changed([before])
     
     return {
         "message": "Correction request created",
@@ -490,28 +507,38 @@ async def get_raw_dataset(
     request: Request,
     form_id: str,
     limit: int = 1000,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    exclude_data: bool = False
 ):
-    """Get raw (all) submissions for a form"""
+    """
+    Get raw (all) submissions for a form, newest first (offset or next_cursor paging).
+    Whole documents by default; `fields` / `exclude_data` select columns.
+    """
     db = request.app.state.db
+    selection = FieldSelection(fields, exclude_data)
     
+    keyset = Keyset("submitted_at", "id", descending=True)
     submissions = await db.submissions.find(
-        {"form_id": form_id}
-    ).skip(offset).limit(limit).to_list(limit)
+        keyset.apply({"form_id": form_id}, cursor), selection.projection(extra=("submitted_at",))
+    ).sort(keyset.sort).skip(0 if cursor else offset).limit(limit).to_list(limit)
     
     total = await db.submissions.count_documents({"form_id": form_id})
+    next_cursor = keyset.next_cursor(submissions, limit)
     
-    for s in submissions:
-        s["_id"] = str(s.get("_id", ""))
+    if selection.selected:
+        submissions = [selection.render(s) for s in submissions]
     
-    return {
+    return json_response({
         "form_id": form_id,
         "dataset_type": "raw",
         "submissions": submissions,
         "total": total,
         "limit": limit,
-        "offset": offset
-    }
+        "offset": offset,
+        "next_cursor": next_cursor
+    })
 
 
 @router.get("/datasets/{form_id}/approved")
@@ -519,34 +546,41 @@ async def get_approved_dataset(
     request: Request,
     form_id: str,
     limit: int = 1000,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    exclude_data: bool = False
 ):
-    """Get approved (analysis-ready) submissions for a form"""
+    """Get approved (analysis-ready) submissions for a form, newest first (`fields` as for raw)"""
     db = request.app.state.db
+    selection = FieldSelection(fields, exclude_data)
     
     approved_statuses = [SubmissionStatus.APPROVED, SubmissionStatus.LOCKED]
     
-    submissions = await db.submissions.find({
+    keyset = Keyset("submitted_at", "id", descending=True)
+    submissions = await db.submissions.find(keyset.apply({
         "form_id": form_id,
         "status": {"$in": approved_statuses}
-    }).skip(offset).limit(limit).to_list(limit)
+    }, cursor), selection.projection(extra=("submitted_at",))).sort(keyset.sort).skip(0 if cursor else offset).limit(limit).to_list(limit)
+    next_cursor = keyset.next_cursor(submissions, limit)
     
     total = await db.submissions.count_documents({
         "form_id": form_id,
         "status": {"$in": approved_statuses}
     })
     
-    for s in submissions:
-        s["_id"] = str(s.get("_id", ""))
+    if selection.selected:
+        submissions = [selection.render(s) for s in submissions]
     
-    return {
+    return json_response({
         "form_id": form_id,
         "dataset_type": "approved",
         "submissions": submissions,
         "total": total,
         "limit": limit,
-        "offset": offset
-    }
+        "offset": offset,
+        "next_cursor": next_cursor
+    })
 
 
 # ============ Helper Functions ============
@@ -3,14 +3,26 @@ FieldForce - Submission Routes
 Optimized for 2M+ daily submissions with bulk operations and async processing
 """
 from fastapi import APIRouter, HTTPException, status, Request, Depends, Query, BackgroundTasks
+from starlette.requests import ClientDisconnect
 from typing import List, Optional, Dict, Any
+import asyncio
 from datetime import datetime, timezone, timedelta
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import logging
 
-from models import Submission, SubmissionCreate, SubmissionOut
+from models import Submission, SubmissionCreate, SubmissionOut, SubmissionPartialOut
 from auth import get_current_user
+from utils.access_cache import check_form_access_cached
+from utils.cache_events import submissions_changed
+from utils.counters import SUBMISSION_COUNTER_FIELDS, apply_counter_updates, counter_updates, status_change_updates
+from utils.ingest_buffer import IngestError
+from utils.ndjson_ingest import DuplexStreamingResponse, NDJSONBodyError, iter_ndjson
+from utils.pagination import NEXT_CURSOR_HEADER, Keyset
+from utils.quality_rules import get_quality_rules
+from utils.streaming_export import cursor_chunks, json_dumps, negotiate_compression, stream_jsonl_response
+from utils.submission_fields import FieldSelection, json_response
 
 logger = logging.getLogger(__name__)
 
@@ -19,10 +31,8 @@ router = APIRouter(prefix="/submissions", tags=["Submissions"])
 # Try to import Celery tasks (optional - graceful fallback if not available)
 try:
     from workers.submission_tasks import (
-        process_submission,
         process_bulk_submissions,
-        validate_submission_media,
-        trigger_submission_webhooks
+        run_submission_pipeline
     )
     CELERY_AVAILABLE = True
 except ImportError:
@@ -30,6 +40,22 @@ except ImportError:
     logger.warning("Celery workers not available - running in synchronous mode")
 
 
+def submission_out(s: dict) -> SubmissionOut:
+    """Build the API representation of a stored submission"""
+    return SubmissionOut(
+        id=s["id"],
+        form_id=s["form_id"],
+        form_version=s["form_version"],
+        data=s["data"],
+        submitted_by=s["submitted_by"],
+        submitted_at=datetime.fromisoformat(s["submitted_at"]) if isinstance(s["submitted_at"], str) else s["submitted_at"],
+        status=s["status"],
+        quality_score=s.get("quality_score"),
+        quality_flags=s.get("quality_flags", []),
+        gps_location=s.get("gps_location")
+    )
+
+
 class SubmissionReview(BaseModel):
     status: str  # approved, rejected, flagged
     notes: Optional[str] = None
@@ -47,6 +73,55 @@ class BulkSubmissionResponse(BaseModel):
     errors: List[dict]
     processing_mode: str  # "async" or "sync"
     task_id: Optional[str] = None
+    # Retried uploads already stored: {"index", "client_submission_id", "submission_id", "status"}
+    duplicate_count: int = 0
+    duplicates: List[dict] = []
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Records per bulk_write for streamed bulk uploads
+BULK_STREAM_CHUNK_SIZE = 500
+MAX_BULK_STREAM_CHUNK_SIZE = 5000
+
+
+def idempotency_key(sub_data: SubmissionCreate, user_id: str) -> Optional[str]:
+    """
+    Dedupe key of a client submission:
+    <user_id>:<device_id>:<client_submission_id>. Scoped by the
+    authenticated user, so another account sending the same device and
+    client ids never matches (or blocks) this user's uploads.
+    """
+    if not sub_data.client_submission_id:
+        return None
+    return f"{user_id}:{sub_data.device_id or ''}:{sub_data.client_submission_id}"
+
+
+def is_retry_of(existing: dict, sub_data: SubmissionCreate, user_id: str) -> bool:
+    """Whether a stored submission with the upload's key is the same upload (same user and form)"""
+    return existing.get("submitted_by") == user_id and existing.get("form_id") == sub_data.form_id
+
+
+KEY_REUSED = "client_submission_id was already used for a different submission"
+
+
+def stored_retry(existing: dict, sub_data: SubmissionCreate, user_id: str) -> SubmissionOut:
+    """The stored submission for a retried upload; 409 (without its data) if the key was reused"""
+    if not is_retry_of(existing, sub_data, user_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=KEY_REUSED)
+    return submission_out(existing)
+
+
+async def find_received(db, keys: List[str]) -> Dict[str, dict]:
+    """Already stored submissions (id, form_id, submitted_by), keyed by idempotency key"""
+    keys = list({key for key in keys if key})
+    if not keys:
+        return {}
+    cursor = db.submissions.find(
+        {"idempotency_key": {"$in": keys}},
+        {"_id": 0, "idempotency_key": 1, "id": 1, "form_id": 1, "submitted_by": 1}
+    )
+    return {doc["idempotency_key"]: doc async for doc in cursor}
 
 
 async def check_form_access(db, form_id: str, user_id: str):
@@ -62,35 +137,16 @@ async def check_form_access(db, form_id: str, user_id: str):
     return membership, form
 
 
-def calculate_quality_score(data: Dict[str, Any], form_fields: List[Dict]) -> tuple:
-    """Calculate submission quality score and flags"""
-    score = 100.0
-    flags = []
-    
-    field_map = {f["name"]: f for f in form_fields}
-    
-    for field_name, field_config in field_map.items():
-        value = data.get(field_name)
-        
-        # Check required fields
-        if field_config.get("validation", {}).get("required") and not value:
-            score -= 10
-            flags.append(f"missing_required:{field_name}")
-        
-        # Check value constraints
-        validation = field_config.get("validation", {})
-        if value is not None:
-            if validation.get("min_value") and isinstance(value, (int, float)):
-                if value < validation["min_value"]:
-                    score -= 5
-                    flags.append(f"below_min:{field_name}")
-            
-            if validation.get("max_value") and isinstance(value, (int, float)):
-                if value > validation["max_value"]:
-                    score -= 5
-                    flags.append(f"above_max:{field_name}")
-    
-    return max(0, score), flags
+def publish_submission_pipeline(submission_ids: List[str]):
+    """Queue the post-submission pipeline (scoring, media, webhooks) for new submissions"""
+    if CELERY_AVAILABLE:
+        run_submission_pipeline.delay(submission_ids)
+
+
+async def publish_ingested_batch(submission_ids: List[str]):
+    """Ingest buffer flush hook: one pipeline task per flushed batch"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, publish_submission_pipeline, submission_ids)
 
 
 @router.post("", response_model=SubmissionOut)
@@ -102,8 +158,10 @@ async def create_submission(
     """Submit form data"""
     db = request.app.state.db
     
-    # Check form access
-    membership, form = await check_form_access(db, data.form_id, current_user["user_id"])
+    # Check form access (form and membership served from the in-process cache)
+    membership, form = await check_form_access_cached(
+        db, data.form_id, current_user["user_id"], data.form_version
+    )
     
     if not membership and not current_user.get("is_superadmin"):
         raise HTTPException(
@@ -117,11 +175,15 @@ async def create_submission(
     if form["status"] != "published":
         raise HTTPException(status_code=400, detail="Form is not published")
     
+    # Retried upload of a submission we already have: return the stored one
+    key = idempotency_key(data, current_user["user_id"])
+    if key:
+        existing = await db.submissions.find_one({"idempotency_key": key}, {"_id": 0})
+        if existing:
+            return stored_retry(existing, data, current_user["user_id"])
+    
     # Calculate quality score
-    quality_score, quality_flags = calculate_quality_score(
-        data.data,
-        form.get("fields", [])
-    )
+    quality_score, quality_flags = get_quality_rules(form).score(data.data)
     
     # Extract GPS if present
     gps_location = None
@@ -145,10 +207,12 @@ async def create_submission(
         org_id=form["org_id"],
         project_id=form["project_id"],
         submitted_by=current_user["user_id"],
+        synced_at=datetime.now(timezone.utc),
         gps_location=gps_location,
         gps_accuracy=gps_accuracy,
         quality_score=quality_score,
-        quality_flags=quality_flags
+        quality_flags=quality_flags,
+        idempotency_key=key
     )
     
     submission_dict = submission.model_dump()
@@ -158,17 +222,40 @@ async def create_submission(
     if submission_dict.get("reviewed_at"):
         submission_dict["reviewed_at"] = submission_dict["reviewed_at"].isoformat()
     
-    await db.submissions.insert_one(submission_dict)
-    
-    # Trigger async processing if Celery is available and Redis is connected
-    if CELERY_AVAILABLE:
+    ingest_buffer = getattr(request.app.state, "ingest_buffer", None)
+    if ingest_buffer is not None:
+        # Write-behind mode: batched insert, one processing task per flush
         try:
-            process_submission.delay(submission.id)
-            validate_submission_media.delay(submission.id)
-            trigger_submission_webhooks.delay(submission.id)
-        except Exception as e:
-            # Celery not available (Redis down), skip async processing
-            logger.warning(f"Celery task failed (Redis unavailable): {e}")
+            existing = await ingest_buffer.submit(submission_dict)
+        except IngestError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        if existing:
+            # Concurrent retry of the same upload was flushed first
+            return stored_retry(existing, data, current_user["user_id"])
+    else:
+        try:
+            await db.submissions.insert_one(submission_dict)
+        except DuplicateKeyError:
+            # Concurrent retry of the same upload won the race
+            existing = await db.submissions.find_one({"idempotency_key": key}, {"_id": 0}) if key else None
+            if not existing:
+                raise
+            return stored_retry(existing, data, current_user["user_id"])
+        await apply_counter_updates(db, counter_updates("submissions", [submission_dict], 1))
+        await submissions_changed([submission_dict])
+        
+        # Trigger async processing if Celery is available and Redis is connected
+        if CELERY_AVAILABLE:
+            pipeline = getattr(request.app.state, "submission_pipeline", None)
+            if pipeline is not None:
+                # Coalesced with other new submissions while the broker is busy
+                pipeline.add(submission.id)
+            else:
+                try:
+                    publish_submission_pipeline([submission.id])
+                except Exception as e:
+                    # Celery not available (Redis down), skip async processing
+                    logger.warning(f"Celery task failed (Redis unavailable): {e}")
     
     return SubmissionOut(
         id=submission.id,
@@ -184,63 +271,103 @@ async def create_submission(
     )
 
 
-@router.post("/bulk", response_model=BulkSubmissionResponse)
-async def create_bulk_submissions(
-    request: Request,
-    data: BulkSubmissionCreate,
-    background_tasks: BackgroundTasks,
-    current_user: dict = Depends(get_current_user)
-):
+class SubmissionAccess:
+    """
+    Forms and org memberships for a bulk upload, resolved with $in queries
+    and memoized for the request (streamed uploads reuse them across chunks).
     """
-    Submit multiple form entries (optimized for offline sync).
     
-    Supports 2M+ daily submissions with:
-    - Bulk MongoDB operations (10-50x faster)
-    - Async background processing via Celery
-    - Graceful error handling per submission
+    def __init__(self, db, current_user: dict):
+        self.db = db
+        self.user_id = current_user["user_id"]
+        self.is_superadmin = current_user.get("is_superadmin", False)
+        self.forms: Dict[str, Optional[dict]] = {}
+        self.user_orgs = set()
+        self._checked_orgs = set()
+    
+    async def load(self, form_ids):
+        """Fetch forms (and the user's memberships in their orgs) not seen yet"""
+        missing = list({form_id for form_id in form_ids if form_id not in self.forms})
+        if missing:
+            found = {
+                form["id"]: form
+                async for form in self.db.forms.find({"id": {"$in": missing}}, {"_id": 0})
+            }
+            for form_id in missing:
+                self.forms[form_id] = found.get(form_id)
+        
+        org_ids = list({f["org_id"] for f in self.forms.values() if f} - self._checked_orgs)
+        if org_ids and not self.is_superadmin:
+            memberships_cursor = self.db.org_members.find(
+                {"org_id": {"$in": org_ids}, "user_id": self.user_id},
+                {"_id": 0, "org_id": 1}
+            )
+            self.user_orgs.update([m["org_id"] async for m in memberships_cursor])
+        self._checked_orgs.update(org_ids)
+    
+    def can_submit(self, form: dict) -> bool:
+        return self.is_superadmin or form["org_id"] in self.user_orgs
+
+
+async def ingest_submissions(
+    db,
+    items: List[tuple],
+    current_user: dict,
+    access: SubmissionAccess,
+    async_processing: bool = True
+) -> Dict[str, Any]:
+    """
+    Validate and insert a batch of submissions with one unordered bulk_write.
     
     Args:
-        data: BulkSubmissionCreate with list of submissions
-        data.async_processing: If True, heavy processing happens in background
+        items: (request index, SubmissionCreate) pairs; indexes are echoed in
+            errors and duplicates
+        access: Forms/memberships, already loaded for the items' form ids
     
     Returns:
-        BulkSubmissionResponse with success/error counts and task_id for tracking
+        {"submission_ids", "errors", "duplicates", "task_id"}
     """
-    db = request.app.state.db
-    
     submission_ids = []
     errors = []
+    duplicates = []
     bulk_operations = []
-    submissions_for_processing = []
-    
-    # Pre-fetch all unique forms in one query (optimization)
-    form_ids = list(set(sub.form_id for sub in data.submissions))
-    forms_cursor = db.forms.find({"id": {"$in": form_ids}}, {"_id": 0})
-    forms_map = {form["id"]: form async for form in forms_cursor}
-    
-    # Pre-check user access to organizations
-    org_ids = list(set(f.get("org_id") for f in forms_map.values() if f))
-    memberships_cursor = db.org_members.find(
-        {"org_id": {"$in": org_ids}, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
-    user_orgs = {m["org_id"] async for m in memberships_cursor}
-    is_superadmin = current_user.get("is_superadmin", False)
+    # (request index, upload, submission doc, idempotency key) per bulk operation
+    pending = []
+    
+    # Submissions this device already uploaded (retries after a dropped connection)
+    keys = [idempotency_key(sub, current_user["user_id"]) for _, sub in items]
+    received = await find_received(db, keys)
+    client_ids = {idx: sub.client_submission_id for idx, sub in items}
+    
+    def already_received(idx: int, sub_data: SubmissionCreate, existing: dict):
+        if not is_retry_of(existing, sub_data, current_user["user_id"]):
+            errors.append({"index": idx, "error": KEY_REUSED, "form_id": sub_data.form_id})
+            return
+        duplicates.append({
+            "index": idx,
+            "client_submission_id": client_ids[idx],
+            "submission_id": existing["id"],
+            "status": "already_received"
+        })
     
     # Process each submission
-    for idx, sub_data in enumerate(data.submissions):
+    for (idx, sub_data), key in zip(items, keys):
         try:
-            form = forms_map.get(sub_data.form_id)
+            form = access.forms.get(sub_data.form_id)
             
             if not form:
                 errors.append({"index": idx, "error": "Form not found", "form_id": sub_data.form_id})
                 continue
             
             # Check access
-            if not is_superadmin and form["org_id"] not in user_orgs:
+            if not access.can_submit(form):
                 errors.append({"index": idx, "error": "Not authorized", "form_id": sub_data.form_id})
                 continue
             
+            if key in received:
+                already_received(idx, sub_data, received[key])
+                continue
+            
             # Extract GPS if present
             gps_location = None
             gps_accuracy = None
@@ -267,9 +394,10 @@ async def create_bulk_submissions(
                 gps_location=gps_location,
                 gps_accuracy=gps_accuracy,
                 # Quality score will be calculated async if enabled
-                quality_score=None if data.async_processing else None,
+                quality_score=None,
                 quality_flags=[],
-                processing_status="pending" if data.async_processing else "completed"
+                processing_status="pending" if async_processing else "completed",
+                idempotency_key=key
             )
             
             submission_dict = submission.model_dump()
@@ -277,19 +405,17 @@ async def create_bulk_submissions(
             submission_dict["synced_at"] = submission_dict["synced_at"].isoformat()
             
             # Calculate quality score synchronously if not using async processing
-            if not data.async_processing:
-                quality_score, quality_flags = calculate_quality_score(
-                    sub_data.data,
-                    form.get("fields", [])
-                )
+            if not async_processing:
+                quality_score, quality_flags = get_quality_rules(form).score(sub_data.data)
                 submission_dict["quality_score"] = quality_score
                 submission_dict["quality_flags"] = quality_flags
                 submission_dict["processing_status"] = "completed"
             
-            # Add to bulk operations
+            # Add to bulk operations (the same upload twice in one batch is stored once)
+            if key:
+                received[key] = submission_dict
             bulk_operations.append(InsertOne(submission_dict))
-            submission_ids.append(submission.id)
-            submissions_for_processing.append(submission.id)
+            pending.append((idx, sub_data, submission_dict, key))
             
         except Exception as e:
             logger.error(f"Error processing submission {idx}: {str(e)}")
@@ -298,32 +424,198 @@ async def create_bulk_submissions(
     # Execute bulk insert (single round-trip to MongoDB)
     task_id = None
     if bulk_operations:
+        failed = {}
         try:
             result = await db.submissions.bulk_write(bulk_operations, ordered=False)
             logger.info(f"Bulk insert: {result.inserted_count} submissions inserted")
-            
-            # Trigger async processing if Celery is available and async mode enabled
-            if CELERY_AVAILABLE and data.async_processing and submissions_for_processing:
-                task = process_bulk_submissions.delay(submissions_for_processing)
-                task_id = task.id
-                logger.info(f"Async processing task queued: {task_id}")
-            
+        except BulkWriteError as e:
+            # Unordered: everything except the reported operations was inserted
+            failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+            logger.info(f"Bulk insert: {e.details.get('nInserted', 0)} inserted, {len(failed)} rejected")
         except Exception as e:
             logger.error(f"Bulk write error: {str(e)}")
-            # Try to extract which operations failed
-            errors.append({"index": -1, "error": f"Bulk write error: {str(e)}"})
+            failed = {i: {"errmsg": f"Bulk write error: {str(e)}"} for i in range(len(pending))}
+        
+        # A duplicate key means a concurrent retry stored the same upload first
+        raced = await find_received(db, [
+            pending[i][3] for i, err in failed.items() if err.get("code") == DUPLICATE_KEY_ERROR
+        ])
+        inserted = []
+        for i, (idx, sub_data, submission_dict, key) in enumerate(pending):
+            err = failed.get(i)
+            if err is None:
+                submission_ids.append(submission_dict["id"])
+                inserted.append(submission_dict)
+            elif key in raced:
+                already_received(idx, sub_data, raced[key])
+            else:
+                errors.append({"index": idx, "error": err.get("errmsg", "Insert failed")})
+        await apply_counter_updates(db, counter_updates("submissions", inserted, 1))
+        await submissions_changed(inserted)
+        
+        # Trigger async processing if Celery is available and async mode enabled
+        if CELERY_AVAILABLE and async_processing and submission_ids:
+            try:
+                task = process_bulk_submissions.delay(submission_ids)
+                task_id = task.id
+                logger.info(f"Async processing task queued: {task_id}")
+            except Exception as e:
+                logger.warning(f"Celery task failed (Redis unavailable): {e}")
+    
+    return {
+        "submission_ids": submission_ids,
+        "errors": errors,
+        "duplicates": duplicates,
+        "task_id": task_id
+    }
+
+
+@router.post("/bulk", response_model=BulkSubmissionResponse)
+async def create_bulk_submissions(
+    request: Request,
+    data: BulkSubmissionCreate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Submit multiple form entries (optimized for offline sync).
+    
+    Supports 2M+ daily submissions with:
+    - Bulk MongoDB operations (10-50x faster)
+    - Async background processing via Celery
+    - Graceful error handling per submission
+    
+    For very large syncs use POST /submissions/bulk/stream instead.
+    
+    Args:
+        data: BulkSubmissionCreate with list of submissions
+        data.async_processing: If True, heavy processing happens in background
+    
+    Returns:
+        BulkSubmissionResponse with success/error counts and task_id for tracking
+    """
+    db = request.app.state.db
+    
+    # Pre-fetch all unique forms and memberships in one query each (optimization)
+    access = SubmissionAccess(db, current_user)
+    await access.load(sub.form_id for sub in data.submissions)
+    
+    result = await ingest_submissions(
+        db, list(enumerate(data.submissions)), current_user, access, data.async_processing
+    )
     
     return BulkSubmissionResponse(
-        success_count=len(submission_ids),
-        error_count=len(errors),
-        submission_ids=submission_ids,
-        errors=errors,
+        success_count=len(result["submission_ids"]),
+        error_count=len(result["errors"]),
+        submission_ids=result["submission_ids"],
+        errors=result["errors"],
         processing_mode="async" if (CELERY_AVAILABLE and data.async_processing) else "sync",
-        task_id=task_id
+        task_id=result["task_id"],
+        duplicate_count=len(result["duplicates"]),
+        duplicates=result["duplicates"]
     )
 
 
-@router.get("", response_model=List[SubmissionOut])
+@router.post("/bulk/stream")
+async def stream_bulk_submissions(
+    request: Request,
+    async_processing: bool = Query(True),
+    chunk_size: int = Query(BULK_STREAM_CHUNK_SIZE, ge=1, le=MAX_BULK_STREAM_CHUNK_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Streaming bulk upload for very large offline syncs.
+    
+    The body is NDJSON, one SubmissionCreate per line, optionally sent with
+    Content-Encoding: gzip. Records are validated and written in chunks of
+    chunk_size as the body arrives, so memory stays bounded regardless of
+    upload size. The response is NDJSON with one line per chunk:
+    
+        {"chunk": 0, "start_index": 0, "count": 500, "success_count": ...,
+         "submission_ids": [...], "duplicates": [...], "errors": [...], "task_id": ...}
+    
+    followed by a summary line ({"done": true, "total": ..., ...}).
+    Indexes are record positions in the body (blank lines are not counted).
+    Chunks already reported are stored even if the upload is interrupted;
+    with client_submission_id set, re-sending the whole file is safe.
+    """
+    db = request.app.state.db
+    
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Encoding must be gzip or identity"
+        )
+    
+    access = SubmissionAccess(db, current_user)
+    
+    async def results():
+        totals = {"total": 0, "success_count": 0, "duplicate_count": 0, "error_count": 0, "chunks": 0}
+        items, invalid = [], []
+        start_index = 0
+        
+        async def process_chunk() -> bytes:
+            await access.load(sub.form_id for _, sub in items)
+            result = await ingest_submissions(db, items, current_user, access, async_processing)
+            errors = sorted(invalid + result["errors"], key=lambda e: e["index"])
+            count = len(items) + len(invalid)
+            totals["total"] += count
+            totals["success_count"] += len(result["submission_ids"])
+            totals["duplicate_count"] += len(result["duplicates"])
+            totals["error_count"] += len(errors)
+            line = {
+                "chunk": totals["chunks"],
+                "start_index": start_index,
+                "count": count,
+                "success_count": len(result["submission_ids"]),
+                "duplicate_count": len(result["duplicates"]),
+                "error_count": len(errors),
+                "submission_ids": result["submission_ids"],
+                "duplicates": result["duplicates"],
+                "errors": errors,
+                "task_id": result["task_id"]
+            }
+            totals["chunks"] += 1
+            return json_dumps(line) + b"\n"
+        
+        try:
+            async for index, value, error in iter_ndjson(request.stream(), gzip=encoding == "gzip"):
+                if error is None:
+                    try:
+                        items.append((index, SubmissionCreate.model_validate(value)))
+                    except ValidationError as e:
+                        first = e.errors()[0]
+                        location = ".".join(str(part) for part in first["loc"])
+                        error = f"{location}: {first['msg']}" if location else first["msg"]
+                if error is not None:
+                    invalid.append({"index": index, "error": error})
+                
+                if len(items) + len(invalid) >= chunk_size:
+                    yield await process_chunk()
+                    items, invalid = [], []
+                    start_index = index + 1
+            
+            if items or invalid:
+                yield await process_chunk()
+        except ClientDisconnect:
+            logger.warning(f"Streamed bulk upload interrupted after {totals['total']} submissions")
+            return
+        except NDJSONBodyError as e:
+            totals["error"] = str(e)
+        
+        yield json_dumps({"done": True, **totals}) + b"\n"
+    
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# Responses are rendered dicts (see FieldSelection); these only document them
+PARTIAL_SUBMISSION_DESCRIPTION = "Every field without fields=/exclude_data=, otherwise only the selected ones"
+
+
+@router.get("", response_model=None, responses={
+    200: {"model": List[SubmissionPartialOut], "description": PARTIAL_SUBMISSION_DESCRIPTION}
+})
 async def list_submissions(
     request: Request,
     form_id: str,
@@ -332,10 +624,24 @@ async def list_submissions(
     end_date: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated metadata fields and data.<path> entries"),
+    exclude_data: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """List form submissions"""
+    """
+    List form submissions, newest first.
+    
+    Pass the X-Next-Cursor header of the previous page as `cursor` to
+    seek straight to the next page (constant cost at any depth); `page`
+    is ignored then and remains for the page-numbered UI.
+    
+    `fields` returns only the selected columns (always with id), e.g.
+    fields=status,submitted_at,data.age; exclude_data=true returns all
+    metadata without the answers.
+    """
     db = request.app.state.db
+    selection = FieldSelection(fields, exclude_data)
     
     # Check form access
     membership, form = await check_form_access(db, form_id, current_user["user_id"])
@@ -358,39 +664,52 @@ async def list_submissions(
         else:
             query["submitted_at"] = {"$lte": end_date}
     
-    skip = (page - 1) * page_size
-    
-    submissions = await db.submissions.find(
-        query, {"_id": 0}
-    ).sort("submitted_at", -1).skip(skip).limit(page_size).to_list(page_size)
-    
-    return [
-        SubmissionOut(
-            id=s["id"],
-            form_id=s["form_id"],
-            form_version=s["form_version"],
-            data=s["data"],
-            submitted_by=s["submitted_by"],
-            submitted_at=datetime.fromisoformat(s["submitted_at"]) if isinstance(s["submitted_at"], str) else s["submitted_at"],
-            status=s["status"],
-            quality_score=s.get("quality_score"),
-            quality_flags=s.get("quality_flags", []),
-            gps_location=s.get("gps_location")
+    # (form_id, submitted_at, id) index: seek past the cursor instead of skipping
+    keyset = Keyset("submitted_at", "id", descending=True)
+    skip = 0 if cursor else (page - 1) * page_size
+    
+    results = db.submissions.find(
+        keyset.apply(query, cursor), selection.projection(extra=("submitted_at",))
+    ).sort(keyset.sort).skip(skip).limit(page_size)
+    
+    # NDJSON variant: stream the page line by line, compressed if the client allows
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        async def rows():
+            async for chunk in cursor_chunks(results):
+                yield [selection.render(s) for s in chunk]
+        
+        return await stream_jsonl_response(
+            rows(),
+            filename=f"{form_id}_submissions.ndjson",
+            content_encoding=negotiate_compression(request.headers.get("accept-encoding"))
         )
-        for s in submissions
-    ]
+    
+    submissions = await results.to_list(page_size)
+    
+    next_cursor = keyset.next_cursor(submissions, page_size)
+    
+    # Plain dicts straight to JSON: no model validation of the answer payloads
+    return json_response(
+        [selection.render(s) for s in submissions],
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    )
 
 
-@router.get("/{submission_id}", response_model=SubmissionOut)
+@router.get("/{submission_id}", response_model=None, responses={
+    200: {"model": SubmissionPartialOut, "description": PARTIAL_SUBMISSION_DESCRIPTION}
+})
 async def get_submission(
     request: Request,
     submission_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated metadata fields and data.<path> entries"),
+    exclude_data: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get submission details"""
+    """Get submission details (optionally only `fields`, or without data)"""
     db = request.app.state.db
+    selection = FieldSelection(fields, exclude_data)
     
-    submission = await db.submissions.find_one({"id": submission_id}, {"_id": 0})
+    submission = await db.submissions.find_one({"id": submission_id}, selection.projection(extra=("org_id",)))
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
     
@@ -406,18 +725,7 @@ async def get_submission(
             detail="Not authorized"
         )
     
-    return SubmissionOut(
-        id=submission["id"],
-        form_id=submission["form_id"],
-        form_version=submission["form_version"],
-        data=submission["data"],
-        submitted_by=submission["submitted_by"],
-        submitted_at=datetime.fromisoformat(submission["submitted_at"]) if isinstance(submission["submitted_at"], str) else submission["submitted_at"],
-        status=submission["status"],
-        quality_score=submission.get("quality_score"),
-        quality_flags=submission.get("quality_flags", []),
-        gps_location=submission.get("gps_location")
-    )
+    return json_response(selection.render(submission))
 
 
 @router.patch("/{submission_id}/review")
@@ -457,15 +765,21 @@ async def review_submission(
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    await db.submissions.update_one(
+    reviewed_at = datetime.now(timezone.utc).isoformat()
+    before = await db.submissions.find_one_and_update(
         {"id": submission_id},
         {"$set": {
             "status": data.status,
             "reviewer_id": current_user["user_id"],
-            "reviewed_at": datetime.now(timezone.utc).isoformat(),
-            "review_notes": data.notes
-        }}
+            "reviewed_at": reviewed_at,
+            "review_notes": data.notes,
+            # Picked up by delta exports
+            "last_modified_at": reviewed_at
+        }},
+        projection=SUBMISSION_COUNTER_FIELDS
     )
+    await apply_counter_updates(db, status_change_updates("submissions", before, data.status))
+    await submissions_changed([before])
     
     return {"message": "Submission reviewed", "status": data.status}
 
@@ -499,6 +813,23 @@ async def delete_submission(
             detail="Admin access required"
         )
     
-    await db.submissions.delete_one({"id": submission_id})
+    result = await db.submissions.delete_one({"id": submission_id})
+    if result.deleted_count:
+        # Tombstone so delta exports can propagate the deletion. Only the
+        # request whose delete matched writes it, so a failed or racing
+        # delete never leaves one behind for a submission that still exists.
+        try:
+            await db.submission_tombstones.insert_one({
+                "id": submission_id,
+                "form_id": submission["form_id"],
+                "org_id": submission["org_id"],
+                "deleted_by": current_user["user_id"],
+                "deleted_at": datetime.now(timezone.utc).isoformat()
+            })
+        except DuplicateKeyError:
+            # Already recorded (written before the delete by earlier versions)
+            pass
+        await apply_counter_updates(db, counter_updates("submissions", [submission], -1))
+        await submissions_changed([submission])
     
     return {"message": "Submission deleted"}
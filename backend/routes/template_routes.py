@@ -2,13 +2,11 @@
 Pre-built form templates for common use cases
 """
 
-import os
 import uuid
 from datetime import datetime, timezone
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Depends
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
 
 router = APIRouter(prefix="/templates", tags=["Templates"])
 
@@ -396,11 +394,9 @@ FORM_TEMPLATES = [
 ]
 
 
-def get_db():
-    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-    db_name = os.environ.get("DB_NAME", "datapulse")
-    client = AsyncIOMotorClient(mongo_url)
-    return client[db_name]
+def get_db(request: Request):
+    """Shared database handle from app state (one pooled client per process)"""
+    return request.app.state.db
 
 
 @router.get("/")
@@ -447,11 +443,10 @@ async def get_template(template_id: str):
 async def create_form_from_template(
     template_id: str,
     project_id: str,
-    form_name: Optional[str] = None
+    form_name: Optional[str] = None,
+    db=Depends(get_db)
 ):
     """Create a new form from a template"""
-    db = get_db()
-    
     # Find template
     template = next((t for t in FORM_TEMPLATES if t["id"] == template_id), None)
     if not template:
@@ -492,11 +487,10 @@ async def save_custom_template(
     description: str,
     category: str,
     form_id: str,
-    org_id: str
+    org_id: str,
+    db=Depends(get_db)
 ):
     """Save an existing form as a custom template"""
-    db = get_db()
-    
     # Get the form
     form = await db.forms.find_one({"id": form_id})
     if not form:
@@ -525,10 +519,8 @@ async def save_custom_template(
 
 
 @router.get("/custom/org/{org_id}")
-async def list_custom_templates(org_id: str):
+async def list_custom_templates(org_id: str, db=Depends(get_db)):
     """List custom templates for an organization"""
-    db = get_db()
-    
     templates = await db.custom_templates.find(
         {"org_id": org_id},
         {"_id": 0}
@@ -1,10 +1,18 @@
 """DataPulse - Dashboard Widgets API Routes"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
 
+from auth import get_current_user
+from utils.analytics_queries import (
+    EPOCH, cached_analytics, get_date_range, percent_change, period_totals, previous_range, quality_breakdown,
+    ranked_by, round_quality, status_distribution, submission_series, top_rows
+)
+from utils.batch_lookup import get_batch_lookup
+from utils.rollups import iso, parse_time
+
 router = APIRouter(prefix="/dashboard/widgets", tags=["dashboard-widgets"])
 
 # Widget Types
@@ -219,86 +227,253 @@ async def delete_dashboard_layout(layout_id: str):
     del dashboard_layouts[layout_id]
     return {"message": "Layout deleted successfully"}
 
-@router.get("/widget-data/{widget_type}")
-async def get_widget_data(
+STATUS_COLORS = {
+    "approved": "#22c55e",
+    "pending": "#f59e0b",
+    "rejected": "#ef4444",
+    "flagged": "#8b5cf6",
+}
+CHART_COLORS = ["#3B82F6", "#22c55e", "#f59e0b", "#ef4444", "#8b5cf6", "#06b6d4", "#ec4899", "#84cc16"]
+
+
+def _time_ago(timestamp: Optional[str], now: datetime) -> str:
+    if not timestamp:
+        return ""
+    minutes = int((now - parse_time(timestamp)).total_seconds() // 60)
+    if minutes < 1:
+        return "just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    if minutes < 60 * 24:
+        hours = minutes // 60
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    days = minutes // (60 * 24)
+    return f"{days} day{'s' if days > 1 else ''} ago"
+
+
+async def _org_count_trend(db, collection: str, query: dict, date_field: str, start: datetime, show_trend: bool) -> dict:
+    """Current document count, and the count before the period for the trend"""
+    value = await db[collection].count_documents(query)
+    if not show_trend or start == EPOCH:
+        return {"value": value, "trend": None, "previous_value": None}
+    previous = await db[collection].count_documents({**query, date_field: {"$lt": iso(start)}})
+    return {"value": value, "trend": percent_change(value, previous), "previous_value": previous}
+
+
+async def _stat_card(db, org_id: str, metric: str, period: str, show_trend: bool) -> dict:
+    start, end = get_date_range(period)
+    if metric == "forms":
+        return await _org_count_trend(db, "forms", {"org_id": org_id}, "created_at", start, show_trend)
+    if metric == "projects":
+        query = {"org_id": org_id, "status": {"$ne": "archived"}}
+        return await _org_count_trend(db, "projects", query, "created_at", start, show_trend)
+    if metric == "users":
+        return await _org_count_trend(db, "org_members", {"org_id": org_id}, "joined_at", start, show_trend)
+    
+    if start == EPOCH and metric == "submissions":
+        value = sum((await status_distribution(db, org_id)).values())
+        return {"value": value, "trend": None, "previous_value": None}
+    
+    current = await period_totals(db, org_id, start, end)
+    previous = await period_totals(db, org_id, *previous_range(start, end)) if show_trend and start != EPOCH else None
+    if metric == "quality_score":
+        value = round_quality(current.avg_quality)
+        previous_value = round_quality(previous.avg_quality) if previous else None
+        trend = round(value - previous_value, 1) if value is not None and previous_value is not None else None
+        return {"value": value, "trend": trend, "previous_value": previous_value}
+    return {
+        "value": current["count"],
+        "trend": percent_change(current["count"], previous["count"]) if previous else None,
+        "previous_value": previous["count"] if previous else None
+    }
+
+
+async def _recent_submissions(request: Request, query: dict, limit: int) -> tuple:
+    """Newest submissions matching query, with user and form documents"""
+    submissions = await request.app.state.db.submissions.find(
+        query,
+        {"_id": 0, "id": 1, "form_id": 1, "submitted_by": 1, "submitted_at": 1, "status": 1, "quality_flags": 1}
+    ).sort("submitted_at", -1).limit(limit).to_list(limit)
+    lookup = get_batch_lookup(request)
+    users = await lookup.fetch("users", (sub["submitted_by"] for sub in submissions), projection={"name": 1})
+    forms = await lookup.fetch("forms", (sub["form_id"] for sub in submissions), projection={"name": 1})
+    return submissions, users, forms
+
+
+async def _widget_data(
+    request: Request,
     widget_type: str,
     org_id: str,
-    metric: Optional[str] = None,
-    period: Optional[str] = None,
-    limit: int = 10
-):
-    """Get data for a specific widget type"""
+    metric: Optional[str],
+    period: Optional[str],
+    group_by: str,
+    limit: int,
+    target: Optional[float],
+    show_trend: bool
+) -> dict:
+    db = request.app.state.db
     
-    # Generate sample data based on widget type
     if widget_type == "stat_card":
-        return {
-            "value": 1247,
-            "trend": 12.5,
-            "previous_value": 1108,
-            "period": period or "week"
-        }
+        metric = metric or "submissions"
+        period = period or "week"
+        return {**await _stat_card(db, org_id, metric, period, show_trend), "period": period}
     
     elif widget_type == "line_chart":
-        from datetime import timedelta
-        days = 14 if period == "14_days" else 7 if period == "7_days" else 30
-        data = []
-        for i in range(days):
-            date = datetime.now() - timedelta(days=days-i-1)
-            data.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "value": 50 + (i * 3) + (i % 3 * 10)
-            })
+        start, end = get_date_range(period or "30_days")
+        series = await submission_series(db, org_id, start, end, group_by)
+        if metric == "quality_score":
+            data = [{"date": point["date"], "value": point["quality_avg"]} for point in series]
+        elif metric == "response_time":
+            # Submission timing is not tracked yet
+            data = [{"date": point["date"], "value": None} for point in series]
+        else:
+            data = [{"date": point["date"], "value": point["submissions"]} for point in series]
         return {"data": data, "metric": metric}
     
     elif widget_type == "bar_chart":
-        return {
-            "data": [
-                {"name": "Household Survey", "value": 234},
-                {"name": "Health Screening", "value": 189},
-                {"name": "Customer Feedback", "value": 156},
-                {"name": "Event Registration", "value": 98},
-                {"name": "Agriculture Survey", "value": 67}
-            ][:limit]
-        }
+        start, end = get_date_range(period or "30_days")
+        dimension = "user_id" if metric == "submissions_by_user" else "form_id"
+        ranked = await ranked_by(db, org_id, start, end, dimension)
+        if metric == "quality_by_form":
+            ranked = sorted(
+                (item for item in ranked if item[1].avg_quality is not None),
+                key=lambda item: -item[1].avg_quality
+            )
+        rows = await top_rows(get_batch_lookup(request), dimension, ranked[:limit])
+        value = "quality_avg" if metric == "quality_by_form" else "submissions"
+        return {"data": [{"name": row["name"], "value": row[value]} for row in rows]}
     
     elif widget_type == "pie_chart":
+        if metric == "quality_distribution":
+            start, end = get_date_range(period or "30_days")
+            breakdown = await quality_breakdown(db, org_id, start, end)
+            slices = [(row["range"], row["count"]) for row in breakdown["score_distribution"]]
+        elif metric == "form_distribution":
+            start, end = get_date_range(period or "30_days")
+            rows = await top_rows(get_batch_lookup(request), "form_id", await ranked_by(db, org_id, start, end, "form_id"))
+            slices = [(row["name"], row["submissions"]) for row in rows]
+        else:
+            distribution = await status_distribution(db, org_id)
+            return {
+                "data": [
+                    {"name": name.title(), "value": count, "color": STATUS_COLORS.get(name, "#6b7280")}
+                    for name, count in sorted(distribution.items(), key=lambda item: -item[1])
+                ]
+            }
         return {
             "data": [
-                {"name": "Approved", "value": 65, "color": "#22c55e"},
-                {"name": "Pending", "value": 25, "color": "#f59e0b"},
-                {"name": "Rejected", "value": 10, "color": "#ef4444"}
+                {"name": name, "value": count, "color": CHART_COLORS[i % len(CHART_COLORS)]}
+                for i, (name, count) in enumerate(slices)
             ]
         }
     
     elif widget_type == "activity_feed":
+        submissions, users, forms = await _recent_submissions(request, {"org_id": org_id}, limit)
+        now = datetime.now(timezone.utc)
         return {
             "activities": [
-                {"user": "John Doe", "action": "submitted", "form": "Household Survey", "time": "5 min ago"},
-                {"user": "Jane Smith", "action": "approved", "form": "Health Screening", "time": "12 min ago"},
-                {"user": "Mike Johnson", "action": "submitted", "form": "Customer Feedback", "time": "28 min ago"},
-                {"user": "Sarah Williams", "action": "rejected", "form": "Event Registration", "time": "45 min ago"},
-                {"user": "Tom Brown", "action": "submitted", "form": "Agriculture Survey", "time": "1 hour ago"}
-            ][:limit]
+                {
+                    "user": users.get(sub["submitted_by"], {}).get("name", "Unknown"),
+                    "action": "submitted",
+                    "form": forms.get(sub["form_id"], {}).get("name", "Unknown"),
+                    "status": sub.get("status"),
+                    "time": _time_ago(sub.get("submitted_at"), now)
+                }
+                for sub in submissions
+            ]
         }
     
     elif widget_type == "progress":
+        start, end = get_date_range(period or "month")
+        totals = await period_totals(db, org_id, start, end)
+        if metric == "quality_target":
+            current = round_quality(totals.avg_quality) or 0
+        else:
+            current = totals["count"]
+        if not target:
+            return {"current": current, "target": None, "percentage": None, "remaining": None}
         return {
-            "current": 847,
-            "target": 1000,
-            "percentage": 84.7,
-            "remaining": 153
+            "current": current,
+            "target": target,
+            "percentage": round(min(current / target * 100, 100.0), 1),
+            "remaining": max(round(target - current, 1), 0)
         }
     
     elif widget_type == "table":
+        if metric == "top_performers":
+            start, end = get_date_range(period or "30_days")
+            ranked = await ranked_by(db, org_id, start, end, "user_id", limit)
+            rows = await top_rows(get_batch_lookup(request), "user_id", ranked)
+            return {
+                "columns": ["Name", "Submissions", "Quality", "Approved"],
+                "rows": [
+                    [row["name"], row["submissions"], row["quality_avg"], bucket["by_status"].get("approved", 0)]
+                    for row, (_, bucket) in zip(rows, ranked)
+                ]
+            }
+        
+        flagged = metric == "flagged_submissions"
+        query = {"org_id": org_id}
+        if flagged:
+            query["quality_flags.0"] = {"$exists": True}
+        submissions, users, forms = await _recent_submissions(request, query, limit)
         return {
-            "columns": ["Submission ID", "Form", "User", "Status", "Date"],
+            "columns": ["Submission ID", "Form", "User", "Flags" if flagged else "Status", "Date"],
             "rows": [
-                ["SUB-001", "Household Survey", "John Doe", "Approved", "2024-01-15"],
-                ["SUB-002", "Health Screening", "Jane Smith", "Pending", "2024-01-15"],
-                ["SUB-003", "Customer Feedback", "Mike Johnson", "Approved", "2024-01-14"],
-                ["SUB-004", "Event Registration", "Sarah Williams", "Rejected", "2024-01-14"],
-                ["SUB-005", "Agriculture Survey", "Tom Brown", "Approved", "2024-01-13"]
-            ][:limit]
+                [
+                    sub["id"],
+                    forms.get(sub["form_id"], {}).get("name", "Unknown"),
+                    users.get(sub["submitted_by"], {}).get("name", "Unknown"),
+                    ", ".join(sub.get("quality_flags") or []) if flagged else str(sub.get("status", "")).title(),
+                    (sub.get("submitted_at") or "")[:10]
+                ]
+                for sub in submissions
+            ]
         }
     
     return {"error": "Unknown widget type"}
+
+
+@router.get("/widget-data/{widget_type}")
+async def get_widget_data(
+    request: Request,
+    widget_type: str,
+    org_id: str,
+    metric: Optional[str] = None,
+    period: Optional[str] = None,
+    group_by: str = "day",
+    limit: int = 10,
+    target: Optional[float] = None,
+    show_trend: bool = True,
+    data_source: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get data for a specific widget type"""
+    db = request.app.state.db
+    # Table widgets configure their data_source rather than a metric
+    metric = metric or data_source
+    
+    # Check org access
+    membership = await db.org_members.find_one(
+        {"org_id": org_id, "user_id": current_user["user_id"]},
+        {"_id": 0}
+    )
+    
+    if not membership and not current_user.get("is_superadmin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    # Activity and submission tables are cheap and should stay current
+    if widget_type in ("activity_feed", "table") and metric != "top_performers":
+        return await _widget_data(request, widget_type, org_id, metric, period, group_by, limit, target, show_trend)
+    
+    params = {
+        "widget_type": widget_type, "metric": metric, "period": period, "group_by": group_by,
+        "limit": limit, "target": target, "show_trend": show_trend
+    }
+    return await cached_analytics(
+        "widget", org_id, params,
+        lambda: _widget_data(request, widget_type, org_id, metric, period, group_by, limit, target, show_trend)
+    )
@@ -25,16 +25,22 @@ load_dotenv(ROOT_DIR / '.env')
 # Production mode check
 PRODUCTION_MODE = os.environ.get("PRODUCTION_MODE", "false").lower() == "true"
 
-# MongoDB connection with connection pooling
+# MongoDB connection with connection pooling (shared by every route via app.state.db)
+from utils.mongo_pool import PoolStatsListener
+
+MONGO_MIN_POOL_SIZE = 10
+MONGO_MAX_POOL_SIZE = 100
 mongo_url = os.environ['MONGO_URL']
+mongo_pool_stats = PoolStatsListener("api", MONGO_MAX_POOL_SIZE)
 client = AsyncIOMotorClient(
     mongo_url,
-    minPoolSize=10,
-    maxPoolSize=100,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
     maxIdleTimeMS=30000,
     serverSelectionTimeoutMS=5000,
     retryWrites=True,
-    w='majority'
+    w='majority',
+    event_listeners=[mongo_pool_stats]
 )
 db = client[os.environ['DB_NAME']]
 
@@ -179,8 +185,9 @@ async def detailed_health_check():
         health_status["checks"]["mongodb"] = {
             "status": "healthy",
             "connection_pool": {
-                "min": 10,
-                "max": 100
+                "min": MONGO_MIN_POOL_SIZE,
+                "max": MONGO_MAX_POOL_SIZE,
+                **mongo_pool_stats.stats()
             }
         }
     except Exception as e:
@@ -259,6 +266,8 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor of listings that return a bare list
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Production middleware (rate limiting, timing, security headers)
@@ -293,6 +302,20 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+INDEX_NOT_FOUND = 27
+
+
+async def drop_superseded_index(collection, name: str):
+    """Drop an index this version no longer creates (deployments created before the change still have it)"""
+    from pymongo.errors import OperationFailure
+    try:
+        await collection.drop_index(name)
+        logger.info(f"Dropped superseded index {collection.name}.{name}")
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database indexes and production services on startup"""
@@ -320,6 +343,28 @@ async def startup_db_client():
     except Exception as e:
         logger.warning(f"S3 initialization error: {e}")
     
+    # Post-submission pipeline tasks, coalesced while the broker is busy
+    try:
+        from utils.task_batcher import TaskBatcher
+        from routes.submission_routes import CELERY_AVAILABLE, publish_submission_pipeline
+        if CELERY_AVAILABLE:
+            submission_pipeline = TaskBatcher(publish_submission_pipeline, name="submission_pipeline")
+            await submission_pipeline.start()
+            app.state.submission_pipeline = submission_pipeline
+    except Exception as e:
+        logger.warning(f"Submission pipeline batcher initialization error: {e}")
+    
+    # Write-behind ingest buffer for single submissions (SUBMISSION_INGEST_MODE=buffered)
+    try:
+        from utils.ingest_buffer import INGEST_MODE, IngestBuffer
+        from routes.submission_routes import publish_ingested_batch
+        if INGEST_MODE == "buffered":
+            ingest_buffer = IngestBuffer(db, on_flush=publish_ingested_batch)
+            await ingest_buffer.start()
+            app.state.ingest_buffer = ingest_buffer
+    except Exception as e:
+        logger.warning(f"Ingest buffer initialization error: {e}")
+    
     try:
         # Users
         await db.users.create_index("email", unique=True)
@@ -342,13 +387,60 @@ async def startup_db_client():
         
         # Submissions
         await db.submissions.create_index("id", unique=True)
-        await db.submissions.create_index([("form_id", 1), ("submitted_at", -1)])
-        await db.submissions.create_index([("org_id", 1), ("submitted_at", -1)])
+        # id breaks submitted_at ties for keyset (cursor) pagination
+        await db.submissions.create_index([("form_id", 1), ("submitted_at", -1), ("id", -1)])
+        await drop_superseded_index(db.submissions, "form_id_1_submitted_at_-1")
+        # Trailing fields cover the enumerator performance pipeline (no document fetches);
+        # the (org_id, submitted_at) prefix serves everything the old 2-field index did
+        await db.submissions.create_index([
+            ("org_id", 1), ("submitted_at", -1), ("project_id", 1), ("submitted_by", 1), ("status", 1), ("quality_score", 1)
+        ])
+        await drop_superseded_index(db.submissions, "org_id_1_submitted_at_-1")
+        # Quality-metrics filters (quality_flags is an array, so that pipeline still fetches)
+        await db.submissions.create_index([("org_id", 1), ("project_id", 1), ("form_id", 1), ("status", 1)])
         await db.submissions.create_index([("project_id", 1), ("status", 1)])
+        await db.submissions.create_index([("form_id", 1), ("last_modified_at", -1)])
+        # Rollup ingest watermark (utils.rollup_engine)
+        await db.submissions.create_index([("synced_at", 1), ("id", 1)])
+        # Offline-sync dedupe: one submission per <device_id>:<client_submission_id>
+        await db.submissions.create_index(
+            "idempotency_key",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}}
+        )
+        await db.submission_tombstones.create_index([("form_id", 1), ("deleted_at", -1)])
+        # One tombstone per submission (replaces the earlier non-unique index)
+        tombstone_indexes = await db.submission_tombstones.index_information()
+        if "id_1" in tombstone_indexes and not tombstone_indexes["id_1"].get("unique"):
+            await drop_superseded_index(db.submission_tombstones, "id_1")
+        try:
+            await db.submission_tombstones.create_index("id", unique=True)
+        except Exception as e:
+            # Duplicate tombstones from before the index; delta exports tolerate them
+            logger.warning(f"Unique tombstone index not created: {e}")
         
+        # Maintained counters (looked up by _id; name for reconciliation)
+        await db.counters.create_index("name")
+
+        # Submission rollups (upsert keys + dashboard range reads)
+        await db.analytics_hourly.create_index(
+            [("org_id", 1), ("project_id", 1), ("form_id", 1), ("period_start", 1)], unique=True
+        )
+        await db.analytics_hourly.create_index([("org_id", 1), ("period_start", 1)])
+        await db.analytics_hourly.create_index([("org_id", 1), ("form_id", 1), ("period_start", 1)])
+        await db.analytics_daily.create_index([("org_id", 1), ("date", 1)], unique=True)
+        await db.analytics_team_daily.create_index([("org_id", 1), ("user_id", 1), ("date", 1)], unique=True)
+        await db.analytics_team_daily.create_index([("org_id", 1), ("date", 1)])
+
         # Cases
         await db.cases.create_index("id", unique=True)
         await db.cases.create_index([("project_id", 1), ("respondent_id", 1)], unique=True)
+        await db.cases.create_index([("project_id", 1), ("created_at", -1), ("id", -1)])
+        
+        # Export Jobs
+        await db.export_jobs.create_index("id", unique=True)
+        await db.export_jobs.create_index([("org_id", 1), ("created_at", -1)])
+        await db.export_jobs.create_index([("cache_key", 1), ("created_at", -1)])
         
         # Lookup Datasets
         await db.lookup_datasets.create_index("id", unique=True)
@@ -364,9 +456,13 @@ async def startup_db_client():
         await db.paradata_sessions.create_index("id", unique=True)
         await db.paradata_sessions.create_index([("submission_id", 1)])
         
+        # Webhook deliveries (_id <submission_id>:<webhook_id>), kept 30 days
+        await db.webhook_deliveries.create_index("created_at", expireAfterSeconds=30 * 86400)
+        
         # Quality Alerts
         await db.quality_alerts.create_index("id", unique=True)
         await db.quality_alerts.create_index([("org_id", 1), ("status", 1)])
+        await db.quality_alerts.create_index([("org_id", 1), ("created_at", -1), ("id", -1)])
         
         # Help Center AI Assistant
         await db.help_chat_sessions.create_index("session_id", unique=True)
@@ -387,6 +483,14 @@ async def shutdown_db_client():
     """Cleanup on shutdown"""
     logger.info("FieldForce API shutting down...")
     
+    # Flush queued submissions before the database connection closes
+    ingest_buffer = getattr(app.state, "ingest_buffer", None)
+    if ingest_buffer is not None:
+        await ingest_buffer.stop()
+    submission_pipeline = getattr(app.state, "submission_pipeline", None)
+    if submission_pipeline is not None:
+        await submission_pipeline.stop()
+    
     # Close Redis connection
     try:
         from config.production import RedisConfig
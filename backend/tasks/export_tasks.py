@@ -3,50 +3,80 @@ Export-related background tasks
 """
 from celery_app import celery_app
 import logging
-from datetime import datetime, timedelta
+import os
+from datetime import datetime, timedelta, timezone
+
+import redis.asyncio as aioredis
+
+from utils.export_builder import run_export_job
+from utils.export_storage import delete_artifact
+from utils.job_manager import JobManager
+from utils.mongo_pool import get_async_db, run_in_worker_loop
 
 logger = logging.getLogger(__name__)
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Large national surveys can take well over the old 10 minute limit
+EXPORT_TIME_LIMIT = 3600
+EXPORT_RETENTION_DAYS = 7
+
 
-@celery_app.task(bind=True, max_retries=2, time_limit=600)
+@celery_app.task(bind=True, max_retries=2, time_limit=EXPORT_TIME_LIMIT)
 def generate_export(self, export_config: dict):
-    """Generate data export (Excel, CSV, SPSS, etc.)"""
+    """Generate data export (CSV, JSON, Excel, Parquet, Arrow) for an ExportJob"""
     try:
         export_id = export_config.get("export_id")
         format_type = export_config.get("format", "xlsx")
         
         logger.info(f"Generating {format_type} export {export_id}")
         
-        # TODO: Implement actual export generation
-        # - Query submissions based on filters
-        # - Format data according to export type
-        # - Upload to S3 or store locally
-        
-        return {
-            "status": "completed",
-            "export_id": export_id,
-            "download_url": f"/api/exports/{export_id}/download"
-        }
+        return run_in_worker_loop(_run_export(export_id))
     except Exception as exc:
         logger.error(f"Export generation failed: {exc}")
         raise self.retry(exc=exc, countdown=120)
 
 
+async def _run_export(export_id: str) -> dict:
+    """Run an export job on the worker's pooled Motor client"""
+    redis = aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    try:
+        try:
+            await redis.ping()
+            manager = JobManager(redis)
+        except Exception:
+            manager = None
+        return await run_export_job(get_async_db(), export_id, manager)
+    finally:
+        await redis.close()
+
+
 @celery_app.task
 def cleanup_old_exports():
     """Clean up export files older than 7 days"""
     logger.info("Cleaning up old exports")
     try:
-        cutoff_date = datetime.utcnow() - timedelta(days=7)
-        # TODO: Delete old exports from database and S3
-        deleted_count = 0
-        logger.info(f"Deleted {deleted_count} old exports")
-        return {"deleted": deleted_count}
+        return run_in_worker_loop(_cleanup_old_exports())
     except Exception as exc:
         logger.error(f"Export cleanup failed: {exc}")
         raise
 
 
+async def _cleanup_old_exports() -> dict:
+    db = get_async_db()
+    cutoff_date = (datetime.now(timezone.utc) - timedelta(days=EXPORT_RETENTION_DAYS)).isoformat()
+    deleted_count = 0
+    async for job in db.export_jobs.find(
+        {"status": "completed", "artifact_key": {"$ne": None}, "completed_at": {"$lt": cutoff_date}},
+        {"_id": 0}
+    ):
+        if await delete_artifact(job):
+            deleted_count += 1
+        await db.export_jobs.update_one({"id": job["id"]}, {"$set": {"status": "expired"}})
+    logger.info(f"Deleted {deleted_count} old exports")
+    return {"deleted": deleted_count}
+
+
 @celery_app.task(bind=True, max_retries=3)
 def generate_report(self, report_config: dict):
     """Generate PDF/HTML report"""
@@ -0,0 +1,79 @@
+"""Shared pytest setup: backend modules import as top-level packages (utils, routes, ...)"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def export_form():
+    """Small form covering every export column kind"""
+    return {
+        "id": "form-export",
+        "name": "Household Survey",
+        "org_id": "org-1",
+        "project_id": "project-1",
+        "version": 1,
+        "fields": [
+            {"name": "name", "type": "text", "label": "Respondent name"},
+            {"name": "age", "type": "number", "label": "Age"},
+            {"name": "region", "type": "select", "label": "Region", "options": [
+                {"value": "north", "label": "North"},
+                {"value": "south", "label": "South"},
+            ]},
+            {"name": "crops", "type": "checkbox", "label": "Crops", "options": [
+                {"value": "maize", "label": "Maize"},
+                {"value": "beans", "label": "Beans"},
+            ]},
+            {"name": "visit_date", "type": "date", "label": "Visit date"},
+            {"name": "location", "type": "gps", "label": "Location"},
+            {"name": "intro", "type": "note", "label": "Introduction"},
+        ],
+    }
+
+
+@pytest.fixture
+def export_submissions():
+    return [
+        {
+            "id": "sub-1",
+            "form_id": "form-export",
+            "submitted_by": "user-1",
+            "submitted_at": "2026-03-01T08:30:00+00:00",
+            "status": "approved",
+            "quality_score": 92.5,
+            "data": {
+                "name": "Amina",
+                "age": 34,
+                "region": "north",
+                "crops": ["maize", "beans"],
+                "visit_date": "2026-03-01",
+                "location": {"latitude": -6.8, "longitude": 39.28},
+            },
+        },
+        {
+            "id": "sub-2",
+            "form_id": "form-export",
+            "submitted_by": "user-2",
+            "submitted_at": "2026-03-02T14:00:00+00:00",
+            "status": "pending",
+            "quality_score": None,
+            "data": {"name": "Juma", "age": "41", "region": "south", "crops": []},
+        },
+    ]
+
+
+@pytest.fixture
+def as_chunks():
+    """Turn a list of submissions into an async generator of chunks, like cursor_chunks"""
+    def chunked(items, size=1):
+        async def chunks():
+            for start in range(0, len(items), size):
+                yield items[start:start + size]
+        return chunks()
+    return chunked
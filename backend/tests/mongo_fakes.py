@@ -0,0 +1,124 @@
+"""
+In-memory MongoDB for unit tests.
+
+mongomock provides the query/update/aggregation engine; AsyncDatabase
+wraps it with the subset of the Motor API the backend awaits. Duplicate
+key errors from bulk inserts carry keyPattern like a real server's.
+"""
+
+from types import SimpleNamespace
+
+import mongomock
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def sync_db():
+    return mongomock.MongoClient().get_database("fieldforce_test")
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.sync = collection
+        # Set to an exception to fail the next bulk_write calls, e.g. [ConnectionError()]
+        self.fail_bulk_writes = []
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(self.sync.aggregate(pipeline))
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_bulk_writes:
+            raise self.fail_bulk_writes.pop(0)
+        if not all(isinstance(op, InsertOne) for op in requests):
+            return self.sync.bulk_write(requests, ordered=ordered)
+        errors = []
+        for index, op in enumerate(requests):
+            doc = op._doc
+            try:
+                self.sync.insert_one(doc)
+            except DuplicateKeyError:
+                field = "id" if self.sync.find_one({"id": doc.get("id")}) else "idempotency_key"
+                errors.append({
+                    "index": index,
+                    "code": DUPLICATE_KEY_ERROR,
+                    "keyPattern": {field: 1},
+                    "keyValue": {field: doc.get(field)},
+                    "errmsg": f"E11000 duplicate key error index: {field}_1",
+                })
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(requests) - len(errors)})
+        return SimpleNamespace(inserted_count=len(requests))
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database=None):
+        self.sync = database if database is not None else sync_db()
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = AsyncCollection(self.sync[name])
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+def submissions_db() -> AsyncDatabase:
+    """Async database with the submissions (and tombstones) unique indexes created at API startup"""
+    db = AsyncDatabase()
+    db.sync.submissions.create_index("id", unique=True)
+    db.sync.submission_tombstones.create_index("id", unique=True)
+    db.sync.submissions.create_index(
+        "idempotency_key",
+        unique=True,
+        partialFilterExpression={"idempotency_key": {"$type": "string"}}
+    )
+    return db
@@ -0,0 +1,243 @@
+"""
+Access cache tests (utils.access_cache)
+
+Tests for:
+- TTLCache expiry, LRU eviction and invalidation
+- get_published_form caching, reload for a newer min_version, and
+  unpublished forms never being cached
+- get_membership caching, missing memberships never being cached
+- Invalidation from publish_form/update_form_fields and from org member
+  add/remove
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from mongo_fakes import AsyncDatabase
+from routes import form_routes, org_routes
+from utils import access_cache
+from utils.access_cache import TTLCache, check_form_access_cached, get_membership, get_published_form
+
+ADMIN = {"user_id": "user-1"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(access_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    monkeypatch.setattr(access_cache, "record_cache_lookup", lambda cache, hit: calls.append((cache, hit)))
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    access_cache.clear_access_cache()
+    yield
+    access_cache.clear_access_cache()
+
+
+@pytest.fixture
+def db():
+    db = AsyncDatabase()
+    db.sync.users.insert_one({"id": "user-2", "email": "enumerator@example.org"})
+    db.sync.org_members.insert_many([
+        {"id": "member-1", "org_id": "org-1", "user_id": "user-1", "role": "admin"},
+        {"id": "member-2", "org_id": "org-1", "user_id": "user-2", "role": "viewer"},
+    ])
+    db.sync.projects.insert_one({"id": "project-1", "org_id": "org-1"})
+    db.sync.forms.insert_many([
+        {"id": "form-1", "org_id": "org-1", "project_id": "project-1", "version": 1, "status": "published",
+         "fields": [{"name": "age", "type": "number"}]},
+        {"id": "form-draft", "org_id": "org-1", "project_id": "project-1", "version": 1, "status": "draft",
+         "fields": [{"name": "age", "type": "number"}]},
+    ])
+    return db
+
+
+def request_for(db):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db)), state=SimpleNamespace())
+
+
+def form(db, form_id="form-1", min_version=None):
+    return asyncio.run(get_published_form(db, form_id, min_version))
+
+
+def membership(db, user_id="user-2"):
+    return asyncio.run(get_membership(db, "org-1", user_id))
+
+
+# ============ TTLCache ============
+
+class TestTTLCache:
+
+    def test_entries_expire_after_ttl(self, clock):
+        cache = TTLCache("test", ttl=60)
+        cache.set("a", 1)
+
+        clock.now += 60
+        assert cache.get("a") == 1
+        clock.now += 0.01
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache("test", ttl=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+
+        cache.set("c", 3)
+
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    def test_invalidate(self):
+        cache = TTLCache("test", ttl=60)
+        for key in [("org-1", "u1"), ("org-1", "u2"), ("org-2", "u1")]:
+            cache.set(key, key)
+
+        cache.invalidate(("org-1", "u1"))
+        cache.invalidate("missing")
+        assert len(cache) == 2
+        cache.invalidate_where(lambda key: key[0] == "org-1")
+        assert cache.get(("org-2", "u1")) == ("org-2", "u1") and len(cache) == 1
+
+
+# ============ Forms ============
+
+def test_published_form_is_served_from_cache(db, lookups):
+    first = form(db)
+    db.sync.forms.update_one({"id": "form-1"}, {"$set": {"fields": []}})
+
+    assert form(db) is first
+    assert lookups == [("forms", False), ("forms", True)]
+
+
+def test_form_is_reloaded_after_ttl(db, clock):
+    form(db)
+    db.sync.forms.update_one({"id": "form-1"}, {"$set": {"fields": []}})
+
+    clock.now += access_cache.FORM_CACHE_TTL + 1
+
+    assert form(db)["fields"] == []
+
+
+def test_newer_min_version_reloads(db, lookups):
+    form(db)
+    db.sync.forms.update_one({"id": "form-1"}, {"$set": {"version": 2}})
+
+    assert form(db, min_version=1)["version"] == 1
+    assert form(db, min_version=2)["version"] == 2
+    assert form(db, min_version=2)["version"] == 2
+    assert lookups == [("forms", False), ("forms", True), ("forms", False), ("forms", True)]
+
+
+@pytest.mark.parametrize("form_id", ["form-draft", "missing"])
+def test_unpublished_or_missing_forms_are_never_cached(db, lookups, form_id):
+    form(db, form_id)
+    form(db, form_id)
+
+    assert lookups == [("forms", False), ("forms", False)]
+    assert len(access_cache._forms) == 0
+
+
+def test_form_that_stops_being_published_is_dropped(db):
+    form(db, min_version=1)
+    db.sync.forms.update_one({"id": "form-1"}, {"$set": {"status": "archived", "version": 2}})
+
+    assert form(db, min_version=2)["status"] == "archived"
+    assert len(access_cache._forms) == 0
+
+
+# ============ Memberships ============
+
+def test_membership_is_served_from_cache(db, lookups):
+    first = membership(db)
+    db.sync.org_members.delete_one({"user_id": "user-2"})
+
+    assert membership(db) is first
+    assert lookups == [("memberships", False), ("memberships", True)]
+
+
+def test_membership_is_reloaded_after_ttl(db, clock):
+    membership(db)
+    db.sync.org_members.delete_one({"user_id": "user-2"})
+
+    clock.now += access_cache.MEMBERSHIP_CACHE_TTL + 1
+
+    assert membership(db) is None
+
+
+def test_missing_membership_is_never_cached(db, lookups):
+    assert membership(db, "user-9") is None
+    db.sync.org_members.insert_one({"id": "member-9", "org_id": "org-1", "user_id": "user-9", "role": "viewer"})
+
+    assert membership(db, "user-9")["role"] == "viewer"
+    assert lookups == [("memberships", False), ("memberships", False)]
+
+
+def test_check_form_access_cached(db):
+    member, found = asyncio.run(check_form_access_cached(db, "form-1", "user-2"))
+    outsider, _ = asyncio.run(check_form_access_cached(db, "form-1", "user-9"))
+
+    assert (member["role"], found["id"]) == ("viewer", "form-1")
+    assert outsider is None
+    assert asyncio.run(check_form_access_cached(db, "missing", "user-2")) == (None, None)
+
+
+# ============ Invalidation from routes ============
+
+def test_publish_form_invalidates(db):
+    assert form(db)["version"] == 1
+
+    asyncio.run(form_routes.publish_form(request_for(db), "form-1", current_user=ADMIN))
+
+    assert form(db)["version"] == 2
+
+
+def test_update_form_fields_invalidates(db):
+    form(db)
+    fields = [{"name": "household_size", "type": "number"}]
+
+    asyncio.run(form_routes.update_form_fields(
+        request_for(db), "form-1", form_routes.FormFieldUpdate(fields=fields), current_user=ADMIN
+    ))
+
+    assert form(db)["fields"] == fields
+
+
+def test_adding_a_member_invalidates(db):
+    assert membership(db)["role"] == "viewer"
+    # Removed elsewhere (another API process), so this process still holds the old entry
+    db.sync.org_members.delete_one({"user_id": "user-2"})
+
+    asyncio.run(org_routes.add_org_member(
+        request_for(db), "org-1", "enumerator@example.org", role="enumerator", current_user=ADMIN
+    ))
+
+    assert membership(db)["role"] == "enumerator"
+
+
+def test_removing_a_member_invalidates(db):
+    membership(db)
+    membership(db, "user-1")
+
+    asyncio.run(org_routes.remove_org_member(request_for(db), "org-1", "member-2", current_user=ADMIN))
+
+    assert membership(db) is None
+    assert membership(db, "user-1")["role"] == "admin"
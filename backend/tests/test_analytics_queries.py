@@ -0,0 +1,58 @@
+"""
+Analytics query tests (utils.analytics_queries)
+
+Tests for:
+- all_time periods start at the org's first submission
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongo_fakes import AsyncDatabase
+from utils.analytics_queries import EPOCH, clamp_start, get_date_range, submission_series
+from utils.rollups import day_floor, iso
+
+
+def seeded_db(days_ago):
+    db = AsyncDatabase()
+    now = datetime.now(timezone.utc)
+    db.sync.submissions.insert_many([
+        {"id": f"sub-{i}", "org_id": "org-1", "status": "approved", "quality_score": 80,
+         "submitted_at": iso(now - timedelta(days=ago))}
+        for i, ago in enumerate(days_ago)
+    ] + [{"id": "other", "org_id": "org-2", "status": "pending", "submitted_at": "2001-01-01T00:00:00+00:00"}])
+    return db
+
+
+def test_all_time_starts_at_first_submission():
+    db = seeded_db([3, 1])
+    start, end = get_date_range("all_time")
+    assert start == EPOCH
+
+    clamped = asyncio.run(clamp_start(db, "org-1", start, end))
+
+    assert clamped == day_floor(end - timedelta(days=3))
+
+
+def test_bounded_periods_are_not_clamped():
+    db = seeded_db([3])
+    start, end = get_date_range("30_days")
+
+    assert asyncio.run(clamp_start(db, "org-1", start, end)) == start
+
+
+def test_all_time_series_has_one_bucket_per_active_day():
+    db = seeded_db([3, 1])
+
+    series = asyncio.run(submission_series(db, "org-1", *get_date_range("all_time")))
+
+    assert len(series) == 4
+    assert sum(row["submissions"] for row in series) == 2
+
+
+def test_all_time_without_submissions_is_empty():
+    db = AsyncDatabase()
+
+    series = asyncio.run(submission_series(db, "org-1", *get_date_range("all_time")))
+
+    assert [row["submissions"] for row in series] == [0]
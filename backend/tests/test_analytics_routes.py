@@ -0,0 +1,89 @@
+"""
+Analytics route access tests (routes.analytics_routes)
+
+Tests for:
+- Non-members of an org are refused before anything is computed
+- project_id/form_id filters must belong to the org
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from mongo_fakes import AsyncDatabase
+from routes import analytics_routes
+
+MEMBER = {"user_id": "user-1"}
+OUTSIDER = {"user_id": "user-2"}
+
+
+@pytest.fixture
+def db():
+    db = AsyncDatabase()
+    db.sync.org_members.insert_one({"org_id": "org-1", "user_id": "user-1", "role": "admin"})
+    db.sync.projects.insert_many([{"id": "project-1", "org_id": "org-1"}, {"id": "project-9", "org_id": "org-9"}])
+    db.sync.forms.insert_many([{"id": "form-1", "org_id": "org-1"}, {"id": "form-9", "org_id": "org-9"}])
+    return db
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    calls = []
+
+    async def cached_analytics(kind, org_id, params, compute):
+        calls.append((kind, org_id))
+        return {}
+    monkeypatch.setattr(analytics_routes, "cached_analytics", cached_analytics)
+    return calls
+
+
+def request_for(db):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db)), state=SimpleNamespace())
+
+
+def overview(db, user, **filters):
+    return asyncio.run(analytics_routes.get_analytics_overview(
+        request_for(db), "org-1", project_id=filters.get("project_id"), form_id=filters.get("form_id"),
+        current_user=user
+    ))
+
+
+def test_non_member_is_refused(db, computed):
+    with pytest.raises(HTTPException) as raised:
+        overview(db, OUTSIDER)
+
+    assert raised.value.status_code == 403
+    assert computed == []
+
+
+def test_superadmin_is_allowed(db, computed):
+    overview(db, {"user_id": "admin", "is_superadmin": True})
+
+    assert computed == [("overview", "org-1")]
+
+
+@pytest.mark.parametrize("filters", [{"project_id": "project-9"}, {"form_id": "form-9"}, {"form_id": "missing"}])
+def test_filters_outside_the_org_are_refused(db, computed, filters):
+    with pytest.raises(HTTPException) as raised:
+        overview(db, MEMBER, **filters)
+
+    assert raised.value.status_code == 404
+    assert computed == []
+
+
+def test_member_with_own_filters(db, computed):
+    overview(db, MEMBER, project_id="project-1", form_id="form-1")
+
+    assert computed == [("overview", "org-1")]
+
+
+def test_report_of_another_org_is_refused(db, computed):
+    db.sync.reports.insert_one({"id": "report-9", "org_id": "org-9", "report_type": "submission", "filters": {}})
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(analytics_routes.run_report(request_for(db), "report-9", current_user=MEMBER))
+
+    assert raised.value.status_code == 403
+    assert computed == []
@@ -0,0 +1,59 @@
+"""
+Cache invalidation tests (utils.cache_events)
+
+Tests for:
+- First change of an org bumps its generation immediately
+- Changes inside the interval coalesce into one trailing bump
+- Documents without org_id are ignored
+"""
+
+import asyncio
+
+import pytest
+
+from utils import cache_events
+
+
+class FakeCacheManager:
+    bumps = []
+
+    @classmethod
+    async def bump_generation(cls, scope: str):
+        cls.bumps.append(scope)
+
+
+@pytest.fixture(autouse=True)
+def cache_manager(monkeypatch):
+    FakeCacheManager.bumps = []
+    monkeypatch.setattr(cache_events, "CacheManager", FakeCacheManager)
+    monkeypatch.setattr(cache_events, "scope_key", lambda field, value: f"{field}:{value}", raising=False)
+    monkeypatch.setattr(cache_events, "CACHE_INVALIDATION_INTERVAL", 0.05)
+    monkeypatch.setattr(cache_events, "_last_bump", {})
+    monkeypatch.setattr(cache_events, "_pending", {})
+    return FakeCacheManager
+
+
+def test_first_change_bumps_immediately(cache_manager):
+    asyncio.run(cache_events.submissions_changed([{"org_id": "org-1"}, {"org_id": "org-2"}]))
+
+    assert sorted(cache_manager.bumps) == ["org_id:org-1", "org_id:org-2"]
+
+
+def test_changes_within_interval_coalesce(cache_manager):
+    async def run():
+        for _ in range(20):
+            await cache_events.submissions_changed([{"org_id": "org-1"}])
+        assert cache_manager.bumps == ["org_id:org-1"]
+        # The trailing bump covers the changes made since the first one
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+    assert cache_manager.bumps == ["org_id:org-1", "org_id:org-1"]
+    assert cache_events._pending == {}
+
+
+def test_documents_without_org_are_ignored(cache_manager):
+    asyncio.run(cache_events.submissions_changed([{"form_id": "form-1"}, None]))
+
+    assert cache_manager.bumps == []
@@ -0,0 +1,117 @@
+"""
+Maintained counter tests (utils.counters)
+
+Tests for:
+- First read seeds a counter from an exact count
+- Inserts, status changes and deletes keep seeded counters exact
+- Increments landing before the seed are not double counted
+- Reconciliation overwrites drift and zeroes emptied keys
+- Bounded counts for filters no counter covers
+"""
+
+import asyncio
+
+import pytest
+
+from mongo_fakes import AsyncDatabase
+from utils import counters
+from utils.counters import (
+    FORM_SUBMISSIONS, PROJECT_SUBMISSIONS, apply_counter_updates, bounded_count, count_of, counter_updates,
+    exact_count_pipeline, get_count, get_counts, reconcile_updates, status_change_updates
+)
+
+
+def submission(i, form_id="form-1", status="pending"):
+    return {"id": f"sub-{i}", "form_id": form_id, "project_id": "project-1", "org_id": "org-1", "status": status}
+
+
+@pytest.fixture
+def db():
+    db = AsyncDatabase()
+    db.sync.submissions.insert_many([submission(i) for i in range(3)] + [submission(3, status="approved")])
+    return db
+
+
+def insert(db, docs):
+    async def run():
+        await db.submissions.insert_many([dict(doc) for doc in docs])
+        await apply_counter_updates(db, counter_updates("submissions", docs, 1))
+    asyncio.run(run())
+
+
+def test_first_read_seeds_counter(db):
+    assert asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1")) == 4
+    assert asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1", status="approved")) == 1
+
+    counter = db.sync.counters.find_one({"_id": "form_submissions:form-1"})
+    assert counter["seeded"] is True
+    assert counter["by_status"] == {"pending": 3, "approved": 1}
+
+
+def test_seeded_counter_follows_writes(db):
+    asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1"))
+    # Reads are served by the counter from now on, not by counting
+    db.sync.submissions.insert_one(submission(99))
+
+    insert(db, [submission(4), submission(5, status="flagged")])
+    asyncio.run(apply_counter_updates(db, status_change_updates("submissions", submission(0), "approved")))
+    asyncio.run(apply_counter_updates(db, counter_updates("submissions", [submission(1)], -1)))
+
+    counts = {
+        status: asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1", status=status))
+        for status in ("pending", "approved", "flagged")
+    }
+    assert counts == {"pending": 2, "approved": 2, "flagged": 1}
+    assert asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1")) == 5
+
+
+def test_increments_before_seed_are_not_double_counted(db):
+    # Counter document created by $inc, never read (so never seeded)
+    insert(db, [submission(4)])
+
+    assert asyncio.run(get_count(db, PROJECT_SUBMISSIONS, "project-1")) == 5
+    insert(db, [submission(5)])
+    assert asyncio.run(get_count(db, PROJECT_SUBMISSIONS, "project-1")) == 6
+
+
+def test_get_counts_batches_keys(db):
+    counts = asyncio.run(get_counts(db, FORM_SUBMISSIONS, ["form-1", "form-2", "form-1"]))
+
+    assert counts == {"form-1": 4, "form-2": 0}
+
+
+def test_exact_bypasses_counters(db):
+    asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1"))
+    db.sync.submissions.insert_one(submission(99))
+
+    assert asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1")) == 4
+    assert asyncio.run(get_count(db, FORM_SUBMISSIONS, "form-1", exact=True)) == 5
+
+
+def test_reconcile_overwrites_drift_and_zeroes_emptied_keys(db):
+    db.sync.counters.insert_one({
+        "_id": "form_submissions:form-gone", "name": FORM_SUBMISSIONS, "key": "form-gone",
+        "total": 7, "by_status": {"pending": 7}, "seeded": True,
+    })
+    db.sync.counters.insert_one({
+        "_id": "form_submissions:form-1", "name": FORM_SUBMISSIONS, "key": "form-1",
+        "total": 40, "by_status": {"pending": 40}, "seeded": True,
+    })
+    rows = list(db.sync.submissions.aggregate(exact_count_pipeline(FORM_SUBMISSIONS)))
+
+    db.sync.counters.bulk_write(reconcile_updates(FORM_SUBMISSIONS, rows, ["form-1", "form-gone"]))
+
+    assert asyncio.run(get_counts(db, FORM_SUBMISSIONS, ["form-1", "form-gone"])) == {"form-1": 4, "form-gone": 0}
+
+
+def test_count_of_never_negative():
+    assert count_of({"pending": -1, "approved": 0}) == 0
+    assert count_of({"pending": 2, "approved": 3}, status="approved") == 3
+
+
+def test_bounded_count(db, monkeypatch):
+    monkeypatch.setattr(counters, "ESTIMATED_COUNT_LIMIT", 3)
+
+    assert asyncio.run(bounded_count(db.submissions, {"status": "pending"})) == (3, True)
+    assert asyncio.run(bounded_count(db.submissions, {"status": "approved"})) == (1, False)
+    assert asyncio.run(bounded_count(db.submissions, {}, estimated=False)) == (4, False)
@@ -0,0 +1,155 @@
+"""
+Dashboard metric pipeline tests (utils.dashboard_metrics)
+
+Tests for:
+- Quality metrics JSON identical to the previous Python reduction,
+  flag_distribution order included
+- Enumerator performance JSON identical to the previous Python
+  reduction, order of tied enumerators included
+- Empty results
+"""
+
+import json
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mongo_fakes import sync_db
+from utils.dashboard_metrics import (
+    enumerator_performance_pipeline, enumerator_performance_rows, enumerator_rows, quality_metrics_pipeline,
+    quality_metrics_result
+)
+
+ORG_ID = "org-1"
+FLAGS = ["missing_required:name", "out_of_range:age", "speeding", "gps_low_accuracy", "duplicate"]
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def submissions():
+    rng = random.Random(42)
+    db = sync_db()
+    db.submissions.insert_many([
+        {
+            "id": f"s{i}",
+            "org_id": rng.choice([ORG_ID, ORG_ID, "org-2"]),
+            "project_id": f"p{i % 3}",
+            "form_id": f"f{i % 7}",
+            "submitted_by": f"u{rng.randrange(40)}",
+            "submitted_at": (NOW - timedelta(minutes=rng.randrange(60 * 24 * 60))).isoformat(),
+            "status": rng.choice(("pending", "approved", "approved", "rejected", "flagged")),
+            "quality_score": rng.choice((None, round(rng.uniform(40, 100), 1))),
+            "quality_flags": rng.sample(FLAGS, rng.choice((0, 0, 0, 1, 2))),
+        }
+        for i in range(1500)
+    ])
+    return db.submissions
+
+
+# ============ Previous implementations (from benchmarks/bench_dashboard_metrics.py) ============
+
+def previous_quality_metrics(collection, query: dict) -> dict:
+    """get_quality_metrics before the aggregation pipeline"""
+    submissions = list(collection.find(query, {"_id": 0, "quality_score": 1, "quality_flags": 1, "status": 1}))
+    if not submissions:
+        return quality_metrics_result([])
+    scores = [s["quality_score"] for s in submissions if s.get("quality_score") is not None]
+    avg_score = sum(scores) / len(scores) if scores else 0
+    flag_counts = defaultdict(int)
+    for sub in submissions:
+        for flag in sub.get("quality_flags", []):
+            flag_counts[flag] += 1
+    return {
+        "avg_quality_score": round(avg_score, 2),
+        "flagged_count": len([s for s in submissions if s.get("quality_flags")]),
+        "approved_count": len([s for s in submissions if s["status"] == "approved"]),
+        "rejected_count": len([s for s in submissions if s["status"] == "rejected"]),
+        "total_count": len(submissions),
+        "flag_distribution": dict(flag_counts)
+    }
+
+
+def previous_enumerator_performance(collection, query: dict) -> list:
+    """get_enumerator_performance before the aggregation pipeline (without the user lookup)"""
+    submissions = list(collection.find(
+        query, {"_id": 0, "submitted_by": 1, "quality_score": 1, "status": 1, "submitted_at": 1}
+    ))
+    stats = defaultdict(lambda: {"submission_count": 0, "quality_scores": [], "approved_count": 0, "rejected_count": 0})
+    for sub in submissions:
+        entry = stats[sub["submitted_by"]]
+        entry["submission_count"] += 1
+        if sub.get("quality_score") is not None:
+            entry["quality_scores"].append(sub["quality_score"])
+        if sub["status"] == "approved":
+            entry["approved_count"] += 1
+        elif sub["status"] == "rejected":
+            entry["rejected_count"] += 1
+    result = []
+    for user_id, entry in stats.items():
+        scores = entry["quality_scores"]
+        result.append({
+            "user_id": user_id,
+            "name": "Unknown",
+            "email": "",
+            "submission_count": entry["submission_count"],
+            "avg_quality_score": round(sum(scores) / len(scores), 2) if scores else 0,
+            "approved_count": entry["approved_count"],
+            "rejected_count": entry["rejected_count"],
+            "approval_rate": round(entry["approved_count"] / entry["submission_count"] * 100, 1)
+        })
+    result.sort(key=lambda x: x["submission_count"], reverse=True)
+    return result
+
+
+def quality_metrics(collection, query: dict) -> dict:
+    return quality_metrics_result(list(collection.aggregate(quality_metrics_pipeline(query), allowDiskUse=True)))
+
+
+def enumerator_performance(collection, query: dict) -> list:
+    rows = enumerator_rows(list(collection.aggregate(enumerator_performance_pipeline(query), allowDiskUse=True)))
+    return enumerator_performance_rows(rows, {})
+
+
+# ============ Old vs new ============
+
+@pytest.mark.parametrize("query", [
+    {"org_id": ORG_ID},
+    {"org_id": ORG_ID, "project_id": "p1"},
+    {"org_id": ORG_ID, "project_id": "p2", "form_id": "f3"},
+    {"org_id": "org-missing"},
+])
+def test_quality_metrics_match_previous_json(submissions, query):
+    old, new = previous_quality_metrics(submissions, query), quality_metrics(submissions, query)
+
+    assert json.dumps(new) == json.dumps(old)
+
+
+def test_flag_distribution_keeps_first_seen_order(submissions):
+    old = previous_quality_metrics(submissions, {"org_id": ORG_ID})
+
+    assert list(old["flag_distribution"]) != sorted(old["flag_distribution"])
+    assert list(quality_metrics(submissions, {"org_id": ORG_ID})["flag_distribution"]) == list(old["flag_distribution"])
+
+
+@pytest.mark.parametrize("days,project_id", [(30, None), (60, None), (14, "p0"), (0, None)])
+def test_enumerator_performance_matches_previous_json(submissions, days, project_id):
+    query = {"org_id": ORG_ID, "submitted_at": {"$gte": (NOW - timedelta(days=days)).isoformat()}}
+    if project_id:
+        query["project_id"] = project_id
+
+    old, new = previous_enumerator_performance(submissions, query), enumerator_performance(submissions, query)
+
+    assert json.dumps(new) == json.dumps(old)
+
+
+def test_enumerator_ties_keep_first_seen_order(submissions):
+    query = {"org_id": ORG_ID}
+    counts = [row["submission_count"] for row in previous_enumerator_performance(submissions, query)]
+
+    # The fixture has ties, so the comparison covers their order
+    assert len(set(counts)) < len(counts)
+    assert json.dumps(enumerator_performance(submissions, query)) == json.dumps(
+        previous_enumerator_performance(submissions, query)
+    )
@@ -0,0 +1,112 @@
+"""
+Export job route tests (routes.export_routes)
+
+Tests for:
+- Batch exports authorize before revealing whether a project exists
+- Single and batch jobs are queued in-process when Celery is unavailable
+- A repeated request reuses the in-flight job instead of queueing another
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+from models import BatchExportRequest, ExportRequest
+from mongo_fakes import AsyncDatabase
+from routes import export_routes
+
+MEMBER = {"user_id": "user-1"}
+OUTSIDER = {"user_id": "user-2"}
+SUPERADMIN = {"user_id": "admin", "is_superadmin": True}
+
+
+class FakeJobManager:
+    def __init__(self):
+        self.jobs = []
+
+    async def create_job(self, job_type, params, user_id, org_id, job_id=None):
+        self.jobs.append((job_type, params, org_id, job_id))
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = FakeJobManager()
+
+    async def get_shared_job_manager():
+        return manager
+    monkeypatch.setattr(export_routes, "get_shared_job_manager", get_shared_job_manager)
+    monkeypatch.setattr(export_routes, "CELERY_AVAILABLE", False)
+    return manager
+
+
+@pytest.fixture
+def db():
+    db = AsyncDatabase()
+    db.sync.org_members.insert_one({"org_id": "org-1", "user_id": "user-1", "role": "admin"})
+    db.sync.projects.insert_one({"id": "project-1", "org_id": "org-1"})
+    db.sync.forms.insert_many([
+        {"id": f"form-{i}", "org_id": "org-1", "project_id": "project-1", "name": f"Form {i}",
+         "version": 1, "status": "published", "created_at": f"2026-01-0{i}"}
+        for i in (1, 2)
+    ])
+    return db
+
+
+def request_for(db):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db)), state=SimpleNamespace())
+
+
+def batch(db, user, **fields):
+    tasks = BackgroundTasks()
+    result = asyncio.run(export_routes.create_batch_export_job.__wrapped__(
+        request_for(db), BatchExportRequest(**fields), tasks, current_user=user
+    ))
+    return result, tasks
+
+
+@pytest.mark.parametrize("project_id", ["project-1", "project-missing"])
+def test_batch_refuses_non_members_whether_or_not_the_project_exists(db, manager, project_id):
+    with pytest.raises(HTTPException) as raised:
+        batch(db, OUTSIDER, project_id=project_id)
+
+    assert raised.value.status_code == 403
+
+
+def test_batch_missing_project_is_404_for_superadmins(db, manager):
+    with pytest.raises(HTTPException) as raised:
+        batch(db, SUPERADMIN, project_id="project-missing")
+
+    assert raised.value.status_code == 404
+
+
+def test_batch_is_queued_in_process_and_reused(db, manager):
+    first, tasks = batch(db, MEMBER, project_id="project-1", format="stata")
+    again, again_tasks = batch(db, MEMBER, project_id="project-1", format="stata")
+
+    assert first["cached"] is False and first["form_count"] == 2
+    assert len(tasks.tasks) == 1 and tasks.tasks[0].func is export_routes.run_export_job
+    job = db.sync.export_jobs.find_one({"id": first["id"]})
+    assert job["scope"] == "project" and job["form_ids"] == ["form-1", "form-2"]
+    assert manager.jobs == [("export", {"scope": "project", "scope_id": "project-1", "format": "stata", "form_count": 2},
+                             "org-1", first["id"])]
+    assert again == {"id": first["id"], "status": "pending", "cached": True, "form_count": 2}
+    assert again_tasks.tasks == []
+
+
+def test_single_export_job_uses_the_same_queueing(db, manager):
+    def create():
+        tasks = BackgroundTasks()
+        result = asyncio.run(export_routes.create_export_job.__wrapped__(
+            request_for(db), ExportRequest(form_id="form-1", format="spss"), tasks, current_user=MEMBER
+        ))
+        return result, tasks
+
+    first, tasks = create()
+    again, again_tasks = create()
+
+    assert first["cached"] is False and len(tasks.tasks) == 1
+    assert manager.jobs[0][1] == {"form_id": "form-1", "format": "spss"}
+    assert again == {"id": first["id"], "status": "pending", "cached": True}
+    assert again_tasks.tasks == []
@@ -0,0 +1,54 @@
+"""
+Export artifact storage tests (utils.export_storage)
+
+Tests for:
+- Local artifacts exist only while their file does
+- S3 artifacts are checked against the bucket before reuse
+"""
+
+import asyncio
+
+import pytest
+
+from utils import export_storage
+
+
+class FakeS3:
+    keys = set()
+
+    @classmethod
+    async def file_exists(cls, key):
+        return key in cls.keys
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    FakeS3.keys = {"org-1/exports/2026/01/01/kept.csv"}
+    monkeypatch.setattr(export_storage, "_s3_storage", lambda: FakeS3)
+    return FakeS3
+
+
+def test_local_artifact_exists_while_file_does(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_storage, "EXPORT_STORAGE_DIR", str(tmp_path))
+    (tmp_path / "org-1").mkdir()
+    (tmp_path / "org-1" / "kept.csv").write_text("id\n")
+    kept = {"storage": "local", "artifact_key": "org-1/kept.csv"}
+    removed = {"storage": "local", "artifact_key": "org-1/removed.csv"}
+
+    assert asyncio.run(export_storage.artifact_exists(kept)) is True
+    assert asyncio.run(export_storage.artifact_exists(removed)) is False
+
+
+def test_s3_artifact_checked_in_bucket(s3):
+    kept = {"storage": "s3", "artifact_key": "org-1/exports/2026/01/01/kept.csv"}
+    expired = {"storage": "s3", "artifact_key": "org-1/exports/2026/01/01/expired.csv"}
+
+    assert asyncio.run(export_storage.artifact_exists(kept)) is True
+    assert asyncio.run(export_storage.artifact_exists(expired)) is False
+
+
+def test_s3_artifact_without_storage_configured(monkeypatch):
+    monkeypatch.setattr(export_storage, "_s3_storage", lambda: None)
+    job = {"storage": "s3", "artifact_key": "org-1/exports/2026/01/01/kept.csv"}
+
+    assert asyncio.run(export_storage.artifact_exists(job)) is False
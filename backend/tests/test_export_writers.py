@@ -0,0 +1,133 @@
+"""
+Export file writer tests (utils.export_builder.write_export_file)
+
+Tests for:
+- CSV, JSON, NDJSON, XLSX, Parquet and Arrow output on a small form
+- Row counts across chunk boundaries
+- Empty exports still carry the header/schema
+- Unknown formats are rejected
+"""
+
+import asyncio
+import csv
+import json
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils.export_builder import write_export_file
+
+COLUMNS = [
+    "id", "submitted_by", "submitted_at", "status", "quality_score",
+    "name", "age", "region", "crops", "visit_date", "location_lat", "location_lng",
+]
+
+
+def write(tmp_path, chunks, form, export_format):
+    path = str(tmp_path / f"export.{export_format}")
+    rows = asyncio.run(write_export_file(chunks, form, export_format, path))
+    return rows, path
+
+
+def test_csv(tmp_path, export_form, export_submissions, as_chunks):
+    rows, path = write(tmp_path, as_chunks(export_submissions), export_form, "csv")
+
+    with open(path, newline="", encoding="utf-8") as f:
+        table = list(csv.reader(f))
+    assert rows == 2
+    assert table[0] == COLUMNS
+    assert table[1] == [
+        "sub-1", "user-1", "2026-03-01T08:30:00+00:00", "approved", "92.5",
+        "Amina", "34", "north", "maize beans", "2026-03-01", "-6.8", "39.28",
+    ]
+    # Numeric strings are exported as numbers, missing answers as empty cells
+    assert table[2][5:] == ["Juma", "41", "south", "", "", "", ""]
+
+
+@pytest.mark.parametrize("export_format", ["json", "ndjson"])
+def test_json_formats(tmp_path, export_form, export_submissions, as_chunks, export_format):
+    rows, path = write(tmp_path, as_chunks(export_submissions), export_form, export_format)
+
+    with open(path, encoding="utf-8") as f:
+        if export_format == "json":
+            docs = json.load(f)
+        else:
+            docs = [json.loads(line) for line in f]
+    assert rows == 2
+    assert docs == export_submissions
+
+
+def test_xlsx(tmp_path, export_form, export_submissions, as_chunks):
+    rows, path = write(tmp_path, as_chunks(export_submissions), export_form, "xlsx")
+
+    sheet = openpyxl.load_workbook(path).worksheets[0]
+    table = [[cell.value for cell in row] for row in sheet.iter_rows()]
+    assert rows == 2
+    assert table[0] == COLUMNS
+    assert table[1][5:9] == ["Amina", 34, "north", "maize, beans"]
+    assert table[1][9].date().isoformat() == "2026-03-01"
+    assert table[1][10:] == [-6.8, 39.28]
+    assert table[2][4] is None
+    assert table[2][6] == 41
+
+
+def test_parquet(tmp_path, export_form, export_submissions, as_chunks):
+    rows, path = write(tmp_path, as_chunks(export_submissions), export_form, "parquet")
+
+    table = pq.read_table(path)
+    assert rows == table.num_rows == 2
+    assert table.column_names == COLUMNS
+    assert table.schema.field("age").type == pa.float64()
+    assert pa.types.is_timestamp(table.schema.field("submitted_at").type)
+    first, second = table.to_pylist()
+    assert first["crops"] == ["maize", "beans"]
+    assert first["visit_date"].isoformat() == "2026-03-01"
+    assert second["age"] == 41.0
+    assert second["crops"] == [] and second["location_lat"] is None
+
+
+def test_arrow_matches_parquet(tmp_path, export_form, export_submissions, as_chunks):
+    _, parquet_path = write(tmp_path, as_chunks(export_submissions), export_form, "parquet")
+    rows, arrow_path = write(tmp_path, as_chunks(export_submissions), export_form, "arrow")
+
+    with open(arrow_path, "rb") as f:
+        table = pa.ipc.open_stream(f).read_all()
+    assert rows == 2
+    assert table.to_pylist() == pq.read_table(parquet_path).to_pylist()
+
+
+def test_rows_counted_across_chunks(tmp_path, export_form, export_submissions, as_chunks):
+    submissions = [dict(export_submissions[i % 2], id=f"sub-{i}") for i in range(25)]
+
+    for export_format in ("csv", "json", "xlsx", "parquet"):
+        rows, _ = write(tmp_path, as_chunks(submissions, size=4), export_form, export_format)
+        assert rows == 25, export_format
+
+    rows, path = write(tmp_path, as_chunks(submissions, size=4), export_form, "json")
+    with open(path, encoding="utf-8") as f:
+        assert [doc["id"] for doc in json.load(f)] == [f"sub-{i}" for i in range(25)]
+
+
+@pytest.mark.parametrize("export_format", ["csv", "json", "xlsx", "parquet"])
+def test_empty_export(tmp_path, export_form, as_chunks, export_format):
+    rows, path = write(tmp_path, as_chunks([]), export_form, export_format)
+
+    assert rows == 0
+    if export_format == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            assert list(csv.reader(f)) == [COLUMNS]
+    elif export_format == "json":
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == []
+    elif export_format == "xlsx":
+        header = next(openpyxl.load_workbook(path).worksheets[0].iter_rows(values_only=True))
+        assert list(header) == COLUMNS
+    else:
+        assert pq.read_table(path).column_names == COLUMNS
+
+
+def test_unknown_format(tmp_path, export_form, as_chunks):
+    with pytest.raises(ValueError, match="Unsupported export format"):
+        write(tmp_path, as_chunks([]), export_form, "dbf")
@@ -0,0 +1,175 @@
+"""
+Write-behind ingest buffer tests (utils.ingest_buffer)
+
+Tests for:
+- Idempotency-key duplicates resolve to the stored submission
+- Duplicates of a document's own id (WAL replay) count as written
+- Failed flushes: flush mode fails the request, WAL mode retries
+- WAL segments left by a stopped process are replayed on start
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+from mongo_fakes import submissions_db
+from utils import ingest_buffer
+from utils.ingest_buffer import IngestBuffer, IngestError
+
+
+@pytest.fixture(autouse=True)
+def no_cache_invalidation(monkeypatch):
+    async def submissions_changed(docs):
+        pass
+    monkeypatch.setattr(ingest_buffer, "submissions_changed", submissions_changed)
+
+
+def make_submission(key=None, **fields):
+    doc = {
+        "id": str(uuid.uuid4()),
+        "form_id": "form-1",
+        "project_id": "project-1",
+        "org_id": "org-1",
+        "status": "pending",
+        "submitted_by": "user-1",
+        "data": {"q1": "yes"},
+        "idempotency_key": key,
+    }
+    doc.update(fields)
+    return doc
+
+
+class Notified:
+    """on_flush hook recording the submission ids published to the pipeline"""
+
+    def __init__(self):
+        self.ids = []
+
+    async def __call__(self, submission_ids):
+        self.ids.extend(submission_ids)
+
+
+async def run_buffer(db, docs, notified, **options):
+    buffer = IngestBuffer(db, on_flush=notified, flush_ms=20, **options)
+    await buffer.start()
+    try:
+        return await asyncio.gather(*(buffer.submit(doc) for doc in docs))
+    finally:
+        await buffer.stop()
+
+
+class TestIdempotencyDedupe:
+    """Concurrent retries of one upload through the buffer"""
+
+    def test_concurrent_retries_resolve_to_stored_submission(self):
+        db = submissions_db()
+        notified = Notified()
+        first = make_submission("device-1:client-1")
+        retry = make_submission("device-1:client-1")
+
+        results = asyncio.run(run_buffer(db, [first, retry], notified))
+
+        assert results[0] is None
+        assert results[1]["id"] == first["id"]
+        assert db.sync.submissions.count_documents({}) == 1
+        # Only the stored submission reaches the post-processing pipeline
+        assert notified.ids == [first["id"]]
+
+    def test_retry_of_earlier_flush_resolves_to_stored_submission(self):
+        db = submissions_db()
+        stored = make_submission("device-1:client-1")
+        db.sync.submissions.insert_one(dict(stored))
+        notified = Notified()
+
+        results = asyncio.run(run_buffer(db, [make_submission("device-1:client-1")], notified))
+
+        assert results[0]["id"] == stored["id"]
+        assert notified.ids == []
+
+    def test_id_duplicate_counts_as_written(self):
+        db = submissions_db()
+        replayed = make_submission("device-1:client-1")
+        db.sync.submissions.insert_one(dict(replayed))
+        notified = Notified()
+
+        results = asyncio.run(run_buffer(db, [replayed, make_submission()], notified))
+
+        assert results == [None, None]
+        assert db.sync.submissions.count_documents({}) == 2
+        assert replayed["id"] in notified.ids
+
+
+def wal_segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".wal"))
+
+
+class TestFlushFailure:
+    """bulk_write raising (e.g. primary unavailable)"""
+
+    def test_flush_mode_fails_the_request(self):
+        db = submissions_db()
+        db.submissions.fail_bulk_writes = [ConnectionError("no primary")]
+        notified = Notified()
+
+        with pytest.raises(IngestError, match="no primary"):
+            asyncio.run(run_buffer(db, [make_submission()], notified))
+
+        assert db.sync.submissions.count_documents({}) == 0
+        assert notified.ids == []
+
+    def test_wal_mode_retries_until_written(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ingest_buffer, "INGEST_RETRY_DELAY", 0.01)
+        db = submissions_db()
+        db.submissions.fail_bulk_writes = [ConnectionError("no primary"), ConnectionError("no primary")]
+        notified = Notified()
+        doc = make_submission()
+
+        results = asyncio.run(run_buffer(db, [doc], notified, durability="wal", wal_dir=str(tmp_path)))
+
+        assert results == [None]
+        assert db.sync.submissions.count_documents({"id": doc["id"]}) == 1
+        assert notified.ids == [doc["id"]]
+        # Flushed segments are removed
+        assert wal_segments(tmp_path) == []
+
+
+class TestWalReplay:
+    """Segments left behind by a crashed process"""
+
+    def write_segment(self, directory, docs, torn_tail=False):
+        lines = "".join(json.dumps(doc) + "\n" for doc in docs)
+        if torn_tail:
+            lines += '{"id": "half-writ'
+        (directory / "crashed-host-1-1-00000001.wal").write_text(lines)
+
+    def test_start_replays_left_over_segments(self, tmp_path):
+        db = submissions_db()
+        docs = [make_submission(), make_submission()]
+        self.write_segment(tmp_path, docs, torn_tail=True)
+        notified = Notified()
+
+        asyncio.run(run_buffer(db, [], notified, durability="wal", wal_dir=str(tmp_path)))
+
+        assert db.sync.submissions.count_documents({}) == 2
+        assert sorted(notified.ids) == sorted(doc["id"] for doc in docs)
+        assert wal_segments(tmp_path) == []
+
+    def test_replay_of_written_documents_is_harmless(self, tmp_path):
+        db = submissions_db()
+        written = make_submission("device-1:client-1")
+        db.sync.submissions.insert_one(dict(written))
+        retried = make_submission("device-1:client-1")
+        fresh = make_submission()
+        # The process crashed after the flush but before releasing the segment
+        self.write_segment(tmp_path, [written, retried, fresh])
+        notified = Notified()
+
+        asyncio.run(run_buffer(db, [], notified, durability="wal", wal_dir=str(tmp_path)))
+
+        assert db.sync.submissions.count_documents({}) == 2
+        assert db.sync.submissions.count_documents({"id": retried["id"]}) == 0
+        assert sorted(notified.ids) == sorted([written["id"], fresh["id"]])
+        assert wal_segments(tmp_path) == []
@@ -0,0 +1,54 @@
+"""
+Worker connection pool tests (utils.mongo_pool)
+
+Tests for:
+- Async tasks share one event loop and Motor client per process
+- A forked child gets its own loop and client
+- Shutdown closes the loop and the next task starts afresh
+"""
+
+import asyncio
+
+import pytest
+
+from utils import mongo_pool
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    mongo_pool.close_async_client()
+    yield
+    mongo_pool.close_async_client()
+
+
+async def current():
+    return asyncio.get_running_loop(), mongo_pool.get_async_client()
+
+
+def test_tasks_share_the_loop_and_client():
+    first_loop, first_client = mongo_pool.run_in_worker_loop(current())
+    loop, client = mongo_pool.run_in_worker_loop(current())
+
+    assert loop is first_loop and client is first_client
+    assert client.io_loop is loop
+    assert mongo_pool.async_pool_stats()["max_pool_size"] == mongo_pool.WORKER_MAX_POOL_SIZE
+
+
+def test_forked_child_gets_its_own(monkeypatch):
+    parent_loop, parent_client = mongo_pool.run_in_worker_loop(current())
+    monkeypatch.setattr(mongo_pool.os, "getpid", lambda: -1)
+
+    loop, client = mongo_pool.run_in_worker_loop(current())
+
+    assert loop is not parent_loop and client is not parent_client
+    assert not parent_loop.is_closed()
+    parent_loop.close()
+
+
+def test_shutdown_closes_the_loop():
+    loop, client = mongo_pool.run_in_worker_loop(current())
+
+    mongo_pool.shutdown_worker_mongo()
+
+    assert loop.is_closed() and mongo_pool.async_pool_stats() is None
+    assert mongo_pool.run_in_worker_loop(current())[1] is not client
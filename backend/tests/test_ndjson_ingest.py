@@ -0,0 +1,96 @@
+"""
+Streaming NDJSON parser tests (utils.ndjson_ingest)
+
+Tests for:
+- Records split across chunk boundaries
+- Malformed and blank lines
+- Oversized lines, whole or spread over chunks
+- Truncated trailing line
+- gzip bodies: chunked, concatenated, corrupt, truncated
+"""
+
+import asyncio
+import gzip
+
+import pytest
+
+from utils.ndjson_ingest import NDJSONBodyError, iter_ndjson
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def parse(*chunks, **options):
+    async def collect():
+        return [record async for record in iter_ndjson(stream(*chunks), **options)]
+    return asyncio.run(collect())
+
+
+def test_records_split_across_chunks():
+    records = parse(b'{"a": 1}\n{"a"', b': 2}\n{"a": 3}\n')
+
+    assert records == [(0, {"a": 1}, None), (1, {"a": 2}, None), (2, {"a": 3}, None)]
+
+
+def test_malformed_line_is_reported_and_skipped():
+    records = parse(b'{"a": 1}\n{"a": \n\n  \n{"a": 2}\n')
+
+    assert [(index, value) for index, value, _ in records] == [(0, {"a": 1}), (1, None), (2, {"a": 2})]
+    assert records[1][2].startswith("Invalid JSON")
+
+
+def test_oversized_line_in_one_chunk():
+    records = parse(b'{"a": 1}\n{"padding": "' + b"x" * 64 + b'"}\n{"a": 2}\n', max_line_bytes=32)
+
+    assert records[0] == (0, {"a": 1}, None)
+    assert records[1] == (1, None, "Record exceeds 32 bytes")
+    assert records[2] == (2, {"a": 2}, None)
+
+
+def test_oversized_line_across_chunks():
+    chunks = [b'{"a": 1}\n{"padding": "'] + [b"x" * 20] * 5 + [b'"}\n{"a": 2}\n']
+
+    records = parse(*chunks, max_line_bytes=32)
+
+    assert records == [(0, {"a": 1}, None), (1, None, "Record exceeds 32 bytes"), (2, {"a": 2}, None)]
+
+
+def test_trailing_line_without_newline():
+    assert parse(b'{"a": 1}\n{"a": 2}') == [(0, {"a": 1}, None), (1, {"a": 2}, None)]
+
+
+def test_truncated_trailing_line():
+    records = parse(b'{"a": 1}\n{"a": 2, "b"')
+
+    assert records[0] == (0, {"a": 1}, None)
+    assert records[1][:2] == (1, None)
+    assert records[1][2].startswith("Invalid JSON")
+
+
+def test_gzip_body_in_small_chunks():
+    body = gzip.compress(b"".join(b'{"i": %d}\n' % i for i in range(100)))
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    records = parse(*chunks, gzip=True)
+
+    assert [value["i"] for _, value, _ in records] == list(range(100))
+
+
+def test_concatenated_gzip_members():
+    body = gzip.compress(b'{"i": 0}\n') + gzip.compress(b'{"i": 1}\n')
+
+    assert [value for _, value, _ in parse(body, gzip=True)] == [{"i": 0}, {"i": 1}]
+
+
+def test_corrupt_gzip_body():
+    with pytest.raises(NDJSONBodyError, match="Invalid gzip"):
+        parse(b"\x1f\x8b\x08\x00" + b"\x00" * 6 + b"\xff" * 16, gzip=True)
+
+
+def test_truncated_gzip_body():
+    body = gzip.compress(b'{"a": 1}\n' * 50)
+
+    with pytest.raises(NDJSONBodyError, match="Truncated"):
+        parse(body[:len(body) // 2], gzip=True)
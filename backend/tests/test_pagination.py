@@ -0,0 +1,83 @@
+"""
+Keyset pagination tests (utils.pagination)
+
+Tests for:
+- Cursor tokens round-trip strings, datetimes and ObjectIds
+- Paging through rows with tied sort keys returns each row once
+- Malformed cursors are rejected with 400
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from mongo_fakes import sync_db
+from utils.pagination import Keyset, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("sort_value,id_value", [
+    ("2026-03-01T08:30:00+00:00", "sub-1"),
+    (datetime(2026, 3, 1, 8, 30, tzinfo=timezone.utc), "sub-1"),
+    (None, ObjectId("65f0c0ffee0123456789abcd")),
+    (42.5, 7),
+])
+def test_cursor_round_trip(sort_value, id_value):
+    token = encode_cursor(sort_value, id_value)
+
+    assert "=" not in token
+    assert decode_cursor(token) == (sort_value, id_value)
+
+
+@pytest.mark.parametrize("token", ["not a cursor", "e30", encode_cursor("a", "b")[:-3]])
+def test_malformed_cursor_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+def page_through(collection, keyset, query, limit):
+    pages, cursor = [], None
+    while True:
+        docs = list(collection.find(keyset.apply(query, cursor), {"_id": 0}).sort(keyset.sort).limit(limit))
+        pages.append([doc["id"] for doc in docs])
+        cursor = keyset.next_cursor(docs, limit)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_through_tied_sort_keys(descending):
+    db = sync_db()
+    # Three submissions per timestamp: page boundaries fall inside each tie
+    db.submissions.insert_many([
+        {"id": f"sub-{i:02d}", "form_id": "form-1", "submitted_at": f"2026-03-0{1 + i // 3}T00:00:00+00:00"}
+        for i in range(10)
+    ] + [{"id": "other", "form_id": "form-2", "submitted_at": "2026-03-01T00:00:00+00:00"}])
+    keyset = Keyset("submitted_at", "id", descending=descending)
+
+    pages = page_through(db.submissions, keyset, {"form_id": "form-1"}, limit=4)
+
+    ids = [doc_id for page in pages for doc_id in page]
+    expected = [f"sub-{i:02d}" for i in range(10)]
+    assert ids == (expected[::-1] if descending else expected)
+    assert [len(page) for page in pages] == [4, 4, 2]
+
+
+def test_id_only_keyset():
+    db = sync_db()
+    db.cases.insert_many([{"id": f"case-{i}"} for i in range(5)])
+    keyset = Keyset(None, "id", descending=False)
+
+    pages = page_through(db.cases, keyset, {}, limit=2)
+
+    assert pages == [["case-0", "case-1"], ["case-2", "case-3"], ["case-4"]]
+
+
+def test_next_cursor_only_after_full_page():
+    keyset = Keyset("submitted_at")
+    docs = [{"id": "a", "submitted_at": "t"}, {"id": "b", "submitted_at": "t"}]
+
+    assert keyset.next_cursor(docs, 3) is None
+    assert decode_cursor(keyset.next_cursor(docs, 2)) == ("t", "b")
@@ -0,0 +1,82 @@
+"""
+Quality scoring tests (utils.quality_rules)
+
+Tests for:
+- Penalties and flags of score()
+- score_batch() returns exactly what score() returns per submission
+- Rules cache recompiles edited forms
+"""
+
+import random
+
+import pytest
+
+from utils.quality_rules import QualityRules, clear_quality_rules_cache, get_quality_rules
+
+FIELDS = [
+    {"name": "name", "type": "text", "validation": {"required": True}},
+    {"name": "age", "type": "number", "validation": {"required": True, "min_value": 0, "max_value": 120}},
+    {"name": "income", "type": "number", "validation": {"min_value": "1000"}},
+    {"name": "children", "type": "number", "validation": {"max_value": 0}},
+    {"name": "crops", "type": "checkbox", "validation": {"required": True}},
+    {"name": "notes", "type": "text", "validation": {}},
+    {"name": "bad_bound", "type": "number", "validation": {"min_value": "n/a", "max_value": float("nan")}},
+]
+
+# Answers as they arrive in JSON, plus the awkward ones
+VALUES = [
+    None, "", "text", "0", 0, 0.0, -1, 5, 121, 120.5, 999, 1000, 1e9,
+    True, False, [], ["maize"], {}, {"a": 1}, float("nan"), float("inf"), float("-inf"),
+]
+
+
+@pytest.fixture
+def rules():
+    return QualityRules(FIELDS)
+
+
+def test_score_penalties_and_flag_order(rules):
+    score, flags = rules.score({"age": -3, "income": 10, "children": 2, "crops": []})
+
+    assert flags == [
+        "missing_required:name", "below_min:age", "below_min:income",
+        "above_max:children", "missing_required:crops",
+    ]
+    assert score == 100 - 10 - 5 - 5 - 5 - 10
+
+
+def test_zero_and_false_are_answers(rules):
+    _, flags = rules.score({"name": "A", "age": 0, "crops": ["maize"], "children": False})
+
+    assert flags == []
+
+
+def test_score_never_negative():
+    fields = [{"name": f"q{i}", "validation": {"required": True}} for i in range(15)]
+
+    assert QualityRules(fields).score({}) == (0.0, [f"missing_required:q{i}" for i in range(15)])
+
+
+def test_batch_matches_single_scoring(rules):
+    rng = random.Random(7)
+    names = [field["name"] for field in FIELDS] + ["unknown"]
+    datas = [
+        {name: rng.choice(VALUES) for name in names if rng.random() < 0.8}
+        for _ in range(500)
+    ]
+
+    assert rules.score_batch(datas) == [rules.score(data) for data in datas]
+
+
+def test_batch_edge_cases(rules):
+    assert rules.score_batch([]) == []
+    assert QualityRules([]).score_batch([{}, {"a": 1}]) == [(100.0, []), (100.0, [])]
+
+
+def test_rules_cache_recompiles_edited_form():
+    clear_quality_rules_cache()
+    form = {"id": "form-1", "version": 1, "updated_at": "2026-01-01", "fields": FIELDS[:1]}
+    edited = dict(form, version=2, updated_at="2026-02-01", fields=FIELDS[:2])
+
+    assert get_quality_rules(form) is get_quality_rules(dict(form))
+    assert len(get_quality_rules(edited).rules) == 2
@@ -0,0 +1,208 @@
+"""
+Submission rollup tests (utils.rollups, utils.rollup_engine)
+
+Tests for:
+- plan_segments splits a range over daily, hourly and live sources
+- Incremental rollups equal a rebuild from scratch
+- Rollup reads equal live aggregation
+"""
+
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mongo_fakes import AsyncDatabase, sync_db
+from utils import rollup_engine
+from utils.rollup_engine import WATERMARK, rebuild_rollups, roll_up_new_submissions
+from utils.rollups import (
+    DAY, HOUR, ROLLUP_STATE, _DAILY, _HOURLY, _LIVE, day_floor, iso, plan_segments, submission_rollup
+)
+
+D0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def covered(source, since, until):
+    return (source, since, until)
+
+
+class TestPlanSegments:
+
+    def test_without_rollups_everything_is_live(self):
+        assert plan_segments(D0, D0 + 2 * DAY, []) == [(_LIVE, D0, D0 + 2 * DAY)]
+
+    def test_prefers_days_then_hours_then_live(self):
+        coverages = [covered(_DAILY, D0, D0 + 3 * DAY), covered(_HOURLY, D0, D0 + 3 * DAY + 5 * HOUR)]
+        start, end = D0 + 3 * HOUR + timedelta(minutes=15), D0 + 3 * DAY + 7 * HOUR + timedelta(minutes=30)
+
+        segments = plan_segments(start, end, coverages)
+
+        assert segments == [
+            (_LIVE, start, D0 + 4 * HOUR),
+            (_HOURLY, D0 + 4 * HOUR, D0 + DAY),
+            (_DAILY, D0 + DAY, D0 + 3 * DAY),
+            (_HOURLY, D0 + 3 * DAY, D0 + 3 * DAY + 5 * HOUR),
+            (_LIVE, D0 + 3 * DAY + 5 * HOUR, end),
+        ]
+
+    def test_partial_last_day_uses_hours(self):
+        coverages = [covered(_DAILY, D0, D0 + 10 * DAY), covered(_HOURLY, D0, D0 + 10 * DAY)]
+
+        segments = plan_segments(D0, D0 + DAY + 6 * HOUR, coverages)
+
+        assert segments == [(_DAILY, D0, D0 + DAY), (_HOURLY, D0 + DAY, D0 + DAY + 6 * HOUR)]
+
+    def test_live_before_coverage_starts(self):
+        coverages = [covered(_DAILY, D0 + 2 * DAY, D0 + 5 * DAY)]
+
+        segments = plan_segments(D0, D0 + 4 * DAY, coverages)
+
+        assert segments == [(_LIVE, D0, D0 + 2 * DAY), (_DAILY, D0 + 2 * DAY, D0 + 4 * DAY)]
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_segments_tile_the_range(self, seed):
+        rng = random.Random(seed)
+        hour = lambda n: D0 + n * HOUR
+        daily_from = hour(24 * rng.randrange(0, 4))
+        hourly_from = hour(rng.randrange(0, 96))
+        coverages = [
+            covered(_DAILY, daily_from, daily_from + DAY * rng.randrange(1, 5)),
+            covered(_HOURLY, hourly_from, hourly_from + HOUR * rng.randrange(1, 200)),
+        ]
+        start = hour(rng.randrange(0, 100)) + timedelta(minutes=rng.randrange(60))
+        end = start + timedelta(minutes=rng.randrange(1, 60 * 24 * 6))
+
+        segments = plan_segments(start, end, coverages)
+
+        assert segments[0][1] == start and segments[-1][2] == end
+        for (_, _, until), (_, since, _) in zip(segments, segments[1:]):
+            assert until == since
+        for source, since, until in segments:
+            assert since < until
+            if source is not _LIVE:
+                _, covered_from, covered_until = next(c for c in coverages if c[0] is source)
+                assert covered_from <= since and until <= covered_until
+                assert day_floor(since) == since if source is _DAILY else since.minute == 0
+
+
+# ============ Engine ============
+
+STATUSES = ["pending", "approved", "rejected", None]
+
+
+def seed_submissions(db, count=300, days=3, seed=1):
+    """
+    Submissions over `days` days ending yesterday, synced up to 10 hours
+    after they were submitted (so all of them before now)
+    """
+    rng = random.Random(seed)
+    yesterday = day_floor(datetime.now(timezone.utc)) - DAY
+    docs = []
+    for i in range(count):
+        submitted = yesterday - DAY * rng.randrange(1, days + 1) + timedelta(minutes=rng.randrange(24 * 60))
+        docs.append({
+            "id": f"sub-{i:04d}",
+            "org_id": rng.choice(["org-1", "org-2"]),
+            "project_id": rng.choice(["project-1", "project-2"]),
+            "form_id": rng.choice(["form-1", "form-2", "form-3"]),
+            "submitted_by": rng.choice(["user-1", "user-2", "user-3"]),
+            "submitted_at": iso(submitted),
+            "synced_at": iso(submitted + timedelta(minutes=rng.randrange(0, 600))),
+            "status": rng.choice(STATUSES),
+            "quality_score": rng.choice([None, 55.0, 80.5, 100.0]),
+            "gps_location": rng.choice([None, {"lat": 1.0, "lng": 2.0}]),
+            "has_media": rng.random() < 0.3,
+        })
+    db.submissions.insert_many(docs)
+    return yesterday - DAY * days, yesterday
+
+
+def rollup_rows(db):
+    """Rollup collections without bookkeeping fields, set fields sorted, quality defaults filled"""
+    rows = {}
+    for name in ("analytics_hourly", "analytics_daily", "analytics_team_daily"):
+        collection = []
+        for row in db[name].find({}, {"_id": 0, "updated_at": 0, "rebuilt_at": 0}):
+            row.setdefault("quality_sum", 0)
+            row.setdefault("quality_count", 0)
+            row["by_status"] = {k: v for k, v in row.get("by_status", {}).items() if v}
+            for field in ("form_ids", "user_ids"):
+                if field in row:
+                    row[field] = sorted(row[field], key=str)
+            collection.append(row)
+        rows[name] = sorted(collection, key=lambda r: json.dumps(r, sort_keys=True, default=str))
+    return rows
+
+
+def start_watermark(db, since):
+    db[ROLLUP_STATE].insert_one({"_id": WATERMARK, "synced_at": iso(since), "id": ""})
+
+
+def test_incremental_equals_rebuild():
+    db = sync_db()
+    since, until = seed_submissions(db)
+    start_watermark(db, since)
+
+    result = roll_up_new_submissions(db)
+    incremental = rollup_rows(db)
+    rebuild_rollups(db, since, until)
+
+    assert result["processed"] == 300
+    assert incremental["analytics_daily"]
+    assert incremental == rollup_rows(db)
+
+
+def test_incremental_in_small_batches(monkeypatch):
+    db = sync_db()
+    since, until = seed_submissions(db, count=120)
+    start_watermark(db, since)
+    monkeypatch.setattr(rollup_engine, "ROLLUP_BATCH_SIZE", 7)
+
+    roll_up_new_submissions(db, max_batches=5)
+    state = db[ROLLUP_STATE].find_one({"_id": WATERMARK})
+    assert state["id"]
+    roll_up_new_submissions(db)
+    incremental = rollup_rows(db)
+    rebuild_rollups(db, since, until)
+
+    assert incremental == rollup_rows(db)
+
+
+def test_rebuild_drops_deleted_and_applies_status_changes():
+    db = sync_db()
+    since, until = seed_submissions(db)
+    start_watermark(db, since)
+    roll_up_new_submissions(db)
+
+    db.submissions.delete_many({"form_id": "form-3"})
+    db.submissions.update_many({"status": "pending"}, {"$set": {"status": "approved"}})
+    rebuild_rollups(db, since, until)
+    rebuilt = rollup_rows(db)
+
+    fresh = sync_db()
+    fresh.submissions.insert_many(list(db.submissions.find({}, {"_id": 0})))
+    start_watermark(fresh, since)
+    roll_up_new_submissions(fresh)
+    assert rebuilt == rollup_rows(fresh)
+    assert all(row["form_id"] != "form-3" for row in rebuilt["analytics_hourly"])
+
+
+def test_rollup_reads_equal_live_aggregation():
+    db = sync_db()
+    since, until = seed_submissions(db)
+    start_watermark(db, since)
+    roll_up_new_submissions(db)
+    db[ROLLUP_STATE].update_many({"_id": {"$in": ["hourly", "daily"]}}, {"$set": {"rolled_from": iso(since)}})
+    live_db = sync_db()
+    live_db.submissions.insert_many(list(db.submissions.find({}, {"_id": 0})))
+
+    start, end = since + 5 * HOUR, until - 3 * HOUR
+
+    def read(database, **options):
+        return asyncio.run(submission_rollup(AsyncDatabase(database), "org-1", start, end, **options))
+
+    for options in ({}, {"bucket": None, "dimension": "form_id"}, {"dimension": "user_id"}, {"project_id": "project-1"}):
+        from_rollups, live = read(db, **options), read(live_db, **options)
+        assert from_rollups == live, options
@@ -0,0 +1,116 @@
+"""
+Stata/SPSS export tests (utils.statistical_export)
+
+Tests for:
+- .dta and .sav files read back with values, variable and value labels
+- Stata strings cut to the byte limit without splitting characters
+- Many chunks stream into one file: dates, missing values, codes found
+  only in later chunks and SPSS strings longer than 255 bytes
+"""
+
+import asyncio
+from datetime import date, datetime
+
+import pyreadstat
+import pytest
+
+from utils.statistical_export import (
+    STATA_MAX_STRING_LENGTH,
+    truncate_utf8,
+    write_dta,
+    write_sav,
+)
+
+WRITERS = [
+    (write_dta, ".dta", pyreadstat.read_dta),
+    (write_sav, ".sav", pyreadstat.read_sav),
+]
+
+
+@pytest.mark.parametrize("writer,extension,reader", WRITERS)
+def test_writes_labelled_file(tmp_path, export_form, export_submissions, as_chunks, writer, extension, reader):
+    path = str(tmp_path / f"export{extension}")
+
+    rows = asyncio.run(writer(as_chunks(export_submissions), export_form, path))
+    frame, meta = reader(path)
+
+    assert rows == 2
+    assert list(frame["id"]) == ["sub-1", "sub-2"]
+    assert list(frame["age"]) == [34.0, 41.0]
+    assert list(frame["crops"].fillna("")) == ["maize beans", ""]
+    assert frame["location_lat"][0] == pytest.approx(-6.8)
+    assert "intro" not in frame.columns
+    assert meta.column_names_to_labels["age"] == "Age"
+    assert meta.variable_value_labels["region"] == {1: "North", 2: "South"}
+    assert list(frame["region"]) == [1, 2]
+
+
+@pytest.mark.parametrize("writer,extension,reader", WRITERS)
+def test_empty_export_keeps_columns(tmp_path, export_form, as_chunks, writer, extension, reader):
+    path = str(tmp_path / f"empty{extension}")
+
+    rows = asyncio.run(writer(as_chunks([]), export_form, path))
+    frame, _ = reader(path)
+
+    assert rows == 0
+    assert "region" in frame.columns
+
+
+def test_stata_strings_cut_to_byte_limit(tmp_path, export_form, export_submissions, as_chunks):
+    # 3-byte characters: a character limit would leave 6135 bytes
+    export_submissions[0]["data"]["name"] = "€" * STATA_MAX_STRING_LENGTH
+    path = str(tmp_path / "long.dta")
+
+    asyncio.run(write_dta(as_chunks(export_submissions), export_form, path))
+    frame, _ = pyreadstat.read_dta(path)
+
+    name = frame["name"][0]
+    assert len(name.encode("utf-8")) <= STATA_MAX_STRING_LENGTH
+    assert name == "€" * (STATA_MAX_STRING_LENGTH // 3)
+
+
+def test_truncate_utf8_keeps_whole_characters():
+    assert truncate_utf8("abc", 10) == "abc"
+    assert truncate_utf8("aéb", 2) == "a"
+    assert truncate_utf8("aéb", 3) == "aé"
+
+
+@pytest.mark.parametrize("writer,extension,reader", WRITERS)
+def test_streams_many_chunks(tmp_path, export_form, export_submissions, as_chunks, writer, extension, reader):
+    submissions = []
+    for i in range(250):
+        submission = dict(export_submissions[i % 2], id=f"sub-{i}")
+        submission["data"] = dict(submission["data"], name="€" * (i % 5), age=i - 100)
+        submissions.append(submission)
+    submissions[-1]["data"]["region"] = "east"
+    path = str(tmp_path / f"many{extension}")
+
+    rows = asyncio.run(writer(as_chunks(submissions, size=17), export_form, path))
+    frame, meta = reader(path)
+
+    assert rows == len(frame) == 250
+    assert list(frame["id"]) == [f"sub-{i}" for i in range(250)]
+    assert list(frame["age"]) == [i - 100.0 for i in range(250)]
+    assert list(frame["name"].fillna("")) == ["€" * (i % 5) for i in range(250)]
+    assert frame["quality_score"].isna().sum() == 125
+    assert frame["visit_date"][0] == date(2026, 3, 1)
+    assert frame["visit_date"].isna().sum() == 125
+    assert frame["submitted_at"][1].to_pydatetime() == datetime(2026, 3, 2, 14, 0)
+    # A value first seen in the last chunk still gets its value label
+    assert frame["region"].iloc[-1] == 3
+    assert meta.variable_value_labels["region"][3] == "east"
+
+
+def test_spss_strings_longer_than_255_bytes(tmp_path, export_form, export_submissions, as_chunks):
+    names = ["a" * 255, "é" * 300, "x" * 1000 + "€"]
+    submissions = [
+        dict(export_submissions[0], id=f"sub-{i}", data=dict(export_submissions[0]["data"], name=name))
+        for i, name in enumerate(names)
+    ]
+    path = str(tmp_path / "long.sav")
+
+    asyncio.run(write_sav(as_chunks(submissions), export_form, path))
+    frame, _ = pyreadstat.read_sav(path)
+
+    assert list(frame["name"]) == names
+    assert list(frame["age"]) == [34.0] * 3
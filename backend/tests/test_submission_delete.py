@@ -0,0 +1,105 @@
+"""
+Submission deletion tests (DELETE /api/submissions/{id} handler)
+
+Tests for:
+- Deleting writes one tombstone and decrements the counters
+- Racing deletes of one submission leave a single tombstone
+- No tombstone when the delete fails or matches nothing
+- An existing tombstone for the submission is kept
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from mongo_fakes import submissions_db
+from routes import submission_routes
+
+ADMIN = {"user_id": "admin-1", "is_superadmin": True}
+SUBMISSION = {
+    "id": "sub-1",
+    "form_id": "form-1",
+    "org_id": "org-1",
+    "project_id": "project-1",
+    "status": "pending",
+    "submitted_at": "2026-01-01T00:00:00+00:00",
+}
+
+
+@pytest.fixture(autouse=True)
+def no_cache_invalidation(monkeypatch):
+    async def submissions_changed(docs):
+        pass
+    monkeypatch.setattr(submission_routes, "submissions_changed", submissions_changed)
+
+
+@pytest.fixture
+def db():
+    db = submissions_db()
+    db.sync.submissions.insert_one(dict(SUBMISSION))
+    return db
+
+
+def delete(db, submission_id="sub-1"):
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db)))
+    return submission_routes.delete_submission(request, submission_id, ADMIN)
+
+
+def test_delete_writes_tombstone(db):
+    asyncio.run(delete(db))
+
+    assert db.sync.submissions.count_documents({}) == 0
+    tombstone = db.sync.submission_tombstones.find_one({"id": "sub-1"}, {"_id": 0})
+    assert tombstone["form_id"] == "form-1"
+    assert tombstone["deleted_by"] == "admin-1"
+    counter = db.sync.counters.find_one({"_id": "project_submissions:project-1"})
+    assert counter["total"] == -1
+
+
+def test_racing_deletes_leave_one_tombstone(db):
+    # Both requests loaded the submission before either deleted it
+    async def find_one(query, projection=None):
+        return dict(SUBMISSION)
+    db.submissions.find_one = find_one
+
+    asyncio.run(delete(db))
+    asyncio.run(delete(db))
+
+    assert db.sync.submission_tombstones.count_documents({"id": "sub-1"}) == 1
+    counter = db.sync.counters.find_one({"_id": "project_submissions:project-1"})
+    assert counter["total"] == -1
+
+
+def test_failed_delete_leaves_no_tombstone(db):
+    async def failing_delete_one(query):
+        raise ConnectionError("primary stepped down")
+    db.submissions.delete_one = failing_delete_one
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(delete(db))
+
+    assert db.sync.submissions.count_documents({"id": "sub-1"}) == 1
+    assert db.sync.submission_tombstones.count_documents({}) == 0
+
+
+def test_delete_matching_nothing_leaves_no_tombstone(db):
+    async def find_one(query, projection=None):
+        return dict(SUBMISSION, id="sub-gone")
+    db.submissions.find_one = find_one
+
+    asyncio.run(delete(db, "sub-gone"))
+
+    assert db.sync.submission_tombstones.count_documents({}) == 0
+    assert db.sync.counters.count_documents({}) == 0
+
+
+def test_existing_tombstone_is_kept(db):
+    db.sync.submission_tombstones.insert_one({"id": "sub-1", "form_id": "form-1", "deleted_at": "2026-01-02"})
+
+    asyncio.run(delete(db))
+
+    assert db.sync.submissions.count_documents({}) == 0
+    assert [t["deleted_at"] for t in db.sync.submission_tombstones.find({"id": "sub-1"})] == ["2026-01-02"]
+    counter = db.sync.counters.find_one({"_id": "project_submissions:project-1"})
+    assert counter["total"] == -1
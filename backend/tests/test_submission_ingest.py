@@ -0,0 +1,189 @@
+"""
+Single-submission ingest tests (POST /api/submissions handler)
+
+Tests for:
+- Retried uploads return the stored submission (direct insert)
+- Losing a concurrent insert race returns the winner (direct insert)
+- Concurrent retries through the write-behind buffer
+- Keys are scoped by user: other accounts reusing device/client ids
+  neither see nor block the stored submission
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from models import SubmissionCreate
+from mongo_fakes import submissions_db
+from routes import submission_routes
+from utils import ingest_buffer
+from utils.ingest_buffer import IngestBuffer
+
+FORM = {
+    "id": "form-1",
+    "org_id": "org-1",
+    "project_id": "project-1",
+    "version": 1,
+    "status": "published",
+    "fields": [],
+}
+USER = {"user_id": "user-1"}
+OTHER_USER = {"user_id": "user-2"}
+
+
+@pytest.fixture(autouse=True)
+def form_access(monkeypatch):
+    async def check_form_access_cached(db, form_id, user_id, min_version=None):
+        return {"org_id": FORM["org_id"], "user_id": user_id}, FORM
+
+    async def submissions_changed(docs):
+        pass
+
+    monkeypatch.setattr(submission_routes, "check_form_access_cached", check_form_access_cached)
+    monkeypatch.setattr(submission_routes, "submissions_changed", submissions_changed)
+    monkeypatch.setattr(ingest_buffer, "submissions_changed", submissions_changed)
+    monkeypatch.setattr(submission_routes, "CELERY_AVAILABLE", False)
+
+
+def make_request(db, buffer=None):
+    state = SimpleNamespace(db=db)
+    if buffer is not None:
+        state.ingest_buffer = buffer
+    return SimpleNamespace(app=SimpleNamespace(state=state))
+
+
+def upload(client_submission_id="client-1", form_id="form-1", data=None):
+    return SubmissionCreate(
+        form_id=form_id,
+        form_version=1,
+        data=data or {"q1": "yes"},
+        device_id="device-1",
+        client_submission_id=client_submission_id,
+    )
+
+
+class TestDirectInsert:
+    """Default ingest mode: one insert per request"""
+
+    def test_retry_returns_stored_submission(self):
+        db = submissions_db()
+        request = make_request(db)
+
+        first = asyncio.run(submission_routes.create_submission(request, upload(), USER))
+        retry = asyncio.run(submission_routes.create_submission(request, upload(), USER))
+
+        assert retry.id == first.id
+        assert db.sync.submissions.count_documents({}) == 1
+
+    def test_lost_insert_race_returns_winner(self):
+        db = submissions_db()
+        request = make_request(db)
+        winner = asyncio.run(submission_routes.create_submission(request, upload(), USER))
+
+        # The concurrent retry checked for the key before the winner was stored
+        find_one = db.submissions.find_one
+        misses = [True]
+
+        async def racing_find_one(query, *args, **kwargs):
+            if misses:
+                misses.pop()
+                return None
+            return await find_one(query, *args, **kwargs)
+        db.submissions.find_one = racing_find_one
+
+        retry = asyncio.run(submission_routes.create_submission(request, upload(), USER))
+
+        assert retry.id == winner.id
+        assert db.sync.submissions.count_documents({}) == 1
+
+
+class TestBufferedInsert:
+    """SUBMISSION_INGEST_MODE=buffered"""
+
+    def test_concurrent_retries_return_one_submission(self):
+        db = submissions_db()
+
+        async def run():
+            buffer = IngestBuffer(db, flush_ms=20)
+            await buffer.start()
+            try:
+                request = make_request(db, buffer)
+                return await asyncio.gather(
+                    submission_routes.create_submission(request, upload(), USER),
+                    submission_routes.create_submission(request, upload(), USER),
+                )
+            finally:
+                await buffer.stop()
+
+        first, retry = asyncio.run(run())
+
+        assert first.id == retry.id
+        assert db.sync.submissions.count_documents({}) == 1
+
+
+class TestKeyScope:
+    """Two accounts sending the same device_id and client_submission_id"""
+
+    def test_direct_insert_keeps_users_apart(self):
+        db = submissions_db()
+        request = make_request(db)
+
+        mine = asyncio.run(submission_routes.create_submission(request, upload(data={"q1": "private"}), USER))
+        theirs = asyncio.run(submission_routes.create_submission(request, upload(data={"q1": "other"}), OTHER_USER))
+
+        assert theirs.id != mine.id
+        assert theirs.data == {"q1": "other"}
+        assert db.sync.submissions.count_documents({}) == 2
+
+    def test_buffered_insert_keeps_users_apart(self):
+        db = submissions_db()
+
+        async def run():
+            buffer = IngestBuffer(db, flush_ms=20)
+            await buffer.start()
+            try:
+                request = make_request(db, buffer)
+                return await asyncio.gather(
+                    submission_routes.create_submission(request, upload(), USER),
+                    submission_routes.create_submission(request, upload(), OTHER_USER),
+                )
+            finally:
+                await buffer.stop()
+
+        mine, theirs = asyncio.run(run())
+
+        assert mine.id != theirs.id
+        assert db.sync.submissions.count_documents({}) == 2
+
+    def test_key_reused_for_another_form_conflicts(self):
+        db = submissions_db()
+        request = make_request(db)
+        asyncio.run(submission_routes.create_submission(request, upload(data={"q1": "private"}), USER))
+
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(submission_routes.create_submission(request, upload(form_id="form-2"), USER))
+
+        assert raised.value.status_code == 409
+        assert "private" not in str(raised.value.detail)
+        assert db.sync.submissions.count_documents({}) == 1
+
+    def test_bulk_upload_keeps_users_apart(self):
+        db = submissions_db()
+        request = make_request(db)
+        mine = asyncio.run(submission_routes.create_submission(request, upload(), USER))
+
+        access = submission_routes.SubmissionAccess(db, OTHER_USER)
+        access.forms.update({"form-1": FORM, "form-2": dict(FORM, id="form-2")})
+        access.user_orgs.add(FORM["org_id"])
+        result = asyncio.run(submission_routes.ingest_submissions(
+            db, [(0, upload()), (1, upload("client-2")), (2, upload("client-2", form_id="form-2"))],
+            OTHER_USER, access, async_processing=False
+        ))
+
+        assert len(result["submission_ids"]) == 2
+        assert mine.id not in result["submission_ids"]
+        assert result["duplicates"] == []
+        # The same batch reusing its own key for another form is rejected
+        assert [error["index"] for error in result["errors"]] == [2]
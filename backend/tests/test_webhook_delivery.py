@@ -0,0 +1,76 @@
+"""
+Webhook delivery task tests (workers.notification_tasks)
+
+Tests for:
+- One POST per (submission, webhook) with a delivery id
+- Retries resend only the deliveries that failed
+"""
+
+import pytest
+from celery.exceptions import Retry
+
+from mongo_fakes import sync_db
+from workers import notification_tasks
+from workers.notification_tasks import deliver_submission_webhooks
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = sync_db()
+    db.submissions.insert_many([
+        {"id": "sub-1", "form_id": "form-1", "org_id": "org-1"},
+        {"id": "sub-2", "form_id": "form-1", "org_id": "org-1"},
+        {"id": "sub-3", "form_id": "form-2", "org_id": "org-2"},
+    ])
+    db.webhooks.insert_many([
+        {"id": "hook-ok", "org_id": "org-1", "url": "https://ok.example", "event": "submission.created", "enabled": True},
+        {"id": "hook-flaky", "org_id": "org-1", "url": "https://flaky.example", "event": "submission.created", "enabled": True},
+        {"id": "hook-off", "org_id": "org-1", "url": "https://off.example", "event": "submission.created", "enabled": False},
+    ])
+    monkeypatch.setattr(notification_tasks, "get_sync_db", lambda: db)
+    return db
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    """Fake endpoints: flaky.example answers 503 until `healthy` is set"""
+    calls = []
+    state = {"healthy": False}
+
+    async def post_webhooks(deliveries):
+        results = []
+        for delivery in deliveries:
+            calls.append(delivery["id"])
+            status = 503 if "flaky" in delivery["webhook"]["url"] and not state["healthy"] else 200
+            results.append({"id": delivery["id"], "status": status, "retry": status == 503})
+        return results
+
+    monkeypatch.setattr(notification_tasks, "post_webhooks", post_webhooks)
+    return calls, state
+
+
+def test_delivers_once_per_submission_and_webhook(db, posted):
+    calls, state = posted
+    state["healthy"] = True
+
+    result = deliver_submission_webhooks.run(["sub-1", "sub-2", "sub-3"])
+
+    assert sorted(calls) == ["sub-1:hook-flaky", "sub-1:hook-ok", "sub-2:hook-flaky", "sub-2:hook-ok"]
+    assert result["delivered"] == 4
+    assert db.webhook_deliveries.count_documents({"status": "delivered"}) == 4
+
+
+def test_retry_resends_only_failed_deliveries(db, posted):
+    calls, state = posted
+
+    with pytest.raises(Retry):
+        deliver_submission_webhooks.run(["sub-1"])
+    assert sorted(calls) == ["sub-1:hook-flaky", "sub-1:hook-ok"]
+
+    calls.clear()
+    state["healthy"] = True
+    result = deliver_submission_webhooks.run(["sub-1"])
+
+    assert calls == ["sub-1:hook-flaky"]
+    assert result["skipped"] == 1
+    assert db.webhook_deliveries.find_one({"_id": "sub-1:hook-flaky"})["attempts"] == 2
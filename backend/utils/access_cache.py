@@ -0,0 +1,148 @@
+"""
+DataPulse - Access Cache
+
+In-process cache of published form definitions and org memberships for
+the submission ingest path, so the common case needs no reads before
+the insert.
+
+Entries expire after a TTL. Forms are also version-checked: a
+submission for a newer form_version than the cached copy forces a
+reload. Routes that change forms or memberships invalidate the local
+entries immediately; other API processes pick the change up within the
+TTL, so keep FORM_CACHE_TTL / MEMBERSHIP_CACHE_TTL short.
+
+Cached documents are shared between requests and must not be mutated.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from middleware.prometheus_metrics import record_cache_lookup
+except ImportError:
+    def record_cache_lookup(cache: str, hit: bool):
+        pass
+
+
+FORM_CACHE_TTL = float(os.environ.get("FORM_CACHE_TTL", "60"))
+MEMBERSHIP_CACHE_TTL = float(os.environ.get("MEMBERSHIP_CACHE_TTL", "60"))
+ACCESS_CACHE_MAX_ENTRIES = int(os.environ.get("ACCESS_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, name: str, ttl: float, max_entries: int = ACCESS_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_forms = TTLCache("forms", FORM_CACHE_TTL)
+_memberships = TTLCache("memberships", MEMBERSHIP_CACHE_TTL)
+
+
+async def get_published_form(db, form_id: str, min_version: Optional[int] = None) -> Optional[dict]:
+    """
+    Form document, served from cache when published and fresh.
+
+    Args:
+        min_version: Version the caller expects (e.g. a submission's
+            form_version); a cached copy older than this is reloaded
+    """
+    form = _forms.get(form_id)
+    if form is not None and (min_version is None or form.get("version", 0) >= min_version):
+        record_cache_lookup("forms", True)
+        return form
+
+    record_cache_lookup("forms", False)
+    form = await db.forms.find_one({"id": form_id}, {"_id": 0})
+    # Only published forms accept submissions, so only those are worth caching
+    if form and form.get("status") == "published":
+        _forms.set(form_id, form)
+    else:
+        _forms.invalidate(form_id)
+    return form
+
+
+async def get_membership(db, org_id: str, user_id: str) -> Optional[dict]:
+    """Org membership of a user; only existing memberships are cached"""
+    key = (org_id, user_id)
+    membership = _memberships.get(key)
+    if membership is not None:
+        record_cache_lookup("memberships", True)
+        return membership
+
+    record_cache_lookup("memberships", False)
+    membership = await db.org_members.find_one({"org_id": org_id, "user_id": user_id}, {"_id": 0})
+    if membership:
+        _memberships.set(key, membership)
+    return membership
+
+
+async def check_form_access_cached(
+    db,
+    form_id: str,
+    user_id: str,
+    min_version: Optional[int] = None
+) -> Tuple[Optional[dict], Optional[dict]]:
+    """Cached equivalent of check_form_access: (membership, form)"""
+    form = await get_published_form(db, form_id, min_version)
+    if not form:
+        return None, None
+    membership = await get_membership(db, form["org_id"], user_id)
+    return membership, form
+
+
+def invalidate_form(form_id: str):
+    """Drop a form from this process's cache (call after changing it)"""
+    _forms.invalidate(form_id)
+
+
+def invalidate_membership(org_id: str, user_id: Optional[str] = None):
+    """Drop one membership, or all of an organization's memberships, from this process's cache"""
+    if user_id is not None:
+        _memberships.invalidate((org_id, user_id))
+    else:
+        _memberships.invalidate_where(lambda key: key[0] == org_id)
+
+
+def clear_access_cache():
+    _forms.clear()
+    _memberships.clear()
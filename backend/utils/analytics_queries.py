@@ -0,0 +1,398 @@
+"""
+DataPulse - Analytics Queries
+
+Query layer behind the analytics, report and dashboard widget endpoints.
+
+Counts, status breakdowns and quality averages come from the submission
+rollups (utils.rollups), so a period costs a handful of rollup rows plus
+live aggregation over the current partial hour. Distributions the
+rollups do not carry (quality score ranges, quality flags, GPS/media
+coverage) come from one $facet pass over the period's submissions.
+
+Endpoint results are cached in Redis per (org, query, params) for
+ANALYTICS_CACHE_TTL seconds; without Redis every request is computed.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.counters import FORM_SUBMISSIONS, ORG_SUBMISSIONS, PROJECT_SUBMISSIONS, get_breakdowns
+from utils.rollups import Bucket, day_floor, day_range, iso, parse_time, submission_rollup
+
+logger = logging.getLogger(__name__)
+
+try:
+    from config.production import CacheManager
+except ImportError:
+    CacheManager = None
+
+
+ANALYTICS_CACHE_TTL = int(os.environ.get("ANALYTICS_CACHE_TTL", "120"))
+
+# Start of "all_time" periods; queries move it up to the org's first submission (clamp_start)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_PERIOD_DAYS = {
+    "7_days": 7, "week": 7,
+    "14_days": 14,
+    "30_days": 30, "month": 30,
+    "90_days": 90, "quarter": 90,
+}
+
+GROUP_BY_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+}
+
+# Dimension -> collection holding its display names
+_DIMENSION_NAMES = {
+    "project_id": "projects",
+    "form_id": "forms",
+    "user_id": "users",
+}
+
+SCORE_RANGES = [("0-20", 20), ("21-40", 40), ("41-60", 60), ("61-80", 80), ("81-100", None)]
+
+# Quality flag type (utils.quality_rules) -> issue label, severity
+_FLAG_ISSUES = {
+    "missing_required": ("Missing required field", "high"),
+    "below_min": ("Value below minimum", "medium"),
+    "above_max": ("Value above maximum", "medium"),
+}
+
+
+# ============ Periods ============
+
+def get_date_range(period: str) -> Tuple[datetime, datetime]:
+    """Start and end of a named period (unknown names mean the last 30 days)"""
+    now = datetime.now(timezone.utc)
+
+    if period == "today":
+        return day_floor(now), now
+    if period == "yesterday":
+        start = day_floor(now - timedelta(days=1))
+        return start, start + timedelta(days=1)
+    if period == "this_month":
+        return day_floor(now.replace(day=1)), now
+    if period == "last_month":
+        end = day_floor(now.replace(day=1))
+        return day_floor((end - timedelta(days=1)).replace(day=1)), end
+    if period == "this_year":
+        return day_floor(now.replace(month=1, day=1)), now
+    if period == "all_time":
+        return EPOCH, now
+    return now - timedelta(days=_PERIOD_DAYS.get(period, 30)), now
+
+
+async def clamp_start(db, org_id: str, start: datetime, end: datetime) -> datetime:
+    """
+    Start of an open-ended (all_time) period moved up to the day of the
+    org's first submission, so series do not build empty buckets and
+    rollup reads do not fall back to live aggregation back to 1970.
+    """
+    if start > EPOCH:
+        return start
+    first = await db.submissions.find_one(
+        {"org_id": org_id}, {"_id": 0, "submitted_at": 1}, sort=[("submitted_at", 1)]
+    )
+    submitted_at = first.get("submitted_at") if first else None
+    if isinstance(submitted_at, str):
+        submitted_at = parse_time(submitted_at)
+    if not isinstance(submitted_at, datetime):
+        return day_floor(end)
+    if submitted_at.tzinfo is None:
+        submitted_at = submitted_at.replace(tzinfo=timezone.utc)
+    return min(day_floor(submitted_at), end)
+
+
+def previous_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """Period of the same length right before [start, end)"""
+    return start - (end - start), start
+
+
+def round_quality(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def percent_change(current: float, previous: float) -> float:
+    return round((current - previous) / max(previous, 1) * 100, 1)
+
+
+# ============ Rollup-backed queries ============
+
+async def period_totals(
+    db,
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+) -> Bucket:
+    """Submission count, status breakdown and quality sums over [start, end)"""
+    start = await clamp_start(db, org_id, start, end)
+    totals = await submission_rollup(db, org_id, start, end, bucket=None, project_id=project_id, form_id=form_id)
+    return totals.get((None, None), Bucket())
+
+
+async def submission_series(
+    db,
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    group_by: str = "day",
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Submissions per day, week or month of [start, end), including empty
+    buckets, with status counts and the average quality score.
+    """
+    date_format = GROUP_BY_FORMATS.get(group_by, GROUP_BY_FORMATS["day"])
+    start = await clamp_start(db, org_id, start, end)
+    days = await submission_rollup(db, org_id, start, end, project_id=project_id, form_id=form_id)
+
+    # Day buckets regrouped by week/month
+    series: Dict[str, Bucket] = {}
+    for day in day_range(start, end):
+        label = datetime.strptime(day, "%Y-%m-%d").strftime(date_format)
+        bucket = series.setdefault(label, Bucket())
+        if (day, None) in days:
+            day_bucket = days[(day, None)]
+            bucket.add(day_bucket["count"], day_bucket["by_status"], day_bucket["quality_sum"], day_bucket["quality_count"])
+
+    return [
+        {
+            "date": label,
+            "submissions": bucket["count"],
+            "approved": bucket["by_status"].get("approved", 0),
+            "rejected": bucket["by_status"].get("rejected", 0),
+            "pending": bucket["by_status"].get("pending", 0),
+            "quality_avg": round_quality(bucket.avg_quality)
+        }
+        for label, bucket in series.items()
+    ]
+
+
+async def ranked_by(
+    db,
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    dimension: str,
+    limit: Optional[int] = None,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+) -> List[Tuple[str, Bucket]]:
+    """(project, form or user id, bucket) pairs over [start, end), most submissions first"""
+    start = await clamp_start(db, org_id, start, end)
+    buckets = await submission_rollup(
+        db, org_id, start, end, bucket=None, dimension=dimension, project_id=project_id, form_id=form_id
+    )
+    ranked = sorted(
+        ((key[1], bucket) for key, bucket in buckets.items() if key[1] is not None),
+        key=lambda item: (-item[1]["count"], str(item[0]))
+    )
+    return ranked[:limit] if limit else ranked
+
+
+async def top_rows(lookup, dimension: str, ranked: List[Tuple[str, Bucket]]) -> List[Dict[str, Any]]:
+    """Response rows of ranked_by output, with names from a BatchLookup"""
+    docs = await lookup.fetch(_DIMENSION_NAMES[dimension], (key for key, _ in ranked), projection={"name": 1})
+    return [
+        {
+            dimension: key,
+            "name": docs.get(key, {}).get("name", "Unknown"),
+            "submissions": bucket["count"],
+            "quality_avg": round_quality(bucket.avg_quality)
+        }
+        for key, bucket in ranked
+    ]
+
+
+async def status_distribution(
+    db,
+    org_id: str,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+) -> Dict[str, int]:
+    """All-time submissions per status from the maintained counters"""
+    if form_id:
+        name, key = FORM_SUBMISSIONS, form_id
+    elif project_id:
+        name, key = PROJECT_SUBMISSIONS, project_id
+    else:
+        name, key = ORG_SUBMISSIONS, org_id
+    by_status = (await get_breakdowns(db, name, [key])).get(key, {})
+    return {status: count for status, count in by_status.items() if count > 0}
+
+
+# ============ Live distributions ============
+
+def _flag_types() -> dict:
+    """Flag type of every quality flag ("missing_required:name" -> "missing_required")"""
+    return {"$map": {
+        "input": {"$ifNull": ["$quality_flags", []]},
+        "as": "flag",
+        "in": {"$arrayElemAt": [{"$split": ["$$flag", ":"]}, 0]}
+    }}
+
+
+def _count_if(condition: Any) -> dict:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+
+def _count_unless(condition: Any) -> dict:
+    return {"$sum": {"$cond": [condition, 0, 1]}}
+
+
+def quality_breakdown_pipeline(match: Dict[str, Any], issues_limit: int = 10) -> List[dict]:
+    """One $facet pass: score ranges, most common flags and completeness/coverage counts"""
+    branches = [
+        {"case": {"$lte": ["$quality_score", upper]}, "then": label}
+        for label, upper in SCORE_RANGES if upper is not None
+    ]
+    return [
+        {"$match": match},
+        {"$project": {
+            "quality_score": 1,
+            "quality_flags": 1,
+            "flag_types": _flag_types(),
+            "has_gps": {"$ne": [{"$ifNull": ["$gps_location", None]}, None]},
+            "has_media": {"$eq": ["$has_media", True]},
+        }},
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "complete": _count_unless({"$in": ["missing_required", "$flag_types"]}),
+                "in_range": _count_unless({"$or": [
+                    {"$in": ["below_min", "$flag_types"]},
+                    {"$in": ["above_max", "$flag_types"]},
+                ]}),
+                "with_gps": _count_if("$has_gps"),
+                "with_media": _count_if("$has_media"),
+            }}],
+            "scores": [
+                {"$match": {"quality_score": {"$type": "number"}}},
+                {"$group": {
+                    "_id": {"$switch": {"branches": branches, "default": SCORE_RANGES[-1][0]}},
+                    "count": {"$sum": 1}
+                }},
+            ],
+            "flags": [
+                {"$unwind": "$quality_flags"},
+                {"$group": {"_id": "$quality_flags", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": issues_limit},
+            ],
+        }},
+    ]
+
+
+def _issue(flag: str, count: int) -> Dict[str, Any]:
+    flag_type, _, field = flag.partition(":")
+    label, severity = _FLAG_ISSUES.get(flag_type, (flag_type.replace("_", " ").capitalize(), "low"))
+    return {
+        "issue": f"{label}: {field}" if field else label,
+        "flag": flag,
+        "field": field or None,
+        "count": count,
+        "severity": severity
+    }
+
+
+def _recommendation(issue: Dict[str, Any]) -> str:
+    flag_type = issue["flag"].partition(":")[0]
+    if flag_type == "missing_required" and issue["field"]:
+        return f"Review why '{issue['field']}' is left empty ({issue['count']} submissions)"
+    if flag_type in ("below_min", "above_max") and issue["field"]:
+        return f"Check the allowed range of '{issue['field']}' ({issue['count']} out-of-range values)"
+    return f"Investigate '{issue['issue']}' ({issue['count']} submissions)"
+
+
+async def quality_breakdown(
+    db,
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None,
+    issues_limit: int = 5
+) -> Dict[str, Any]:
+    """
+    Score distribution, quality factors (share of submissions passing
+    each check), most common issues and recommendations over [start, end).
+    """
+    match = {"org_id": org_id, "submitted_at": {"$gte": iso(start), "$lt": iso(end)}}
+    if project_id:
+        match["project_id"] = project_id
+    if form_id:
+        match["form_id"] = form_id
+    rows = await db.submissions.aggregate(
+        quality_breakdown_pipeline(match, issues_limit), allowDiskUse=True
+    ).to_list(1)
+    facet = rows[0] if rows else {}
+
+    scores = {row["_id"]: row["count"] for row in facet.get("scores", [])}
+    scored = sum(scores.values())
+    score_distribution = [
+        {
+            "range": label,
+            "count": scores.get(label, 0),
+            "percentage": round(scores.get(label, 0) / scored * 100, 1) if scored else 0
+        }
+        for label, _ in SCORE_RANGES
+    ]
+
+    summary = facet["summary"][0] if facet.get("summary") else None
+    quality_factors = []
+    if summary:
+        total = summary["total"]
+        for factor, field in (
+            ("Completeness", "complete"),
+            ("Valid Ranges", "in_range"),
+            ("GPS Coverage", "with_gps"),
+            ("Media Attached", "with_media"),
+        ):
+            quality_factors.append({"factor": factor, "score": round(summary[field] / total * 100, 1)})
+
+    common_issues = [_issue(row["_id"], row["count"]) for row in facet.get("flags", [])]
+    return {
+        "submissions": summary["total"] if summary else 0,
+        "score_distribution": score_distribution,
+        "quality_factors": quality_factors,
+        "common_issues": common_issues,
+        "recommendations": [_recommendation(issue) for issue in common_issues[:3]]
+    }
+
+
+# ============ Cache ============
+
+async def cached_analytics(
+    name: str,
+    org_id: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int = ANALYTICS_CACHE_TTL
+) -> Any:
+    """
+    Result of compute(), cached in Redis under
+    fieldforce:analytics:<org_id>:<name>:<hash of params>.
+
+    The result must be JSON-serializable; cache errors fall back to
+    computing the result.
+    """
+    if CacheManager is None or ttl <= 0:
+        return await compute()
+
+    key = CacheManager._make_key(f"analytics:{org_id}:{name}", **params)
+    cached = await CacheManager.get_json(key)
+    if cached is not None:
+        return cached
+
+    result = await compute()
+    await CacheManager.set_json(key, result, ttl)
+    return result
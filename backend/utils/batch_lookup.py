@@ -0,0 +1,100 @@
+"""
+DataPulse - Batched Lookups
+
+Resolves referenced documents (users, forms, ...) for a list of rows
+with one $in query per collection instead of one find_one per row.
+
+A BatchLookup memoizes documents for the lifetime of a request, so
+several lookups against the same collection in one request never fetch
+the same document twice.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+
+
+class BatchLookup:
+    """
+    Per-request memoized batch loader.
+
+    Usage:
+        lookup = get_batch_lookup(request)
+        users = await lookup.fetch("users", (s["submitted_by"] for s in subs), projection={"name": 1})
+        name = users.get(user_id, {}).get("name", "Unknown")
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # (collection, key, projection) -> {key value: document or None if missing}
+        self._cache: Dict[Tuple[str, str, Tuple], Dict[Any, Optional[dict]]] = {}
+
+    async def fetch(
+        self,
+        collection: str,
+        ids: Iterable[Any],
+        key: str = "id",
+        projection: Optional[Dict[str, int]] = None
+    ) -> Dict[Any, dict]:
+        """
+        Documents of a collection whose `key` is in ids, keyed by that value.
+
+        Ids that are None, already fetched, or known to be missing cost no
+        query; everything else is fetched in a single $in query.
+        """
+        projection = dict(projection or {})
+        if projection:
+            projection[key] = 1
+        projection["_id"] = 0
+        cache = self._cache.setdefault((collection, key, tuple(sorted(projection.items()))), {})
+
+        wanted = {value for value in ids if value is not None}
+        missing = [value for value in wanted if value not in cache]
+        if missing:
+            docs = await self.db[collection].find(
+                {key: {"$in": missing}}, projection
+            ).to_list(len(missing))
+            for doc in docs:
+                cache[doc[key]] = doc
+            for value in missing:
+                cache.setdefault(value, None)
+
+        return {value: cache[value] for value in wanted if cache[value] is not None}
+
+    async def fetch_one(
+        self,
+        collection: str,
+        value: Any,
+        key: str = "id",
+        projection: Optional[Dict[str, int]] = None
+    ) -> Optional[dict]:
+        """Single memoized lookup (same cache as fetch)"""
+        docs = await self.fetch(collection, [value], key=key, projection=projection)
+        return docs.get(value)
+
+
+def get_batch_lookup(request: Request) -> BatchLookup:
+    """The request's BatchLookup (created on first use); also usable as a FastAPI dependency"""
+    lookup = getattr(request.state, "batch_lookup", None)
+    if lookup is None:
+        lookup = BatchLookup(request.app.state.db)
+        request.state.batch_lookup = lookup
+    return lookup
+
+
+async def lookup_by_ids(
+    db,
+    collection: str,
+    ids: Iterable[Any],
+    key: str = "id",
+    projection: Optional[Dict[str, int]] = None
+) -> Dict[Any, dict]:
+    """One-off batched lookup outside a request (e.g. in workers)"""
+    return await BatchLookup(db).fetch(collection, ids, key=key, projection=projection)
+
+
+def attach(rows: List[dict], docs: Dict[Any, dict], ref: str, field: str, attr: str, default: Any = None):
+    """Copy docs[row[ref]][attr] onto each row as row[field]"""
+    for row in rows:
+        doc = docs.get(row.get(ref))
+        row[field] = doc.get(attr, default) if doc else default
@@ -0,0 +1,76 @@
+"""
+DataPulse - Cache Invalidation Events
+
+Submission ingest, review and deletion change an org's dashboard
+numbers. The write paths report them here, which bumps each affected
+org's cache generation: results cached with
+config.production.cached(..., scope="org_id") go stale and are
+refreshed in the background on their next read, without scanning Redis
+for keys to delete.
+
+Bumps are coalesced per process: an org's generation is bumped at most
+once every CACHE_INVALIDATION_INTERVAL seconds, and changes inside that
+window are covered by one trailing bump at its end. An org that ingests
+continuously therefore still gets cache hits between bumps instead of a
+recompute on every dashboard read.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from config.production import CacheManager, scope_key
+except ImportError:
+    CacheManager = None
+
+
+CACHE_INVALIDATION_INTERVAL = float(os.environ.get("CACHE_INVALIDATION_INTERVAL", "30"))
+
+# org_id -> monotonic time of its last bump from this process
+_last_bump: Dict[str, float] = {}
+# org_id -> trailing bump waiting for the end of the interval
+_pending: Dict[str, asyncio.Task] = {}
+
+
+async def _bump(org_id: str):
+    _last_bump[org_id] = time.monotonic()
+    await CacheManager.bump_generation(scope_key("org_id", org_id))
+
+
+async def _trailing_bump(org_id: str, delay: float):
+    try:
+        await asyncio.sleep(delay)
+        await _bump(org_id)
+    except Exception as e:
+        logger.warning(f"Deferred cache invalidation failed for org {org_id}: {e}")
+    finally:
+        _pending.pop(org_id, None)
+
+
+def _forget_idle_orgs(now: float):
+    for org_id, bumped in list(_last_bump.items()):
+        if now - bumped >= CACHE_INVALIDATION_INTERVAL:
+            del _last_bump[org_id]
+
+
+async def submissions_changed(docs: Iterable[Optional[dict]]):
+    """Invalidate cached org results for submissions inserted, reviewed or deleted (docs need org_id)"""
+    if CacheManager is None:
+        return
+    org_ids = {doc.get("org_id") for doc in docs if doc} - {None}
+    now = time.monotonic()
+    for org_id in org_ids:
+        if org_id in _pending:
+            continue
+        wait = _last_bump.get(org_id, now - CACHE_INVALIDATION_INTERVAL) + CACHE_INVALIDATION_INTERVAL - now
+        if wait <= 0:
+            await _bump(org_id)
+        else:
+            _pending[org_id] = asyncio.create_task(_trailing_bump(org_id, wait))
+    if len(_last_bump) > 10000:
+        _forget_idle_orgs(now)
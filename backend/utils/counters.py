@@ -0,0 +1,298 @@
+"""
+DataPulse - Maintained Counters
+
+Per-scope document counts (submissions per form, project and org,
+quality alerts per org, notifications per user), broken down by status and kept
+up to date with $inc on every insert, status change and delete, so
+listings read one small counter document instead of running
+count_documents over large collections on every request.
+
+Counter documents live in the `counters` collection:
+    {"_id": "form_submissions:<form_id>", "name": ..., "key": ...,
+     "total": n, "by_status": {"pending": n, ...}, "seeded": true}
+
+A counter that has never been read is seeded from an exact count the
+first time it is needed; increments that land between that count and
+the seed write can be lost, which the daily reconcile_counters task
+corrects. Pass exact=True to bypass counters altogether.
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on documents scanned by a count that no counter can answer
+ESTIMATED_COUNT_LIMIT = int(os.environ.get("ESTIMATED_COUNT_LIMIT", "10000"))
+
+
+class CounterSpec(NamedTuple):
+    collection: str
+    key_field: str
+    status_field: str
+
+
+FORM_SUBMISSIONS = "form_submissions"
+PROJECT_SUBMISSIONS = "project_submissions"
+ORG_SUBMISSIONS = "org_submissions"
+ORG_QUALITY_ALERTS = "org_quality_alerts"
+USER_NOTIFICATIONS = "user_notifications"
+
+COUNTERS: Dict[str, CounterSpec] = {
+    FORM_SUBMISSIONS: CounterSpec("submissions", "form_id", "status"),
+    PROJECT_SUBMISSIONS: CounterSpec("submissions", "project_id", "status"),
+    ORG_SUBMISSIONS: CounterSpec("submissions", "org_id", "status"),
+    ORG_QUALITY_ALERTS: CounterSpec("quality_alerts", "org_id", "status"),
+    USER_NOTIFICATIONS: CounterSpec("notifications", "user_id", "read"),
+}
+
+
+# Projection with every field submission counters read (key fields + status)
+SUBMISSION_COUNTER_FIELDS = {"_id": 0, "form_id": 1, "project_id": 1, "org_id": 1, "status": 1}
+
+
+def status_key(value: Any) -> str:
+    """Counter field name for a status value (True/False for notifications' read flag)"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "none"
+    if isinstance(value, Enum):
+        value = value.value
+    return str(value).replace(".", "_").lstrip("$")
+
+
+def _counter_id(name: str, key: Any) -> str:
+    return f"{name}:{key}"
+
+
+def _counters_for(collection: str) -> List[Tuple[str, CounterSpec]]:
+    return [(name, spec) for name, spec in COUNTERS.items() if spec.collection == collection]
+
+
+def _increments(changes: Dict[Tuple[str, Any, str], int]) -> List[UpdateOne]:
+    now = datetime.now(timezone.utc)
+    per_counter: Dict[Tuple[str, Any], Dict[str, int]] = {}
+    for (name, key, status), delta in changes.items():
+        if not delta:
+            continue
+        inc = per_counter.setdefault((name, key), {})
+        inc[f"by_status.{status}"] = inc.get(f"by_status.{status}", 0) + delta
+    updates = []
+    for (name, key), inc in per_counter.items():
+        total = sum(inc.values())
+        if total:
+            inc["total"] = total
+        updates.append(UpdateOne(
+            {"_id": _counter_id(name, key)},
+            {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": {"name": name, "key": key}},
+            upsert=True
+        ))
+    return updates
+
+
+def counter_updates(collection: str, docs: Iterable[dict], delta: int) -> List[UpdateOne]:
+    """
+    Counter increments for documents inserted (delta=1) into or deleted
+    (delta=-1) from a collection. Docs need the key and status fields.
+    """
+    specs = _counters_for(collection)
+    changes: Dict[Tuple[str, Any, str], int] = {}
+    for doc in docs:
+        for name, spec in specs:
+            key = doc.get(spec.key_field)
+            if key is None:
+                continue
+            change = (name, key, status_key(doc.get(spec.status_field)))
+            changes[change] = changes.get(change, 0) + delta
+    return _increments(changes)
+
+
+def status_change_updates(collection: str, before: Optional[dict], new_status: Any, count: int = 1) -> List[UpdateOne]:
+    """
+    Counter moves for `count` documents sharing `before`'s key fields going
+    from before's status to new_status (nothing if before is None).
+    """
+    if before is None or count <= 0:
+        return []
+    changes: Dict[Tuple[str, Any, str], int] = {}
+    for name, spec in _counters_for(collection):
+        key = before.get(spec.key_field)
+        old, new = status_key(before.get(spec.status_field)), status_key(new_status)
+        if key is None or old == new:
+            continue
+        changes[(name, key, old)] = changes.get((name, key, old), 0) - count
+        changes[(name, key, new)] = changes.get((name, key, new), 0) + count
+    return _increments(changes)
+
+
+async def apply_counter_updates(db, updates: List[UpdateOne]):
+    """Apply counter updates; never fails the write they describe"""
+    if not updates:
+        return
+    try:
+        await db.counters.bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.warning(f"Counter update failed ({len(updates)} counters): {e}")
+
+
+def apply_counter_updates_sync(db, updates: List[UpdateOne]):
+    """apply_counter_updates for pymongo (Celery workers)"""
+    if not updates:
+        return
+    try:
+        db.counters.bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.warning(f"Counter update failed ({len(updates)} counters): {e}")
+
+
+def exact_count_pipeline(name: str, keys: Optional[List[Any]] = None) -> List[dict]:
+    """Aggregation over the counted collection grouping by (key, status)"""
+    spec = COUNTERS[name]
+    pipeline = []
+    if keys is not None:
+        pipeline.append({"$match": {spec.key_field: {"$in": list(keys)}}})
+    pipeline.append({"$group": {
+        "_id": {"key": f"${spec.key_field}", "status": f"${spec.status_field}"},
+        "count": {"$sum": 1}
+    }})
+    return pipeline
+
+
+def breakdowns(rows: Iterable[dict]) -> Dict[Any, Dict[str, int]]:
+    """{key: {status: count}} from exact_count_pipeline rows"""
+    result: Dict[Any, Dict[str, int]] = {}
+    for row in rows:
+        key = row["_id"].get("key")
+        if key is None:
+            continue
+        by_status = result.setdefault(key, {})
+        status = status_key(row["_id"].get("status"))
+        by_status[status] = by_status.get(status, 0) + row["count"]
+    return result
+
+
+def seed_document(name: str, key: Any, by_status: Dict[str, int]) -> dict:
+    return {
+        "name": name,
+        "key": key,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "seeded": True,
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+
+def reconcile_updates(name: str, exact_rows: Iterable[dict], existing_keys: Iterable[Any]) -> List[UpdateOne]:
+    """
+    Overwrite every counter of `name` with exact counts (rows of
+    exact_count_pipeline over the whole collection); counters whose key
+    no longer has documents are zeroed.
+    """
+    exact = breakdowns(exact_rows)
+    keys = list(exact) + [key for key in existing_keys if key not in exact]
+    return [
+        UpdateOne(
+            {"_id": _counter_id(name, key)},
+            {"$set": seed_document(name, key, exact.get(key, {}))},
+            upsert=True
+        )
+        for key in keys
+    ]
+
+
+def count_of(by_status: Dict[str, int], status: Any = None) -> int:
+    """Total (or one status's) count from a breakdown"""
+    value = sum(by_status.values()) if status is None else by_status.get(status_key(status), 0)
+    # Transient drift must never surface as a negative count
+    return max(0, value)
+
+
+async def _exact_breakdowns(db, name: str, keys: List[Any]) -> Dict[Any, Dict[str, int]]:
+    rows = await db[COUNTERS[name].collection].aggregate(exact_count_pipeline(name, keys)).to_list(None)
+    return breakdowns(rows)
+
+
+async def get_breakdowns(db, name: str, keys: List[Any], exact: bool = False) -> Dict[Any, Dict[str, int]]:
+    """
+    {key: {status: count}} for many keys of one counter in a single
+    round-trip. Keys without a seeded counter are counted exactly once
+    and seeded.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    if exact:
+        exact_counts = await _exact_breakdowns(db, name, keys)
+        return {key: exact_counts.get(key, {}) for key in keys}
+
+    result: Dict[Any, Dict[str, int]] = {}
+    docs = await db.counters.find(
+        {"_id": {"$in": [_counter_id(name, key) for key in keys]}, "seeded": True}
+    ).to_list(None)
+    for doc in docs:
+        result[doc["key"]] = doc.get("by_status") or {}
+
+    missing = [key for key in keys if key not in result]
+    if missing:
+        exact_counts = await _exact_breakdowns(db, name, missing)
+        for key in missing:
+            result[key] = exact_counts.get(key, {})
+            try:
+                await db.counters.update_one(
+                    {"_id": _counter_id(name, key), "seeded": {"$ne": True}},
+                    {"$set": seed_document(name, key, result[key])},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # seeded concurrently
+    return result
+
+
+async def get_counts(
+    db,
+    name: str,
+    keys: List[Any],
+    status: Any = None,
+    exact: bool = False
+) -> Dict[Any, int]:
+    """Document counts (optionally of one status) for many keys of one counter"""
+    return {
+        key: count_of(by_status, status)
+        for key, by_status in (await get_breakdowns(db, name, keys, exact=exact)).items()
+    }
+
+
+async def get_count(db, name: str, key: Any, status: Any = None, exact: bool = False) -> int:
+    counts = await get_counts(db, name, [key], status=status, exact=exact)
+    return counts.get(key, 0)
+
+
+async def reset_counter(db, name: str, key: Any):
+    """Zero a counter after every counted document of the key was deleted"""
+    try:
+        await db.counters.update_one(
+            {"_id": _counter_id(name, key)},
+            {"$set": seed_document(name, key, {})},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"Counter reset failed for {name}:{key}: {e}")
+
+
+async def bounded_count(collection, query: dict, estimated: bool = True) -> Tuple[int, bool]:
+    """
+    count_documents for filters no counter covers. In estimated mode the
+    scan stops at ESTIMATED_COUNT_LIMIT; returns (count, is_estimate).
+    """
+    if not estimated:
+        return await collection.count_documents(query), False
+    count = await collection.count_documents(query, limit=ESTIMATED_COUNT_LIMIT)
+    return count, count >= ESTIMATED_COUNT_LIMIT
@@ -0,0 +1,142 @@
+"""
+DataPulse - Dashboard Metric Pipelines
+
+Aggregation pipelines behind the dashboard quality and enumerator
+endpoints. MongoDB computes the averages and counts; the API only
+reads one small result document (or one row per enumerator) instead of
+every matching submission.
+
+The previous Python implementations returned flags and tied enumerators
+in the order they were first seen while scanning the submissions, so
+the pipelines collect that order as well ($mergeObjects keeps the first
+position of a repeated key) and the JSON stays identical.
+"""
+
+from typing import Any, Dict, List
+
+EMPTY_QUALITY_METRICS = {
+    "avg_quality_score": 0,
+    "flagged_count": 0,
+    "approved_count": 0,
+    "rejected_count": 0,
+    "total_count": 0,
+    "flag_distribution": {}
+}
+
+
+def _status_count(value: str) -> dict:
+    return {"$sum": {"$cond": [{"$eq": ["$status", value]}, 1, 0]}}
+
+
+def _first_seen(pairs: Any) -> dict:
+    """$group accumulator: one key per distinct value, in the order the values were first seen"""
+    return {"$mergeObjects": {"$arrayToObject": pairs}}
+
+
+def quality_metrics_pipeline(query: Dict[str, Any]) -> List[dict]:
+    """One $facet pass: totals and per-flag counts of the matching submissions"""
+    return [
+        {"$match": query},
+        {"$project": {"_id": 0, "quality_score": 1, "quality_flags": 1, "status": 1}},
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": None,
+                "total_count": {"$sum": 1},
+                # $avg skips missing and null scores
+                "avg_quality_score": {"$avg": "$quality_score"},
+                "flagged_count": {"$sum": {"$cond": [
+                    {"$gt": [{"$size": {"$ifNull": ["$quality_flags", []]}}, 0]}, 1, 0
+                ]}},
+                "approved_count": _status_count("approved"),
+                "rejected_count": _status_count("rejected"),
+            }}],
+            "flags": [
+                {"$unwind": "$quality_flags"},
+                {"$group": {"_id": "$quality_flags", "count": {"$sum": 1}}},
+            ],
+            "flag_order": [
+                {"$match": {"quality_flags.0": {"$exists": True}}},
+                {"$group": {"_id": None, "flags": _first_seen(
+                    {"$map": {"input": "$quality_flags", "in": {"k": "$$this", "v": True}}}
+                )}},
+            ],
+        }},
+    ]
+
+
+def quality_metrics_result(rows: List[dict]) -> Dict[str, Any]:
+    """Endpoint response from quality_metrics_pipeline output"""
+    facet = rows[0] if rows else {}
+    if not facet.get("summary"):
+        return dict(EMPTY_QUALITY_METRICS, flag_distribution={})
+    summary = facet["summary"][0]
+    counts = {row["_id"]: row["count"] for row in facet["flags"]}
+    order = facet["flag_order"][0]["flags"] if facet["flag_order"] else {}
+    return {
+        "avg_quality_score": round(summary["avg_quality_score"] or 0, 2),
+        "flagged_count": summary["flagged_count"],
+        "approved_count": summary["approved_count"],
+        "rejected_count": summary["rejected_count"],
+        "total_count": summary["total_count"],
+        "flag_distribution": {flag: counts[flag] for flag in order}
+    }
+
+
+def enumerator_performance_pipeline(query: Dict[str, Any]) -> List[dict]:
+    """Per-enumerator counts and average quality, plus the order enumerators were first seen in"""
+    return [
+        {"$match": query},
+        {"$project": {"_id": 0, "submitted_by": 1, "quality_score": 1, "status": 1}},
+        {"$facet": {
+            "enumerators": [{"$group": {
+                "_id": "$submitted_by",
+                "submission_count": {"$sum": 1},
+                "avg_quality_score": {"$avg": "$quality_score"},
+                "approved_count": _status_count("approved"),
+                "rejected_count": _status_count("rejected"),
+            }}],
+            "order": [
+                {"$match": {"submitted_by": {"$type": "string"}}},
+                # {"k": submitted_by, "v": true}
+                {"$group": {"_id": None, "ids": _first_seen({"$map": {
+                    "input": {"$objectToArray": {"id": "$submitted_by"}},
+                    "in": {"k": "$$this.v", "v": True}
+                }})}},
+            ],
+        }},
+    ]
+
+
+def enumerator_rows(rows: List[dict]) -> List[dict]:
+    """
+    Per-enumerator rows from enumerator_performance_pipeline output, most
+    submissions first (ties in the order the enumerators were first seen)
+    """
+    facet = rows[0] if rows else {}
+    if not facet.get("enumerators"):
+        return []
+    order = facet["order"][0]["ids"] if facet["order"] else {}
+    position = {user_id: i for i, user_id in enumerate(order)}
+    return sorted(
+        facet["enumerators"],
+        key=lambda row: (-row["submission_count"], position.get(row["_id"], len(position)))
+    )
+
+
+def enumerator_performance_rows(rows: List[dict], users: Dict[Any, dict]) -> List[Dict[str, Any]]:
+    """Endpoint rows from enumerator_performance_pipeline output and user docs"""
+    result = []
+    for row in rows:
+        user = users.get(row["_id"])
+        count = row["submission_count"]
+        result.append({
+            "user_id": row["_id"],
+            "name": user["name"] if user else "Unknown",
+            "email": user["email"] if user else "",
+            "submission_count": count,
+            "avg_quality_score": round(row["avg_quality_score"] or 0, 2),
+            "approved_count": row["approved_count"],
+            "rejected_count": row["rejected_count"],
+            "approval_rate": round(row["approved_count"] / count * 100, 1) if count > 0 else 0
+        })
+    return result
@@ -0,0 +1,666 @@
+"""
+DataPulse - Export Builder
+
+Builds export artifacts (files) for background export jobs, using the
+same row builders and format writers as the synchronous /exports
+endpoints.
+"""
+
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from utils.columnar_export import ArrowBatchBuilder, arrow_stream, write_parquet
+from utils.export_storage import save_artifact
+from utils.row_projector import DATE, DATETIME, MULTI_CHOICE, NUMBER, get_row_projector
+from utils.statistical_export import write_dta, write_sav
+from utils.job_manager import JobManager, JobStatus
+from utils.streaming_export import (
+    COMPRESSIONS,
+    ProgressTrackingExporter,
+    coerce_datetime,
+    compress_file,
+    cursor_chunks,
+    json_dumps,
+)
+from utils.xlsx_export import write_xlsx
+
+logger = logging.getLogger(__name__)
+
+
+# Supported artifact formats
+EXPORT_FORMATS = {
+    "csv": {"extension": ".csv", "media_type": "text/csv"},
+    "json": {"extension": ".json", "media_type": "application/json"},
+    "ndjson": {"extension": ".ndjson", "media_type": "application/x-ndjson"},
+    "xlsx": {
+        "extension": ".xlsx",
+        "media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    },
+    "parquet": {"extension": ".parquet", "media_type": "application/vnd.apache.parquet"},
+    "arrow": {"extension": ".arrows", "media_type": "application/vnd.apache.arrow.stream"},
+    "stata": {"extension": ".dta", "media_type": "application/x-stata-dta"},
+    "spss": {"extension": ".sav", "media_type": "application/x-spss-sav"},
+}
+
+
+def build_export_query(
+    form_id: str,
+    filters: Optional[Dict[str, Any]] = None,
+    since: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the submissions query for an export request.
+    
+    With a since watermark only submissions received or modified after it
+    are matched (delta export).
+    """
+    query = {"form_id": form_id}
+    query.update(filters or {})
+    if since:
+        delta = {"$or": [
+            {"submitted_at": {"$gt": since}},
+            {"last_modified_at": {"$gt": since}},
+            # Revision edits store last_modified_at as a BSON date
+            {"last_modified_at": {"$gt": coerce_datetime(since)}},
+        ]}
+        if "$or" in query:
+            query = {"$and": [query, delta]}
+        else:
+            query.update(delta)
+    return query
+
+
+def normalize_watermark(value: Any) -> Optional[str]:
+    """Normalize a timestamp (datetime or ISO string) to the UTC ISO format submissions are stored in"""
+    parsed = coerce_datetime(value)
+    return parsed.astimezone(timezone.utc).isoformat() if parsed else None
+
+
+def submission_watermark(sub: Dict) -> Optional[str]:
+    """Latest of a submission's submitted_at and last_modified_at"""
+    marks = [
+        mark for mark in (
+            normalize_watermark(sub.get("submitted_at")),
+            normalize_watermark(sub.get("last_modified_at"))
+        ) if mark
+    ]
+    return max(marks) if marks else None
+
+
+class ExportTracker:
+    """
+    Counts rows and tracks the high-water mark of the submissions passing
+    through an export, so both are known without a second pass.
+    """
+    
+    def __init__(self, since: Optional[str] = None):
+        self.row_count = 0
+        # A delta export with no new rows keeps the previous watermark
+        self.high_water_mark = since
+    
+    def observe(self, chunk: List[Dict]):
+        self.row_count += len(chunk)
+        for sub in chunk:
+            mark = submission_watermark(sub)
+            if mark and (self.high_water_mark is None or mark > self.high_water_mark):
+                self.high_water_mark = mark
+    
+    async def track(self, chunks: AsyncGenerator[List[Dict], None]) -> AsyncGenerator[List[Dict], None]:
+        async for chunk in chunks:
+            self.observe(chunk)
+            yield chunk
+
+
+async def resolve_since(db, form: dict, export_format: str, since: Optional[str]) -> Optional[str]:
+    """
+    Resolve an ExportRequest.since value to a timestamp watermark.
+    
+    Accepts an ISO timestamp, an export job id (continue from that export),
+    or "last" (continue from the latest completed export of this form and
+    format; a full export if there is none).
+    
+    Raises:
+        ValueError: if since is neither a timestamp nor a usable export id
+    """
+    return await resolve_job_since(db, {"form_id": form["id"]}, export_format, since)
+
+
+async def resolve_job_since(db, job_query: Dict[str, Any], export_format: str, since: Optional[str]) -> Optional[str]:
+    """resolve_since for the export jobs matching job_query (a form, or a project/org batch scope)"""
+    if not since:
+        return None
+    
+    if since == "last":
+        previous = await db.export_jobs.find(
+            {
+                **job_query,
+                "format": export_format,
+                "status": "completed",
+                "high_water_mark": {"$ne": None}
+            },
+            {"_id": 0, "high_water_mark": 1}
+        ).sort("completed_at", -1).limit(1).to_list(1)
+        return previous[0]["high_water_mark"] if previous else None
+    
+    watermark = normalize_watermark(since)
+    if watermark:
+        return watermark
+    
+    previous = await db.export_jobs.find_one(
+        {"id": since, **job_query},
+        {"_id": 0, "status": 1, "high_water_mark": 1}
+    )
+    if not previous or previous.get("status") != "completed" or not previous.get("high_water_mark"):
+        raise ValueError(f"Unknown or incomplete export: {since}")
+    return previous["high_water_mark"]
+
+
+async def deleted_submission_ids(db, form_id: str, since: Optional[str]) -> List[str]:
+    """Tombstones: ids of a form's submissions deleted after the watermark"""
+    query = {"form_id": form_id}
+    if since:
+        query["deleted_at"] = {"$gt": since}
+    tombstones = await db.submission_tombstones.find(
+        query, {"_id": 0, "id": 1}
+    ).to_list(None)
+    return [t["id"] for t in tombstones]
+
+
+async def latest_submission_watermark(db, query: Dict[str, Any]) -> Optional[str]:
+    """Return submitted_at of the newest submission matching the query (uses the form_id/submitted_at index)"""
+    latest = await db.submissions.find(
+        query, {"_id": 0, "submitted_at": 1}
+    ).sort("submitted_at", -1).limit(1).to_list(1)
+    if not latest:
+        return None
+    value = latest[0].get("submitted_at")
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_cache_key(
+    form_id: str,
+    filters: Dict[str, Any],
+    export_format: str,
+    form_version: Optional[int],
+    watermark: Optional[str],
+    since: Optional[str] = None,
+    compression: Optional[str] = None
+) -> str:
+    """Cache key identifying an export artifact; identical keys can share one artifact"""
+    key_data = json.dumps({
+        "form_id": form_id,
+        "filters": filters,
+        "format": export_format,
+        "form_version": form_version,
+        "watermark": watermark,
+        "since": since,
+        "compression": compression,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+
+# =============================================================================
+# ROW BUILDERS
+# =============================================================================
+
+def _csv_number(value: float):
+    return int(value) if value.is_integer() else value
+
+
+# Projected column kind -> CSV cell renderer (text passes through)
+CSV_RENDERERS = {
+    NUMBER: _csv_number,
+    DATE: lambda value: value.isoformat(),
+    DATETIME: lambda value: value.isoformat(),
+    MULTI_CHOICE: lambda values: " ".join(values),
+}
+
+
+def csv_columns(form: dict) -> List[str]:
+    """CSV header for a form's export"""
+    return list(get_row_projector(form).names)
+
+
+def csv_rows(form: dict, submissions: List[Dict]) -> List[List]:
+    """Convert a chunk of submissions into CSV rows aligned with csv_columns()"""
+    projector = get_row_projector(form)
+    renderers = [CSV_RENDERERS.get(column.kind) for column in projector.columns]
+    rows = []
+    for values in projector.project_rows(submissions):
+        rows.append([
+            "" if value is None else (render(value) if render else value)
+            for value, render in zip(values, renderers)
+        ])
+    return rows
+
+
+# =============================================================================
+# FILE WRITERS
+# =============================================================================
+
+async def _write_csv(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    loop = asyncio.get_event_loop()
+    row_count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_columns(form))
+        async for chunk in chunks:
+            await loop.run_in_executor(None, writer.writerows, csv_rows(form, chunk))
+            row_count += len(chunk)
+    return row_count
+
+
+async def _write_json(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    row_count = 0
+    with open(path, "wb") as f:
+        f.write(b"[")
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            body = b",\n".join(json_dumps(sub) for sub in chunk)
+            f.write(body if not row_count else b",\n" + body)
+            row_count += len(chunk)
+        f.write(b"]\n")
+    return row_count
+
+
+async def _write_ndjson(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    row_count = 0
+    with open(path, "wb") as f:
+        async for chunk in chunks:
+            f.write(b"".join(json_dumps(sub) + b"\n" for sub in chunk))
+            row_count += len(chunk)
+    return row_count
+
+
+async def _write_xlsx(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    return await write_xlsx(chunks, form, path)
+
+
+async def _write_parquet(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    return await write_parquet(chunks, ArrowBatchBuilder(form), path)
+
+
+async def _write_arrow(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    row_count = 0
+
+    async def counted():
+        nonlocal row_count
+        async for chunk in chunks:
+            row_count += len(chunk)
+            yield chunk
+
+    with open(path, "wb") as f:
+        async for payload in arrow_stream(counted(), ArrowBatchBuilder(form)):
+            f.write(payload)
+    return row_count
+
+
+FORMAT_WRITERS = {
+    "csv": _write_csv,
+    "json": _write_json,
+    "ndjson": _write_ndjson,
+    "xlsx": _write_xlsx,
+    "parquet": _write_parquet,
+    "arrow": _write_arrow,
+    "stata": write_dta,
+    "spss": write_sav,
+}
+
+
+def artifact_format(export_format: str, compression: Optional[str] = None) -> Dict[str, str]:
+    """File extension and media type of an export artifact, accounting for compression"""
+    fmt = EXPORT_FORMATS[export_format]
+    if not compression:
+        return fmt
+    return {
+        "extension": fmt["extension"] + COMPRESSIONS[compression]["extension"],
+        "media_type": COMPRESSIONS[compression]["media_type"],
+    }
+
+
+def job_artifact_format(job: dict) -> Dict[str, str]:
+    """File extension and media type of a stored export job artifact"""
+    if job.get("scope", "form") != "form":
+        return {"extension": ".zip", "media_type": "application/zip"}
+    return artifact_format(job["format"], job.get("compression"))
+
+
+async def write_export_file(
+    chunks: AsyncGenerator[List[Dict], None],
+    form: dict,
+    export_format: str,
+    path: str
+) -> int:
+    """
+    Write submission chunks to a file in the given format.
+
+    Returns:
+        Number of rows written
+    """
+    writer = FORMAT_WRITERS.get(export_format)
+    if writer is None:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return await writer(chunks, form, path)
+
+
+# =============================================================================
+# BACKGROUND JOB RUNNER
+# =============================================================================
+
+# ExportJob status -> JobManager status
+EXPORT_JOB_STATUSES = {
+    "processing": JobStatus.RUNNING,
+    "completed": JobStatus.COMPLETED,
+    "failed": JobStatus.FAILED,
+}
+
+
+def _job_updater(db, export_id: str, manager: Optional[JobManager]):
+    """Update function writing job state to the JobManager (live polling) and export_jobs"""
+    async def update(status: Optional[str] = None, progress: Optional[int] = None,
+                     message: Optional[str] = None, result: Any = None, error: Optional[str] = None,
+                     **fields):
+        if manager:
+            await manager.update_job(
+                export_id,
+                status=EXPORT_JOB_STATUSES.get(status),
+                progress=progress,
+                message=message,
+                result=result,
+                error=error
+            )
+        updates = dict(fields)
+        if status:
+            updates["status"] = status
+        if progress is not None:
+            updates["progress"] = progress
+        if error:
+            updates["error"] = error
+        if updates:
+            await db.export_jobs.update_one({"id": export_id}, {"$set": updates})
+    return update
+
+
+async def run_export_job(db, export_id: str, manager: Optional[JobManager] = None) -> dict:
+    """
+    Build the artifact for an export job and record the result.
+
+    Progress is reported through the JobManager (for live polling) and
+    mirrored onto the export_jobs document. Safe to call again for a job
+    that already completed (e.g. on a Celery retry).
+    """
+    job = await db.export_jobs.find_one({"id": export_id}, {"_id": 0})
+    if not job:
+        return {"status": "error", "message": "Export job not found"}
+
+    if job["status"] == "completed":
+        return {"status": "completed", "export_id": export_id, "download_url": job.get("file_url")}
+
+    if job.get("scope", "form") != "form":
+        return await run_batch_export_job(db, job, manager)
+
+    update = _job_updater(db, export_id, manager)
+
+    form = await db.forms.find_one({"id": job["form_id"]}, {"_id": 0})
+    if not form:
+        await update(status="failed", error="Form not found")
+        return {"status": "error", "message": "Form not found"}
+
+    fmt = artifact_format(job["format"], job.get("compression"))
+    query = build_export_query(job["form_id"], job.get("filters"), job.get("since"))
+
+    await update(status="processing", message="Counting submissions...")
+
+    total = await db.submissions.count_documents(query)
+
+    async def progress_callback(progress: int, message: str):
+        await update(progress=progress, message=message)
+
+    progress = ProgressTrackingExporter(max(total, 1), progress_callback)
+    tracker = ExportTracker(job.get("since"))
+
+    async def tracked_chunks():
+        async for chunk in tracker.track(cursor_chunks(db.submissions.find(query, {"_id": 0}))):
+            yield await progress.export_chunk(chunk)
+
+    tmp = tempfile.NamedTemporaryFile(suffix=fmt["extension"], delete=False)
+    tmp.close()
+    artifact_path = tmp.name
+    try:
+        row_count = await write_export_file(tracked_chunks(), form, job["format"], tmp.name)
+        if job.get("compression"):
+            artifact_path = f"{tmp.name}.{job['compression']}"
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, compress_file, tmp.name, artifact_path, job["compression"])
+            os.unlink(tmp.name)
+        file_size = os.path.getsize(artifact_path)
+        artifact = await save_artifact(
+            artifact_path,
+            form["org_id"],
+            f"{export_id}{fmt['extension']}",
+            fmt["media_type"]
+        )
+    except Exception as e:
+        for path in {tmp.name, artifact_path}:
+            if os.path.exists(path):
+                os.unlink(path)
+        logger.error(f"Export {export_id} failed: {e}")
+        await update(
+            status="failed",
+            message=f"Failed: {e}",
+            error=str(e),
+            completed_at=datetime.now(timezone.utc).isoformat()
+        )
+        raise
+
+    download_url = f"/api/exports/{export_id}/download"
+    result = {
+        "status": "completed",
+        "export_id": export_id,
+        "row_count": row_count,
+        "download_url": download_url,
+    }
+    await update(
+        status="completed",
+        progress=100,
+        message="Completed successfully",
+        result=result,
+        row_count=row_count,
+        high_water_mark=tracker.high_water_mark,
+        file_size=file_size,
+        file_url=download_url,
+        completed_at=datetime.now(timezone.utc).isoformat(),
+        **artifact
+    )
+    return result
+
+
+# =============================================================================
+# BATCH (PROJECT / ORGANIZATION) EXPORTS
+# =============================================================================
+
+BATCH_EXPORT_CONCURRENCY = int(os.environ.get("BATCH_EXPORT_CONCURRENCY", "4"))
+
+# Formats that are already compressed are stored in the archive as-is
+STORED_FORMATS = {"xlsx", "parquet"}
+ARCHIVE_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def archive_entry_names(forms: List[Dict], extension: str) -> Dict[str, str]:
+    """Unique archive entry name per form id, derived from the form name"""
+    names, taken = {}, set()
+    for form in forms:
+        base = "".join(c if c.isalnum() or c in "-_" else "_" for c in form.get("name", "")) or form["id"]
+        name, suffix = f"{base}{extension}", 1
+        while name.lower() in taken:
+            suffix += 1
+            name = f"{base}_{suffix}{extension}"
+        taken.add(name.lower())
+        names[form["id"]] = name
+    return names
+
+
+def _copy_into_archive(archive: zipfile.ZipFile, src: str, name: str, compress_type: int) -> Dict[str, Any]:
+    """Stream a finished file into an archive entry, returning its size and checksum"""
+    info = zipfile.ZipInfo(name, date_time=datetime.now(timezone.utc).timetuple()[:6])
+    info.compress_type = compress_type
+    digest = hashlib.sha256()
+    size = 0
+    with open(src, "rb") as fin, archive.open(info, "w", force_zip64=True) as fout:
+        while True:
+            data = fin.read(ARCHIVE_COPY_CHUNK_SIZE)
+            if not data:
+                break
+            digest.update(data)
+            fout.write(data)
+            size += len(data)
+    return {"bytes": size, "sha256": digest.hexdigest()}
+
+
+async def run_batch_export_job(db, job: dict, manager: Optional[JobManager] = None) -> dict:
+    """
+    Export every form of a project/organization export job into one ZIP.
+
+    Forms are exported concurrently (at most BATCH_EXPORT_CONCURRENCY at a
+    time), each to a temp file in the job's format that is then streamed
+    into its own archive entry. A manifest.json with per-form row counts,
+    sizes and SHA-256 checksums is written last.
+    """
+    export_id = job["id"]
+    update = _job_updater(db, export_id, manager)
+
+    forms = await db.forms.find({"id": {"$in": job.get("form_ids", [])}}, {"_id": 0}).to_list(None)
+    forms.sort(key=lambda form: job["form_ids"].index(form["id"]))
+    if not forms:
+        await update(status="failed", error="No forms to export")
+        return {"status": "error", "message": "No forms to export"}
+
+    fmt = EXPORT_FORMATS[job["format"]]
+    entry_names = archive_entry_names(forms, fmt["extension"])
+    compress_type = zipfile.ZIP_STORED if job["format"] in STORED_FORMATS else zipfile.ZIP_DEFLATED
+    queries = {
+        form["id"]: build_export_query(form["id"], job.get("filters"), job.get("since"))
+        for form in forms
+    }
+
+    await update(status="processing", message=f"Counting submissions in {len(forms)} forms...")
+
+    counts = await asyncio.gather(*(db.submissions.count_documents(queries[form["id"]]) for form in forms))
+
+    async def progress_callback(progress: int, message: str):
+        await update(progress=progress, message=message)
+
+    progress = ProgressTrackingExporter(max(sum(counts), 1), progress_callback)
+    semaphore = asyncio.Semaphore(BATCH_EXPORT_CONCURRENCY)
+    archive_lock = asyncio.Lock()
+    loop = asyncio.get_event_loop()
+
+    tmp_archive = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+    tmp_archive.close()
+    archive = zipfile.ZipFile(tmp_archive.name, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    async def export_form(form: dict) -> Dict[str, Any]:
+        async with semaphore:
+            tracker = ExportTracker(job.get("since"))
+
+            async def tracked_chunks():
+                cursor = db.submissions.find(queries[form["id"]], {"_id": 0})
+                async for chunk in tracker.track(cursor_chunks(cursor)):
+                    yield await progress.export_chunk(chunk)
+
+            tmp = tempfile.NamedTemporaryFile(suffix=fmt["extension"], delete=False)
+            tmp.close()
+            try:
+                row_count = await write_export_file(tracked_chunks(), form, job["format"], tmp.name)
+                # ZipFile supports one open entry at a time
+                async with archive_lock:
+                    entry = await loop.run_in_executor(
+                        None, _copy_into_archive, archive, tmp.name, entry_names[form["id"]], compress_type
+                    )
+            finally:
+                os.unlink(tmp.name)
+
+            return {
+                "form_id": form["id"],
+                "form_name": form.get("name"),
+                "form_version": form.get("version"),
+                "file": entry_names[form["id"]],
+                "row_count": row_count,
+                "high_water_mark": tracker.high_water_mark,
+                **entry,
+            }
+
+    tasks = [asyncio.ensure_future(export_form(form)) for form in forms]
+    try:
+        entries = await asyncio.gather(*tasks)
+        total_rows = sum(entry["row_count"] for entry in entries)
+        marks = [entry["high_water_mark"] for entry in entries if entry["high_water_mark"]]
+        manifest = {
+            "export_id": export_id,
+            "scope": job.get("scope"),
+            "org_id": job.get("org_id"),
+            "project_id": job.get("project_id"),
+            "format": job["format"],
+            "filters": job.get("filters") or {},
+            "since": job.get("since"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "total_rows": total_rows,
+            "forms": entries,
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2, default=str))
+        archive.close()
+
+        file_size = os.path.getsize(tmp_archive.name)
+        artifact = await save_artifact(
+            tmp_archive.name,
+            job["org_id"],
+            f"{export_id}.zip",
+            "application/zip"
+        )
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        archive.close()
+        if os.path.exists(tmp_archive.name):
+            os.unlink(tmp_archive.name)
+        logger.error(f"Batch export {export_id} failed: {e}")
+        await update(
+            status="failed",
+            message=f"Failed: {e}",
+            error=str(e),
+            completed_at=datetime.now(timezone.utc).isoformat()
+        )
+        raise
+
+    download_url = f"/api/exports/{export_id}/download"
+    result = {
+        "status": "completed",
+        "export_id": export_id,
+        "row_count": total_rows,
+        "form_count": len(entries),
+        "download_url": download_url,
+    }
+    await update(
+        status="completed",
+        progress=100,
+        message="Completed successfully",
+        result=result,
+        row_count=total_rows,
+        high_water_mark=max(marks) if marks else job.get("since"),
+        manifest=manifest,
+        file_size=file_size,
+        file_url=download_url,
+        completed_at=datetime.now(timezone.utc).isoformat(),
+        **artifact
+    )
+    return result
@@ -0,0 +1,93 @@
+"""
+DataPulse - Export Artifact Storage
+
+Stores finished export files on S3 when configured, otherwise on local
+disk under EXPORT_STORAGE_DIR. When the API and workers run in separate
+containers without S3, EXPORT_STORAGE_DIR must be a shared volume.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_STORAGE_DIR = os.environ.get(
+    "EXPORT_STORAGE_DIR",
+    os.path.join(tempfile.gettempdir(), "fieldforce-exports")
+)
+
+
+def _s3_storage():
+    """S3Storage if credentials are configured, else None"""
+    try:
+        from config.production import S3Storage
+    except ImportError:
+        return None
+    return S3Storage if S3Storage.is_available() else None
+
+
+def local_artifact_path(artifact_key: str) -> str:
+    """Absolute path of a locally stored artifact"""
+    return os.path.join(EXPORT_STORAGE_DIR, artifact_key)
+
+
+async def save_artifact(path: str, org_id: str, filename: str, content_type: str) -> dict:
+    """
+    Move a finished export file into artifact storage.
+
+    Returns:
+        {"storage": "s3" | "local", "artifact_key": str}
+    """
+    s3 = _s3_storage()
+    if s3:
+        key = s3.generate_key(org_id, "exports", filename)
+        url = await s3.upload_path(path, key, content_type)
+        if url:
+            os.unlink(path)
+            return {"storage": "s3", "artifact_key": key}
+        logger.warning("S3 export upload failed, keeping artifact on local disk")
+
+    artifact_key = os.path.join(org_id, filename)
+    dest = local_artifact_path(artifact_key)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, shutil.move, path, dest)
+    return {"storage": "local", "artifact_key": artifact_key}
+
+
+async def artifact_exists(job: dict) -> bool:
+    """Whether a completed job's artifact can still be served"""
+    if not job.get("artifact_key"):
+        return False
+    if job.get("storage") == "local":
+        return os.path.exists(local_artifact_path(job["artifact_key"]))
+    # Bucket lifecycle rules or manual removal can drop the object while
+    # the job still says completed
+    s3 = _s3_storage()
+    return await s3.file_exists(job["artifact_key"]) if s3 else False
+
+
+async def get_artifact_url(job: dict, expiration: int = 3600) -> Optional[str]:
+    """Presigned download URL for an S3-stored artifact"""
+    s3 = _s3_storage()
+    if job.get("storage") != "s3" or not s3:
+        return None
+    return await s3.get_presigned_url(job["artifact_key"], expiration=expiration)
+
+
+async def delete_artifact(job: dict) -> bool:
+    """Delete a job's artifact from wherever it is stored"""
+    if not job.get("artifact_key"):
+        return False
+    if job.get("storage") == "s3":
+        s3 = _s3_storage()
+        return await s3.delete_file(job["artifact_key"]) if s3 else False
+    path = local_artifact_path(job["artifact_key"])
+    if os.path.exists(path):
+        os.unlink(path)
+        return True
+    return False
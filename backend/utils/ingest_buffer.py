@@ -0,0 +1,478 @@
+"""
+DataPulse - Write-Behind Submission Ingest Buffer
+
+Optional ingest mode for single submissions. Instead of one insert_one
+plus per-submission Celery tasks, validated submission documents are
+queued in-process and a background flusher writes them with one
+unordered bulk_write every SUBMISSION_INGEST_FLUSH_MS milliseconds or
+SUBMISSION_INGEST_BATCH_SIZE documents, whichever comes first, then
+publishes one batched post-processing task per flush.
+
+Durability (SUBMISSION_INGEST_DURABILITY):
+- "flush": the request is acknowledged once its batch is in MongoDB;
+  a failed flush fails the request.
+- "wal": the request is acknowledged once the document is appended to a
+  local write-ahead log; failed flushes are retried and any log left by a
+  crashed process is replayed on the next startup. Set
+  SUBMISSION_INGEST_WAL_FSYNC=true to also survive host crashes.
+  Requests are acknowledged before the idempotency_key index is checked,
+  so a concurrent retry of an upload may be acknowledged with an id that
+  is then dropped as a duplicate; use "flush" where clients keep the id.
+
+Enabled with SUBMISSION_INGEST_MODE=buffered; the default "direct" mode
+keeps the per-request insert.
+"""
+
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from utils.cache_events import submissions_changed
+from utils.counters import apply_counter_updates, counter_updates
+from utils.streaming_export import json_dumps
+
+logger = logging.getLogger(__name__)
+
+try:
+    from middleware.prometheus_metrics import record_ingest_flush
+except ImportError:
+    def record_ingest_flush(size: int, duration: float, status: str = "success"):
+        pass
+
+
+INGEST_MODE = os.environ.get("SUBMISSION_INGEST_MODE", "direct")
+INGEST_DURABILITY = os.environ.get("SUBMISSION_INGEST_DURABILITY", "flush")
+INGEST_BATCH_SIZE = int(os.environ.get("SUBMISSION_INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_MS = int(os.environ.get("SUBMISSION_INGEST_FLUSH_MS", "50"))
+# Requests wait (backpressure) once this many documents are queued
+INGEST_MAX_PENDING = int(os.environ.get("SUBMISSION_INGEST_MAX_PENDING", "20000"))
+INGEST_WAL_DIR = os.environ.get(
+    "SUBMISSION_INGEST_WAL_DIR",
+    os.path.join(tempfile.gettempdir(), "fieldforce-ingest-wal")
+)
+INGEST_WAL_FSYNC = os.environ.get("SUBMISSION_INGEST_WAL_FSYNC", "false").lower() == "true"
+# Delay before retrying a failed flush in WAL mode (doubles up to the max)
+INGEST_RETRY_DELAY = 0.5
+INGEST_MAX_RETRY_DELAY = 30.0
+INGEST_SHUTDOWN_TIMEOUT = 30.0
+
+DURABILITY_MODES = ("flush", "wal")
+DUPLICATE_KEY_ERROR = 11000
+
+
+class IngestError(Exception):
+    """A buffered submission could not be written"""
+
+
+class WriteAheadLog:
+    """
+    Append-only log of queued submission documents, one JSON line each.
+
+    The log is split into segments: the flusher rotates to a new segment
+    before every flush, and a segment is deleted once every document in it
+    has been written to MongoDB. Segment files stay flock'ed while open so
+    recovery never touches the log of a live process.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self._prefix = f"{socket.gethostname()}-{os.getpid()}-{int(time.time() * 1000)}"
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._current: Optional[int] = None
+        # segment -> [file, documents not yet flushed, path]
+        self._segments: Dict[int, list] = {}
+
+    def _open_segment(self) -> int:
+        self._seq += 1
+        path = os.path.join(self.directory, f"{self._prefix}-{self._seq:08d}.wal")
+        handle = open(path, "ab")
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._segments[self._seq] = [handle, 0, path]
+        self._current = self._seq
+        return self._seq
+
+    def append(self, doc: dict) -> int:
+        """Log a document; returns the segment it was written to (blocking I/O)"""
+        with self._lock:
+            segment = self._current if self._current is not None else self._open_segment()
+            entry = self._segments[segment]
+            entry[0].write(json_dumps(doc) + b"\n")
+            entry[0].flush()
+            if self.fsync:
+                os.fsync(entry[0].fileno())
+            entry[1] += 1
+            return segment
+
+    def rotate(self):
+        """Start a new segment for subsequent appends"""
+        with self._lock:
+            current = self._current
+            self._current = None
+            if current is not None and self._segments[current][1] == 0:
+                self._remove(current)
+
+    def release(self, segments: List[int]):
+        """Mark documents as flushed; drop segments that are fully flushed"""
+        with self._lock:
+            for segment, count in Counter(segments).items():
+                entry = self._segments.get(segment)
+                if entry is None:
+                    continue
+                entry[1] -= count
+                if entry[1] <= 0 and segment != self._current:
+                    self._remove(segment)
+
+    def _remove(self, segment: int):
+        handle, _, path = self._segments.pop(segment)
+        try:
+            os.remove(path)
+        finally:
+            handle.close()
+
+    def close(self):
+        """Close all segments, keeping any that still hold unflushed documents"""
+        with self._lock:
+            for segment in list(self._segments):
+                if self._segments[segment][1] <= 0:
+                    self._remove(segment)
+                else:
+                    self._segments.pop(segment)[0].close()
+            self._current = None
+
+    @staticmethod
+    def recover(directory: str) -> Iterator[Tuple[str, List[dict]]]:
+        """
+        Yield (path, documents) for segments left behind by stopped processes.
+
+        Segments still locked by a running process are skipped. A torn last
+        line (crash mid-append) is ignored. The caller deletes each path
+        once its documents are written.
+        """
+        for path in sorted(glob.glob(os.path.join(directory, "*.wal"))):
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if not os.path.exists(path):
+                    # Replayed and removed by another process since the glob
+                    continue
+                docs = []
+                for line in handle:
+                    try:
+                        docs.append(json.loads(line))
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable ingest WAL line in {path}")
+                yield path, docs
+
+
+class _Entry:
+    __slots__ = ("doc", "future", "segment")
+
+    def __init__(self, doc: dict, future: Optional[asyncio.Future], segment: Optional[int]):
+        self.doc = doc
+        self.future = future
+        self.segment = segment
+
+
+def _duplicate_of(error: dict) -> Optional[str]:
+    """Unique field a duplicate-key write error collided on ("id", "idempotency_key"), else None"""
+    if error.get("code") != DUPLICATE_KEY_ERROR:
+        return None
+    pattern = error.get("keyPattern")
+    if pattern:
+        return next(iter(pattern))
+    # Servers before 4.4 only name the index in the message
+    message = error.get("errmsg", "")
+    if "idempotency_key" in message:
+        return "idempotency_key"
+    if "index: id_" in message:
+        return "id"
+    return None
+
+
+def _insert_errors(error: BulkWriteError) -> Dict[int, dict]:
+    """
+    Failed batch positions of a bulk insert.
+
+    Duplicates of a document's own id are ignored: an earlier attempt
+    (e.g. WAL replay) already wrote it. Duplicates of its idempotency key
+    are kept - another upload of the same client submission was stored
+    under a different id.
+    """
+    return {
+        e["index"]: e
+        for e in error.details.get("writeErrors", [])
+        if _duplicate_of(e) != "id"
+    }
+
+
+class IngestBuffer:
+    """
+    In-process write-behind queue for submission documents.
+
+    Usage:
+        buffer = IngestBuffer(db, on_flush=publish_batch_task)
+        await buffer.start()
+        stored = await buffer.submit(submission_dict)  # None, or the earlier upload
+        ...
+        await buffer.stop()  # drains the queue
+    """
+
+    def __init__(
+        self,
+        db,
+        on_flush: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_ms: int = INGEST_FLUSH_MS,
+        max_pending: int = INGEST_MAX_PENDING,
+        durability: str = INGEST_DURABILITY,
+        wal_dir: str = INGEST_WAL_DIR,
+        wal_fsync: bool = INGEST_WAL_FSYNC
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown ingest durability '{durability}' (expected one of {DURABILITY_MODES})")
+        self.db = db
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.max_pending = max_pending
+        self.durability = durability
+        self.wal_dir = wal_dir
+        self.wal = WriteAheadLog(wal_dir, wal_fsync) if durability == "wal" else None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Replay logs left by crashed processes (WAL mode), then start the flusher"""
+        if self.wal:
+            await self.recover()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._closing = False
+        self._flusher = asyncio.create_task(self._run())
+        logger.info(
+            f"Submission ingest buffer started ({self.durability}, "
+            f"{self.batch_size} docs / {int(self.flush_interval * 1000)} ms)"
+        )
+
+    async def stop(self):
+        """Stop accepting submissions and flush everything queued"""
+        if not self.running:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), INGEST_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Ingest buffer stopped with {self.pending} submissions unflushed")
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        # Anything still queued stays in the WAL (replayed on restart) or fails its request
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry.future is not None and not entry.future.done():
+                entry.future.set_exception(IngestError("Submission ingest buffer stopped"))
+        if self.wal:
+            self.wal.close()
+        logger.info("Submission ingest buffer stopped")
+
+    async def submit(self, doc: dict) -> Optional[dict]:
+        """
+        Queue a submission document.
+
+        Returns once the document is durable for the configured mode:
+        written to MongoDB ("flush") or appended to the WAL ("wal").
+
+        Returns:
+            None once the document is stored; in flush mode, the already
+            stored submission with the same idempotency_key if a concurrent
+            retry of the upload was written first
+
+        Raises:
+            IngestError: The buffer is not accepting submissions, or
+                (flush mode) the document could not be written
+        """
+        if not self.running or self._closing:
+            raise IngestError("Submission ingest buffer is not running")
+
+        if self.wal:
+            loop = asyncio.get_running_loop()
+            segment = await loop.run_in_executor(None, self.wal.append, doc)
+            await self._queue.put(_Entry(doc, None, segment))
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Entry(doc, future, None))
+        return await future
+
+    async def _next_batch(self) -> List[_Entry]:
+        """Wait for a document, then collect more until the batch is full or the interval elapses"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                if self.wal:
+                    self.wal.rotate()
+                await self._flush(batch)
+            except Exception as e:
+                logger.error(f"Ingest buffer flush error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[_Entry]):
+        delay = INGEST_RETRY_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                failed = await self._write([entry.doc for entry in batch])
+                break
+            except Exception as e:
+                record_ingest_flush(len(batch), time.monotonic() - started, "error")
+                if not self.wal:
+                    for entry in batch:
+                        if not entry.future.done():
+                            entry.future.set_exception(IngestError(f"Submission write failed: {e}"))
+                    return
+                # Already acknowledged: keep retrying, the WAL still holds the batch
+                logger.warning(f"Ingest flush of {len(batch)} submissions failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, INGEST_MAX_RETRY_DELAY)
+
+        record_ingest_flush(len(batch), time.monotonic() - started)
+        stored = await self._stored_duplicates([entry.doc for entry in batch], failed)
+        written = []
+        for index, entry in enumerate(batch):
+            error = failed.get(index)
+            existing = stored.get(index)
+            if error is None:
+                written.append(entry.doc["id"])
+            elif existing is not None:
+                logger.info(
+                    f"Buffered submission {entry.doc['id']} is a retry of {existing['id']} "
+                    f"({entry.doc['idempotency_key']}), not stored"
+                )
+            else:
+                logger.error(f"Buffered submission {entry.doc.get('id')} rejected: {error.get('errmsg')}")
+            if entry.future is not None and not entry.future.done():
+                if error is None:
+                    entry.future.set_result(None)
+                elif existing is not None:
+                    entry.future.set_result(existing)
+                else:
+                    entry.future.set_exception(IngestError(error.get("errmsg", "Write failed")))
+
+        if self.wal:
+            self.wal.release([entry.segment for entry in batch])
+        await self._notify(written)
+
+    async def _write(self, docs: List[dict]) -> Dict[int, dict]:
+        """One unordered bulk insert; returns rejected positions (id duplicates count as written)"""
+        try:
+            await self.db.submissions.bulk_write(
+                [InsertOne(dict(doc)) for doc in docs], ordered=False
+            )
+        except BulkWriteError as e:
+            # Nothing rejected was inserted now: id duplicates were counted when first
+            # written (e.g. WAL replay), idempotency_key duplicates by the upload that won
+            not_inserted = {err["index"] for err in e.details.get("writeErrors", [])}
+            inserted = [doc for i, doc in enumerate(docs) if i not in not_inserted]
+            await apply_counter_updates(self.db, counter_updates("submissions", inserted, 1))
+            await submissions_changed(inserted)
+            return _insert_errors(e)
+        await apply_counter_updates(self.db, counter_updates("submissions", docs, 1))
+        await submissions_changed(docs)
+        return {}
+
+    async def _stored_duplicates(self, docs: List[dict], failed: Dict[int, dict]) -> Dict[int, dict]:
+        """Stored submissions for batch positions rejected as idempotency_key duplicates"""
+        keys = {
+            index: docs[index]["idempotency_key"]
+            for index, error in failed.items()
+            if _duplicate_of(error) == "idempotency_key" and docs[index].get("idempotency_key")
+        }
+        if not keys:
+            return {}
+        try:
+            cursor = self.db.submissions.find(
+                {"idempotency_key": {"$in": list(set(keys.values()))}}, {"_id": 0}
+            )
+            by_key = {doc["idempotency_key"]: doc async for doc in cursor}
+        except Exception as e:
+            logger.warning(f"Could not look up {len(keys)} duplicate buffered submissions: {e}")
+            return {}
+        return {index: by_key[key] for index, key in keys.items() if key in by_key}
+
+    async def _notify(self, submission_ids: List[str]):
+        if not submission_ids or self.on_flush is None:
+            return
+        try:
+            await self.on_flush(submission_ids)
+        except Exception as e:
+            logger.warning(f"Ingest post-flush hook failed for {len(submission_ids)} submissions: {e}")
+
+    async def recover(self) -> int:
+        """Write documents from WAL segments left behind by stopped processes"""
+        recovered = 0
+        for path, docs in WriteAheadLog.recover(self.wal_dir):
+            for start in range(0, len(docs), self.batch_size):
+                chunk = docs[start:start + self.batch_size]
+                failed = await self._write(chunk)
+                for index, error in failed.items():
+                    if _duplicate_of(error) == "idempotency_key":
+                        logger.info(f"Recovered submission {chunk[index].get('id')} was already stored by a retry")
+                    else:
+                        logger.error(f"Recovered submission {chunk[index].get('id')} rejected: {error.get('errmsg')}")
+                await self._notify([doc["id"] for i, doc in enumerate(chunk) if i not in failed])
+            os.remove(path)
+            recovered += len(docs)
+        if recovered:
+            logger.info(f"Recovered {recovered} buffered submissions from the ingest WAL")
+        return recovered
@@ -40,10 +40,11 @@ class JobManager:
         job_type: str,
         params: dict,
         user_id: str,
-        org_id: str
+        org_id: str,
+        job_id: Optional[str] = None
     ) -> str:
-        """Create a new job and return job ID"""
-        job_id = str(uuid.uuid4())
+        """Create a new job and return job ID (generated unless given)"""
+        job_id = job_id or str(uuid.uuid4())
         
         job_data = {
             "id": job_id,
@@ -210,6 +211,21 @@ def get_job_manager() -> JobManager:
     return job_manager
 
 
+async def get_shared_job_manager() -> JobManager:
+    """
+    Get a job manager visible to every API and worker process.
+    
+    Uses Redis when it is reachable so progress written by a Celery worker
+    can be polled from the API; otherwise falls back to the in-memory manager.
+    """
+    try:
+        from config.production import RedisConfig
+        redis = await RedisConfig.get_client()
+    except Exception:
+        redis = None
+    return JobManager(redis) if redis else get_job_manager()
+
+
 async def run_background_job(
     job_id: str,
     task_func: Callable,
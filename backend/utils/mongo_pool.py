@@ -0,0 +1,249 @@
+"""
+DataPulse - MongoDB Connection Manager
+
+One pooled MongoClient per process for Celery workers (created on
+worker_process_init, recreated automatically after a fork) instead of a
+new client, pool and monitor threads per task, plus connection pool
+statistics for both the workers and the API's Motor client.
+
+Tasks that reuse the API's async code (exports) get the same treatment:
+one event loop and one Motor client per worker process, since a Motor
+client is bound to the loop it first ran on and asyncio.run() would
+otherwise need a new client for every task.
+
+Pool statistics are kept by a pymongo ConnectionPoolListener and exported
+as Prometheus metrics when the metrics middleware is importable.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+
+from config.scalability import MONGO_MAX_IDLE_TIME_MS, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+try:
+    from middleware.prometheus_metrics import record_mongo_checkout_failure, update_mongo_pool
+except ImportError:
+    def update_mongo_pool(role: str, open_connections: int, checked_out: int, max_size: int):
+        pass
+
+    def record_mongo_checkout_failure(role: str, reason: str):
+        pass
+
+
+WORKER_MAX_POOL_SIZE = int(os.environ.get("WORKER_MONGO_MAX_POOL_SIZE", str(MONGO_MAX_POOL_SIZE)))
+WORKER_MIN_POOL_SIZE = int(os.environ.get("WORKER_MONGO_MIN_POOL_SIZE", str(MONGO_MIN_POOL_SIZE)))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connections per process (summed over all servers of a client)"""
+
+    def __init__(self, role: str, max_pool_size: int):
+        self.role = role
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def _publish(self):
+        update_mongo_pool(self.role, self.open_connections, self.checked_out, self.max_pool_size)
+
+    def _change(self, open_delta: int = 0, checked_out_delta: int = 0, checkouts: int = 0):
+        with self._lock:
+            self.open_connections += open_delta
+            self.checked_out += checked_out_delta
+            self.checkouts += checkouts
+        self._publish()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_pool_size": self.max_pool_size,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+            }
+
+    def connection_created(self, event):
+        self._change(open_delta=1)
+
+    def connection_closed(self, event):
+        self._change(open_delta=-1)
+
+    def connection_checked_out(self, event):
+        self._change(checked_out_delta=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._change(checked_out_delta=-1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+        record_mongo_checkout_failure(self.role, str(event.reason))
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+_sync_client: Optional[MongoClient] = None
+_sync_client_pid: Optional[int] = None
+_sync_listener: Optional[PoolStatsListener] = None
+_sync_lock = threading.Lock()
+
+
+def get_sync_client() -> MongoClient:
+    """The process-wide pooled MongoClient (created on first use, and again after a fork)"""
+    global _sync_client, _sync_client_pid, _sync_listener
+    pid = os.getpid()
+    if _sync_client is not None and _sync_client_pid == pid:
+        return _sync_client
+
+    with _sync_lock:
+        if _sync_client is None or _sync_client_pid != pid:
+            # A client inherited through fork is unusable; never close it from the child
+            _sync_listener = PoolStatsListener("worker", WORKER_MAX_POOL_SIZE)
+            # Read at connect time so worker modules can load .env first
+            _sync_client = MongoClient(
+                os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+                minPoolSize=WORKER_MIN_POOL_SIZE,
+                maxPoolSize=WORKER_MAX_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                event_listeners=[_sync_listener],
+                connect=False,
+            )
+            _sync_client_pid = pid
+            logger.info(f"MongoDB pool initialized for process {pid} (max {WORKER_MAX_POOL_SIZE} connections)")
+    return _sync_client
+
+
+def get_sync_db():
+    """Database handle on the process-wide client, for Celery tasks"""
+    return get_sync_client()[os.environ.get("DB_NAME", "fieldforce")]
+
+
+def close_sync_client():
+    """Close this process's client (worker shutdown)"""
+    global _sync_client, _sync_client_pid
+    with _sync_lock:
+        if _sync_client is not None and _sync_client_pid == os.getpid():
+            _sync_client.close()
+        _sync_client = None
+        _sync_client_pid = None
+
+
+def sync_pool_stats() -> Optional[Dict[str, int]]:
+    """Connection pool statistics of this process's worker client, if created"""
+    if _sync_listener is None or _sync_client_pid != os.getpid():
+        return None
+    return _sync_listener.stats()
+
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_client: Optional[AsyncIOMotorClient] = None
+_async_pid: Optional[int] = None
+_async_listener: Optional[PoolStatsListener] = None
+
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    global _worker_loop, _async_client, _async_pid, _async_listener
+    pid = os.getpid()
+    if _worker_loop is None or _worker_loop.is_closed() or _async_pid != pid:
+        # Whatever was inherited through fork belongs to the parent; drop it unclosed
+        _worker_loop = asyncio.new_event_loop()
+        _async_client = None
+        _async_listener = None
+        _async_pid = pid
+    return _worker_loop
+
+
+def run_in_worker_loop(coro: Awaitable) -> Any:
+    """
+    Run a coroutine to completion on this process's event loop (the
+    replacement for asyncio.run in tasks). Prefork workers run one task at
+    a time per process, so the loop is never entered concurrently.
+    """
+    return _get_worker_loop().run_until_complete(coro)
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """The process-wide pooled Motor client, bound to the worker loop"""
+    global _async_client, _async_listener
+    loop = _get_worker_loop()
+    if _async_client is None:
+        _async_listener = PoolStatsListener("worker_async", WORKER_MAX_POOL_SIZE)
+        _async_client = AsyncIOMotorClient(
+            os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+            minPoolSize=WORKER_MIN_POOL_SIZE,
+            maxPoolSize=WORKER_MAX_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            event_listeners=[_async_listener],
+            connect=False,
+            io_loop=loop,
+        )
+        logger.info(
+            f"Async MongoDB pool initialized for process {os.getpid()} (max {WORKER_MAX_POOL_SIZE} connections)"
+        )
+    return _async_client
+
+
+def get_async_db():
+    """Motor database handle on the process-wide client, for tasks run with run_in_worker_loop"""
+    return get_async_client()[os.environ.get("DB_NAME", "fieldforce")]
+
+
+def close_async_client():
+    """Close this process's Motor client and worker loop (worker shutdown)"""
+    global _worker_loop, _async_client, _async_pid, _async_listener
+    if _async_pid == os.getpid():
+        if _async_client is not None:
+            _async_client.close()
+        if _worker_loop is not None and not _worker_loop.is_closed():
+            _worker_loop.run_until_complete(_worker_loop.shutdown_asyncgens())
+            _worker_loop.close()
+    _worker_loop = None
+    _async_client = None
+    _async_pid = None
+    _async_listener = None
+
+
+def async_pool_stats() -> Optional[Dict[str, int]]:
+    """Connection pool statistics of this process's Motor worker client, if created"""
+    if _async_listener is None or _async_pid != os.getpid():
+        return None
+    return _async_listener.stats()
+
+
+def init_worker_mongo(**kwargs):
+    """worker_process_init handler: open the pooled client in each worker process"""
+    get_sync_client()
+
+
+def shutdown_worker_mongo(**kwargs):
+    """worker_process_shutdown handler"""
+    close_sync_client()
+    close_async_client()
@@ -0,0 +1,132 @@
+"""
+DataPulse - Streaming NDJSON Ingest
+
+Incremental parsing of NDJSON request bodies (optionally gzip-compressed)
+for very large uploads, so records can be processed while the body is
+still arriving and memory stays bounded by one chunk of records.
+
+DuplexStreamingResponse lets an endpoint stream results back while it is
+still reading the request body.
+"""
+
+import os
+import zlib
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+
+from utils.streaming_export import json_loads
+
+
+# A single record larger than this is rejected (and skipped) instead of buffered
+NDJSON_MAX_LINE_BYTES = int(os.environ.get("NDJSON_MAX_LINE_BYTES", str(8 * 1024 * 1024)))
+# Upper bound on bytes inflated from one gzip step (limits decompression bombs per step)
+INFLATE_STEP_BYTES = 1024 * 1024
+
+
+class NDJSONBodyError(ValueError):
+    """The request body cannot be read any further (e.g. corrupt gzip stream)"""
+
+
+async def _inflate(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Decompress a gzip body incrementally (concatenated gzip members included)"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    in_member = False  # input consumed since the last complete gzip member
+    try:
+        async for chunk in body:
+            while chunk:
+                in_member = True
+                data = decompressor.decompress(chunk, INFLATE_STEP_BYTES)
+                if data:
+                    yield data
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    in_member = False
+                else:
+                    chunk = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+    except zlib.error as e:
+        raise NDJSONBodyError(f"Invalid gzip body: {e}")
+    if in_member and not decompressor.eof:
+        raise NDJSONBodyError("Truncated gzip body")
+
+
+async def iter_ndjson(
+    body: AsyncIterator[bytes],
+    gzip: bool = False,
+    max_line_bytes: int = NDJSON_MAX_LINE_BYTES
+) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Parse an NDJSON byte stream record by record.
+
+    Yields (index, value, error) per non-blank line: error is None for
+    parsed records, or a message (and value None) for lines that are not
+    valid JSON or exceed max_line_bytes. Bad lines never stop the stream.
+
+    Raises:
+        NDJSONBodyError: The gzip stream is corrupt
+    """
+    stream = _inflate(body) if gzip else body
+    buffer = bytearray()
+    index = 0
+    skipping = False  # inside an oversized line: discard until its newline
+
+    def parse(line: bytes) -> Tuple[Any, Optional[str]]:
+        try:
+            return json_loads(line), None
+        except ValueError as e:
+            return None, f"Invalid JSON: {e}"
+
+    async for chunk in stream:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > max_line_bytes:
+                # Arrived whole within one chunk
+                yield index, None, f"Record exceeds {max_line_bytes} bytes"
+                index += 1
+            elif line:
+                value, error = parse(line)
+                yield index, value, error
+                index += 1
+        del buffer[:start]
+
+        if len(buffer) > max_line_bytes:
+            if not skipping:
+                yield index, None, f"Record exceeds {max_line_bytes} bytes"
+                index += 1
+                skipping = True
+            buffer.clear()
+
+    line = bytes(buffer).strip()
+    if line and not skipping:
+        value, error = parse(line)
+        yield index, value, error
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that can be sent while the request body is still
+    being read.
+
+    Starlette's StreamingResponse watches for client disconnects by
+    consuming receive(), which would swallow the request body messages
+    the endpoint is still reading. Here a disconnect surfaces as
+    ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
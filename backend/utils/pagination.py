@@ -0,0 +1,111 @@
+"""
+DataPulse - Keyset Pagination
+
+Opaque cursor tokens for seek pagination over (sort key, id). A page
+continues strictly after the last row of the previous page, so deep
+pages cost the same as the first one instead of walking every skipped
+index entry like skip() does.
+
+The token is the URL-safe base64 of the last row's (sort key, id) pair.
+Datetimes and ObjectIds are tagged so they round-trip with their BSON
+type and keep matching the index.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Response header carrying the next cursor for endpoints that return a bare list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def encode_cursor(sort_value: Any, id_value: Any) -> str:
+    raw = json.dumps([_encode_value(sort_value), _encode_value(id_value)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    """
+    Raises:
+        HTTPException: 400 if the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, id_value = json.loads(raw)
+        return _decode_value(sort_value), _decode_value(id_value)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class Keyset:
+    """
+    Seek pagination over (sort_field, id_field), both in one direction.
+
+    Usage:
+        keyset = Keyset("submitted_at", "id", descending=True)
+        query = keyset.apply(query, cursor)
+        docs = await db.submissions.find(query).sort(keyset.sort).limit(n).to_list(n)
+        next_cursor = keyset.next_cursor(docs, n)
+
+    The collection needs an index ending in (sort_field, id_field) after
+    the query's equality fields, e.g. (form_id, submitted_at, id).
+    """
+
+    def __init__(self, sort_field: Optional[str], id_field: str = "id", descending: bool = True):
+        self.sort_field = sort_field
+        self.id_field = id_field
+        self.direction = -1 if descending else 1
+
+    @property
+    def sort(self) -> List[Tuple[str, int]]:
+        if self.sort_field is None:
+            return [(self.id_field, self.direction)]
+        return [(self.sort_field, self.direction), (self.id_field, self.direction)]
+
+    def apply(self, query: Dict, cursor: Optional[str]) -> Dict:
+        """Restrict query to rows after the cursor (no-op without one)"""
+        if not cursor:
+            return query
+        sort_value, id_value = decode_cursor(cursor)
+        op = "$lt" if self.direction < 0 else "$gt"
+        if self.sort_field is None:
+            after = {self.id_field: {op: id_value}}
+        else:
+            after = {"$or": [
+                {self.sort_field: {op: sort_value}},
+                {self.sort_field: sort_value, self.id_field: {op: id_value}},
+            ]}
+        if not query:
+            return after
+        return {"$and": [query, after]}
+
+    def cursor_for(self, doc: Dict) -> str:
+        sort_value = doc.get(self.sort_field) if self.sort_field is not None else None
+        return encode_cursor(sort_value, doc.get(self.id_field))
+
+    def next_cursor(self, docs: List[Dict], limit: int) -> Optional[str]:
+        """Cursor after the last doc, or None when this was the last page"""
+        if not docs or len(docs) < limit:
+            return None
+        return self.cursor_for(docs[-1])
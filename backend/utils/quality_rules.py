@@ -0,0 +1,183 @@
+"""
+DataPulse - Submission Quality Rules
+
+Compiles a form's field validations into a flat rule table once per form
+version and scores submissions against it, one at a time (ingest) or as
+a whole batch (workers, rescoring backlogs).
+
+Scoring starts at 100:
+- required field missing: -10, flag missing_required:<field>
+- number below min_value: -5, flag below_min:<field>
+- number above max_value: -5, flag above_max:<field>
+and never drops below 0. Flags are listed in form field order.
+
+Batch scoring extracts each rule's column once and runs the numeric
+bound checks and the score arithmetic as NumPy array operations.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+MAX_SCORE = 100.0
+REQUIRED_PENALTY = 10.0
+BOUND_PENALTY = 5.0
+
+QUALITY_RULES_CACHE_SIZE = int(os.environ.get("QUALITY_RULES_CACHE_SIZE", "256"))
+
+
+class QualityRule(NamedTuple):
+    field: str
+    required: bool
+    min_value: Optional[float]
+    max_value: Optional[float]
+
+
+def _bound(value: Any) -> Optional[float]:
+    """Numeric validation bound, or None when unset/unusable (0 is a valid bound)"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        bound = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(bound) else bound
+
+
+# Exact types as parsed from JSON (bool counts as a number, as with isinstance)
+_NUMBER_TYPES = (int, float, bool)
+_EMPTY_TYPES = (str, list, dict)
+
+
+def is_missing(value: Any) -> bool:
+    """Required-field check: 0 and False are answers, empty strings/lists are not"""
+    return value is None or (isinstance(value, _EMPTY_TYPES) and not value)
+
+
+class QualityRules:
+    """
+    Quality rules of one form version.
+
+    Usage:
+        rules = get_quality_rules(form)
+        score, flags = rules.score(submission["data"])
+        results = rules.score_batch([s["data"] for s in submissions])
+    """
+
+    def __init__(self, fields: List[Dict]):
+        by_name: Dict[str, QualityRule] = {}
+        for field in fields:
+            name = field.get("name")
+            if not name:
+                continue
+            validation = field.get("validation") or {}
+            by_name[name] = QualityRule(
+                field=name,
+                required=bool(validation.get("required")),
+                min_value=_bound(validation.get("min_value")),
+                max_value=_bound(validation.get("max_value")),
+            )
+        self.rules: List[QualityRule] = [
+            rule for rule in by_name.values()
+            if rule.required or rule.min_value is not None or rule.max_value is not None
+        ]
+
+    def score(self, data: Dict[str, Any]) -> Tuple[float, List[str]]:
+        """Score one submission's data"""
+        score = MAX_SCORE
+        flags = []
+        for rule in self.rules:
+            value = data.get(rule.field)
+            if rule.required and is_missing(value):
+                score -= REQUIRED_PENALTY
+                flags.append(f"missing_required:{rule.field}")
+            if isinstance(value, (int, float)):
+                if rule.min_value is not None and value < rule.min_value:
+                    score -= BOUND_PENALTY
+                    flags.append(f"below_min:{rule.field}")
+                if rule.max_value is not None and value > rule.max_value:
+                    score -= BOUND_PENALTY
+                    flags.append(f"above_max:{rule.field}")
+        return max(0.0, score), flags
+
+    def score_batch(self, datas: List[Dict[str, Any]]) -> List[Tuple[float, List[str]]]:
+        """Score many submissions' data at once; same results as score() per item"""
+        count = len(datas)
+        if count == 0:
+            return []
+        if not self.rules:
+            return [(MAX_SCORE, []) for _ in range(count)]
+
+        penalties = np.zeros(count)
+        # (flag, row mask) in rule order, so flags come out in form field order
+        checks = []
+        nan = math.nan
+        for rule in self.rules:
+            field = rule.field
+            values = [data.get(field) for data in datas]
+            if rule.required:
+                missing = np.array(
+                    [v is None or (type(v) in _EMPTY_TYPES and not v) for v in values], dtype=bool
+                )
+                checks.append((f"missing_required:{field}", missing))
+                penalties += missing * REQUIRED_PENALTY
+            if rule.min_value is None and rule.max_value is None:
+                continue
+            numbers = np.array(
+                [v if type(v) in _NUMBER_TYPES else nan for v in values], dtype=np.float64
+            )
+            # NaN (missing/non-numeric) compares False, so it is never flagged
+            if rule.min_value is not None:
+                below = numbers < rule.min_value
+                checks.append((f"below_min:{field}", below))
+                penalties += below * BOUND_PENALTY
+            if rule.max_value is not None:
+                above = numbers > rule.max_value
+                checks.append((f"above_max:{field}", above))
+                penalties += above * BOUND_PENALTY
+
+        scores = np.maximum(MAX_SCORE - penalties, 0.0)
+        flags: List[List[str]] = [[] for _ in range(count)]
+        for flag, mask in checks:
+            for row in np.flatnonzero(mask):
+                flags[row].append(flag)
+        return list(zip(scores.tolist(), flags))
+
+
+_rules_cache: "OrderedDict[tuple, QualityRules]" = OrderedDict()
+_rules_cache_lock = threading.Lock()
+
+
+def get_quality_rules(form: dict) -> QualityRules:
+    """
+    Cached QualityRules for a form, keyed by (form id, version, updated_at)
+    like the export row projector, so edited forms are recompiled.
+    """
+    if not form.get("id"):
+        return QualityRules(form.get("fields", []))
+
+    key = (form["id"], form.get("version"), form.get("updated_at"))
+    with _rules_cache_lock:
+        rules = _rules_cache.get(key)
+        if rules is not None:
+            _rules_cache.move_to_end(key)
+            return rules
+
+    rules = QualityRules(form.get("fields", []))
+    with _rules_cache_lock:
+        _rules_cache[key] = rules
+        _rules_cache.move_to_end(key)
+        while len(_rules_cache) > QUALITY_RULES_CACHE_SIZE:
+            _rules_cache.popitem(last=False)
+    return rules
+
+
+def clear_quality_rules_cache():
+    with _rules_cache_lock:
+        _rules_cache.clear()
+
@@ -0,0 +1,441 @@
+"""
+DataPulse - Rollup Engine
+
+Keeps the submission rollups (see utils.rollups) up to date:
+
+- Incremental: submissions that arrived since the last run, found by an
+  ingest watermark on (synced_at, id), are merged into their hourly,
+  daily and per-enumerator buckets (keyed by submitted_at) with $inc
+  bulk upserts. Late offline syncs for past hours are counted when they
+  arrive, and each run reads only the new submissions.
+- Rebuild: buckets of a submitted_at range are recomputed from scratch
+  (status changes, async quality scores, deletions and writes that
+  landed behind the watermark). The daily task rebuilds recent days;
+  the backfill CLI rebuilds history.
+
+Both run under one lease on the watermark document so increments never
+interleave with a rebuild of the same buckets.
+
+Backfill (from backend/):
+    python -m utils.rollup_engine --since 2026-01-01 [--until 2026-06-01] [--org ORG_ID]
+"""
+
+import argparse
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.counters import status_key
+from utils.pagination import Keyset, encode_cursor
+from utils.rollups import (
+    DAY, HOURLY_ROLLUP_RETENTION_DAYS, ROLLUP_STATE, day_floor, hour_floor, iso, parse_time, quality_fields
+)
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUP_BATCH_SIZE = int(os.environ.get("ROLLUP_BATCH_SIZE", "5000"))
+# Submissions synced within this many seconds are left to the next run
+# (in-flight buffered/bulk writes may still land with an older synced_at)
+ROLLUP_SETTLE_SECONDS = int(os.environ.get("ROLLUP_SETTLE_SECONDS", "120"))
+# Recent days recomputed by the daily reconcile (and on the first run)
+ROLLUP_REBUILD_DAYS = int(os.environ.get("ROLLUP_REBUILD_DAYS", "2"))
+ROLLUP_LEASE_SECONDS = int(os.environ.get("ROLLUP_LEASE_SECONDS", "600"))
+
+WATERMARK = "ingest"
+
+# Submission fields the rollups read
+ROLLUP_FIELDS = {
+    "_id": 0, "id": 1, "org_id": 1, "project_id": 1, "form_id": 1, "submitted_by": 1,
+    "submitted_at": 1, "synced_at": 1, "status": 1, "quality_score": 1, "gps_location": 1, "has_media": 1
+}
+
+
+class RollupBusy(Exception):
+    """Another rollup run holds the lease"""
+
+
+# ============ Lease / watermark ============
+
+def acquire_lease(db, now: datetime) -> Tuple[str, dict]:
+    """
+    Take the watermark lease; returns (owner token, watermark document).
+
+    Raises:
+        RollupBusy: another run holds an unexpired lease
+    """
+    owner = uuid.uuid4().hex
+    try:
+        state = db[ROLLUP_STATE].find_one_and_update(
+            {"_id": WATERMARK, "$or": [{"lease_until": {"$lt": iso(now)}}, {"lease_until": None}]},
+            {"$set": {"lease_owner": owner, "lease_until": iso(now + timedelta(seconds=ROLLUP_LEASE_SECONDS))}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise RollupBusy("Rollup already running")
+    return owner, state
+
+
+def renew_lease(db, owner: str):
+    db[ROLLUP_STATE].update_one(
+        {"_id": WATERMARK, "lease_owner": owner},
+        {"$set": {"lease_until": iso(datetime.now(timezone.utc) + timedelta(seconds=ROLLUP_LEASE_SECONDS))}}
+    )
+
+
+def release_lease(db, owner: str):
+    db[ROLLUP_STATE].update_one(
+        {"_id": WATERMARK, "lease_owner": owner},
+        {"$unset": {"lease_owner": "", "lease_until": ""}}
+    )
+
+
+def _mark_covered(db, complete_until: Optional[datetime] = None, since: Optional[datetime] = None):
+    """
+    Publish rollup coverage for the read layer: every submission synced
+    before complete_until is rolled up, back to `since`.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    for name, floor in (("hourly", hour_floor), ("daily", day_floor)):
+        update = {"$set": {"updated_at": now}}
+        if complete_until is not None:
+            update["$set"]["rolled_until"] = iso(floor(complete_until))
+        if since is not None:
+            update["$min"] = {"rolled_from": iso(since)}
+        db[ROLLUP_STATE].update_one({"_id": name}, update, upsert=True)
+
+
+# ============ Incremental ============
+
+def _timestamp(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return iso(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    return value if isinstance(value, str) else None
+
+
+def _quality(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class _Increments:
+    """$inc / $addToSet per rollup row, accumulated over a batch"""
+
+    def __init__(self):
+        self.rows: Dict[Tuple[str, tuple], Dict[str, Any]] = {}
+
+    def add(self, collection: str, key: Dict[str, Any], inc: Dict[str, float], add_to_set: Dict[str, Any] = None):
+        row = self.rows.setdefault((collection, tuple(key.items())), {"inc": {}, "sets": {}})
+        for field, value in inc.items():
+            row["inc"][field] = row["inc"].get(field, 0) + value
+        for field, value in (add_to_set or {}).items():
+            if value is not None:
+                row["sets"].setdefault(field, set()).add(value)
+
+    def updates(self, now: datetime) -> Dict[str, List[UpdateOne]]:
+        per_collection: Dict[str, List[UpdateOne]] = {}
+        for (collection, key), row in self.rows.items():
+            update = {"$inc": row["inc"], "$set": {"updated_at": now.isoformat()}}
+            if row["sets"]:
+                update["$addToSet"] = {field: {"$each": sorted(values)} for field, values in row["sets"].items()}
+            per_collection.setdefault(collection, []).append(UpdateOne(dict(key), update, upsert=True))
+        return per_collection
+
+
+def submission_increments(docs: Iterable[dict]) -> _Increments:
+    """Rollup increments for newly arrived submissions"""
+    increments = _Increments()
+    for doc in docs:
+        submitted_at = _timestamp(doc.get("submitted_at"))
+        if not doc.get("org_id") or not submitted_at:
+            continue
+        quality = _quality(doc.get("quality_score"))
+        common = {"by_status." + status_key(doc.get("status")): 1}
+        if quality is not None:
+            common.update(quality_sum=quality, quality_count=1)
+        hour, day = f"{submitted_at[:13]}:00:00+00:00", submitted_at[:10]
+
+        increments.add(
+            "analytics_hourly",
+            {"org_id": doc["org_id"], "project_id": doc.get("project_id"), "form_id": doc.get("form_id"), "period_start": hour},
+            {"submission_count": 1, **common}
+        )
+        increments.add(
+            "analytics_daily",
+            {"org_id": doc["org_id"], "date": day},
+            {
+                "total_submissions": 1,
+                "submissions_with_gps": int(doc.get("gps_location") is not None),
+                "submissions_with_media": int(doc.get("has_media") is True),
+                **common
+            },
+            {"form_ids": doc.get("form_id"), "user_ids": doc.get("submitted_by")}
+        )
+        increments.add(
+            "analytics_team_daily",
+            {"org_id": doc["org_id"], "user_id": doc.get("submitted_by"), "date": day},
+            {"submission_count": 1, **common},
+            {"form_ids": doc.get("form_id")}
+        )
+    return increments
+
+
+def _bulk_write(db, per_collection: Dict[str, List[UpdateOne]]):
+    for collection, updates in per_collection.items():
+        for start in range(0, len(updates), 1000):
+            db[collection].bulk_write(updates[start:start + 1000], ordered=False)
+
+
+def roll_up_new_submissions(db, max_batches: int = 100) -> dict:
+    """
+    Merge submissions synced since the watermark into the rollups.
+    The first run starts the watermark at the settle cutoff and rebuilds
+    the last ROLLUP_REBUILD_DAYS days instead.
+
+    Raises:
+        RollupBusy: another run holds the lease
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+    owner, state = acquire_lease(db, now)
+    try:
+        if not state.get("synced_at"):
+            since = day_floor(cutoff) - (ROLLUP_REBUILD_DAYS - 1) * DAY
+            watermark = {"synced_at": iso(cutoff), "id": ""}
+            db[ROLLUP_STATE].update_one({"_id": WATERMARK}, {"$set": watermark})
+            rebuilt = _rebuild(db, owner, watermark, since, day_floor(cutoff) + DAY)
+            _mark_covered(db, cutoff, since)
+            return {"initialized": iso(cutoff), "rebuilt": rebuilt}
+
+        keyset = Keyset("synced_at", "id", descending=False)
+        cursor = encode_cursor(state["synced_at"], state.get("id", ""))
+        processed = 0
+        complete_until = parse_time(state["synced_at"])
+        for _ in range(max_batches):
+            query = keyset.apply({"synced_at": {"$lt": iso(cutoff)}}, cursor)
+            docs = list(db.submissions.find(query, ROLLUP_FIELDS).sort(keyset.sort).limit(ROLLUP_BATCH_SIZE))
+            if docs:
+                _bulk_write(db, submission_increments(docs).updates(now))
+                last = docs[-1]
+                cursor = keyset.cursor_for(last)
+                # Advance only after the batch is merged
+                db[ROLLUP_STATE].update_one(
+                    {"_id": WATERMARK, "lease_owner": owner},
+                    {"$set": {"synced_at": last["synced_at"], "id": last["id"], "updated_at": now.isoformat()}}
+                )
+                renew_lease(db, owner)
+                processed += len(docs)
+                complete_until = parse_time(last["synced_at"])
+            if len(docs) < ROLLUP_BATCH_SIZE:
+                complete_until = cutoff
+                break
+        _mark_covered(db, complete_until)
+        return {"processed": processed, "complete_until": iso(complete_until)}
+    finally:
+        release_lease(db, owner)
+
+
+# ============ Rebuild ============
+
+def rollup_pipeline(match: dict, key: Dict[str, Any], extra: Optional[dict] = None) -> List[dict]:
+    """
+    Submissions matching `match` grouped by `key` (plus status), then
+    folded into one row per key with a by_status breakdown.
+    """
+    status_group = dict(key, status={"$ifNull": ["$status", "none"]})
+    second = {
+        "submission_count": {"$sum": "$count"},
+        "quality_sum": {"$sum": "$quality_sum"},
+        "quality_count": {"$sum": "$quality_count"},
+        "statuses": {"$push": {"k": "$_id.status", "v": "$count"}},
+    }
+    for name, accumulator in (extra or {}).items():
+        # Sets are unioned below; sums add up
+        second[name] = {"$push": f"${name}"} if "$addToSet" in accumulator else {"$sum": f"${name}"}
+    return [
+        {"$match": match},
+        {"$group": {"_id": status_group, "count": {"$sum": 1}, **quality_fields(), **(extra or {})}},
+        {"$group": {"_id": {name: f"$_id.{name}" for name in key}, **second}},
+    ]
+
+
+def _fold(row: dict) -> dict:
+    by_status: Dict[str, int] = {}
+    for item in row.get("statuses", []):
+        status = status_key(item["k"])
+        by_status[status] = by_status.get(status, 0) + item["v"]
+    return {
+        "by_status": by_status,
+        "quality_sum": row.get("quality_sum", 0),
+        "quality_count": row.get("quality_count", 0),
+    }
+
+
+def _union(sets: List[List[Any]]) -> List[Any]:
+    return sorted({value for values in sets for value in values if value is not None}, key=str)
+
+
+def _rebuild_hours(db, match: dict, day: datetime, stamp: str, org_match: dict) -> int:
+    hourly = db.submissions.aggregate(rollup_pipeline(match, {
+        "org_id": "$org_id", "project_id": "$project_id", "form_id": "$form_id",
+        "hour": {"$substr": ["$submitted_at", 0, 13]}
+    }), allowDiskUse=True)
+    updates = []
+    for row in hourly:
+        key = row["_id"]
+        if not key.get("org_id"):
+            continue
+        updates.append(UpdateOne(
+            {"org_id": key["org_id"], "project_id": key.get("project_id"), "form_id": key.get("form_id"),
+             "period_start": f"{key['hour']}:00:00+00:00"},
+            {"$set": {"submission_count": row["submission_count"], **_fold(row), "rebuilt_at": stamp}},
+            upsert=True
+        ))
+    _bulk_write(db, {"analytics_hourly": updates})
+    db.analytics_hourly.delete_many({
+        **org_match,
+        "period_start": {"$gte": iso(day), "$lt": iso(day + DAY)},
+        "rebuilt_at": {"$ne": stamp}
+    })
+    return len(updates)
+
+
+def _rebuild_day(db, watermark: dict, day: datetime, stamp: str, org_id: Optional[str]) -> int:
+    """Recompute every rollup row of one day; returns rows written"""
+    match = {
+        "submitted_at": {"$gte": iso(day), "$lt": iso(day + DAY)},
+        # Submissions up to the watermark only; later ones arrive by $inc
+        "$or": [
+            {"synced_at": {"$lt": watermark["synced_at"]}},
+            {"synced_at": watermark["synced_at"], "id": {"$lte": watermark.get("id", "")}},
+            {"synced_at": None},
+        ],
+    }
+    if org_id:
+        match["org_id"] = org_id
+    org_match = {"org_id": org_id} if org_id else {}
+    written = 0
+
+    if day + DAY > hour_floor(datetime.now(timezone.utc)) - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS):
+        # Older hours would only be cleaned up again
+        written += _rebuild_hours(db, match, day, stamp, org_match)
+
+    daily = db.submissions.aggregate(rollup_pipeline(match, {"org_id": "$org_id"}, extra={
+        "form_ids": {"$addToSet": "$form_id"},
+        "user_ids": {"$addToSet": "$submitted_by"},
+        "submissions_with_gps": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$gps_location", None]}, None]}, 1, 0]}},
+        "submissions_with_media": {"$sum": {"$cond": [{"$eq": ["$has_media", True]}, 1, 0]}},
+    }), allowDiskUse=True)
+    updates = []
+    for row in daily:
+        if not row["_id"].get("org_id"):
+            continue
+        updates.append(UpdateOne(
+            {"org_id": row["_id"]["org_id"], "date": day.strftime("%Y-%m-%d")},
+            {"$set": {
+                "total_submissions": row["submission_count"],
+                **_fold(row),
+                "form_ids": _union(row["form_ids"]),
+                "user_ids": _union(row["user_ids"]),
+                "submissions_with_gps": row["submissions_with_gps"],
+                "submissions_with_media": row["submissions_with_media"],
+                "rebuilt_at": stamp
+            }},
+            upsert=True
+        ))
+    _bulk_write(db, {"analytics_daily": updates})
+    db.analytics_daily.delete_many({**org_match, "date": day.strftime("%Y-%m-%d"), "rebuilt_at": {"$ne": stamp}})
+    written += len(updates)
+
+    team = db.submissions.aggregate(rollup_pipeline(
+        match, {"org_id": "$org_id", "user_id": "$submitted_by"}, extra={"form_ids": {"$addToSet": "$form_id"}}
+    ), allowDiskUse=True)
+    updates = []
+    for row in team:
+        key = row["_id"]
+        if not key.get("org_id"):
+            continue
+        updates.append(UpdateOne(
+            {"org_id": key["org_id"], "user_id": key.get("user_id"), "date": day.strftime("%Y-%m-%d")},
+            {"$set": {
+                "submission_count": row["submission_count"],
+                **_fold(row),
+                "form_ids": _union(row["form_ids"]),
+                "rebuilt_at": stamp
+            }},
+            upsert=True
+        ))
+    _bulk_write(db, {"analytics_team_daily": updates})
+    db.analytics_team_daily.delete_many({**org_match, "date": day.strftime("%Y-%m-%d"), "rebuilt_at": {"$ne": stamp}})
+    written += len(updates)
+
+    return written
+
+
+def _rebuild(db, owner: str, watermark: dict, since: datetime, until: datetime, org_id: Optional[str] = None) -> int:
+    stamp = uuid.uuid4().hex
+    written = 0
+    day = day_floor(since)
+    while day < until:
+        written += _rebuild_day(db, watermark, day, stamp, org_id)
+        renew_lease(db, owner)
+        day += DAY
+    return written
+
+
+def rebuild_rollups(db, since: datetime, until: Optional[datetime] = None, org_id: Optional[str] = None) -> dict:
+    """
+    Recompute the rollups of whole days from `since` up to `until`
+    (default: through today), for one org or all of them.
+
+    Raises:
+        RollupBusy: another run holds the lease
+    """
+    now = datetime.now(timezone.utc)
+    since = day_floor(since)
+    until = day_floor(until) if until else day_floor(now) + DAY
+    owner, state = acquire_lease(db, now)
+    try:
+        initialized = None
+        if not state.get("synced_at"):
+            # Nothing rolled up yet: everything synced so far belongs to the rebuild
+            initialized = now - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+            state.update(synced_at=iso(initialized), id="")
+            db[ROLLUP_STATE].update_one({"_id": WATERMARK}, {"$set": {"synced_at": state["synced_at"], "id": ""}})
+        written = _rebuild(db, owner, state, since, until, org_id)
+
+        if org_id is None:
+            # Extend coverage back to `since` when the rebuilt range joins it
+            coverage = db[ROLLUP_STATE].find_one({"_id": "daily"}) or {}
+            rolled_from = parse_time(coverage.get("rolled_from"))
+            if initialized is not None or rolled_from is None or until >= rolled_from:
+                _mark_covered(db, initialized, since)
+        return {"since": iso(since), "until": iso(until), "rows": written}
+    finally:
+        release_lease(db, owner)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", required=True, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--until", help="day after the last one to rebuild (default: through today)")
+    parser.add_argument("--org", help="rebuild one organization only")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from utils.mongo_pool import get_sync_db
+
+    load_dotenv()
+    result = rebuild_rollups(get_sync_db(), parse_time(args.since), parse_time(args.until), args.org)
+    print(f"Rebuilt {result['rows']} rollup rows for {result['since'][:10]} .. {result['until'][:10]}")
+
+
+if __name__ == "__main__":
+    main()
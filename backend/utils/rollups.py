@@ -0,0 +1,267 @@
+"""
+DataPulse - Submission Rollups
+
+Pre-aggregated submission statistics and the read layer that serves
+dashboard/analytics queries from them:
+
+- analytics_hourly      per (org, project, form, hour)
+- analytics_daily       per (org, day)
+- analytics_team_daily  per (org, enumerator, day)
+
+Every rollup row carries submission_count (total_submissions for
+analytics_daily), by_status, quality_sum and quality_count, so rows add
+up over any range. utils.rollup_engine maintains them and records in
+analytics_rollup_state which time window each rollup covers
+({"_id": "hourly" | "daily", "rolled_from", "rolled_until"}).
+
+A query over [start, end) is split into segments: whole days inside the
+daily coverage, whole hours inside the hourly coverage, and live
+aggregation over submissions for everything else (normally just the
+current partial hour).
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+HOURLY_ROLLUP_RETENTION_DAYS = int(os.environ.get("HOURLY_ROLLUP_RETENTION_DAYS", "90"))
+
+ROLLUP_STATE = "analytics_rollup_state"
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def iso(value: datetime) -> str:
+    """Timestamp in the stored submitted_at format (UTC isoformat)"""
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def day_str(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def hour_floor(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_floor(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def quality_fields() -> dict:
+    """$group accumulators for quality_sum / quality_count (numeric scores only)"""
+    return {
+        "quality_sum": {"$sum": {"$cond": [{"$isNumber": "$quality_score"}, "$quality_score", 0]}},
+        "quality_count": {"$sum": {"$cond": [{"$isNumber": "$quality_score"}, 1, 0]}},
+    }
+
+
+# ============ Read layer ============
+
+class Bucket(dict):
+    """Summed rollup values of one (time bucket, dimension) key"""
+
+    def __init__(self):
+        super().__init__(count=0, by_status={}, quality_sum=0.0, quality_count=0)
+
+    def add(self, count: int, by_status: Dict[str, int], quality_sum: float, quality_count: int):
+        self["count"] += count
+        for status, n in by_status.items():
+            self["by_status"][status] = self["by_status"].get(status, 0) + n
+        self["quality_sum"] += quality_sum or 0
+        self["quality_count"] += quality_count or 0
+
+    @property
+    def avg_quality(self) -> Optional[float]:
+        return self["quality_sum"] / self["quality_count"] if self["quality_count"] else None
+
+
+class _Source(NamedTuple):
+    collection: str
+    state: Optional[str]            # coverage document id; None = live submissions
+    step: timedelta                 # granularity
+    time_field: str
+    count: Any                      # count expression per row
+    dimensions: Dict[str, str]      # dimension name -> field expression
+    filters: Tuple[str, ...]        # filter fields the rows carry
+
+
+_LIVE = _Source("submissions", None, timedelta(0), "submitted_at", 1,
+                {"project_id": "$project_id", "form_id": "$form_id", "user_id": "$submitted_by"}, ("project_id", "form_id"))
+_HOURLY = _Source("analytics_hourly", "hourly", HOUR, "period_start", "$submission_count",
+                  {"project_id": "$project_id", "form_id": "$form_id"}, ("project_id", "form_id"))
+_DAILY = _Source("analytics_daily", "daily", DAY, "date", "$total_submissions", {}, ())
+_TEAM_DAILY = _Source("analytics_team_daily", "daily", DAY, "date", "$submission_count", {"user_id": "$user_id"}, ())
+
+
+def _supports(source: _Source, dimension: Optional[str], filters: Dict[str, str]) -> bool:
+    return (dimension is None or dimension in source.dimensions) and all(f in source.filters for f in filters)
+
+
+def _floor(value: datetime, step: timedelta) -> datetime:
+    return day_floor(value) if step == DAY else hour_floor(value)
+
+
+def plan_segments(
+    start: datetime,
+    end: datetime,
+    coverages: List[Tuple[_Source, datetime, datetime]]
+) -> List[Tuple[_Source, datetime, datetime]]:
+    """
+    Split [start, end) into (source, from, until) segments, preferring the
+    coarsest rollup whose coverage holds whole steps, then finer ones,
+    then live aggregation. `coverages` is ordered coarsest first.
+    """
+    segments = []
+    cur = start
+    while cur < end:
+        for source, covered_from, covered_until in coverages:
+            if not (covered_from <= cur and _floor(cur, source.step) == cur):
+                continue
+            stop = min(_floor(end, source.step), covered_until)
+            # Stop where a coarser rollup can take over
+            for coarser, c_from, c_until in coverages:
+                if coarser is source:
+                    break
+                boundary = _floor(cur, coarser.step) + coarser.step
+                if c_from <= boundary < c_until and boundary + coarser.step <= end:
+                    stop = min(stop, boundary)
+            if stop > cur:
+                segments.append((source, cur, stop))
+                cur = stop
+                break
+        else:
+            # Live until the next point where some rollup covers a whole step
+            stop = end
+            for source, covered_from, covered_until in coverages:
+                boundary = max(covered_from, _floor(cur, source.step) + source.step)
+                if boundary < covered_until:
+                    stop = min(stop, boundary)
+            segments.append((_LIVE, cur, stop))
+            cur = stop
+    return segments
+
+
+async def rollup_coverage(db) -> Dict[str, Tuple[datetime, datetime]]:
+    """{"hourly": (from, until), "daily": (from, until)} for rollups that have run"""
+    coverage = {}
+    async for state in db[ROLLUP_STATE].find({}):
+        rolled_from, rolled_until = parse_time(state.get("rolled_from")), parse_time(state.get("rolled_until"))
+        if rolled_from and rolled_until and rolled_from < rolled_until:
+            coverage[state["_id"]] = (rolled_from, rolled_until)
+    if "hourly" in coverage:
+        # Hours older than the retention window may already be cleaned up
+        retained = hour_floor(datetime.now(timezone.utc) - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS)) + HOUR
+        rolled_from, rolled_until = coverage["hourly"]
+        coverage["hourly"] = (max(rolled_from, retained), rolled_until)
+    return coverage
+
+
+def _range_match(source: _Source, start: datetime, end: datetime) -> dict:
+    if source.step == DAY:
+        return {source.time_field: {"$gte": day_str(start), "$lt": day_str(end)}}
+    return {source.time_field: {"$gte": iso(start), "$lt": iso(end)}}
+
+
+def _segment_pipeline(source: _Source, match: dict, key: dict) -> List[dict]:
+    # Totals over the whole range group on a constant
+    group_key = key or None
+    if source is _LIVE:
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": dict(key, status={"$ifNull": ["$status", "none"]}),
+                "count": {"$sum": 1},
+                **quality_fields()
+            }},
+        ]
+    return [
+        {"$match": match},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": group_key,
+                "count": {"$sum": source.count},
+                "quality_sum": {"$sum": "$quality_sum"},
+                "quality_count": {"$sum": "$quality_count"},
+            }}],
+            "statuses": [
+                {"$project": {"key": group_key if key else {"$literal": None}, "status": {"$objectToArray": {"$ifNull": ["$by_status", {}]}}}},
+                {"$unwind": "$status"},
+                {"$group": {"_id": {"key": "$key", "status": "$status.k"}, "count": {"$sum": "$status.v"}}},
+            ],
+        }},
+    ]
+
+
+async def submission_rollup(
+    db,
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    bucket: Optional[str] = "day",
+    dimension: Optional[str] = None,
+    project_id: Optional[str] = None,
+    form_id: Optional[str] = None
+) -> Dict[Tuple[Optional[str], Optional[str]], Bucket]:
+    """
+    Submission counts, status breakdown and quality sums for an org over
+    [start, end), keyed by (day or None, dimension value or None).
+
+    bucket: "day" or None (totals over the whole range)
+    dimension: None, "project_id", "form_id" or "user_id"
+    """
+    filters = {name: value for name, value in (("project_id", project_id), ("form_id", form_id)) if value}
+    coverage = await rollup_coverage(db)
+    coverages = []
+    for source in (_TEAM_DAILY if dimension == "user_id" else _DAILY, _HOURLY):
+        if source.state in coverage and _supports(source, dimension, filters):
+            coverages.append((source, *coverage[source.state]))
+
+    result: Dict[Tuple[Optional[str], Optional[str]], Bucket] = {}
+    for source, seg_start, seg_end in plan_segments(start, end, coverages):
+        key = {}
+        if bucket == "day":
+            key["day"] = f"${source.time_field}" if source.step == DAY else {"$substr": [f"${source.time_field}", 0, 10]}
+        if dimension:
+            key["dim"] = source.dimensions[dimension]
+        match = {"org_id": org_id, **filters, **_range_match(source, seg_start, seg_end)}
+        rows = await db[source.collection].aggregate(_segment_pipeline(source, match, key)).to_list(None)
+
+        def target(row_key: Optional[dict]) -> Bucket:
+            row_key = row_key or {}
+            k = (row_key.get("day"), row_key.get("dim"))
+            if k not in result:
+                result[k] = Bucket()
+            return result[k]
+
+        if source is _LIVE:
+            for row in rows:
+                status = str(row["_id"]["status"])
+                target(row["_id"]).add(row["count"], {status: row["count"]}, row["quality_sum"], row["quality_count"])
+        elif rows:
+            for row in rows[0]["totals"]:
+                target(row["_id"]).add(row["count"], {}, row["quality_sum"], row["quality_count"])
+            for row in rows[0]["statuses"]:
+                target(row["_id"]["key"]).add(0, {row["_id"]["status"]: row["count"]}, 0, 0)
+    return result
+
+
+def day_range(start: datetime, end: datetime) -> List[str]:
+    """Day strings from start's day through end's day"""
+    days = []
+    current = day_floor(start)
+    while current <= end:
+        days.append(day_str(current))
+        current += DAY
+    return days
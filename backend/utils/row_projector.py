@@ -0,0 +1,229 @@
+"""
+DataPulse - Export Row Projector
+
+Compiles a form's field definitions into a row projector that pulls
+each export column straight out of a submission document.
+
+The projector is built once per form version: every column gets a
+getter bound to its data path and a coercion for its field type, so
+exporting a row is a single pass over precompiled getters instead of
+flattening the whole data dict and rebuilding key strings per row.
+GPS fields expand to <name>_lat / <name>_lng columns.
+
+Projectors are cached in-process (LRU) and shared by all exporters;
+each exporter only decides how to render the typed values for its format.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from utils.streaming_export import (
+    coerce_date,
+    coerce_datetime,
+    coerce_float,
+    coerce_str,
+    coerce_str_list,
+)
+
+
+# Column kinds (the Python type each kind projects to)
+TEXT = "text"                  # str
+NUMBER = "number"              # float
+DATE = "date"                  # datetime.date
+DATETIME = "datetime"          # timezone-aware datetime
+CATEGORICAL = "categorical"    # option value as str
+MULTI_CHOICE = "multi_choice"  # list of option values
+
+NUMERIC_FIELD_TYPES = {"number", "calculate"}
+CATEGORICAL_FIELD_TYPES = {"select", "radio"}
+MULTI_CHOICE_FIELD_TYPES = {"multiselect", "checkbox"}
+SKIPPED_FIELD_TYPES = {"note"}
+
+STATUS_OPTIONS = [
+    {"value": "pending", "label": "Pending"},
+    {"value": "approved", "label": "Approved"},
+    {"value": "rejected", "label": "Rejected"},
+    {"value": "flagged", "label": "Flagged"},
+]
+
+PROJECTOR_CACHE_SIZE = int(os.environ.get("ROW_PROJECTOR_CACHE_SIZE", "256"))
+
+
+class ProjectedColumn(NamedTuple):
+    name: str
+    kind: str
+    label: str
+    options: List[Dict]
+
+
+def _coerce_categorical(value: Any) -> Optional[str]:
+    value = coerce_str(value)
+    return value if value else None
+
+
+KIND_COERCIONS: Dict[str, Callable[[Any], Any]] = {
+    TEXT: coerce_str,
+    NUMBER: coerce_float,
+    DATE: coerce_date,
+    DATETIME: coerce_datetime,
+    CATEGORICAL: _coerce_categorical,
+    MULTI_CHOICE: coerce_str_list,
+}
+
+
+def _path_getter(name: str) -> Callable[[dict], Any]:
+    """Getter for a (possibly dotted, i.e. grouped) field name within submission data"""
+    parts = name.split(".")
+    if len(parts) == 1:
+        return lambda data: data.get(name)
+
+    def get(data: dict) -> Any:
+        value = data
+        for part in parts:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+    return get
+
+
+def _gps_getter(path: Callable[[dict], Any], key: str, short_key: str) -> Callable[[dict], Optional[float]]:
+    def get(data: dict) -> Optional[float]:
+        value = path(data)
+        if isinstance(value, dict):
+            return coerce_float(value.get(key, value.get(short_key)))
+        return None
+    return get
+
+
+class RowProjector:
+    """
+    Projects submission documents onto a form's export columns.
+
+    Columns, in order:
+    - id, submitted_by, submitted_at, status, quality_score
+    - one column per form field (note fields skipped)
+    - gps fields as <name>_lat / <name>_lng numbers
+    """
+
+    def __init__(self, form: dict):
+        self.columns: List[ProjectedColumn] = []
+        self._getters: List[Callable[[dict, dict], Any]] = []
+
+        self._add_meta("id", TEXT, "Submission ID")
+        self._add_meta("submitted_by", TEXT, "Submitted By")
+        self._add_meta("submitted_at", DATETIME, "Submission Date/Time")
+        self._add_meta("status", CATEGORICAL, "Submission Status", STATUS_OPTIONS)
+        self._add_meta("quality_score", NUMBER, "Quality Score (0-100)")
+
+        for field in form.get("fields", []):
+            self._add_field(field)
+
+        self.names: List[str] = [column.name for column in self.columns]
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    def _add(self, column: ProjectedColumn, getter: Callable[[dict, dict], Any]):
+        self.columns.append(column)
+        self._getters.append(getter)
+
+    def _add_meta(self, key: str, kind: str, label: str, options: Optional[List[Dict]] = None):
+        coerce = KIND_COERCIONS[kind]
+        self._add(
+            ProjectedColumn(key, kind, label, options or []),
+            lambda sub, data: coerce(sub.get(key))
+        )
+
+    def _add_field(self, field: dict):
+        name = field["name"]
+        label = field.get("label") or name
+        field_type = field.get("type", "text")
+        path = _path_getter(name)
+
+        if field_type in SKIPPED_FIELD_TYPES:
+            return
+        if field_type == "gps":
+            for suffix, key, short_key, part_label in (
+                ("lat", "latitude", "lat", "latitude"),
+                ("lng", "longitude", "lng", "longitude")
+            ):
+                get = _gps_getter(path, key, short_key)
+                self._add(
+                    ProjectedColumn(f"{name}_{suffix}", NUMBER, f"{label} ({part_label})", []),
+                    lambda sub, data, get=get: get(data)
+                )
+            return
+
+        if field_type in NUMERIC_FIELD_TYPES:
+            kind = NUMBER
+        elif field_type == "date":
+            kind = DATE
+        elif field_type == "datetime":
+            kind = DATETIME
+        elif field_type in CATEGORICAL_FIELD_TYPES:
+            kind = CATEGORICAL
+        elif field_type in MULTI_CHOICE_FIELD_TYPES:
+            kind = MULTI_CHOICE
+        else:
+            kind = TEXT
+
+        options = [opt for opt in field.get("options", []) if isinstance(opt, dict)]
+        coerce = KIND_COERCIONS[kind]
+        if "." in name:
+            getter = lambda sub, data, path=path, coerce=coerce: coerce(path(data))
+        else:
+            # Top-level field: skip the path walk
+            getter = lambda sub, data, key=name, coerce=coerce: coerce(data.get(key))
+        self._add(ProjectedColumn(name, kind, label, options), getter)
+
+    def project(self, sub: dict) -> List[Any]:
+        """Typed values of one submission, aligned with self.columns"""
+        data = sub.get("data") or {}
+        return [getter(sub, data) for getter in self._getters]
+
+    def project_rows(self, submissions: List[Dict]) -> List[List[Any]]:
+        """Row-major projection of a chunk"""
+        project = self.project
+        return [project(sub) for sub in submissions]
+
+    def project_columns(self, submissions: List[Dict]) -> List[List[Any]]:
+        """Column-major projection of a chunk (for columnar writers)"""
+        pairs = [(sub, sub.get("data") or {}) for sub in submissions]
+        return [[getter(sub, data) for sub, data in pairs] for getter in self._getters]
+
+
+_projector_cache: "OrderedDict[tuple, RowProjector]" = OrderedDict()
+_projector_cache_lock = threading.Lock()
+
+
+def get_row_projector(form: dict) -> RowProjector:
+    """
+    Cached RowProjector for a form.
+
+    Keyed by (form id, version, updated_at): publishing bumps the version
+    and draft field edits bump updated_at, so a stale projector is never
+    reused. Least recently used projectors are evicted first.
+    """
+    if not form.get("id"):
+        return RowProjector(form)
+
+    key = (form["id"], form.get("version"), form.get("updated_at"))
+    with _projector_cache_lock:
+        projector = _projector_cache.get(key)
+        if projector is not None:
+            _projector_cache.move_to_end(key)
+            return projector
+
+    projector = RowProjector(form)
+    with _projector_cache_lock:
+        _projector_cache[key] = projector
+        _projector_cache.move_to_end(key)
+        while len(_projector_cache) > PROJECTOR_CACHE_SIZE:
+            _projector_cache.popitem(last=False)
+    return projector
+
+
+def clear_projector_cache():
+    with _projector_cache_lock:
+        _projector_cache.clear()
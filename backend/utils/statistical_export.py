@@ -0,0 +1,249 @@
+"""
+DataPulse - Statistical Package Exports
+
+Native Stata (.dta) and SPSS (.sav) files.
+
+Variables are typed by the form's row projector and carry the
+field labels as variable labels. Select/radio fields are exported as
+numeric codes with value labels taken from the field options, so the
+files open in Stata/SPSS ready for analysis without re-importing CSV.
+
+Both formats declare string widths and value labels ahead of the data,
+and neither is known until the last submission has been seen. Cursor
+chunks are therefore converted into typed column blocks and spooled to
+a temp file as they arrive; once the cursor is exhausted the file
+header is written with the final widths, labels and row count and the
+spooled blocks are packed into records one at a time
+(utils.statistical_formats). Memory use is bounded by the chunk size,
+not the export size, so exports of any size can be downloaded directly.
+"""
+
+import asyncio
+import pickle
+import re
+import tempfile
+from typing import AsyncGenerator, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.row_projector import (
+    CATEGORICAL,
+    DATE,
+    DATETIME,
+    MULTI_CHOICE,
+    TEXT,
+    get_row_projector,
+)
+from utils.statistical_formats import StatisticalVariable, write_dta_file, write_sav_file
+
+
+# Both packages accept longer names in recent versions; 32 is safe for either
+MAX_VARIABLE_NAME_LENGTH = 32
+# Stata limits variable labels to 80 characters and str# columns to 2045 bytes
+STATA_MAX_LABEL_LENGTH = 80
+STATA_MAX_STRING_LENGTH = 2045
+SPSS_MAX_LABEL_LENGTH = 256
+SPSS_MAX_STRING_LENGTH = 32767
+
+# Unix epoch as a proleptic Gregorian ordinal
+EPOCH_ORDINAL = 719163
+
+
+def truncate_utf8(value: str, max_bytes: int) -> str:
+    """Cut a string to at most max_bytes of UTF-8 without splitting a character"""
+    encoded = value.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return value
+    return encoded[:max_bytes].decode("utf-8", "ignore")
+
+
+def variable_name(name: str, taken: set) -> str:
+    """Make a form field name a valid, unique Stata/SPSS variable name"""
+    cleaned = re.sub(r"[^A-Za-z0-9_]", "_", name) or "var"
+    if not cleaned[0].isalpha():
+        cleaned = f"v{cleaned}"
+    cleaned = cleaned[:MAX_VARIABLE_NAME_LENGTH]
+
+    candidate, suffix = cleaned, 1
+    while candidate.lower() in taken:
+        suffix += 1
+        tail = f"_{suffix}"
+        candidate = f"{cleaned[:MAX_VARIABLE_NAME_LENGTH - len(tail)]}{tail}"
+    taken.add(candidate.lower())
+    return candidate
+
+
+class ValueLabelEncoder:
+    """
+    Maps categorical values to stable numeric codes with value labels.
+
+    Options whose values are all integers keep those integers as codes
+    (so "1"/"2" stay 1/2); otherwise options are numbered 1..n in form
+    order. Values found in the data but not declared as options get the
+    next free code, labelled with the raw value.
+    """
+
+    def __init__(self, options: List[Dict]):
+        values = [str(opt.get("value", "")) for opt in options]
+        use_values = bool(values) and all(re.fullmatch(r"-?\d+", v) for v in values)
+
+        self.codes: Dict[str, int] = {}
+        self.labels: Dict[int, str] = {}
+        for i, (opt, value) in enumerate(zip(options, values), 1):
+            if value in self.codes:
+                continue
+            code = int(value) if use_values else i
+            self.codes[value] = code
+            self.labels[code] = str(opt.get("label") or value)
+
+    def encode(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        code = self.codes.get(value)
+        if code is None:
+            code = max(self.labels, default=0) + 1
+            self.codes[value] = code
+            self.labels[code] = value
+        return code
+
+
+class StatisticalBlockBuilder:
+    """
+    Converts chunks of submission documents into typed column blocks.
+
+    Columns come from the form's row projector:
+    - number/calculate (and gps lat/lng) -> double
+    - select/radio -> numeric codes with value labels
+    - date -> days since 1970, datetime -> seconds since 1970 (UTC);
+      written as %td/%tc (Stata) or DATE/DATETIME (SPSS)
+    - multiselect/checkbox -> space-separated option values
+    - everything else -> UTF-8 string (nested values as JSON), cut to
+      max_string_bytes
+
+    The widest string of each column is tracked as blocks are built, so
+    variables() is final once every chunk has gone through build().
+    """
+
+    def __init__(self, form: dict, max_string_bytes: int):
+        self.projector = get_row_projector(form)
+        self.max_string_bytes = max_string_bytes
+        taken: set = set()
+        self.names: List[str] = [variable_name(column.name, taken) for column in self.projector.columns]
+        self.widths: List[int] = [0] * len(self.names)
+        self._encoders: Dict[int, ValueLabelEncoder] = {
+            i: ValueLabelEncoder(column.options)
+            for i, column in enumerate(self.projector.columns)
+            if column.kind == CATEGORICAL
+        }
+
+    def build(self, submissions: List[Dict]) -> List:
+        """Convert a chunk of submission documents into one column block"""
+        block = []
+        values_by_column = self.projector.project_columns(submissions)
+        for i, (column, values) in enumerate(zip(self.projector.columns, values_by_column)):
+            kind = column.kind
+            if kind == CATEGORICAL:
+                encode = self._encoders[i].encode
+                block.append(np.array([encode(v) for v in values], dtype="float64"))
+            elif kind == DATE:
+                block.append(np.array([v.toordinal() - EPOCH_ORDINAL if v else None for v in values], dtype="float64"))
+            elif kind == DATETIME:
+                block.append(np.array([v.timestamp() if v else None for v in values], dtype="float64"))
+            elif kind == MULTI_CHOICE:
+                block.append(self._strings(i, [" ".join(v) if v else None for v in values]))
+            elif kind == TEXT:
+                block.append(self._strings(i, values))
+            else:
+                block.append(np.array(values, dtype="float64"))
+        return block
+
+    def _strings(self, i: int, values: List[Optional[str]]) -> List[bytes]:
+        encoded = [
+            value.encode("utf-8") if isinstance(value, str) else b""
+            for value in values
+        ]
+        if any(len(value) > self.max_string_bytes for value in encoded):
+            encoded = [
+                truncate_utf8(value.decode("utf-8"), self.max_string_bytes).encode("utf-8")
+                if len(value) > self.max_string_bytes else value
+                for value in encoded
+            ]
+        self.widths[i] = max([self.widths[i]] + [len(value) for value in encoded])
+        return encoded
+
+    def variables(self, max_label_length: int) -> List[StatisticalVariable]:
+        """Final variable list (call after every chunk has been built)"""
+        return [
+            StatisticalVariable(
+                name,
+                column.label[:max_label_length],
+                TEXT if column.kind == MULTI_CHOICE else column.kind,
+                self.widths[i],
+                dict(self._encoders[i].labels) if i in self._encoders else {}
+            )
+            for i, (name, column) in enumerate(zip(self.names, self.projector.columns))
+        ]
+
+
+def _read_spool(spool, blocks: int) -> Iterator[List]:
+    spool.seek(0)
+    for _ in range(blocks):
+        yield pickle.load(spool)
+
+
+async def _write_spooled(
+    chunks: AsyncGenerator[List[Dict], None],
+    builder: StatisticalBlockBuilder,
+    write: Callable[[List[StatisticalVariable], int, Iterator[List]], None],
+    max_label_length: int
+) -> int:
+    """
+    Spool every chunk as a column block, then hand the final variables,
+    row count and spooled blocks to a format writer.
+    """
+    loop = asyncio.get_event_loop()
+    rows = blocks = 0
+    with tempfile.TemporaryFile(prefix="statistical-export-") as spool:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            await loop.run_in_executor(
+                None, lambda chunk=chunk: pickle.dump(builder.build(chunk), spool, pickle.HIGHEST_PROTOCOL)
+            )
+            rows += len(chunk)
+            blocks += 1
+        variables = builder.variables(max_label_length)
+        await loop.run_in_executor(None, write, variables, rows, _read_spool(spool, blocks))
+    return rows
+
+
+async def write_dta(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    """
+    Write submission chunks to a Stata .dta file.
+
+    Returns:
+        Number of rows written
+    """
+    builder = StatisticalBlockBuilder(form, max_string_bytes=STATA_MAX_STRING_LENGTH)
+    label = str(form.get("name", ""))[:STATA_MAX_LABEL_LENGTH]
+    return await _write_spooled(
+        chunks, builder,
+        lambda variables, rows, blocks: write_dta_file(path, variables, rows, blocks, label),
+        STATA_MAX_LABEL_LENGTH
+    )
+
+
+async def write_sav(chunks: AsyncGenerator[List[Dict], None], form: dict, path: str) -> int:
+    """
+    Write submission chunks to a bytecode-compressed SPSS .sav file.
+
+    Returns:
+        Number of rows written
+    """
+    builder = StatisticalBlockBuilder(form, max_string_bytes=SPSS_MAX_STRING_LENGTH)
+    label = str(form.get("name", ""))
+    return await _write_spooled(
+        chunks, builder,
+        lambda variables, rows, blocks: write_sav_file(path, variables, rows, blocks, label),
+        SPSS_MAX_LABEL_LENGTH
+    )
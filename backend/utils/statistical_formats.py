@@ -0,0 +1,365 @@
+"""
+DataPulse - Stata/SPSS File Formats
+
+Writers for Stata 14+ .dta (format 118) and SPSS .sav (bytecode
+compressed) files that take the data as a sequence of column blocks.
+
+Both formats declare every string width and (for SPSS) every value
+label ahead of the data, so callers pass the final variable list and
+row count first and then the blocks in order; each block is packed into
+fixed-width records and written as it comes, so only one block is held
+in memory at a time.
+
+Block columns are aligned with the variables:
+- NUMBER/CATEGORICAL: float64 arrays, NaN for missing
+- DATE: float64 days since 1970-01-01
+- DATETIME: float64 seconds since 1970-01-01 00:00 UTC
+- TEXT: lists of UTF-8 bytes (b"" for missing)
+"""
+
+import struct
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple
+
+import numpy as np
+
+from utils.row_projector import CATEGORICAL, DATE, DATETIME, NUMBER, TEXT
+
+
+class StatisticalVariable(NamedTuple):
+    name: str
+    label: str
+    kind: str                     # NUMBER, CATEGORICAL, DATE, DATETIME or TEXT
+    width: int                    # UTF-8 bytes of the longest value (TEXT only)
+    value_labels: Dict[int, str]  # CATEGORICAL only
+
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def _utf8(value: str, max_bytes: int) -> bytes:
+    """UTF-8 bytes of value, cut to max_bytes without splitting a character"""
+    return value.encode("utf-8")[:max_bytes].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _fixed(value: str, size: int, pad: bytes = b"\0") -> bytes:
+    """UTF-8 value cut and padded to exactly size bytes"""
+    return _utf8(value, size).ljust(size, pad)
+
+
+def _record_dtype(fields: List[str]) -> np.dtype:
+    return np.dtype([(f"v{i}", field) for i, field in enumerate(fields)])
+
+
+# ============ Stata .dta (format 118) ============
+
+STATA_DOUBLE = 65526
+# "." for doubles; values above it are the extended missing values
+STATA_MISSING = struct.unpack("<d", struct.pack("<Q", 0x7FE0000000000000))[0]
+# Days from Stata's epoch (1960-01-01) to 1970-01-01
+STATA_EPOCH_DAYS = 3653
+STATA_FORMATS = {NUMBER: "%10.0g", CATEGORICAL: "%8.0g", DATE: "%td", DATETIME: "%tc"}
+STATA_MAX_VALUE_LABEL = 32000
+# Largest value a Stata value label may be attached to (.a and up are missing codes)
+STATA_MAX_LABELLED_VALUE = 2147483620
+
+
+def _dta_values(kind: str, column: np.ndarray) -> np.ndarray:
+    if kind == DATE:
+        column = column + STATA_EPOCH_DAYS
+    elif kind == DATETIME:
+        column = np.round(column * 1000) + STATA_EPOCH_DAYS * 86400000
+    return np.where(np.isnan(column), STATA_MISSING, column)
+
+
+def _dta_value_label_table(name: str, labels: Dict[int, str]) -> bytes:
+    values = sorted(v for v in labels if -2 ** 31 <= v <= STATA_MAX_LABELLED_VALUE)
+    offsets, text = [], b""
+    for value in values:
+        offsets.append(len(text))
+        text += labels[value].encode("utf-8")[:STATA_MAX_VALUE_LABEL - 1] + b"\0"
+    table = struct.pack(f"<ii{len(values)}i{len(values)}i", len(values), len(text), *offsets, *values) + text
+    return b"<lbl>" + struct.pack("<i", len(table)) + _fixed(name, 129) + b"\0" * 3 + table + b"</lbl>"
+
+
+def write_dta_file(
+    path: str,
+    variables: List[StatisticalVariable],
+    rows: int,
+    blocks: Iterable[List],
+    file_label: str = ""
+):
+    """Write a Stata 118 .dta file; string widths must already be final"""
+    stamp = datetime.now(timezone.utc)
+    timestamp = f"{stamp.day:02d} {MONTHS[stamp.month - 1]} {stamp:%Y %H:%M}".encode("ascii")
+    label = _utf8(file_label, 320)
+    widths = [max(var.width, 1) for var in variables]
+    dtype = _record_dtype(["<f8" if var.kind != TEXT else f"S{w}" for var, w in zip(variables, widths)])
+    labelled = [var for var in variables if var.value_labels]
+
+    with open(path, "wb") as f:
+        offsets = [0]
+
+        def section(tag: str, body: bytes = b""):
+            offsets.append(f.tell())
+            f.write(f"<{tag}>".encode("ascii") + body + f"</{tag}>".encode("ascii"))
+
+        f.write(
+            b"<stata_dta><header><release>118</release><byteorder>LSF</byteorder>"
+            + b"<K>" + struct.pack("<H", len(variables)) + b"</K>"
+            + b"<N>" + struct.pack("<Q", rows) + b"</N>"
+            + b"<label>" + struct.pack("<H", len(label)) + label + b"</label>"
+            + b"<timestamp>" + struct.pack("<B", len(timestamp)) + timestamp + b"</timestamp>"
+            + b"</header>"
+        )
+        map_at = f.tell()
+        section("map", b"\0" * 8 * 14)
+        section("variable_types", b"".join(
+            struct.pack("<H", STATA_DOUBLE if var.kind != TEXT else w) for var, w in zip(variables, widths)
+        ))
+        section("varnames", b"".join(_fixed(var.name, 129) for var in variables))
+        section("sortlist", b"\0\0" * (len(variables) + 1))
+        section("formats", b"".join(
+            _fixed(STATA_FORMATS.get(var.kind, f"%{w}s"), 57) for var, w in zip(variables, widths)
+        ))
+        section("value_label_names", b"".join(
+            _fixed(var.name if var.value_labels else "", 129) for var in variables
+        ))
+        section("variable_labels", b"".join(_fixed(var.label, 321) for var in variables))
+        section("characteristics")
+
+        offsets.append(f.tell())
+        f.write(b"<data>")
+        for block in blocks:
+            records = np.zeros(len(block[0]), dtype)
+            for i, (var, column) in enumerate(zip(variables, block)):
+                records[f"v{i}"] = column if var.kind == TEXT else _dta_values(var.kind, column)
+            f.write(records.tobytes())
+        f.write(b"</data>")
+
+        section("strls")
+        section("value_labels", b"".join(_dta_value_label_table(var.name, var.value_labels) for var in labelled))
+        offsets.append(f.tell())
+        f.write(b"</stata_dta>")
+        offsets.append(f.tell())
+
+        f.seek(map_at + len(b"<map>"))
+        f.write(struct.pack("<14Q", *offsets))
+
+
+# ============ SPSS .sav ============
+
+SPSS_SYSMIS = -np.finfo(np.float64).max
+# Seconds from SPSS's epoch (1582-10-14) to 1970-01-01
+SPSS_EPOCH_SECONDS = 12219379200
+SPSS_MAX_VALUE_LABEL = 120
+SPSS_MAX_VARIABLE_LABEL = 255
+# Strings wider than this are split into segments of 255 bytes (252 bytes of declared width each)
+SPSS_SEGMENT_WIDTH = 255
+
+# Print/write formats: (format type << 16) | (width << 8) | decimals
+SPSS_FORMATS = {
+    NUMBER: (5 << 16) | (8 << 8) | 2,       # F8.2
+    CATEGORICAL: (5 << 16) | (8 << 8),      # F8.0
+    DATE: (20 << 16) | (11 << 8),           # DATE11
+    DATETIME: (22 << 16) | (20 << 8),       # DATETIME20
+}
+SPSS_MEASURES = {TEXT: 1, CATEGORICAL: 1}  # nominal; everything else scale (3)
+
+# Compression opcodes
+_BIAS = 100
+_RAW = 253
+_SPACES = 254
+_SYSMIS = 255
+_ALL_SPACES = np.frombuffer(b" " * 8, "<u8")[0]
+
+
+def _segments(var: StatisticalVariable) -> List[int]:
+    """Declared widths of the segments a variable is stored in (0 for numbers)"""
+    if var.kind != TEXT:
+        return [0]
+    width = max(var.width, 1)
+    if width <= SPSS_SEGMENT_WIDTH:
+        return [width]
+    count = (width + 251) // 252
+    return [SPSS_SEGMENT_WIDTH] * (count - 1) + [width - (count - 1) * 252]
+
+
+def _storage(width: int) -> int:
+    """Bytes a segment takes in a case (8 for numbers)"""
+    return max((width + 7) // 8 * 8, 8)
+
+
+def _sav_string_cells(values: List[bytes], segments: List[int]) -> List[bytes]:
+    """Space padded string cells; very long strings packed 255 bytes per segment"""
+    if len(segments) == 1:
+        size = _storage(segments[0])
+        return [value.ljust(size, b" ") for value in values]
+    cells = []
+    for value in values:
+        cells.append(b"".join(
+            value[j * SPSS_SEGMENT_WIDTH:(j + 1) * SPSS_SEGMENT_WIDTH].ljust(_storage(width), b" ")
+            for j, width in enumerate(segments)
+        ))
+    return cells
+
+
+def _sav_values(kind: str, column: np.ndarray) -> np.ndarray:
+    if kind == DATE:
+        return column * 86400 + SPSS_EPOCH_SECONDS
+    if kind == DATETIME:
+        return column + SPSS_EPOCH_SECONDS
+    return column
+
+
+def _numeric_opcodes(values: np.ndarray) -> np.ndarray:
+    compact = (values == np.floor(values)) & (values >= 1 - _BIAS) & (values <= 251 - _BIAS)
+    return np.where(np.isnan(values), _SYSMIS, np.where(compact, values + _BIAS, _RAW)).astype(np.uint8)
+
+
+class _BytecodeWriter:
+    """
+    Bytecode-compressed case data: groups of 8 opcodes, each followed by
+    the raw 8-byte elements of its opcodes that are 253. Groups run on
+    across cases and blocks.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.codes = np.empty(0, np.uint8)
+        self.raw = np.empty(0, "<u8")
+
+    def write(self, codes: np.ndarray, elements: np.ndarray):
+        raw = np.concatenate([self.raw, elements[codes == _RAW]])
+        codes = np.concatenate([self.codes, codes])
+        full = len(codes) // 8 * 8
+        carried = int((codes[full:] == _RAW).sum())
+        self._emit(codes[:full], raw[:len(raw) - carried])
+        self.codes, self.raw = codes[full:], raw[len(raw) - carried:]
+
+    def close(self):
+        if len(self.codes):
+            padding = np.zeros(8 - len(self.codes), np.uint8)
+            self._emit(np.concatenate([self.codes, padding]), self.raw)
+
+    def _emit(self, codes: np.ndarray, raw: np.ndarray):
+        if not len(codes):
+            return
+        groups = codes.reshape(-1, 8)
+        per_group = (groups == _RAW).sum(axis=1)
+        starts = np.arange(len(groups)) + np.concatenate([[0], np.cumsum(per_group)[:-1]])
+        out = np.empty(len(groups) + len(raw), "<u8")
+        is_opcode = np.zeros(len(out), bool)
+        is_opcode[starts] = True
+        out[is_opcode] = np.ascontiguousarray(groups).view("<u8").ravel()
+        out[~is_opcode] = raw
+        self.f.write(out.tobytes())
+
+
+def _extension(subtype: int, size: int, data: bytes) -> bytes:
+    return struct.pack("<4i", 7, subtype, size, len(data) // size) + data
+
+
+def write_sav_file(
+    path: str,
+    variables: List[StatisticalVariable],
+    rows: int,
+    blocks: Iterable[List],
+    file_label: str = ""
+):
+    """Write a bytecode-compressed SPSS .sav file; string widths and value labels must already be final"""
+    layouts = [_segments(var) for var in variables]
+    elements = sum(_storage(width) // 8 for segments in layouts for width in segments)
+    stamp = datetime.now()
+
+    with open(path, "wb") as f:
+        f.write(
+            b"$FL2" + _fixed("@(#) SPSS DATA FILE DataPulse", 60, b" ")
+            + struct.pack("<5i", 2, elements, 1, 0, rows if rows < 2 ** 31 else -1)
+            + struct.pack("<d", _BIAS)
+            + f"{stamp.day:02d} {MONTHS[stamp.month - 1]} {stamp:%y}".encode("ascii")
+            + stamp.strftime("%H:%M:%S").encode("ascii")
+            + _fixed(file_label, 64, b" ") + b"\0" * 3
+        )
+
+        # Variable records: one per segment, plus a continuation record per extra 8 bytes
+        short_names, first_records, display = [], [], []
+        record = 0
+        for var, segments in zip(variables, layouts):
+            first_records.append(record + 1)
+            label = _utf8(var.label, SPSS_MAX_VARIABLE_LABEL)
+            for j, width in enumerate(segments):
+                short_name = f"V{len(short_names) + 1}" if j == 0 else f"S{record + 1}"
+                if j == 0:
+                    short_names.append(short_name)
+                fmt = SPSS_FORMATS[var.kind] if var.kind != TEXT else (1 << 16) | (width << 8)
+                has_label = j == 0 and bool(label)
+                f.write(struct.pack("<6i", 2, width, int(has_label), 0, fmt, fmt) + _fixed(short_name, 8, b" "))
+                if has_label:
+                    f.write(struct.pack("<i", len(label)) + label.ljust((len(label) + 3) // 4 * 4, b" "))
+                for _ in range(_storage(width) // 8 - 1):
+                    f.write(struct.pack("<6i", 2, -1, 0, 0, 0, 0) + b" " * 8)
+                record += _storage(width) // 8
+                # Measure, display width, alignment (left for strings, right for numbers)
+                if var.kind == TEXT:
+                    display += [SPSS_MEASURES[TEXT], min(width, 40), 0]
+                else:
+                    display += [SPSS_MEASURES.get(var.kind, 3), 8, 1]
+
+        for var, index in zip(variables, first_records):
+            if not var.value_labels:
+                continue
+            f.write(struct.pack("<ii", 3, len(var.value_labels)))
+            for value, text in sorted(var.value_labels.items()):
+                encoded = _utf8(text, SPSS_MAX_VALUE_LABEL)
+                entry = struct.pack("<dB", value, len(encoded)) + encoded
+                f.write(entry.ljust(8 + (len(entry) - 8 + 7) // 8 * 8, b" "))
+            f.write(struct.pack("<iii", 4, 1, index))
+
+        f.write(_extension(3, 4, struct.pack("<8i", 1, 0, 0, -1, 1, 1, 2, 65001)))
+        f.write(_extension(4, 8, struct.pack(
+            "<3d", SPSS_SYSMIS, np.finfo(np.float64).max, np.nextafter(SPSS_SYSMIS, 0)
+        )))
+        f.write(_extension(11, 4, struct.pack(f"<{len(display)}i", *display)))
+        f.write(_extension(13, 1, "\t".join(
+            f"{short}={var.name}" for short, var in zip(short_names, variables)
+        ).encode("utf-8")))
+        very_long = [
+            f"{short}={var.width:05d}\0\t" for short, var, segments in zip(short_names, variables, layouts)
+            if len(segments) > 1
+        ]
+        if very_long:
+            f.write(_extension(14, 1, "".join(very_long).encode("utf-8")))
+        f.write(_extension(20, 1, b"UTF-8"))
+        f.write(struct.pack("<ii", 999, 0))
+
+        # Each case is a row of 8-byte elements; opcodes are chosen per element
+        fields, kinds = [], []
+        for var, segments in zip(variables, layouts):
+            size = sum(_storage(width) for width in segments)
+            fields.append("<f8" if var.kind != TEXT else f"S{size}")
+            kinds.append((var, segments, size // 8))
+        dtype = _record_dtype(fields)
+        compressor = _BytecodeWriter(f)
+        for block in blocks:
+            count = len(block[0])
+            records = np.zeros(count, dtype)
+            codes = np.empty((count, elements), np.uint8)
+            position = 0
+            for i, ((var, segments, width), column) in enumerate(zip(kinds, block)):
+                if var.kind == TEXT:
+                    records[f"v{i}"] = _sav_string_cells(column, segments)
+                else:
+                    values = _sav_values(var.kind, column)
+                    records[f"v{i}"] = values
+                    codes[:, position] = _numeric_opcodes(values)
+                position += width
+            units = np.frombuffer(records.tobytes(), "<u8").reshape(count, elements)
+            position = 0
+            for var, segments, width in kinds:
+                if var.kind == TEXT:
+                    part = units[:, position:position + width]
+                    codes[:, position:position + width] = np.where(part == _ALL_SPACES, _SPACES, _RAW)
+                position += width
+            compressor.write(codes.ravel(), units.ravel())
+        compressor.close()
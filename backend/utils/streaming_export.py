@@ -7,12 +7,244 @@ Memory-efficient streaming exports for large datasets.
 import csv
 import io
 import json
-from typing import AsyncGenerator, List, Dict, Any, Optional
+import zlib
+from datetime import date, datetime, timezone
+from typing import AsyncGenerator, AsyncIterator, List, Dict, Any, Optional
 from fastapi.responses import StreamingResponse
 import pandas as pd
 
 from config.scalability import CHUNK_SIZE, STREAM_CHUNK_SIZE
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+# Supported stream compressions
+COMPRESSIONS = {
+    "gzip": {"extension": ".gz", "media_type": "application/gzip"},
+    "zstd": {"extension": ".zst", "media_type": "application/zstd"},
+}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def flatten_dict(d: Dict, parent_key: str = '', sep: str = '.') -> Dict:
+    """Flatten nested dictionary"""
+    items = []
+    for k, v in d.items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if isinstance(v, dict):
+            items.extend(flatten_dict(v, new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def coerce_float(value: Any) -> Optional[float]:
+    """Coerce a submitted value to float, None if not numeric"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def coerce_datetime(value: Any) -> Optional[datetime]:
+    """Coerce a datetime or ISO string to a timezone-aware datetime (UTC if naive)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def coerce_date(value: Any) -> Optional[date]:
+    """Coerce a date, datetime or ISO string to a date"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def coerce_str(value: Any) -> Optional[str]:
+    """Coerce a value to string, JSON-encoding lists and dicts"""
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def coerce_str_list(value: Any) -> Optional[List[str]]:
+    """Coerce a multi-choice answer to a list of strings"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def json_dumps(value: Any) -> bytes:
+    """Serialize to compact JSON bytes (orjson when installed, stdlib json otherwise)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_loads(data: bytes) -> Any:
+    """Parse JSON bytes (orjson when installed, stdlib json otherwise)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def available_compressions() -> List[str]:
+    """Compressions usable in this process (zstd needs the zstandard package)"""
+    return [name for name in COMPRESSIONS if name != "zstd" or ZSTD_AVAILABLE]
+
+
+def negotiate_compression(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a Content-Encoding from an Accept-Encoding header.
+    
+    zstd is preferred over gzip when both are accepted with the same
+    quality; returns None if the client accepts neither.
+    """
+    if not accept_encoding:
+        return None
+    
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    
+    candidates = [
+        (accepted.get(name, accepted.get("*", 0.0)), -rank, name)
+        for rank, name in enumerate(reversed(available_compressions()))
+    ]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+
+def compressor(compression: str):
+    """Streaming compressor object with compress()/flush() for the given compression"""
+    if compression == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd compression is not available")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+async def compress_stream(
+    byte_chunks: AsyncIterator[bytes],
+    compression: str
+) -> AsyncGenerator[bytes, None]:
+    """Compress a byte stream on the fly"""
+    comp = compressor(compression)
+    async for data in byte_chunks:
+        out = comp.compress(data)
+        if out:
+            yield out
+    tail = comp.flush()
+    if tail:
+        yield tail
+
+
+def compress_file(src: str, dest: str, compression: str):
+    """Compress a finished export file (blocking; run in an executor)"""
+    comp = compressor(compression)
+    with open(src, "rb") as fin, open(dest, "wb") as fout:
+        while True:
+            data = fin.read(STREAM_CHUNK_SIZE)
+            if not data:
+                break
+            fout.write(comp.compress(data))
+        fout.write(comp.flush())
+
+
+async def cursor_chunks(
+    cursor,
+    chunk_size: int = CHUNK_SIZE
+) -> AsyncGenerator[List[Dict], None]:
+    """
+    Async generator that drains a Motor cursor in fixed-size chunks.
+    
+    Only one chunk is held in memory at a time, so memory use stays flat
+    regardless of how many documents the query matches.
+    
+    Args:
+        cursor: Motor cursor (e.g. db.submissions.find(query))
+        chunk_size: Documents per chunk (also used as the server batch size)
+    """
+    cursor.batch_size(chunk_size)
+    while True:
+        chunk = await cursor.to_list(length=chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_file(fileobj, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Generator that reads a staged export file in chunks and closes it.
+    
+    Use with spooled/temporary files so the response body is streamed
+    rather than read into memory in one piece.
+    """
+    try:
+        fileobj.seek(0)
+        while True:
+            data = fileobj.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        fileobj.close()
+
 
 async def stream_csv_response(
     data_generator: AsyncGenerator[List[Dict], None],
@@ -23,21 +255,36 @@ async def stream_csv_response(
     Create a streaming CSV response from a data generator.
     
     Args:
-        data_generator: Async generator yielding chunks of data
+        data_generator: Async generator yielding chunks of rows (dicts, or
+            lists aligned with columns)
         filename: Output filename
         columns: Column names (if None, inferred from first row)
     """
     async def generate():
+        nonlocal columns
         header_written = False
         
+        # With known columns the header goes out before the first query batch
+        if columns is not None:
+            output = io.StringIO()
+            csv.DictWriter(output, fieldnames=columns).writeheader()
+            header_written = True
+            yield output.getvalue().encode('utf-8')
+        
         async for chunk in data_generator:
             if not chunk:
                 continue
             
             output = io.StringIO()
             
+            # Rows are dicts, or lists already aligned with columns
+            if not isinstance(chunk[0], dict):
+                writer = csv.writer(output)
+                writer.writerows(chunk)
+                yield output.getvalue().encode('utf-8')
+                continue
+            
             # Get columns from first chunk if not provided
-            nonlocal columns
             if columns is None:
                 columns = list(chunk[0].keys()) if chunk else []
             
@@ -63,39 +310,63 @@ async def stream_csv_response(
     )
 
 
+def _encoded_response(
+    body: AsyncIterator[bytes],
+    filename: str,
+    media_type: str,
+    compression: Optional[str] = None,
+    content_encoding: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Wrap a byte stream in a download response, optionally compressed.
+    
+    compression produces a compressed file (e.g. export.ndjson.gz);
+    content_encoding compresses on the wire only, for clients that
+    negotiated it through Accept-Encoding.
+    """
+    headers = {}
+    if compression:
+        body = compress_stream(body, compression)
+        filename += COMPRESSIONS[compression]["extension"]
+        media_type = COMPRESSIONS[compression]["media_type"]
+    elif content_encoding:
+        body = compress_stream(body, content_encoding)
+        headers["Content-Encoding"] = content_encoding
+        headers["Vary"] = "Accept-Encoding"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
 async def stream_json_response(
     data_generator: AsyncGenerator[List[Dict], None],
-    filename: str
+    filename: str,
+    compression: Optional[str] = None,
+    content_encoding: Optional[str] = None
 ) -> StreamingResponse:
     """
-    Create a streaming JSON response from a data generator.
-    Outputs JSON Lines format for efficient streaming.
+    Create a streaming JSON array response from a data generator.
+    Each chunk is serialized in one piece, so memory stays bounded by the chunk size.
     """
     async def generate():
-        yield b'[\n'
         first = True
-        
+        yield b'['
         async for chunk in data_generator:
-            for row in chunk:
-                if not first:
-                    yield b',\n'
-                first = False
-                yield json.dumps(row).encode('utf-8')
-        
-        yield b'\n]'
+            if not chunk:
+                continue
+            body = b',\n'.join(json_dumps(row) for row in chunk)
+            yield body if first else b',\n' + body
+            first = False
+        yield b']\n'
     
-    return StreamingResponse(
-        generate(),
-        media_type="application/json",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        }
-    )
+    return _encoded_response(generate(), filename, "application/json", compression, content_encoding)
 
 
 async def stream_jsonl_response(
     data_generator: AsyncGenerator[List[Dict], None],
-    filename: str
+    filename: str,
+    compression: Optional[str] = None,
+    content_encoding: Optional[str] = None
 ) -> StreamingResponse:
     """
     Create a streaming JSON Lines response.
@@ -103,16 +374,10 @@ async def stream_jsonl_response(
     """
     async def generate():
         async for chunk in data_generator:
-            for row in chunk:
-                yield (json.dumps(row) + '\n').encode('utf-8')
+            if chunk:
+                yield b''.join(json_dumps(row) + b'\n' for row in chunk)
     
-    return StreamingResponse(
-        generate(),
-        media_type="application/x-ndjson",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        }
-    )
+    return _encoded_response(generate(), filename, "application/x-ndjson", compression, content_encoding)
 
 
 def dataframe_to_chunks(
@@ -0,0 +1,106 @@
+"""
+DataPulse - Submission Field Selection
+
+Turns a `fields=` selector (submission metadata names plus data.<path>
+entries) into a MongoDB projection, and renders the projected documents
+as plain JSON-ready dicts. Listings then neither load nor validate the
+answer payloads they do not show.
+
+    fields=id,status,submitted_at,data.age,data.household.size
+    exclude_data=true   -> every metadata field, no `data`
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from starlette.responses import Response
+
+from utils.streaming_export import json_dumps
+
+
+# Selectable metadata, in SubmissionOut field order
+SUBMISSION_FIELDS = (
+    "id", "form_id", "form_version", "data", "submitted_by", "submitted_at",
+    "status", "quality_score", "quality_flags", "gps_location"
+)
+# Defaults SubmissionOut applies to optional fields
+_FIELD_DEFAULTS = {"quality_score": None, "quality_flags": [], "gps_location": None}
+
+MAX_SELECTED_FIELDS = 100
+
+
+class FieldSelection:
+    """
+    Parsed `fields` / `exclude_data` parameters of a submission read.
+
+    Usage:
+        selection = FieldSelection(fields, exclude_data)
+        docs = await db.submissions.find(query, selection.projection()).to_list(n)
+        return json_response([selection.render(d) for d in docs])
+
+    Raises:
+        HTTPException: 400 for unknown fields or malformed data paths
+    """
+
+    def __init__(self, fields: Optional[str] = None, exclude_data: bool = False):
+        self.exclude_data = exclude_data
+        self.metadata: List[str] = []
+        self.data_paths: List[str] = []
+
+        names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+        if len(names) > MAX_SELECTED_FIELDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_SELECTED_FIELDS} fields can be selected")
+        for name in dict.fromkeys(names):
+            if name.startswith("data."):
+                path = name[len("data."):]
+                if not path or "$" in path or any(not part for part in path.split(".")):
+                    raise HTTPException(status_code=400, detail=f"Invalid data path: {name}")
+                self.data_paths.append(path)
+            elif name in SUBMISSION_FIELDS:
+                self.metadata.append(name)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+
+        if "data" in self.metadata:
+            # The whole answer object already covers its paths
+            self.data_paths = []
+        if exclude_data:
+            self.metadata = [name for name in self.metadata if name != "data"]
+            self.data_paths = []
+
+    @property
+    def selected(self) -> bool:
+        return bool(self.metadata or self.data_paths)
+
+    def projection(self, extra: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        MongoDB projection for the selection; `extra` fields are loaded
+        too (e.g. pagination sort keys) but not rendered.
+        """
+        if not self.selected:
+            return {"_id": 0, "data": 0} if self.exclude_data else {"_id": 0}
+        projection = {"_id": 0, "id": 1}
+        for name in self.metadata:
+            projection[name] = 1
+        for path in self.data_paths:
+            projection[f"data.{path}"] = 1
+        for name in extra:
+            if name != "data" and not name.startswith("data."):
+                projection[name] = 1
+        return projection
+
+    def render(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-ready output for a document read with projection()"""
+        if not self.selected:
+            names = [name for name in SUBMISSION_FIELDS if not (self.exclude_data and name == "data")]
+        else:
+            names = ["id"] + [name for name in self.metadata if name != "id"]
+        out = {name: doc.get(name, _FIELD_DEFAULTS.get(name)) for name in names}
+        if self.data_paths:
+            out["data"] = doc.get("data") or {}
+        return out
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response serialized as is (no response_model validation pass)"""
+    return Response(content=json_dumps(content), media_type="application/json", headers=headers)
@@ -0,0 +1,81 @@
+"""
+DataPulse - Task Batcher
+
+Coalesces ids (e.g. new submission ids) into batched Celery publishes.
+
+An id is published right away when the batcher is idle. Ids that arrive
+while a publish is still in flight are collected and sent together with
+the next publish, so batches grow with load (up to max_batch) and light
+traffic sees no added latency.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+TASK_BATCH_MAX = int(os.environ.get("TASK_BATCH_MAX", "200"))
+
+
+class TaskBatcher:
+    """
+    Usage:
+        batcher = TaskBatcher(lambda ids: run_submission_pipeline.delay(ids))
+        await batcher.start()
+        batcher.add(submission_id)
+        ...
+        await batcher.stop()  # publishes anything still pending
+    """
+
+    def __init__(self, publish: Callable[[List[Any]], Any], max_batch: int = TASK_BATCH_MAX, name: str = "tasks"):
+        self.publish = publish
+        self.max_batch = max_batch
+        self.name = name
+        self._pending: List[Any] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    def add(self, item: Any):
+        """Queue an id for the next publish (never blocks)"""
+        if not self.running:
+            raise RuntimeError(f"Task batcher '{self.name}' is not running")
+        self._pending.append(item)
+        self._wake.set()
+
+    async def _publish_pending(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            try:
+                # Broker calls block; keep them off the event loop
+                await loop.run_in_executor(None, self.publish, batch)
+            except Exception as e:
+                logger.warning(f"Task batcher '{self.name}' failed to publish {len(batch)} ids: {e}")
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self._publish_pending()
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        await self._publish_pending()
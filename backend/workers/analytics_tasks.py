@@ -2,104 +2,27 @@
 FieldForce Analytics Background Tasks
 Aggregation and reporting tasks for high-volume data
 """
-import os
 from datetime import datetime, timezone, timedelta
 from celery import shared_task
-from pymongo import MongoClient
 
-# MongoDB connection
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-DB_NAME = os.environ.get('DB_NAME', 'fieldforce')
-
-
-def get_sync_db():
-    """Get synchronous MongoDB client for Celery tasks"""
-    client = MongoClient(MONGO_URL)
-    return client[DB_NAME]
+from utils.counters import COUNTERS, exact_count_pipeline, reconcile_updates
+from utils.mongo_pool import get_sync_db
+from utils.rollup_engine import ROLLUP_REBUILD_DAYS, RollupBusy, rebuild_rollups, roll_up_new_submissions
+from utils.rollups import HOURLY_ROLLUP_RETENTION_DAYS, ROLLUP_STATE, hour_floor, iso
 
 
 @shared_task
-def aggregate_hourly_stats():
+def roll_up_submissions():
     """
-    Aggregate submission stats every hour.
-    Pre-computes metrics for dashboard performance.
+    Merge submissions synced since the last run into the hourly, daily
+    and team rollups (incremental, watermark on synced_at).
     """
     try:
         db = get_sync_db()
+        return {"status": "success", **roll_up_new_submissions(db)}
         
-        now = datetime.now(timezone.utc)
-        hour_start = now.replace(minute=0, second=0, microsecond=0)
-        hour_end = hour_start + timedelta(hours=1)
-        
-        # Aggregate submissions by organization
-        pipeline = [
-            {
-                "$match": {
-                    "submitted_at": {
-                        "$gte": hour_start.isoformat(),
-                        "$lt": hour_end.isoformat()
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "org_id": "$org_id",
-                        "project_id": "$project_id",
-                        "form_id": "$form_id"
-                    },
-                    "count": {"$sum": 1},
-                    "avg_quality": {"$avg": "$quality_score"},
-                    "validated": {
-                        "$sum": {"$cond": [{"$eq": ["$status", "validated"]}, 1, 0]}
-                    },
-                    "pending": {
-                        "$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}
-                    },
-                    "flagged": {
-                        "$sum": {"$cond": [{"$eq": ["$status", "flagged"]}, 1, 0]}
-                    }
-                }
-            }
-        ]
-        
-        results = list(db.submissions.aggregate(pipeline))
-        
-        # Store aggregated stats
-        for result in results:
-            stat_doc = {
-                "org_id": result["_id"]["org_id"],
-                "project_id": result["_id"]["project_id"],
-                "form_id": result["_id"]["form_id"],
-                "period": "hourly",
-                "period_start": hour_start.isoformat(),
-                "period_end": hour_end.isoformat(),
-                "submission_count": result["count"],
-                "avg_quality_score": result["avg_quality"],
-                "validated_count": result["validated"],
-                "pending_count": result["pending"],
-                "flagged_count": result["flagged"],
-                "created_at": now.isoformat()
-            }
-            
-            # Upsert to avoid duplicates
-            db.analytics_hourly.update_one(
-                {
-                    "org_id": stat_doc["org_id"],
-                    "project_id": stat_doc["project_id"],
-                    "form_id": stat_doc["form_id"],
-                    "period_start": stat_doc["period_start"]
-                },
-                {"$set": stat_doc},
-                upsert=True
-            )
-        
-        return {
-            "status": "success",
-            "period": hour_start.isoformat(),
-            "aggregations": len(results)
-        }
-        
+    except RollupBusy as e:
+        return {"status": "skipped", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -107,121 +30,18 @@ def aggregate_hourly_stats():
 @shared_task
 def aggregate_daily_stats():
     """
-    Aggregate daily submission stats.
-    Runs at end of each day.
+    Rebuild the rollups of the last ROLLUP_REBUILD_DAYS days from the
+    submissions, picking up review status changes, async quality scores
+    and deletions the incremental runs do not see.
     """
     try:
         db = get_sync_db()
         
-        now = datetime.now(timezone.utc)
-        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # Aggregate by organization
-        pipeline = [
-            {
-                "$match": {
-                    "submitted_at": {
-                        "$gte": day_start.isoformat(),
-                        "$lt": day_end.isoformat()
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$org_id",
-                    "total_submissions": {"$sum": 1},
-                    "unique_forms": {"$addToSet": "$form_id"},
-                    "unique_users": {"$addToSet": "$submitted_by"},
-                    "avg_quality": {"$avg": "$quality_score"},
-                    "validated": {
-                        "$sum": {"$cond": [{"$eq": ["$status", "validated"]}, 1, 0]}
-                    },
-                    "with_gps": {
-                        "$sum": {"$cond": [{"$ne": ["$gps_location", None]}, 1, 0]}
-                    },
-                    "with_media": {
-                        "$sum": {"$cond": [{"$eq": ["$has_media", True]}, 1, 0]}
-                    }
-                }
-            }
-        ]
-        
-        results = list(db.submissions.aggregate(pipeline))
-        
-        # Store daily stats
-        for result in results:
-            stat_doc = {
-                "org_id": result["_id"],
-                "date": day_start.strftime("%Y-%m-%d"),
-                "period": "daily",
-                "total_submissions": result["total_submissions"],
-                "unique_forms": len(result["unique_forms"]),
-                "unique_users": len(result["unique_users"]),
-                "avg_quality_score": result["avg_quality"],
-                "validated_count": result["validated"],
-                "submissions_with_gps": result["with_gps"],
-                "submissions_with_media": result["with_media"],
-                "created_at": now.isoformat()
-            }
-            
-            db.analytics_daily.update_one(
-                {"org_id": stat_doc["org_id"], "date": stat_doc["date"]},
-                {"$set": stat_doc},
-                upsert=True
-            )
-        
-        # Also aggregate team performance
-        team_pipeline = [
-            {
-                "$match": {
-                    "submitted_at": {
-                        "$gte": day_start.isoformat(),
-                        "$lt": day_end.isoformat()
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "org_id": "$org_id",
-                        "user_id": "$submitted_by"
-                    },
-                    "submission_count": {"$sum": 1},
-                    "avg_quality": {"$avg": "$quality_score"},
-                    "unique_forms": {"$addToSet": "$form_id"}
-                }
-            }
-        ]
-        
-        team_results = list(db.submissions.aggregate(team_pipeline))
-        
-        for result in team_results:
-            db.analytics_team_daily.update_one(
-                {
-                    "org_id": result["_id"]["org_id"],
-                    "user_id": result["_id"]["user_id"],
-                    "date": day_start.strftime("%Y-%m-%d")
-                },
-                {"$set": {
-                    "org_id": result["_id"]["org_id"],
-                    "user_id": result["_id"]["user_id"],
-                    "date": day_start.strftime("%Y-%m-%d"),
-                    "submission_count": result["submission_count"],
-                    "avg_quality_score": result["avg_quality"],
-                    "forms_used": len(result["unique_forms"]),
-                    "created_at": now.isoformat()
-                }},
-                upsert=True
-            )
-        
-        return {
-            "status": "success",
-            "date": day_start.strftime("%Y-%m-%d"),
-            "org_aggregations": len(results),
-            "team_aggregations": len(team_results)
-        }
+        since = datetime.now(timezone.utc) - timedelta(days=ROLLUP_REBUILD_DAYS - 1)
+        return {"status": "success", **rebuild_rollups(db, since)}
         
+    except RollupBusy as e:
+        return {"status": "skipped", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -238,10 +58,11 @@ def cleanup_old_data():
         
         results = {}
         
-        # Clean up old hourly stats (keep 7 days)
-        cutoff_hourly = (now - timedelta(days=7)).isoformat()
+        # Clean up old hourly rollups; daily rollups serve older ranges
+        cutoff_hourly = iso(hour_floor(now - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS)))
+        db[ROLLUP_STATE].update_one({"_id": "hourly"}, {"$max": {"rolled_from": cutoff_hourly}})
         hourly_result = db.analytics_hourly.delete_many({
-            "created_at": {"$lt": cutoff_hourly}
+            "period_start": {"$lt": cutoff_hourly}
         })
         results["hourly_stats_deleted"] = hourly_result.deleted_count
         
@@ -275,6 +96,31 @@ def cleanup_old_data():
         return {"status": "error", "message": str(e)}
 
 
+@shared_task
+def reconcile_counters():
+    """
+    Recompute every maintained counter (submissions per form/project/org,
+    alerts per org, notifications per user) from exact counts, fixing
+    any drift from lost increments or counters seeded mid-write.
+    """
+    try:
+        db = get_sync_db()
+        reconciled = {}
+        
+        for name, spec in COUNTERS.items():
+            rows = db[spec.collection].aggregate(exact_count_pipeline(name), allowDiskUse=True)
+            existing = [doc["key"] for doc in db.counters.find({"name": name}, {"key": 1})]
+            updates = reconcile_updates(name, rows, existing)
+            for start in range(0, len(updates), 1000):
+                db.counters.bulk_write(updates[start:start + 1000], ordered=False)
+            reconciled[name] = len(updates)
+        
+        return {"status": "success", "reconciled": reconciled}
+        
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
 @shared_task
 def generate_org_report(org_id: str, report_type: str, date_range: dict):
     """
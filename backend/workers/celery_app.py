@@ -5,6 +5,7 @@ Supports 2M+ daily submissions
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from kombu import Queue, Exchange
 from dotenv import load_dotenv
 
@@ -75,9 +76,9 @@ celery_app.conf.update(
     
     # Beat scheduler for periodic tasks
     beat_schedule={
-        'aggregate-hourly-stats': {
-            'task': 'workers.analytics_tasks.aggregate_hourly_stats',
-            'schedule': 3600.0,  # Every hour
+        'roll-up-submissions': {
+            'task': 'workers.analytics_tasks.roll_up_submissions',
+            'schedule': 300.0,  # Every 5 minutes (only newly synced submissions)
         },
         'aggregate-daily-stats': {
             'task': 'workers.analytics_tasks.aggregate_daily_stats',
@@ -87,9 +88,18 @@ celery_app.conf.update(
             'task': 'workers.analytics_tasks.cleanup_old_data',
             'schedule': 86400.0,  # Daily cleanup
         },
+        'reconcile-counters': {
+            'task': 'workers.analytics_tasks.reconcile_counters',
+            'schedule': 86400.0,  # Daily drift correction
+        },
     },
 )
 
+# One pooled MongoDB client per worker process, shared by all tasks
+from utils.mongo_pool import init_worker_mongo, shutdown_worker_mongo
+worker_process_init.connect(init_worker_mongo, weak=False)
+worker_process_shutdown.connect(shutdown_worker_mongo, weak=False)
+
 # Task priorities
 class TaskPriority:
     LOW = 1
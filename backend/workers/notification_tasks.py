@@ -2,20 +2,20 @@
 FieldForce Notification Background Tasks
 Handles async notification delivery
 """
-import os
+import asyncio
 from datetime import datetime, timezone
+from typing import Dict, List
 from celery import shared_task
-from pymongo import MongoClient
 
-# MongoDB connection
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-DB_NAME = os.environ.get('DB_NAME', 'fieldforce')
+from utils.counters import apply_counter_updates_sync, counter_updates
+from utils.mongo_pool import get_sync_db
 
 
-def get_sync_db():
-    """Get synchronous MongoDB client for Celery tasks"""
-    client = MongoClient(MONGO_URL)
-    return client[DB_NAME]
+# Webhook POSTs in flight at once per delivery task
+WEBHOOK_CONCURRENCY = 20
+WEBHOOK_TIMEOUT = 10
+# Deliveries answered with these statuses (or not answered) are retried
+WEBHOOK_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
 
 
 @shared_task
@@ -121,9 +121,10 @@ def notify_submission_flagged(submission_id: str):
         }))
         
         notified = 0
+        notifications = []
         for supervisor in supervisors:
             # Create in-app notification
-            db.notifications.insert_one({
+            notification = {
                 "user_id": supervisor["user_id"],
                 "type": "submission_flagged",
                 "title": "Submission Flagged",
@@ -135,8 +136,11 @@ def notify_submission_flagged(submission_id: str):
                 },
                 "read": False,
                 "created_at": datetime.now(timezone.utc).isoformat()
-            })
+            }
+            db.notifications.insert_one(notification)
+            notifications.append(notification)
             notified += 1
+        apply_counter_updates_sync(db, counter_updates("notifications", notifications, 1))
         
         return {
             "status": "success",
@@ -182,8 +186,11 @@ def notify_daily_summary(org_id: str):
                 {
                     "date": yesterday,
                     "total_submissions": daily_stats["total_submissions"],
-                    "avg_quality": daily_stats.get("avg_quality_score", 0),
-                    "active_users": daily_stats.get("unique_users", 0)
+                    "avg_quality": (
+                        daily_stats["quality_sum"] / daily_stats["quality_count"]
+                        if daily_stats.get("quality_count") else 0
+                    ),
+                    "active_users": len(daily_stats.get("user_ids", []))
                 }
             )
             notified += 1
@@ -196,3 +203,125 @@ def notify_daily_summary(org_id: str):
         
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+def delivery_id(submission_id: str, webhook_id: str) -> str:
+    """Key of one webhook delivery; also sent as X-Webhook-Delivery-Id so receivers can dedupe"""
+    return f"{submission_id}:{webhook_id}"
+
+
+async def post_webhooks(deliveries: List[Dict]) -> List[Dict]:
+    """
+    POST submission.created for (submission, webhook) pairs concurrently.
+    Returns one result per delivery: {"id", "status", "retry"}.
+    """
+    import httpx
+    
+    semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+    
+    async def post(client, delivery: Dict) -> Dict:
+        submission, webhook = delivery["submission"], delivery["webhook"]
+        async with semaphore:
+            try:
+                response = await client.post(
+                    webhook["url"],
+                    json={
+                        "event": "submission.created",
+                        "submission_id": submission["id"],
+                        "form_id": submission["form_id"],
+                        "timestamp": datetime.now(timezone.utc).isoformat()
+                    },
+                    headers={"X-Webhook-Delivery-Id": delivery["id"]}
+                )
+            except Exception as e:
+                return {"id": delivery["id"], "status": "error", "message": str(e), "retry": True}
+        return {
+            "id": delivery["id"],
+            "status": response.status_code,
+            "retry": response.status_code in WEBHOOK_RETRY_STATUSES
+        }
+    
+    async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT) as client:
+        return await asyncio.gather(*(post(client, delivery) for delivery in deliveries))
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def deliver_submission_webhooks(self, submission_ids: List[str]):
+    """
+    Deliver submission.created webhooks for a batch of new submissions.
+    
+    Runs on the notifications queue, apart from the submission pipeline,
+    so slow endpoints never hold up scoring. Each (submission, webhook)
+    delivery is recorded in webhook_deliveries; a retry only resends the
+    deliveries that failed with a timeout, connection error or 408/429/5xx.
+    """
+    db = get_sync_db()
+    
+    submissions = list(db.submissions.find(
+        {"id": {"$in": submission_ids}},
+        {"_id": 0, "id": 1, "form_id": 1, "org_id": 1}
+    ))
+    webhooks_by_org: Dict[str, List[Dict]] = {}
+    for webhook in db.webhooks.find({
+        "org_id": {"$in": list({s.get("org_id") for s in submissions})},
+        "event": "submission.created",
+        "enabled": True
+    }, {"_id": 0}):
+        webhooks_by_org.setdefault(webhook["org_id"], []).append(webhook)
+    
+    deliveries = [
+        {"id": delivery_id(submission["id"], webhook["id"]), "submission": submission, "webhook": webhook}
+        for submission in submissions
+        for webhook in webhooks_by_org.get(submission.get("org_id"), [])
+    ]
+    if not deliveries:
+        return {"status": "success", "delivered": 0, "failed": 0, "pending": 0, "skipped": 0}
+    
+    # Already delivered by an earlier attempt of this task
+    done = set(db.webhook_deliveries.distinct("_id", {
+        "_id": {"$in": [d["id"] for d in deliveries]},
+        "status": {"$in": ["delivered", "failed"]}
+    }))
+    deliveries = [d for d in deliveries if d["id"] not in done]
+    
+    results = asyncio.run(post_webhooks(deliveries)) if deliveries else []
+    
+    from pymongo import UpdateOne
+    now = datetime.now(timezone.utc)
+    states = {"delivered": 0, "failed": 0, "pending": 0}
+    operations = []
+    for delivery, result in zip(deliveries, results):
+        if result["retry"]:
+            state = "pending"
+        elif result["status"] < 400:
+            state = "delivered"
+        else:
+            state = "failed"
+        states[state] += 1
+        operations.append(UpdateOne(
+            {"_id": delivery["id"]},
+            {
+                "$set": {
+                    "status": state,
+                    "response_status": result["status"],
+                    "message": result.get("message"),
+                    "updated_at": now
+                },
+                "$setOnInsert": {
+                    "submission_id": delivery["submission"]["id"],
+                    "webhook_id": delivery["webhook"]["id"],
+                    "org_id": delivery["submission"].get("org_id"),
+                    "created_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            upsert=True
+        ))
+    if operations:
+        db.webhook_deliveries.bulk_write(operations, ordered=False)
+    
+    if states["pending"]:
+        # Back off 1, 2, 4... minutes; finished deliveries are skipped next time
+        raise self.retry(countdown=60 * 2 ** self.request.retries)
+    
+    return {"status": "success", **states, "skipped": len(done)}
@@ -2,7 +2,6 @@
 FieldForce Submission Background Tasks
 Handles async processing of submissions for 2M+ daily volume
 """
-import os
 import asyncio
 from datetime import datetime, timezone
 from typing import List, Dict, Any
@@ -10,49 +9,11 @@ from celery import shared_task
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
-load_dotenv()
-
-# MongoDB connection for workers
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-DB_NAME = os.environ.get('DB_NAME', 'fieldforce')
-
-
-def get_sync_db():
-    """Get synchronous MongoDB client for Celery tasks"""
-    from pymongo import MongoClient
-    client = MongoClient(MONGO_URL)
-    return client[DB_NAME]
+from utils.mongo_pool import get_sync_db
+from utils.quality_rules import get_quality_rules
+from workers.notification_tasks import deliver_submission_webhooks
 
-
-def calculate_quality_score(data: Dict[str, Any], form_fields: List[Dict]) -> tuple:
-    """Calculate submission quality score and flags"""
-    score = 100.0
-    flags = []
-    
-    field_map = {f["name"]: f for f in form_fields}
-    
-    for field_name, field_config in field_map.items():
-        value = data.get(field_name)
-        
-        # Check required fields
-        if field_config.get("validation", {}).get("required") and not value:
-            score -= 10
-            flags.append(f"missing_required:{field_name}")
-        
-        # Check value constraints
-        validation = field_config.get("validation", {})
-        if value is not None:
-            if validation.get("min_value") and isinstance(value, (int, float)):
-                if value < validation["min_value"]:
-                    score -= 5
-                    flags.append(f"below_min:{field_name}")
-            
-            if validation.get("max_value") and isinstance(value, (int, float)):
-                if value > validation["max_value"]:
-                    score -= 5
-                    flags.append(f"above_max:{field_name}")
-    
-    return max(0, score), flags
+load_dotenv()
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
@@ -81,10 +42,7 @@ def process_submission(self, submission_id: str):
         
         # Calculate quality score if not already done
         if submission.get("quality_score") is None:
-            quality_score, quality_flags = calculate_quality_score(
-                submission.get("data", {}),
-                form.get("fields", [])
-            )
+            quality_score, quality_flags = get_quality_rules(form).score(submission.get("data", {}))
             updates["quality_score"] = quality_score
             updates["quality_flags"] = quality_flags
         
@@ -131,44 +89,45 @@ def process_bulk_submissions(self, submission_ids: List[str]):
         results = {"processed": 0, "failed": 0, "errors": []}
         
         # Get all submissions in one query
-        submissions = list(db.submissions.find({"id": {"$in": submission_ids}}))
+        submissions = list(db.submissions.find(
+            {"id": {"$in": submission_ids}},
+            {"_id": 0, "id": 1, "form_id": 1, "data": 1}
+        ))
         
         # Group by form_id for efficient form lookups
         form_ids = set(s["form_id"] for s in submissions)
         forms = {f["id"]: f for f in db.forms.find({"id": {"$in": list(form_ids)}})}
+        by_form: Dict[str, List[Dict]] = {}
+        for submission in submissions:
+            by_form.setdefault(submission["form_id"], []).append(submission)
         
         # Prepare bulk updates
         from pymongo import UpdateOne
         operations = []
-        
-        for submission in submissions:
-            try:
-                form = forms.get(submission["form_id"])
-                if not form:
-                    results["failed"] += 1
-                    results["errors"].append({"id": submission["id"], "error": "Form not found"})
-                    continue
-                
-                # Calculate quality score
-                quality_score, quality_flags = calculate_quality_score(
-                    submission.get("data", {}),
-                    form.get("fields", [])
+        processed_at = datetime.now(timezone.utc).isoformat()
+        
+        for form_id, form_submissions in by_form.items():
+            form = forms.get(form_id)
+            if not form:
+                results["failed"] += len(form_submissions)
+                results["errors"].extend(
+                    {"id": s["id"], "error": "Form not found"} for s in form_submissions
                 )
-                
+                continue
+            
+            # Score the form's whole batch at once
+            scores = get_quality_rules(form).score_batch([s.get("data") or {} for s in form_submissions])
+            for submission, (quality_score, quality_flags) in zip(form_submissions, scores):
                 operations.append(UpdateOne(
                     {"id": submission["id"]},
                     {"$set": {
                         "quality_score": quality_score,
                         "quality_flags": quality_flags,
-                        "processed_at": datetime.now(timezone.utc).isoformat(),
+                        "processed_at": processed_at,
                         "processing_status": "completed"
                     }}
                 ))
-                results["processed"] += 1
-                
-            except Exception as e:
-                results["failed"] += 1
-                results["errors"].append({"id": submission["id"], "error": str(e)})
+            results["processed"] += len(form_submissions)
         
         # Execute bulk update
         if operations:
@@ -180,6 +139,75 @@ def process_bulk_submissions(self, submission_ids: List[str]):
         self.retry(exc=e)
 
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=120)
+def rescore_form_submissions(self, form_id: str, batch_size: int = 5000):
+    """
+    Recalculate quality scores of all of a form's submissions
+    (e.g. after its validation rules changed).
+    """
+    try:
+        db = get_sync_db()
+        
+        form = db.forms.find_one({"id": form_id})
+        if not form:
+            return {"status": "error", "message": "Form not found"}
+        rules = get_quality_rules(form)
+        
+        rescored = 0
+        cursor = db.submissions.find({"form_id": form_id}, {"_id": 0, "id": 1, "data": 1}).batch_size(batch_size)
+        batch = []
+        for submission in cursor:
+            batch.append(submission)
+            if len(batch) >= batch_size:
+                rescored += _write_scores(db, batch, rules.score_batch([s.get("data") or {} for s in batch]))
+                batch = []
+        if batch:
+            rescored += _write_scores(db, batch, rules.score_batch([s.get("data") or {} for s in batch]))
+        
+        return {"status": "success", "form_id": form_id, "rescored": rescored}
+        
+    except Exception as e:
+        self.retry(exc=e)
+
+
+def _write_scores(db, submissions: List[Dict], scores: List[tuple]) -> int:
+    """Store batch-scored quality results; returns the number of submissions"""
+    from pymongo import UpdateOne
+    db.submissions.bulk_write([
+        UpdateOne(
+            {"id": submission["id"]},
+            {"$set": {"quality_score": quality_score, "quality_flags": quality_flags}}
+        )
+        for submission, (quality_score, quality_flags) in zip(submissions, scores)
+    ], ordered=False)
+    return len(submissions)
+
+
+def find_media_fields(data: Dict[str, Any]) -> List[Dict]:
+    """Media attachments (photo/video/audio) in submission data"""
+    return [
+        {"field": key, "media": value}
+        for key, value in data.items()
+        if isinstance(value, dict) and value.get("type") in ["photo", "video", "audio"]
+    ]
+
+
+def validate_media_fields(media_fields: List[Dict]) -> List[Dict]:
+    """Validation result per media attachment"""
+    processed = []
+    for media_info in media_fields:
+        # TODO: Implement actual media processing
+        # - Download from S3
+        # - Validate file type
+        # - Generate thumbnail
+        # - Extract metadata
+        processed.append({
+            "field": media_info["field"],
+            "status": "validated"
+        })
+    return processed
+
+
 @shared_task(bind=True)
 def validate_submission_media(self, submission_id: str):
     """
@@ -195,29 +223,13 @@ def validate_submission_media(self, submission_id: str):
         if not submission:
             return {"status": "error", "message": "Submission not found"}
         
-        media_fields = []
-        data = submission.get("data", {})
-        
-        # Find media fields
-        for key, value in data.items():
-            if isinstance(value, dict) and value.get("type") in ["photo", "video", "audio"]:
-                media_fields.append({"field": key, "media": value})
+        media_fields = find_media_fields(submission.get("data", {}))
         
         if not media_fields:
             return {"status": "success", "message": "No media to process"}
         
         # Process each media file
-        processed = []
-        for media_info in media_fields:
-            # TODO: Implement actual media processing
-            # - Download from S3
-            # - Validate file type
-            # - Generate thumbnail
-            # - Extract metadata
-            processed.append({
-                "field": media_info["field"],
-                "status": "validated"
-            })
+        processed = validate_media_fields(media_fields)
         
         # Update submission with media validation status
         db.submissions.update_one(
@@ -235,50 +247,87 @@ def validate_submission_media(self, submission_id: str):
 def trigger_submission_webhooks(submission_id: str):
     """
     Trigger configured webhooks for new submission.
+    Kept for messages already queued; delivery runs in deliver_submission_webhooks.
+    """
+    task = deliver_submission_webhooks.delay([submission_id])
+    return {"status": "queued", "task_id": task.id}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def run_submission_pipeline(self, submission_ids: List[str]):
+    """
+    Post-submission pipeline for one or more new submissions.
+    Replaces process_submission, validate_submission_media and
+    trigger_submission_webhooks: each submission is loaded once and carried
+    through quality scoring, GPS checks and media validation, with one read
+    per collection and one bulk write per batch. Webhooks are then handed
+    to deliver_submission_webhooks (notifications queue), outside this
+    task's retries.
     """
-    import requests
-    
     try:
         db = get_sync_db()
+        from pymongo import UpdateOne
         
-        submission = db.submissions.find_one({"id": submission_id})
-        if not submission:
-            return {"status": "error", "message": "Submission not found"}
+        submissions = list(db.submissions.find({"id": {"$in": submission_ids}}, {"_id": 0}))
+        if not submissions:
+            return {"status": "error", "message": "Submissions not found"}
+        
+        updates = {s["id"]: {} for s in submissions}
+        
+        # Quality scores not calculated at ingest, batched per form
+        unscored: Dict[str, List[Dict]] = {}
+        for submission in submissions:
+            if submission.get("quality_score") is None:
+                unscored.setdefault(submission["form_id"], []).append(submission)
+        if unscored:
+            forms = {f["id"]: f for f in db.forms.find({"id": {"$in": list(unscored)}}, {"_id": 0})}
+            for form_id, form_submissions in unscored.items():
+                form = forms.get(form_id)
+                if not form:
+                    continue
+                scores = get_quality_rules(form).score_batch([s.get("data") or {} for s in form_submissions])
+                for submission, (quality_score, quality_flags) in zip(form_submissions, scores):
+                    updates[submission["id"]].update(quality_score=quality_score, quality_flags=quality_flags)
+        
+        # Validate GPS against project geofences (if configured)
+        located = [s for s in submissions if (s.get("gps_location") or {}).get("lat") and s["gps_location"].get("lng")]
+        if located:
+            fenced = set(db.projects.distinct("id", {
+                "id": {"$in": list({s.get("project_id") for s in located})},
+                "geofence": {"$nin": [None, {}, []]}
+            }))
+            for submission in located:
+                if submission.get("project_id") in fenced:
+                    # TODO: Implement geofence validation
+                    updates[submission["id"]]["gps_validated"] = True
         
-        # Get organization webhooks
-        org_id = submission.get("org_id")
-        webhooks = list(db.webhooks.find({
-            "org_id": org_id,
-            "event": "submission.created",
-            "enabled": True
-        }))
-        
-        results = []
-        for webhook in webhooks:
-            try:
-                response = requests.post(
-                    webhook["url"],
-                    json={
-                        "event": "submission.created",
-                        "submission_id": submission_id,
-                        "form_id": submission["form_id"],
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10
+        # Media attachments
+        for submission in submissions:
+            media_fields = find_media_fields(submission.get("data") or {})
+            if media_fields:
+                updates[submission["id"]].update(
+                    media_validated=True,
+                    media_validation_results=validate_media_fields(media_fields)
                 )
-                results.append({
-                    "webhook_id": webhook["id"],
-                    "status": response.status_code
-                })
-            except Exception as e:
-                results.append({
-                    "webhook_id": webhook["id"],
-                    "status": "error",
-                    "message": str(e)
-                })
-        
-        return {"status": "success", "webhooks_triggered": len(results), "results": results}
+        
+        # Mark as processed
+        now = datetime.now(timezone.utc).isoformat()
+        db.submissions.bulk_write([
+            UpdateOne({"id": submission_id}, {"$set": {**fields, "processed_at": now, "processing_status": "completed"}})
+            for submission_id, fields in updates.items()
+        ], ordered=False)
         
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        self.retry(exc=e)
+    
+    # Webhook fan-out, after the submissions are stored as processed
+    hooked_orgs = set(db.webhooks.distinct("org_id", {
+        "org_id": {"$in": list({s.get("org_id") for s in submissions})},
+        "event": "submission.created",
+        "enabled": True
+    }))
+    hooked = [s["id"] for s in submissions if s.get("org_id") in hooked_orgs]
+    if hooked:
+        deliver_submission_webhooks.delay(hooked)
+    
+    return {"status": "success", "processed": len(updates), "webhook_submissions": len(hooked)}